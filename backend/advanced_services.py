@@ -12,6 +12,8 @@ Advanced AI Services for RegenMed AI Pro - WORLD-CLASS TRANSFORMATION
 import asyncio
 import logging
 import json
+import os
+import time
 import numpy as np
 import base64
 from datetime import datetime, timedelta
@@ -34,6 +36,22 @@ import torch
 import torch.nn as nn
 import torchvision.transforms as transforms
 from motor.motor_asyncio import AsyncIOMotorClient
+from llm_gateway import get_llm_gateway, LLMGatewayError
+from request_coalescing import coalesce
+from eutils_client import get_eutils_client, EUtilsError, MAX_EFETCH_BATCH, PUBMED_REFRESH_FIELDS
+from literature_index import index_literature_papers, search_literature
+from dedup import deduplicate_papers, normalize_doi
+from bulk_writes import bulk_upsert
+from synthetic_training_data import (
+    generate_success_training_data, generate_timeline_training_data, generate_dosage_training_data
+)
+from cohort_risk import stratify_cohort as compute_cohort_stratification
+from diagnosis_kb import get_diagnosis_kb
+from credible_intervals import credible_intervals
+from monte_carlo import simulate_diagnostic_probabilities, summarize_simulation
+from model_registry import get_model_registry, hash_training_data, ModelNotFoundError
+from dicom_loader import LazyDicom
+from executors import run_io
 import re
 import pandas as pd
 import uuid
@@ -1258,31 +1276,12 @@ class WorldClassLiteratureService:
     def _deduplicate_multilingual_papers(self, papers: List[Dict]) -> List[Dict]:
         """Remove duplicates across different languages"""
         
-        unique_papers = []
-        seen_fingerprints = set()
-        
-        for paper in papers:
-            # Create fingerprint based on authors and key terms
-            authors = paper.get("authors", [])
-            author_fingerprint = "".join(sorted([author.split()[-1].lower() if author.split() else "" for author in authors]))
-            
-            year = paper.get("year", "")
-            
-            # Extract key terms from title (translated or original)
-            title = paper.get("title", "").lower()
-            key_terms = re.findall(r'\b\w{4,}\b', title)[:5]  # First 5 significant words
-            key_terms_fingerprint = "".join(sorted(key_terms))
-            
-            fingerprint = f"{author_fingerprint}_{year}_{key_terms_fingerprint}"
-            
-            if fingerprint not in seen_fingerprints:
-                seen_fingerprints.add(fingerprint)
-                unique_papers.append(paper)
-            else:
-                # Mark as potential duplicate
-                paper["duplicate_status"] = "potential_duplicate"
-        
-        return unique_papers
+        # Non-English papers carry their English translation in "title"; keep the original alongside
+        return deduplicate_papers(papers, text_getter=lambda paper: paper.get("translated_title") or paper.get("title", ""))
+
+    def _deduplicate_papers(self, papers: List[Dict]) -> List[Dict]:
+        """Remove duplicate papers (PMID/DOI match or near-identical titles)"""
+        return deduplicate_papers(papers)
 
     async def _rank_multilingual_studies(self, studies: List[Dict], condition: str, intervention: str) -> List[Dict]:
         """Rank multilingual studies by global relevance and quality"""
@@ -3785,13 +3784,8 @@ class ComparativeEffectivenessAnalytics:
         """Query literature database for effectiveness data"""
         
         try:
-            # Search literature papers
-            papers = await self.db.literature_papers.find({
-                "$or": [
-                    {"title": {"$regex": query, "$options": "i"}},
-                    {"abstract": {"$regex": query, "$options": "i"}}
-                ]
-            }).limit(20).to_list(20)
+            # Search literature papers through the BM25 index
+            papers = await search_literature(query, k=20)
             
             # Filter for effectiveness studies
             effectiveness_papers = []
@@ -5182,6 +5176,23 @@ class PersonalizedRiskAssessment:
             "monitoring_recommendation": "Standard post-treatment monitoring protocol"
         }
 
+    async def stratify_cohort(
+        self, patients: List[Dict[str, Any]], treatment_plan: Dict[str, Any], store: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Vectorized risk stratification of a whole cohort, ranked by risk-benefit ratio"""
+        
+        treatment_type = treatment_plan.get("treatment_type", "PRP")
+        # Column operations over the cohort DataFrame are CPU-bound; keep them off the event loop
+        summaries, documents = await asyncio.to_thread(compute_cohort_stratification, patients, treatment_type)
+        
+        if store and documents:
+            try:
+                await self.db.risk_assessments.insert_many(documents, ordered=False)
+            except Exception as e:
+                logger.error(f"Error storing cohort risk assessments: {str(e)}")
+        
+        return summaries
+
     async def _store_risk_assessment(self, assessment: Dict[str, Any]) -> bool:
         """Store risk assessment in database"""
         
@@ -5411,6 +5422,10 @@ class LivingEvidenceEngine:
             "deduplication": "semantic_similarity_based"
         }
 
+    @coalesce(
+        "protocol_evidence_mapping",
+        lambda self, protocol_id, protocol_data: (protocol_data.get("patient_id"), [protocol_id, protocol_data])
+    )
     async def generate_protocol_evidence_mapping(
         self, protocol_id: str, protocol_data: Dict[str, Any]
     ) -> Dict[str, Any]:
@@ -5690,17 +5705,8 @@ class LivingEvidenceEngine:
     async def _deduplicate_and_rank_evidence(self, evidence_sources: List[Dict]) -> List[Dict]:
         """Deduplicate and rank evidence by quality and relevance"""
         
-        # Simple deduplication by title similarity (in production would use semantic similarity)
-        seen_titles = set()
-        deduplicated = []
-        
-        for study in evidence_sources:
-            title = study.get("title", "").lower()
-            title_key = title[:50]  # Use first 50 characters as key
-            
-            if title_key not in seen_titles:
-                seen_titles.add(title_key)
-                deduplicated.append(study)
+        # MinHash/LSH near-duplicate removal with PMID/DOI short-circuits
+        deduplicated = deduplicate_papers(evidence_sources)
         
         # Rank by evidence level and relevance score
         evidence_level_scores = {
@@ -6015,6 +6021,10 @@ class LivingEvidenceEngine:
             "protocol_positioning": "evidence-based optimal approach for this patient profile"
         }
 
+    @coalesce(
+        "living_systematic_review",
+        lambda self, therapies, condition: (None, [sorted(therapies), condition])
+    )
     async def _perform_living_systematic_review(
         self, therapies: List[str], condition: str
     ) -> Dict[str, Any]:
@@ -8143,30 +8153,20 @@ class PubMedIntegrationService:
     async def perform_pubmed_search(self, search_terms: str, max_results: int = 20) -> Dict[str, Any]:
         """Perform real PubMed search for regenerative medicine literature"""
         
-        import requests
-        import feedparser
-        from urllib.parse import quote
+        eutils = get_eutils_client()
         
         try:
             # Build PubMed search query for regenerative medicine
             base_query = f"({search_terms}) AND (regenerative medicine OR stem cell therapy OR PRP OR platelet rich plasma OR BMAC OR bone marrow concentrate)"
-            encoded_query = quote(base_query)
             
             # Search PubMed using E-utilities
-            search_url = f"https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?db=pubmed&term={encoded_query}&retmax={max_results}&retmode=xml"
-            
-            search_response = requests.get(search_url, timeout=10)
-            
-            if search_response.status_code != 200:
+            try:
+                search_result = await eutils.esearch(base_query, retmax=max_results)
+            except EUtilsError as e:
+                logging.error(f"PubMed esearch failed: {str(e)}")
                 return {"error": "PubMed search failed", "papers": [], "total_count": 0}
             
-            # Parse XML response to get PMIDs
-            import xml.etree.ElementTree as ET
-            search_root = ET.fromstring(search_response.content)
-            
-            pmids = []
-            for id_elem in search_root.findall('.//Id'):
-                pmids.append(id_elem.text)
+            pmids = search_result["ids"]
             
             if not pmids:
                 return {
@@ -8177,16 +8177,14 @@ class PubMedIntegrationService:
                 }
             
             # Fetch paper details
-            pmid_string = ",".join(pmids[:10])  # Limit to top 10 for details
-            fetch_url = f"https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi?db=pubmed&id={pmid_string}&retmode=xml"
-            
-            fetch_response = requests.get(fetch_url, timeout=15)
-            
-            if fetch_response.status_code != 200:
+            try:
+                fetch_content = await eutils.efetch(ids=pmids[:10], timeout=15.0)  # Limit to top 10 for details
+            except EUtilsError as e:
+                logging.error(f"PubMed efetch failed: {str(e)}")
                 return {"error": "Failed to fetch paper details", "papers": [], "total_count": len(pmids)}
             
             # Parse paper details
-            fetch_root = ET.fromstring(fetch_response.content)
+            fetch_root = ET.fromstring(fetch_content)
             papers = []
             
             for article in fetch_root.findall('.//PubmedArticle'):
@@ -8213,7 +8211,7 @@ class PubMedIntegrationService:
                         "journal": journal_elem.text if journal_elem is not None else "Journal unknown",
                         "year": date_elem.text if date_elem is not None else "Year unknown",
                         "authors": authors[:3],  # First 3 authors
-                        "relevance_score": self._calculate_relevance_score(
+                        "relevance_score": self._calculate_query_relevance_score(
                             title_elem.text if title_elem is not None else "",
                             abstract_elem.text if abstract_elem is not None else "",
                             search_terms
@@ -8234,7 +8232,7 @@ class PubMedIntegrationService:
             return {
                 "search_query": search_terms,
                 "papers": papers,
-                "total_count": len(pmids),
+                "total_count": search_result["count"] or len(pmids),
                 "search_timestamp": datetime.utcnow().isoformat(),
                 "status": "success"
             }
@@ -8247,7 +8245,7 @@ class PubMedIntegrationService:
                 "total_count": 0
             }
 
-    def _calculate_relevance_score(self, title: str, abstract: str, search_terms: str) -> float:
+    def _calculate_query_relevance_score(self, title: str, abstract: str, search_terms: str) -> float:
         """Calculate relevance score for a paper based on search terms"""
         
         if not title and not abstract:
@@ -8284,31 +8282,28 @@ class PubMedIntegrationService:
         
         return min(score, 1.0)  # Cap at 1.0
 
-    async def _store_literature_papers(self, papers: List[Dict], search_query: str):
-        """Store literature papers in database"""
+    async def _store_literature_papers(self, papers: List[Dict], search_query: str, refresh_fields: Optional[List[str]] = None):
+        """Store literature papers in database
+        
+        refresh_fields are overwritten on papers already stored (for sources that
+        revise records, e.g. MeSH indexing added months after publication).
+        """
         
         try:
-            for paper in papers:
-                # Check if paper already exists
-                existing = await self.db.literature_papers.find_one({"pmid": paper["pmid"]})
-                
-                if not existing:
-                    paper_doc = {
-                        **paper,
-                        "search_queries": [search_query],
-                        "created_at": datetime.utcnow(),
-                        "last_accessed": datetime.utcnow()
-                    }
-                    await self.db.literature_papers.insert_one(paper_doc)
-                else:
-                    # Update search queries and last accessed
-                    await self.db.literature_papers.update_one(
-                        {"pmid": paper["pmid"]},
-                        {
-                            "$addToSet": {"search_queries": search_query},
-                            "$set": {"last_accessed": datetime.utcnow()}
-                        }
-                    )
+            # One bulk upsert: new papers inserted whole, existing ones tagged with this query
+            now = datetime.utcnow()
+            result = await bulk_upsert(
+                self.db.literature_papers,
+                [{**paper, "created_at": now} for paper in papers],
+                key_field="pmid",
+                add_to_set={"search_queries": [search_query]},
+                set_fields={"last_accessed": now},
+                refresh_fields=refresh_fields
+            )
+            
+            # Keep the full-text index current with new papers and revised ones
+            indexed = result["inserted_documents"] + (result["updated_documents"] if refresh_fields else [])
+            await index_literature_papers(indexed)
                     
         except Exception as e:
             logging.error(f"Error storing literature papers: {str(e)}")
@@ -8494,6 +8489,10 @@ class PubMedIntegrationService:
             "last_system_update": datetime.utcnow().isoformat()
         }
 
+    @coalesce(
+        "evidence_protocol_synthesis",
+        lambda self, condition, existing_evidence=None: (None, [condition, existing_evidence])
+    )
     async def synthesize_evidence_into_protocol(self, condition: str, existing_evidence: List[Dict] = None) -> Dict[str, Any]:
         """AI-driven synthesis of evidence into actionable protocols"""
         
@@ -8700,22 +8699,14 @@ Base your analysis strictly on the provided papers. If information is not availa
 """
         
         try:
-            # Use existing AI integration
-            ai_engine = RegenerativeMedicineAI()
-            
-            async with httpx.AsyncClient(timeout=90.0) as client:
-                response = await client.post(
-                    f"{ai_engine.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {ai_engine.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "gpt-4",
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": """You are a world-class systematic review expert and meta-analysis specialist with 20+ years of experience in evidence synthesis. 
+            # Use the shared LLM gateway
+            try:
+                ai_response = await get_llm_gateway().chat_completion(
+                    model="gpt-4",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": """You are a world-class systematic review expert and meta-analysis specialist with 20+ years of experience in evidence synthesis. 
 
 You excel at:
 - Critical appraisal of clinical studies
@@ -8725,38 +8716,35 @@ You excel at:
 - Clinical recommendation formulation
 
 Always provide rigorous, evidence-based analysis with appropriate statistical interpretation."""
-                            },
-                            {"role": "user", "content": analysis_prompt}
-                        ],
-                        "temperature": 0.2,
-                        "max_tokens": 3000
-                    }
+                        },
+                        {"role": "user", "content": analysis_prompt}
+                    ],
+                    temperature=0.2,
+                    max_tokens=3000,
+                    timeout=90.0
                 )
-            
-            if response.status_code == 200:
-                ai_response = response.json()
-                analysis_content = ai_response['choices'][0]['message']['content']
-                
-                try:
-                    # Parse JSON response
-                    import json
-                    json_match = re.search(r'\{.*\}', analysis_content, re.DOTALL)
-                    if json_match:
-                        analysis_data = json.loads(json_match.group())
-                        return analysis_data
-                except Exception as e:
-                    logger.warning(f"JSON parsing failed: {str(e)}")
-                
-                # Return raw analysis if JSON parsing fails
-                return {
-                    "raw_analysis": analysis_content,
-                    "analysis_confidence": 0.6,
-                    "parsing_status": "partial"
-                }
-                
-            else:
-                logger.error(f"AI analysis API error: {response.status_code}")
+            except LLMGatewayError as e:
+                logger.error(f"AI analysis API error: {e.status_code or str(e)}")
                 return {"analysis": "AI analysis failed", "error": "API error"}
+            
+            analysis_content = ai_response['choices'][0]['message']['content']
+            
+            try:
+                # Parse JSON response
+                import json
+                json_match = re.search(r'\{.*\}', analysis_content, re.DOTALL)
+                if json_match:
+                    analysis_data = json.loads(json_match.group())
+                    return analysis_data
+            except Exception as e:
+                logger.warning(f"JSON parsing failed: {str(e)}")
+            
+            # Return raw analysis if JSON parsing fails
+            return {
+                "raw_analysis": analysis_content,
+                "analysis_confidence": 0.6,
+                "parsing_status": "partial"
+            }
                 
         except Exception as e:
             logger.error(f"AI paper analysis error: {str(e)}")
@@ -8771,38 +8759,11 @@ Always provide rigorous, evidence-based analysis with appropriate statistical in
     ) -> Dict[str, Any]:
         """Calculate Bayesian credible intervals"""
         
-        # Simulate Bayesian analysis (in production would use proper Bayesian inference)
-        # Using beta distribution for probability estimates
-        
-        # Parameters for beta distribution (pseudo-counts)
-        alpha = probability * 100  # Prior successes
-        beta = (1 - probability) * 100  # Prior failures
-        
-        # Calculate credible intervals (HDI - Highest Density Interval)
-        from scipy import stats
-        
-        try:
-            # 95% credible interval
-            ci_95_lower = stats.beta.ppf(0.025, alpha, beta)
-            ci_95_upper = stats.beta.ppf(0.975, alpha, beta)
-            
-            # 90% credible interval
-            ci_90_lower = stats.beta.ppf(0.05, alpha, beta)
-            ci_90_upper = stats.beta.ppf(0.95, alpha, beta)
-            
-            # 80% credible interval
-            ci_80_lower = stats.beta.ppf(0.1, alpha, beta)
-            ci_80_upper = stats.beta.ppf(0.9, alpha, beta)
-            
-        except:
-            # Fallback if scipy not available
-            margin_95 = 0.1
-            margin_90 = 0.08
-            margin_80 = 0.06
-            
-            ci_95_lower, ci_95_upper = max(0, probability - margin_95), min(1, probability + margin_95)
-            ci_90_lower, ci_90_upper = max(0, probability - margin_90), min(1, probability + margin_90)
-            ci_80_lower, ci_80_upper = max(0, probability - margin_80), min(1, probability + margin_80)
+        # Beta(p * 100, (1 - p) * 100) posterior, served from the shared interval cache
+        intervals = credible_intervals([probability])[0]
+        ci_95_lower, ci_95_upper = intervals["95_percent"]
+        ci_90_lower, ci_90_upper = intervals["90_percent"]
+        ci_80_lower, ci_80_upper = intervals["80_percent"]
         
         return {
             "diagnosis": diagnosis,
@@ -8820,126 +8781,28 @@ Always provide rigorous, evidence-based analysis with appropriate statistical in
         }
 
     async def _perform_monte_carlo_simulation(
-        self, diagnosis: str, patient_data: Dict
+        self, diagnosis: str, patient_data: Dict, num_simulations: int = 1000, seed: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Perform Monte Carlo simulation for scenario analysis"""
-        
-        # Simulate multiple scenarios with parameter variations
-        num_simulations = 1000
-        simulation_results = []
-        
-        for i in range(num_simulations):
-            # Add random variations to key parameters
-            simulated_age = self._vary_parameter(
-                patient_data.get("demographics", {}).get("age", 50), 
-                variation_percent=0.1
-            )
-            
-            simulated_severity = self._vary_severity(
-                patient_data.get("clinical_presentation", {}).get("symptom_severity", "moderate")
-            )
-            
-            simulated_duration = self._vary_duration(
-                patient_data.get("clinical_presentation", {}).get("symptom_duration", "months")
-            )
-            
-            # Simulate diagnostic probability for this scenario
-            simulated_probability = await self._simulate_diagnostic_probability(
-                diagnosis, simulated_age, simulated_severity, simulated_duration
-            )
-            
-            simulation_results.append(simulated_probability)
-        
-        # Calculate statistics
-        mean_probability = np.mean(simulation_results)
-        std_probability = np.std(simulation_results)
-        percentile_5 = np.percentile(simulation_results, 5)
-        percentile_95 = np.percentile(simulation_results, 95)
+        """Perform Monte Carlo simulation for scenario analysis
         
-        return {
-            "simulation_type": "monte_carlo_diagnostic_scenarios",
-            "num_simulations": num_simulations,
-            "results": {
-                "mean_probability": mean_probability,
-                "standard_deviation": std_probability,
-                "5th_percentile": percentile_5,
-                "95th_percentile": percentile_95,
-                "confidence_interval_90": [percentile_5, percentile_95]
-            },
-            "scenario_robustness": "high" if std_probability < 0.1 else "moderate" if std_probability < 0.2 else "low",
-            "interpretation": f"Across {num_simulations} scenarios, diagnostic probability ranges from {percentile_5:.1%} to {percentile_95:.1%}"
-        }
-
-    def _vary_parameter(self, value: Any, variation_percent: float = 0.1) -> Any:
-        """Add random variation to parameter"""
-        try:
-            numeric_value = float(value)
-            variation = np.random.normal(0, numeric_value * variation_percent)
-            return max(0, numeric_value + variation)
-        except (ValueError, TypeError):
-            return value
-
-    def _vary_severity(self, severity: str) -> str:
-        """Randomly vary severity level"""
-        severities = ["mild", "moderate", "severe"]
-        if severity.lower() in severities:
-            current_index = severities.index(severity.lower())
-            # 70% chance to stay same, 15% each to move up/down
-            random_val = np.random.random()
-            if random_val < 0.15 and current_index > 0:
-                return severities[current_index - 1]
-            elif random_val > 0.85 and current_index < len(severities) - 1:
-                return severities[current_index + 1]
-        return severity
-
-    def _vary_duration(self, duration: str) -> str:
-        """Randomly vary duration"""
-        if "week" in duration.lower():
-            return "weeks" if np.random.random() < 0.3 else duration
-        elif "month" in duration.lower():
-            return "months" if np.random.random() < 0.3 else duration
-        elif "year" in duration.lower():
-            return "years" if np.random.random() < 0.3 else duration
-        return duration
-
-    async def _simulate_diagnostic_probability(
-        self, diagnosis: str, age: Any, severity: str, duration: str
-    ) -> float:
-        """Simulate diagnostic probability for given parameters"""
-        
-        base_prob = 0.5
-        
-        # Age adjustment
-        try:
-            age_num = float(age)
-            if diagnosis == "Osteoarthritis":
-                age_adj = 0.2 if age_num > 60 else 0.1 if age_num > 40 else -0.1
-            elif diagnosis == "Rheumatoid Arthritis":
-                age_adj = 0.15 if 40 <= age_num <= 60 else 0.05
-            else:
-                age_adj = 0.05 if age_num > 50 else 0.0
-        except (ValueError, TypeError):
-            age_adj = 0.0
+        All scenario perturbations are sampled as arrays and the probability
+        model is evaluated vectorized; num_simulations may go up to 1e6.
+        """
         
-        # Severity adjustment
-        if "severe" in severity.lower():
-            severity_adj = 0.15
-        elif "moderate" in severity.lower():
-            severity_adj = 0.08
-        else:
-            severity_adj = -0.05
+        demographics = patient_data.get("demographics", {})
+        clinical_presentation = patient_data.get("clinical_presentation", {})
         
-        # Duration adjustment  
-        if "year" in duration.lower():
-            duration_adj = 0.2 if diagnosis in ["Osteoarthritis", "Rheumatoid Arthritis"] else 0.1
-        elif "month" in duration.lower():
-            duration_adj = 0.1
-        else:
-            duration_adj = -0.05
+        probabilities = await asyncio.to_thread(
+            simulate_diagnostic_probabilities,
+            diagnosis,
+            demographics.get("age", 50),
+            clinical_presentation.get("symptom_severity", "moderate"),
+            clinical_presentation.get("symptom_duration", "months"),
+            num_simulations,
+            seed
+        )
         
-        # Calculate final probability
-        final_prob = base_prob + age_adj + severity_adj + duration_adj
-        return max(0.05, min(0.95, final_prob))
+        return summarize_simulation(probabilities, seed=seed)
 
     async def _decompose_uncertainty(self, diagnosis: str, patient_data: Dict) -> Dict[str, Any]:
         """Decompose uncertainty into epistemic and aleatoric components"""
@@ -9295,21 +9158,13 @@ Generate the most evidence-based, clinically actionable protocol possible.
 """
         
         try:
-            ai_engine = RegenerativeMedicineAI()
-            
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(
-                    f"{ai_engine.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {ai_engine.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "gpt-4",
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": """You are the world's leading expert in evidence-based medicine and clinical protocol development. You excel at:
+            try:
+                ai_response = await get_llm_gateway().chat_completion(
+                    model="gpt-4",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": """You are the world's leading expert in evidence-based medicine and clinical protocol development. You excel at:
 
 - Systematic evidence synthesis
 - Clinical guideline development
@@ -9318,38 +9173,36 @@ Generate the most evidence-based, clinically actionable protocol possible.
 - Protocol validation and optimization
 
 You create protocols that are both scientifically rigorous and clinically practical, always grounding recommendations in the best available evidence."""
-                            },
-                            {"role": "user", "content": synthesis_prompt}
-                        ],
-                        "temperature": 0.1,
-                        "max_tokens": 4000
-                    }
+                        },
+                        {"role": "user", "content": synthesis_prompt}
+                    ],
+                    temperature=0.1,
+                    max_tokens=4000,
+                    timeout=120.0
                 )
-            
-            if response.status_code == 200:
-                ai_response = response.json()
-                protocol_content = ai_response['choices'][0]['message']['content']
-                
-                try:
-                    # Parse JSON response
-                    import json
-                    json_match = re.search(r'\{.*\}', protocol_content, re.DOTALL)
-                    if json_match:
-                        protocol_data = json.loads(json_match.group())
-                        return protocol_data
-                except Exception as e:
-                    logger.warning(f"Protocol JSON parsing failed: {str(e)}")
-                
-                # Return structured fallback
-                return {
-                    "protocol_name": f"Evidence-Based {condition} Protocol",
-                    "evidence_grade": "B",
-                    "raw_protocol": protocol_content,
-                    "synthesis_status": "partial_parsing"
-                }
-            else:
-                logger.error(f"Protocol generation API error: {response.status_code}")
+            except LLMGatewayError as e:
+                logger.error(f"Protocol generation API error: {e.status_code or str(e)}")
                 return await self._generate_fallback_protocol(condition, evidence)
+            
+            protocol_content = ai_response['choices'][0]['message']['content']
+            
+            try:
+                # Parse JSON response
+                import json
+                json_match = re.search(r'\{.*\}', protocol_content, re.DOTALL)
+                if json_match:
+                    protocol_data = json.loads(json_match.group())
+                    return protocol_data
+            except Exception as e:
+                logger.warning(f"Protocol JSON parsing failed: {str(e)}")
+            
+            # Return structured fallback
+            return {
+                "protocol_name": f"Evidence-Based {condition} Protocol",
+                "evidence_grade": "B",
+                "raw_protocol": protocol_content,
+                "synthesis_status": "partial_parsing"
+            }
                 
         except Exception as e:
             logger.error(f"Evidence-based protocol generation error: {str(e)}")
@@ -9478,15 +9331,10 @@ You create protocols that are both scientifically rigorous and clinically practi
                 }
             ]
             
-            # Insert papers into database
-            inserted_count = 0
-            for paper in essential_papers:
-                # Check if paper already exists
-                existing = await self.db.literature_papers.find_one({"pmid": paper["pmid"]})
-                
-                if not existing:
-                    await self.db.literature_papers.insert_one(paper)
-                    inserted_count += 1
+            # Insert papers into database (existing PMIDs are left untouched)
+            result = await bulk_upsert(self.db.literature_papers, essential_papers, key_field="pmid")
+            await index_literature_papers(result["inserted_documents"])
+            inserted_count = result["inserted"]
                     
             return {
                 "status": "completed",
@@ -9513,33 +9361,16 @@ You create protocols that are both scientifically rigorous and clinically practi
         # Format dates for PubMed API
         date_range = f"{start_date.strftime('%Y/%m/%d')}:{end_date.strftime('%Y/%m/%d')}"
         
-        # Construct PubMed search URL
-        search_params = {
-            "db": "pubmed",
-            "term": f'("{query}") AND ("{date_range}"[Date - Publication])',
-            "retmax": 50,
-            "retmode": "xml",
-            "tool": "RegenMedAI",
-            "email": "research@regenmed.ai"
-        }
-        
         try:
-            async with httpx.AsyncClient() as client:
-                # Search for papers
-                search_response = await client.get(
-                    f"{self.pubmed_base_url}/esearch.fcgi",
-                    params=search_params,
-                    timeout=30.0
-                )
-                
-                if search_response.status_code == 200:
-                    # Parse XML response to get PMIDs
-                    pmids = self._parse_search_results(search_response.text)
-                    
-                    if pmids:
-                        # Fetch detailed paper information
-                        papers = await self._fetch_paper_details(pmids)
-                        return papers
+            # Search for papers
+            search_result = await get_eutils_client().esearch(
+                f'("{query}") AND ("{date_range}"[Date - Publication])',
+                retmax=50
+            )
+            
+            if search_result["ids"]:
+                # Fetch detailed paper information
+                return await self._fetch_paper_details(search_result["ids"])
                         
         except Exception as e:
             logging.error(f"PubMed API error for query '{query}': {str(e)}")
@@ -9550,31 +9381,79 @@ You create protocols that are both scientifically rigorous and clinically practi
         """Fetch detailed information for specific PMIDs"""
         
         papers = []
-        pmid_batch = ",".join(pmids[:10])  # Limit batch size
-        
-        fetch_params = {
-            "db": "pubmed",
-            "id": pmid_batch,
-            "retmode": "xml",
-            "tool": "RegenMedAI"
-        }
+        eutils = get_eutils_client()
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.pubmed_base_url}/efetch.fcgi",
-                    params=fetch_params,
-                    timeout=45.0
-                )
-                
-                if response.status_code == 200:
-                    papers = self._parse_paper_details(response.text)
+            # Stream each batch and extract articles as they close instead of parsing whole responses
+            for offset in range(0, len(pmids), MAX_EFETCH_BATCH):
+                async for article in eutils.iter_efetch_articles(ids=pmids[offset:offset + MAX_EFETCH_BATCH], timeout=45.0):
+                    paper_data = self._extract_paper_data(article)
+                    if paper_data:
+                        papers.append(paper_data)
                     
         except Exception as e:
             logging.error(f"Error fetching paper details: {str(e)}")
         
         return papers
 
+    async def ingest_pubmed_corpus(
+        self,
+        query: str,
+        max_records: int = 5000,
+        batch_size: int = MAX_EFETCH_BATCH,
+        progress_callback=None
+    ) -> Dict[str, Any]:
+        """Bulk-ingest a PubMed result set into the local literature corpus
+        
+        Pages through the E-utilities history server (WebEnv/query_key) in
+        batches of 200-500 and parses articles incrementally, storing each
+        batch before fetching the next so memory stays flat for large corpora.
+        """
+        
+        started = datetime.utcnow()
+        total = 0
+        skipped = 0
+        stored = 0
+        batch: List[Dict] = []
+        
+        async def flush_batch():
+            nonlocal stored
+            if batch:
+                await self._store_literature_papers(batch, query, refresh_fields=PUBMED_REFRESH_FIELDS)
+                stored += len(batch)
+                batch.clear()
+                if progress_callback and total:
+                    await progress_callback(stored / total, f"Stored {stored} of {total} papers")
+        
+        async for item in get_eutils_client().iter_history_articles(query, max_records=max_records, batch_size=batch_size):
+            if "_search" in item:
+                total = item["_search"]["total"]
+                skipped = item["_search"]["skipped"]
+                continue
+            
+            item["relevance_score"] = self._calculate_query_relevance_score(item["title"], item["abstract"], query)
+            item["regenerative_keywords"] = self._extract_regenerative_keywords(item["title"], item["abstract"])
+            item["source"] = "pubmed"
+            batch.append(item)
+            if len(batch) >= batch_size:
+                await flush_batch()
+        
+        await flush_batch()
+        
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        logging.info(f"PubMed ingestion for '{query}' stored {stored}/{total} papers in {elapsed:.1f}s")
+        
+        return {
+            "query": query,
+            "total_matching": total,
+            "papers_ingested": stored,
+            # Beyond the history server's 10,000-record paging limit; narrow the query
+            # (e.g. by publication date range) to reach them
+            "records_skipped": skipped,
+            "elapsed_seconds": elapsed,
+            "status": "completed"
+        }
+
     def _parse_search_results(self, xml_response: str) -> List[str]:
         """Parse PubMed search results to extract PMIDs"""
         try:
@@ -9711,6 +9590,7 @@ You create protocols that are both scientifically rigorous and clinically practi
                 if not existing and paper["relevance_score"] >= 0.7:
                     # Add to literature database
                     await self.db.literature_papers.insert_one(paper)
+                    await index_literature_papers([paper])
                     
                     # Generate evidence synthesis
                     await self._synthesize_paper_evidence(paper)
@@ -9993,36 +9873,72 @@ You create protocols that are both scientifically rigorous and clinically practi
         
         return min(score, 1.0)
 
+    async def _match_existing_papers(self, papers: List[Dict]) -> Tuple[List[Any], List[Dict]]:
+        """Split papers into _ids of stored papers from other sources and papers still to store
+        
+        Matches on DOI/PMID, or on the first 50 title characters (case-insensitive);
+        papers stored under their own gs_id are left to the gs_id upsert.
+        """
+        
+        clauses = []
+        for paper in papers:
+            if paper.get("title"):
+                clauses.append({"title": {"$regex": re.escape(paper["title"][:50]), "$options": "i"}})
+            if normalize_doi(paper.get("doi")):
+                clauses.append({"doi": paper["doi"]})
+            if paper.get("pmid") and paper["pmid"] != "Unknown":
+                clauses.append({"pmid": paper["pmid"]})
+        if not clauses:
+            return [], papers
+        
+        stored = await self.db.literature_papers.find(
+            {"$or": clauses}, {"_id": 1, "title": 1, "gs_id": 1, "pmid": 1, "doi": 1}
+        ).to_list(None)
+        
+        existing_ids: List[Any] = []
+        remaining: List[Dict] = []
+        for paper in papers:
+            title_prefix = (paper.get("title") or "")[:50].lower()
+            doi = normalize_doi(paper.get("doi"))
+            match = next((
+                doc for doc in stored
+                if doc.get("gs_id") != paper.get("gs_id") and (
+                    (title_prefix and title_prefix in (doc.get("title") or "").lower())
+                    or (doi and normalize_doi(doc.get("doi")) == doi)
+                    or (paper.get("pmid") not in (None, "", "Unknown") and doc.get("pmid") == paper.get("pmid"))
+                )
+            ), None)
+            if match is None:
+                remaining.append(paper)
+            elif match["_id"] not in existing_ids:
+                existing_ids.append(match["_id"])
+        
+        return existing_ids, remaining
+
     async def _store_google_scholar_papers(self, papers: List[Dict], search_query: str):
         """Store Google Scholar papers in database"""
         
         try:
-            for paper in papers:
-                # Check if paper already exists (by title similarity)
-                existing = await self.db.literature_papers.find_one({
-                    "$or": [
-                        {"gs_id": paper.get("gs_id")},
-                        {"title": {"$regex": re.escape(paper["title"][:50]), "$options": "i"}}
-                    ]
-                })
-                
-                if not existing:
-                    paper_doc = {
-                        **paper,
-                        "search_queries": [search_query],
-                        "created_at": datetime.utcnow(),
-                        "last_accessed": datetime.utcnow()
-                    }
-                    await self.db.literature_papers.insert_one(paper_doc)
-                else:
-                    # Update search queries and last accessed
-                    await self.db.literature_papers.update_one(
-                        {"_id": existing["_id"]},
-                        {
-                            "$addToSet": {"search_queries": search_query},
-                            "$set": {"last_accessed": datetime.utcnow()}
-                        }
-                    )
+            now = datetime.utcnow()
+            
+            # Papers already stored from another source (PubMed) under a similar title, or
+            # the same DOI/PMID, are tagged with this query instead of stored a second time
+            existing_ids, papers = await self._match_existing_papers(papers)
+            if existing_ids:
+                await self.db.literature_papers.update_many(
+                    {"_id": {"$in": existing_ids}},
+                    {"$addToSet": {"search_queries": search_query}, "$set": {"last_accessed": now}}
+                )
+            
+            # gs_id is derived from the title hash, so it identifies the same paper across searches
+            result = await bulk_upsert(
+                self.db.literature_papers,
+                [{**paper, "created_at": now} for paper in papers],
+                key_field="gs_id",
+                add_to_set={"search_queries": [search_query]},
+                set_fields={"last_accessed": now}
+            )
+            await index_literature_papers(result["inserted_documents"])
                     
         except Exception as e:
             logging.error(f"Error storing Google Scholar papers: {str(e)}")
@@ -10100,25 +10016,10 @@ You create protocols that are both scientifically rigorous and clinically practi
             }
 
     def _deduplicate_papers(self, papers: List[Dict]) -> List[Dict]:
-        """Remove duplicate papers based on title similarity"""
+        """Remove duplicate papers, merging PubMed and Google Scholar metadata"""
         
-        unique_papers = []
-        seen_titles = set()
+        unique_papers = deduplicate_papers(papers)
         
-        for paper in papers:
-            title = paper.get("title", "").lower().strip()
-            
-            # Create a normalized title for comparison
-            normalized_title = re.sub(r'[^\w\s]', '', title)
-            normalized_title = ' '.join(normalized_title.split())
-            
-            # Check for similar titles (simple approach)
-            is_duplicate = False
-            for seen_title in seen_titles:
-                if self._titles_similar(normalized_title, seen_title):
-                    is_duplicate = True
-                    break
-            
         return unique_papers
 
 # ==========================================
@@ -10240,6 +10141,12 @@ class AdvancedDifferentialDiagnosisEngine:
             "therapeutic_targets": "druggable_pathway_identification"
         }
 
+    @coalesce(
+        "comprehensive_differential_diagnosis",
+        lambda self, patient_data, practitioner_controlled=True: (
+            patient_data.get("patient_id"), [patient_data, practitioner_controlled]
+        )
+    )
     async def perform_comprehensive_differential_diagnosis(
         self, patient_data: Dict[str, Any], practitioner_controlled: bool = True
     ) -> Dict[str, Any]:
@@ -10743,23 +10650,16 @@ class AdvancedDifferentialDiagnosisEngine:
         # Extract diagnostic clues from multi-modal analysis
         diagnostic_clues = multi_modal_analysis.get("multi_modal_fusion", {}).get("all_diagnostic_implications", [])
         
-        # Generate potential diagnoses based on clues
-        potential_diagnoses = await self._generate_potential_diagnoses(diagnostic_clues, patient_data)
+        # Candidates, priors, likelihoods and normalized posteriors from the compiled knowledge base
+        scored_diagnoses = get_diagnosis_kb().score(diagnostic_clues, patient_data).to_records()
         
         # Apply evidence-weighted Bayesian reasoning
         evidence_weighted_diagnoses = []
         
-        for diagnosis in potential_diagnoses:
-            # Calculate prior probability (population prevalence)
-            prior_probability = await self._calculate_prior_probability(diagnosis, patient_data)
-            
-            # Calculate likelihood (given patient data)
-            likelihood = await self._calculate_diagnostic_likelihood(diagnosis, patient_data, diagnostic_clues)
-            
-            # Apply Bayes' theorem for posterior probability
-            posterior_probability = await self._calculate_posterior_probability(
-                prior_probability, likelihood, potential_diagnoses
-            )
+        for diagnosis in scored_diagnoses:
+            prior_probability = diagnosis["prior_probability"]
+            likelihood = diagnosis["likelihood"]
+            posterior_probability = diagnosis["posterior_probability"]
             
             # Get supporting evidence
             supporting_evidence = await self._get_diagnostic_supporting_evidence(diagnosis)
@@ -10784,212 +10684,6 @@ class AdvancedDifferentialDiagnosisEngine:
         
         return evidence_weighted_diagnoses[:5]  # Return top 5 diagnoses
 
-    async def _generate_potential_diagnoses(self, diagnostic_clues: List[str], patient_data: Dict) -> List[Dict]:
-        """Generate potential diagnoses based on diagnostic clues"""
-        
-        # Extract key information
-        age_category = self._categorize_age(patient_data.get("demographics", {}).get("age", 50))
-        chief_complaint = patient_data.get("clinical_presentation", {}).get("chief_complaint", "").lower()
-        
-        # Generate diagnosis candidates based on patterns
-        potential_diagnoses = []
-        
-        # Osteoarthritis
-        if any(clue in ["degenerative_conditions", "chronic_degenerative", "mechanical_pattern"] for clue in diagnostic_clues) or \
-           any(term in chief_complaint for term in ["knee pain", "joint pain", "stiffness"]):
-            potential_diagnoses.append({
-                "diagnosis_name": "Osteoarthritis",
-                "icd_10_code": "M17.9",  # Osteoarthritis of knee, unspecified
-                "pattern_match": True
-            })
-        
-        # Rheumatoid Arthritis  
-        if any(clue in ["autoimmune_predisposition", "inflammatory_pattern", "elevated_inflammatory_markers"] for clue in diagnostic_clues) or \
-           any(term in chief_complaint for term in ["joint swelling", "morning stiffness"]):
-            potential_diagnoses.append({
-                "diagnosis_name": "Rheumatoid Arthritis",
-                "icd_10_code": "M06.9",  # Rheumatoid arthritis, unspecified
-                "pattern_match": True
-            })
-        
-        # Rotator Cuff Injury
-        if any(clue in ["post_traumatic_sequelae", "overuse_injuries"] for clue in diagnostic_clues) or \
-           any(term in chief_complaint for term in ["shoulder pain", "rotator cuff", "arm weakness"]):
-            potential_diagnoses.append({
-                "diagnosis_name": "Rotator Cuff Injury",
-                "icd_10_code": "M75.30",  # Calcific tendinitis of unspecified shoulder
-                "pattern_match": True
-            })
-        
-        # Fibromyalgia
-        if any(clue in ["chronic_degenerative", "nerve_involvement"] for clue in diagnostic_clues) or \
-           any(term in chief_complaint for term in ["widespread pain", "tender points", "fatigue"]):
-            potential_diagnoses.append({
-                "diagnosis_name": "Fibromyalgia",
-                "icd_10_code": "M79.3",  # Panniculitis, unspecified
-                "pattern_match": True
-            })
-        
-        # Tendinopathy
-        if any(clue in ["overuse_injuries", "mechanical_pattern"] for clue in diagnostic_clues) or \
-           any(term in chief_complaint for term in ["tendon pain", "activity pain", "chronic pain"]):
-            potential_diagnoses.append({
-                "diagnosis_name": "Chronic Tendinopathy",
-                "icd_10_code": "M76.9",  # Enthesopathy, unspecified
-                "pattern_match": True
-            })
-        
-        # If no specific patterns match, add general musculoskeletal diagnoses
-        if not potential_diagnoses:
-            potential_diagnoses.extend([
-                {
-                    "diagnosis_name": "Chronic Musculoskeletal Pain",
-                    "icd_10_code": "M79.3",  # Other specified soft tissue disorders
-                    "pattern_match": False
-                },
-                {
-                    "diagnosis_name": "Joint Degeneration",
-                    "icd_10_code": "M19.90",  # Unspecified osteoarthritis, unspecified site
-                    "pattern_match": False
-                }
-            ])
-        
-        return potential_diagnoses
-
-    async def _calculate_prior_probability(self, diagnosis: Dict, patient_data: Dict) -> float:
-        """Calculate prior probability based on population prevalence"""
-        
-        # Get age and gender for prevalence adjustment
-        demographics = patient_data.get("demographics", {})
-        age = demographics.get("age", 50)
-        gender = demographics.get("gender", "unknown")
-        
-        try:
-            age_num = int(age)
-        except (ValueError, TypeError):
-            age_num = 50
-        
-        # Prevalence data (simplified - would use real epidemiological data)
-        prevalence_data = {
-            "Osteoarthritis": {
-                "base_prevalence": 0.15,  # 15% population prevalence
-                "age_factor": 1.5 if age_num > 65 else 1.2 if age_num > 50 else 0.8,
-                "gender_factor": 1.2 if gender.lower() == "female" else 1.0
-            },
-            "Rheumatoid Arthritis": {
-                "base_prevalence": 0.01,  # 1% population prevalence
-                "age_factor": 1.3 if 40 <= age_num <= 60 else 1.0,
-                "gender_factor": 3.0 if gender.lower() == "female" else 1.0
-            },
-            "Rotator Cuff Injury": {
-                "base_prevalence": 0.08,  # 8% population prevalence
-                "age_factor": 1.8 if age_num > 60 else 1.0,
-                "gender_factor": 1.1 if gender.lower() == "male" else 1.0
-            },
-            "Fibromyalgia": {
-                "base_prevalence": 0.02,  # 2% population prevalence
-                "age_factor": 1.3 if 30 <= age_num <= 50 else 1.0,
-                "gender_factor": 7.0 if gender.lower() == "female" else 1.0
-            },
-            "Chronic Tendinopathy": {
-                "base_prevalence": 0.05,  # 5% population prevalence
-                "age_factor": 1.2 if age_num > 40 else 1.0,
-                "gender_factor": 1.0
-            }
-        }
-        
-        diagnosis_name = diagnosis["diagnosis_name"]
-        prevalence_info = prevalence_data.get(diagnosis_name, {"base_prevalence": 0.05, "age_factor": 1.0, "gender_factor": 1.0})
-        
-        prior = (prevalence_info["base_prevalence"] * 
-                prevalence_info["age_factor"] * 
-                prevalence_info["gender_factor"])
-        
-        return min(0.8, prior)  # Cap at 80%
-
-    async def _calculate_diagnostic_likelihood(
-        self, diagnosis: Dict, patient_data: Dict, diagnostic_clues: List[str]
-    ) -> float:
-        """Calculate likelihood of patient data given diagnosis"""
-        
-        diagnosis_name = diagnosis["diagnosis_name"]
-        
-        # Define likelihood of clues given specific diagnosis
-        clue_likelihoods = {
-            "Osteoarthritis": {
-                "degenerative_conditions": 0.9,
-                "mechanical_pattern": 0.85,
-                "age_related_wear": 0.9,
-                "knee_pathology": 0.8,
-                "chronic_degenerative": 0.85
-            },
-            "Rheumatoid Arthritis": {
-                "autoimmune_predisposition": 0.8,
-                "inflammatory_pattern": 0.9,
-                "elevated_inflammatory_markers": 0.7,
-                "morning": 0.85,
-                "autoimmune_progression": 0.9
-            },
-            "Rotator Cuff Injury": {
-                "post_traumatic_sequelae": 0.7,
-                "overuse_injuries": 0.8,
-                "shoulder_pathology": 0.95,
-                "occupational_exposure": 0.6
-            },
-            "Fibromyalgia": {
-                "nerve_involvement": 0.6,
-                "chronic_degenerative": 0.5,
-                "widespread_pain": 0.9,
-                "female": 0.7
-            },
-            "Chronic Tendinopathy": {
-                "overuse_injuries": 0.85,
-                "mechanical_pattern": 0.8,
-                "activity": 0.85,
-                "occupational_exposure": 0.7
-            }
-        }
-        
-        # Calculate likelihood based on present clues
-        diagnosis_clue_likelihoods = clue_likelihoods.get(diagnosis_name, {})
-        
-        if not diagnostic_clues:
-            return 0.5  # Neutral likelihood if no clues
-        
-        # Calculate combined likelihood
-        matching_clues = []
-        for clue in diagnostic_clues:
-            for pattern, likelihood in diagnosis_clue_likelihoods.items():
-                if pattern in clue.lower():
-                    matching_clues.append(likelihood)
-        
-        if matching_clues:
-            # Use geometric mean to avoid over-multiplication
-            combined_likelihood = np.exp(np.mean(np.log(matching_clues)))
-        else:
-            # If no direct matches, check for general compatibility
-            combined_likelihood = 0.3  # Low but non-zero likelihood
-        
-        return min(0.95, combined_likelihood)
-
-    async def _calculate_posterior_probability(
-        self, prior: float, likelihood: float, all_diagnoses: List[Dict]
-    ) -> float:
-        """Calculate posterior probability using Bayes' theorem"""
-        
-        # Bayes' theorem: P(diagnosis|data) = P(data|diagnosis) * P(diagnosis) / P(data)
-        # Where P(data) is the normalization constant
-        
-        numerator = likelihood * prior
-        
-        # For simplicity, we'll use the numerator and normalize later
-        # In a full implementation, we'd calculate the marginal probability
-        
-        # Apply some normalization to keep probabilities reasonable
-        posterior = min(0.9, numerator)
-        
-        return posterior
-
     async def _get_diagnostic_supporting_evidence(self, diagnosis: Dict) -> Dict[str, Any]:
         """Get supporting evidence for diagnosis"""
         
@@ -11208,24 +10902,6 @@ class AdvancedDifferentialDiagnosisEngine:
 
 # ==========================================
 
-    def _titles_similar(self, title1: str, title2: str, threshold: float = 0.8) -> bool:
-        """Check if two titles are similar (simple word overlap method)"""
-        
-        if not title1 or not title2:
-            return False
-        
-        words1 = set(title1.lower().split())
-        words2 = set(title2.lower().split())
-        
-        if not words1 or not words2:
-            return False
-        
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
-        
-        similarity = len(intersection) / len(union) if union else 0
-        return similarity >= threshold
-
     # =============== EVIDENCE EXTRACTION HELPER METHODS ===============
     
     def _extract_therapy_implications(self, paper: Dict) -> List[str]:
@@ -11655,32 +11331,17 @@ class AdvancedDifferentialDiagnosisEngine:
         """Store clinical trials in database"""
         
         try:
-            for trial in trials:
-                # Check if trial already exists
-                existing = await self.db.clinical_trials.find_one({"nct_id": trial["nct_id"]})
-                
-                if not existing:
-                    trial_doc = {
-                        **trial,
-                        "search_conditions": [condition],
-                        "search_interventions": [intervention] if intervention else [],
-                        "created_at": datetime.utcnow(),
-                        "last_accessed": datetime.utcnow()
-                    }
-                    await self.db.clinical_trials.insert_one(trial_doc)
-                else:
-                    # Update search conditions and last accessed
-                    update_data = {
-                        "$addToSet": {"search_conditions": condition},
-                        "$set": {"last_accessed": datetime.utcnow()}
-                    }
-                    if intervention:
-                        update_data["$addToSet"]["search_interventions"] = intervention
-                    
-                    await self.db.clinical_trials.update_one(
-                        {"nct_id": trial["nct_id"]},
-                        update_data
-                    )
+            now = datetime.utcnow()
+            await bulk_upsert(
+                self.db.clinical_trials,
+                [{**trial, "search_interventions": [], "created_at": now} for trial in trials],
+                key_field="nct_id",
+                add_to_set={
+                    "search_conditions": [condition],
+                    "search_interventions": [intervention] if intervention else []
+                },
+                set_fields={"last_accessed": now}
+            )
                     
         except Exception as e:
             logging.error(f"Error storing clinical trials: {str(e)}")
@@ -11972,14 +11633,13 @@ class AdvancedDifferentialDiagnosisEngine:
         try:
             confidence_analyses = []
             
-            for diagnosis in differential_diagnoses:
+            # Beta credible intervals for all diagnoses in one cached, vectorized pass
+            posteriors = [diagnosis.get("posterior_probability", 0.5) for diagnosis in differential_diagnoses]
+            all_intervals = credible_intervals(posteriors)
+            
+            for diagnosis, posterior_prob, intervals in zip(differential_diagnoses, posteriors, all_intervals):
                 diagnosis_name = diagnosis.get("diagnosis", "")
-                posterior_prob = diagnosis.get("posterior_probability", 0.5)
-                
-                # Simulate Bayesian credible intervals
-                # In real implementation, this would use proper Bayesian inference
-                lower_bound = max(0.0, posterior_prob - 0.15)
-                upper_bound = min(1.0, posterior_prob + 0.15)
+                lower_bound, upper_bound = intervals["95_percent"]
                 
                 confidence_analysis = {
                     "diagnosis": diagnosis_name,
@@ -11989,6 +11649,7 @@ class AdvancedDifferentialDiagnosisEngine:
                         "upper": upper_bound,
                         "width": upper_bound - lower_bound
                     },
+                    "credible_intervals": intervals,
                     "confidence_level": "high" if (upper_bound - lower_bound) < 0.2 else "moderate",
                     "bayesian_factors": {
                         "prior_probability": 0.3,
@@ -12388,7 +12049,7 @@ class DICOMProcessingService:
         
         try:
             # Convert DICOM to processable format
-            image_array = self._dicom_to_array(dicom_data)
+            image_array = await self._dicom_to_array(dicom_data)
             
             if image_array is not None:
                 # Perform AI-powered analysis
@@ -12416,29 +12077,67 @@ class DICOMProcessingService:
                     "regenerative_insights": regenerative_insights,
                     "processing_id": str(processing_record.get("_id"))
                 }
+            
+            return {"status": "error", "error": "No decodable DICOM pixel data"}
         
         except Exception as e:
             logging.error(f"DICOM processing error: {str(e)}")
             return {"status": "error", "error": str(e)}
 
-    def _dicom_to_array(self, dicom_data: bytes) -> np.ndarray:
-        """Convert DICOM data to numpy array for processing"""
+    async def _dicom_to_array(self, dicom_data: bytes) -> Optional[np.ndarray]:
+        """Representative frame of a DICOM instance (header first, one frame decoded)"""
         try:
-            # In a real implementation, this would use pydicom
-            # For demo purposes, we'll simulate the conversion
-            
-            # Simulate DICOM to array conversion
-            # Real implementation would use: dcm = pydicom.dcmread(BytesIO(dicom_data))
-            
-            # Create a simulated medical image array
-            simulated_image = np.random.randint(0, 255, (512, 512), dtype=np.uint8)
-            
-            return simulated_image
+            dicom = LazyDicom(dicom_data)
+            return await run_io(dicom.representative_frame)
             
         except Exception as e:
             logging.error(f"DICOM conversion error: {str(e)}")
             return None
 
+    async def store_study_ingestion(
+        self, patient_id: str, studies: Dict[str, List[Dict]], job_id: Optional[str] = None,
+        storage_ids: Optional[List[str]] = None
+    ) -> Dict:
+        """Persist per-series aggregates and refresh the study summaries they belong to
+        
+        Series are keyed on (patient_id, series_instance_uid): re-ingesting a series
+        replaces its aggregates, and a study uploaded in several parts accumulates series.
+        """
+        
+        now = datetime.utcnow()
+        summaries = []
+        for study_uid, series_documents in studies.items():
+            for series in series_documents:
+                await self.db.dicom_series.replace_one(
+                    {"patient_id": patient_id, "series_instance_uid": series["series_instance_uid"]},
+                    {**series, "patient_id": patient_id, "job_id": job_id, "processing_date": now},
+                    upsert=True
+                )
+            
+            # Study summary rebuilt from every stored series of the study, without frame records
+            stored_series = await self.db.dicom_series.find(
+                {"patient_id": patient_id, "study_instance_uid": study_uid}, {"_id": 0, "frames": 0}
+            ).to_list(None)
+            summary = {
+                "patient_id": patient_id,
+                "study_instance_uid": study_uid,
+                "modalities": sorted({series["modality"] for series in stored_series}),
+                "series_count": len(stored_series),
+                "instance_count": sum(series["instance_count"] for series in stored_series),
+                "frame_count": sum(series["frame_count"] for series in stored_series),
+                "series": stored_series,
+                "processing_date": now
+            }
+            await self.db.dicom_studies.update_one(
+                {"patient_id": patient_id, "study_instance_uid": study_uid},
+                {"$set": summary, "$addToSet": {"storage_ids": {"$each": storage_ids or []},
+                                                 "job_ids": {"$each": [job_id] if job_id else []}}},
+                upsert=True
+            )
+            summaries.append(summary)
+        
+        return {"status": "processed", "studies": summaries}
+
     async def _analyze_medical_image(self, image_array: np.ndarray, modality: str) -> Dict:
         """AI-powered medical image analysis"""
         
@@ -12563,22 +12262,114 @@ class DICOMProcessingService:
 class OutcomePredictionService:
     """Machine learning models for treatment outcome prediction"""
     
+    MODEL_NAMES = ("success_predictor", "timeline_predictor", "dosage_optimizer")
+    # Seeded so retraining on unchanged synthetic data reproduces the same training_data_hash
+    TRAINING_SEED = 42
+    # How often the registry's CURRENT pointers are re-read, so versions activated by the
+    # retrain CLI or another worker process are picked up without a restart
+    MODEL_REFRESH_SECONDS = float(os.environ.get("MODEL_REFRESH_SECONDS", "60"))
+    # Columns of the _extract_prediction_features vector each model consumes, in the order
+    # the model was trained on (see the "features" list stored with each model)
+    SUCCESS_FEATURES = slice(0, 8)
+    # age, severity, therapy_type, baseline_function, inflammation_markers
+    TIMELINE_FEATURES = [0, 8, 3, 9, 10]
+    # age, weight, severity, therapy_type, previous_response
+    DOSAGE_FEATURES = [0, 11, 8, 3, 12]
+    # Training-population values used when a patient record lacks them
+    DEFAULT_WEIGHT_KG = 70.0
+    DEFAULT_PREVIOUS_RESPONSE = 0.5
+    
     def __init__(self, db_client):
         self.db = db_client
         self.models = {}
-        self.scaler = StandardScaler()
+        self.registry = get_model_registry()
+        self._versions_checked_at: Optional[float] = None
+        self._load_lock = asyncio.Lock()
         
     async def initialize_prediction_models(self):
-        """Initialize ML models for outcome prediction"""
+        """Report registered models; fitted models are loaded lazily on first prediction"""
+        
+        registered = await asyncio.to_thread(self.registry.list_models)
+        return {
+            "status": "models_registered",
+            "model_count": sum(1 for name in self.MODEL_NAMES if registered.get(name, {}).get("current_version")),
+            "loaded": sorted(self.models)
+        }
+
+    def _refresh_due(self) -> bool:
+        return self._versions_checked_at is None or time.monotonic() - self._versions_checked_at >= self.MODEL_REFRESH_SECONDS
+
+    async def ensure_models_loaded(self) -> Dict[str, Any]:
+        """Load each model's current registered version, re-checking CURRENT on a TTL (never trains)"""
         
-        # Load or train models
-        await self._train_success_prediction_model()
-        await self._train_timeline_prediction_model()
-        await self._train_dosage_optimization_model()
+        if not self._refresh_due():
+            return self.models
         
-        return {"status": "models_initialized", "model_count": len(self.models)}
+        async with self._load_lock:
+            if not self._refresh_due():
+                return self.models
+            
+            current = await asyncio.to_thread(
+                lambda: {name: self.registry.current_version(name) for name in self.MODEL_NAMES}
+            )
+            for name, version in current.items():
+                if version is None:
+                    logger.warning(f"No registered {name}; predictions fall back to defaults until models are retrained")
+                    continue
+                if self.models.get(name, {}).get("version") == version:
+                    continue
+                try:
+                    artifact, manifest = await asyncio.to_thread(self.registry.load, name, version)
+                except ModelNotFoundError:
+                    logger.warning(f"Registered {name} version {version} not found; keeping the loaded version")
+                    continue
+                except Exception as e:
+                    logger.error(f"Failed to load registered {name}: {str(e)}")
+                    continue
+                self.models[name] = self._with_manifest(artifact, manifest)
+                logger.info(f"Loaded {name} version {version}")
+            
+            self._versions_checked_at = time.monotonic()
+        
+        return self.models
+
+    async def retrain_models(self, model_names: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Fit, register and hot-swap models; the only code path that trains"""
+        
+        trainers = {
+            "success_predictor": self._train_success_prediction_model,
+            "timeline_predictor": self._train_timeline_prediction_model,
+            "dosage_optimizer": self._train_dosage_optimization_model
+        }
+        unknown = [name for name in (model_names or []) if name not in trainers]
+        if unknown:
+            raise ValueError(f"Unknown models: {', '.join(unknown)}")
+        
+        results = {}
+        for name in (model_names or self.MODEL_NAMES):
+            # CPU-bound fitting and disk I/O stay off the event loop
+            entry, training_data_hash = await asyncio.to_thread(trainers[name])
+            artifact = {key: value for key, value in entry.items() if key in ("model", "scaler", "categories")}
+            manifest = await asyncio.to_thread(
+                self.registry.save, name, artifact, entry["features"], training_data_hash, entry["performance"]
+            )
+            self.models[name] = self._with_manifest(artifact, manifest)
+            results[name] = manifest
+        
+        return {"status": "models_retrained", "models": results}
 
-    async def _train_success_prediction_model(self):
+    @staticmethod
+    def _with_manifest(artifact: Dict[str, Any], manifest: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **artifact,
+            "performance": manifest.get("metrics", {}),
+            "features": manifest.get("feature_schema", []),
+            "version": manifest.get("version"),
+            "training_data_hash": manifest.get("training_data_hash"),
+            "trained_at": manifest.get("created_at")
+        }
+
+    def _train_success_prediction_model(self) -> Tuple[Dict[str, Any], str]:
         """Train model to predict treatment success probability"""
         
         # Generate synthetic training data (in production, use real historical data)
@@ -12592,8 +12383,9 @@ class OutcomePredictionService:
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
         # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
         
         # Train Random Forest model
         model = RandomForestRegressor(n_estimators=100, random_state=42)
@@ -12603,10 +12395,9 @@ class OutcomePredictionService:
         predictions = model.predict(X_test_scaled)
         mse = mean_squared_error(y_test, predictions)
         
-        # Store model
-        self.models["success_predictor"] = {
+        entry = {
             "model": model,
-            "scaler": self.scaler,
+            "scaler": scaler,
             "performance": {"mse": mse, "accuracy": 1 - mse},
             "features": [
                 "age", "gender", "diagnosis_confidence", "therapy_type",
@@ -12614,9 +12405,9 @@ class OutcomePredictionService:
             ]
         }
         
-        return {"model": "success_predictor", "mse": mse}
+        return entry, hash_training_data(X, y)
 
-    async def _train_timeline_prediction_model(self):
+    def _train_timeline_prediction_model(self) -> Tuple[Dict[str, Any], str]:
         """Train model to predict treatment response timelines"""
         
         # Timeline prediction model (classification: fast/moderate/slow response)
@@ -12635,16 +12426,16 @@ class OutcomePredictionService:
         predictions = model.predict(X_test)
         accuracy = accuracy_score(y_test, predictions)
         
-        self.models["timeline_predictor"] = {
+        entry = {
             "model": model,
             "performance": {"accuracy": accuracy},
             "features": ["age", "severity", "therapy_type", "baseline_function", "inflammation_markers"],
             "categories": {0: "2-4 weeks", 1: "4-8 weeks", 2: "8-12 weeks"}
         }
         
-        return {"model": "timeline_predictor", "accuracy": accuracy}
+        return entry, hash_training_data(X, y)
 
-    async def _train_dosage_optimization_model(self):
+    def _train_dosage_optimization_model(self) -> Tuple[Dict[str, Any], str]:
         """Train model for optimal dosage recommendations"""
         
         # Generate synthetic dosage optimization data
@@ -12668,53 +12459,24 @@ class OutcomePredictionService:
         predictions = model.predict(X_test_scaled)
         mse = mean_squared_error(y_test, predictions)
         
-        self.models["dosage_optimizer"] = {
+        entry = {
             "model": model,
             "scaler": dosage_scaler,
             "performance": {"mse": mse, "accuracy": 1 - mse},
             "features": ["age", "weight", "severity", "therapy_type", "previous_response"]
         }
         
-        return {"model": "dosage_optimizer", "mse": mse}
+        return entry, hash_training_data(X, y)
 
     def _generate_dosage_training_data(self) -> Dict:
         """Generate synthetic dosage optimization training data"""
-        
-        n_samples = 800
-        
-        features = []
-        optimal_dosages = []
-        
-        for _ in range(n_samples):
-            age = np.random.normal(50, 20)
-            weight = np.random.normal(70, 15)  # kg
-            severity = np.random.uniform(1, 5)
-            therapy_type = np.random.choice([0, 1, 2])  # PRP, BMAC, Exosomes
-            previous_response = np.random.uniform(0, 1)  # 0=no response, 1=excellent
-            
-            feature_vector = [age, weight, severity, therapy_type, previous_response]
-            features.append(feature_vector)
-            
-            # Calculate optimal dosage based on features
-            base_dosage = 1.0
-            dosage_modifier = (
-                (weight / 70) * 0.3 +  # Weight adjustment
-                severity * 0.2 +  # Severity adjustment
-                (therapy_type + 1) * 0.1 +  # Therapy type adjustment
-                (1 - previous_response) * 0.2  # Previous response adjustment
-            )
-            
-            optimal_dosage = max(0.5, min(3.0, base_dosage + dosage_modifier))
-            optimal_dosages.append(optimal_dosage)
-        
-        return {
-            "features": np.array(features),
-            "optimal_dosages": np.array(optimal_dosages)
-        }
+        return generate_dosage_training_data(n_samples=800, seed=self.TRAINING_SEED)
 
     async def predict_treatment_outcome(self, patient_data: Dict, therapy_plan: Dict) -> Dict:
         """Predict treatment outcome for specific patient and therapy"""
         
+        await self.ensure_models_loaded()
+        
         # Extract features for prediction
         features = self._extract_prediction_features(patient_data, therapy_plan)
         
@@ -12727,10 +12489,89 @@ class OutcomePredictionService:
         # Dosage optimization
         optimal_dosage = await self._optimize_dosage(features, therapy_plan)
         
+        prediction_result = self._build_prediction_result(
+            patient_data, therapy_plan, success_prob, timeline_prediction, optimal_dosage
+        )
+        
+        # Store prediction for future validation
+        await self.db.outcome_predictions.insert_one(prediction_result)
+        
+        return prediction_result
+
+    async def predict_treatment_outcomes_batch(
+        self,
+        patients: List[Dict],
+        therapy_plans: List[Dict],
+        store: bool = True
+    ) -> List[Dict]:
+        """Score every patient x therapy plan pair with one predict call per model
+
+        Rows are ordered patient-major (all plans for the first patient, then
+        the next). Results are stored with a single insert_many.
+        """
+        
+        await self.ensure_models_loaded()
+        
+        pairs = [(patient, plan) for patient in patients for plan in therapy_plans]
+        if not pairs:
+            return []
+        
+        # Feature extraction, inference and per-row result assembly are all CPU-bound at
+        # batch sizes; one thread call keeps every row's work off the event loop
+        results = await asyncio.to_thread(self._score_pairs, pairs)
+        
+        if store:
+            # Copies so the returned results stay free of ObjectIds
+            await self.db.outcome_predictions.insert_many([dict(result) for result in results], ordered=False)
+        
+        return results
+
+    def _score_pairs(self, pairs: List[Tuple[Dict, Dict]]) -> List[Dict]:
+        """Prediction results for (patient, therapy plan) pairs, in order"""
+        
+        feature_matrix = np.vstack([self._extract_prediction_features(patient, plan) for patient, plan in pairs])
+        success, timeline_probabilities, dosages = self._predict_matrix(feature_matrix)
+        
+        results = []
+        for row, (patient, plan) in enumerate(pairs):
+            timeline = self._format_timeline(timeline_probabilities[row] if timeline_probabilities is not None else None)
+            dosage = self._format_dosage(float(dosages[row]) if dosages is not None else None, plan)
+            results.append(self._build_prediction_result(patient, plan, float(success[row]), timeline, dosage))
+        return results
+
+    def _predict_matrix(self, feature_matrix: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+        """Run each loaded model once over all rows (missing models fall back to defaults)"""
+        
+        n_rows = feature_matrix.shape[0]
+        
+        if "success_predictor" in self.models:
+            model_data = self.models["success_predictor"]
+            scaled = model_data["scaler"].transform(feature_matrix[:, self.SUCCESS_FEATURES])
+            success = np.clip(model_data["model"].predict(scaled), 0.0, 1.0)
+        else:
+            success = np.full(n_rows, 0.75)  # Default prediction
+        
+        timeline_probabilities = None
+        if "timeline_predictor" in self.models:
+            timeline_probabilities = self.models["timeline_predictor"]["model"].predict_proba(
+                feature_matrix[:, self.TIMELINE_FEATURES]
+            )
+        
+        dosages = None
+        if "dosage_optimizer" in self.models:
+            model_data = self.models["dosage_optimizer"]
+            scaled = model_data["scaler"].transform(feature_matrix[:, self.DOSAGE_FEATURES])
+            dosages = model_data["model"].predict(scaled)
+        
+        return success, timeline_probabilities, dosages
+
+    def _build_prediction_result(
+        self, patient_data: Dict, therapy_plan: Dict, success_prob: float, timeline_prediction: Dict, optimal_dosage: Dict
+    ) -> Dict:
         # Risk assessment
         risk_factors = self._assess_risk_factors(patient_data, therapy_plan)
         
-        prediction_result = {
+        return {
             "patient_id": patient_data.get("patient_id"),
             "therapy": therapy_plan.get("therapy_name"),
             "predictions": {
@@ -12742,20 +12583,15 @@ class OutcomePredictionService:
             "risk_assessment": risk_factors,
             "recommendations": self._generate_outcome_recommendations(success_prob, timeline_prediction, risk_factors),
             "prediction_date": datetime.utcnow(),
-            "model_version": "v1.0"
+            "model_version": self.models.get("success_predictor", {}).get("version", "untrained")
         }
-        
-        # Store prediction for future validation
-        await self.db.outcome_predictions.insert_one(prediction_result)
-        
-        return prediction_result
 
     async def _predict_success_probability(self, features: np.ndarray) -> float:
         """Predict probability of treatment success"""
         
         if "success_predictor" in self.models:
             model_data = self.models["success_predictor"]
-            scaled_features = model_data["scaler"].transform([features])
+            scaled_features = model_data["scaler"].transform([features[self.SUCCESS_FEATURES]])
             prediction = model_data["model"].predict(scaled_features)[0]
             return max(0.0, min(1.0, prediction))  # Clamp to [0,1]
         
@@ -12766,22 +12602,30 @@ class OutcomePredictionService:
         
         if "timeline_predictor" in self.models:
             model_data = self.models["timeline_predictor"]
-            prediction = model_data["model"].predict([features[:5]])[0]  # Use first 5 features
-            probability = model_data["model"].predict_proba([features[:5]])[0]
-            
+            probability = model_data["model"].predict_proba([features[self.TIMELINE_FEATURES]])[0]
+            return self._format_timeline(probability)
+        
+        return self._format_timeline(None)
+
+    def _format_timeline(self, probability: Optional[np.ndarray]) -> Dict:
+        """Timeline prediction payload from one row of class probabilities"""
+        
+        if probability is None:
             return {
-                "predicted_category": model_data["categories"][prediction],
-                "category_probabilities": {
-                    "fast (2-4 weeks)": round(probability[0], 3),
-                    "moderate (4-8 weeks)": round(probability[1], 3),
-                    "slow (8-12 weeks)": round(probability[2], 3)
-                },
-                "most_likely": model_data["categories"][prediction]
+                "predicted_category": "4-8 weeks",
+                "most_likely": "moderate response expected"
             }
         
+        model_data = self.models["timeline_predictor"]
+        prediction = model_data["model"].classes_[int(np.argmax(probability))]
         return {
-            "predicted_category": "4-8 weeks",
-            "most_likely": "moderate response expected"
+            "predicted_category": model_data["categories"][prediction],
+            "category_probabilities": {
+                "fast (2-4 weeks)": round(float(probability[0]), 3),
+                "moderate (4-8 weeks)": round(float(probability[1]), 3),
+                "slow (8-12 weeks)": round(float(probability[2]), 3)
+            },
+            "most_likely": model_data["categories"][prediction]
         }
 
     async def _optimize_dosage(self, features: np.ndarray, therapy_plan: Dict) -> Dict:
@@ -12789,9 +12633,16 @@ class OutcomePredictionService:
         
         if "dosage_optimizer" in self.models:
             model_data = self.models["dosage_optimizer"]
-            scaled_features = model_data["scaler"].transform([features[:5]])  # Use first 5 features
+            scaled_features = model_data["scaler"].transform([features[self.DOSAGE_FEATURES]])
             predicted_dosage = model_data["model"].predict(scaled_features)[0]
-            
+            return self._format_dosage(predicted_dosage, therapy_plan)
+        
+        return self._format_dosage(None, therapy_plan)
+
+    def _format_dosage(self, predicted_dosage: Optional[float], therapy_plan: Dict) -> Dict:
+        """Therapy-specific dosage recommendation for a predicted relative dose"""
+        
+        if predicted_dosage is not None:
             # Convert to therapy-specific dosage recommendations
             therapy_name = therapy_plan.get("therapy", "").lower()
             
@@ -12833,83 +12684,11 @@ class OutcomePredictionService:
 
     def _generate_synthetic_training_data(self) -> Dict:
         """Generate synthetic training data for model development"""
-        
-        n_samples = 1000
-        
-        # Generate features: [age, gender, diagnosis_confidence, therapy_type, dosage, comorbidities, previous_treatments, baseline_pain]
-        features = []
-        success_rates = []
-        
-        for _ in range(n_samples):
-            age = np.random.normal(55, 15)  # Average age 55
-            gender = np.random.choice([0, 1])  # 0=male, 1=female
-            diagnosis_conf = np.random.uniform(0.7, 1.0)
-            therapy_type = np.random.choice([0, 1, 2])  # 0=PRP, 1=BMAC, 2=Exosomes
-            dosage = np.random.uniform(0.5, 2.0)  # Relative dosage
-            comorbidities = np.random.poisson(1)  # Number of comorbidities
-            prev_treatments = np.random.poisson(2)  # Previous treatments
-            baseline_pain = np.random.uniform(3, 9)  # Pain scale 1-10
-            
-            feature_vector = [age, gender, diagnosis_conf, therapy_type, dosage, comorbidities, prev_treatments, baseline_pain]
-            features.append(feature_vector)
-            
-            # Calculate success rate based on features (simplified model)
-            success_rate = (
-                0.8 +  # Base success rate
-                (1 - age/100) * 0.1 +  # Age factor
-                diagnosis_conf * 0.1 +  # Confidence factor
-                (therapy_type + 1) * 0.05 +  # Therapy effectiveness
-                dosage * 0.05 -  # Dosage optimization
-                comorbidities * 0.03 -  # Comorbidity penalty
-                prev_treatments * 0.02 -  # Previous treatment failures
-                baseline_pain * 0.02  # Pain severity penalty
-            )
-            success_rates.append(max(0.3, min(0.95, success_rate)))  # Clamp to reasonable range
-        
-        return {
-            "features": np.array(features),
-            "success_rates": np.array(success_rates)
-        }
+        return generate_success_training_data(n_samples=1000, seed=self.TRAINING_SEED)
 
     def _generate_timeline_training_data(self) -> Dict:
         """Generate synthetic timeline training data"""
-        
-        n_samples = 800
-        
-        features = []
-        categories = []
-        
-        for _ in range(n_samples):
-            age = np.random.normal(50, 20)
-            severity = np.random.uniform(1, 5)  # Severity score
-            therapy_type = np.random.choice([0, 1, 2])
-            baseline_function = np.random.uniform(0.3, 0.9)
-            inflammation = np.random.uniform(0.1, 0.8)
-            
-            feature_vector = [age, severity, therapy_type, baseline_function, inflammation]
-            features.append(feature_vector)
-            
-            # Determine response category based on features
-            response_score = (
-                baseline_function * 2 +  # Better baseline = faster response
-                (1 - severity/5) * 1.5 +  # Lower severity = faster response
-                (1 - inflammation) * 1 +  # Lower inflammation = faster response
-                (therapy_type + 1) * 0.3  # Therapy effectiveness
-            )
-            
-            if response_score > 3.5:
-                category = 0  # Fast response
-            elif response_score > 2.5:
-                category = 1  # Moderate response
-            else:
-                category = 2  # Slow response
-                
-            categories.append(category)
-        
-        return {
-            "features": np.array(features),
-            "response_categories": np.array(categories)
-        }
+        return generate_timeline_training_data(n_samples=800, seed=self.TRAINING_SEED)
 
     def _extract_prediction_features(self, patient_data: Dict, therapy_plan: Dict) -> np.ndarray:
         """Extract numerical features for ML prediction"""
@@ -12943,9 +12722,31 @@ class OutcomePredictionService:
         baseline_function = 0.6  # Functional assessment score
         inflammation = 0.4  # Inflammatory marker levels
         
+        # Additional features for dosage optimization
+        weight = self._patient_weight_kg(patient_data)
+        # No treatment-response history is recorded yet; the training midpoint is neutral
+        previous_response = self.DEFAULT_PREVIOUS_RESPONSE
+        
         return np.array([age, gender, diagnosis_conf, therapy_type, dosage, 
                         comorbidities, prev_treatments, baseline_pain, severity, 
-                        baseline_function, inflammation])
+                        baseline_function, inflammation, weight, previous_response])
+
+    def _patient_weight_kg(self, patient_data: Dict) -> float:
+        """Body weight from demographics or vital signs ("82", "82 kg", "180 lb"), else the default"""
+        
+        for source in (patient_data.get("demographics") or {}, patient_data.get("vital_signs") or {}):
+            value = source.get("weight_kg", source.get("weight"))
+            if value is None:
+                continue
+            match = re.search(r"\d+(\.\d+)?", str(value))
+            if not match:
+                continue
+            weight = float(match.group())
+            if re.search(r"lb|pound", str(value), re.IGNORECASE):
+                weight *= 0.4536
+            if 20.0 <= weight <= 300.0:
+                return weight
+        return self.DEFAULT_WEIGHT_KG
 
     def _assess_risk_factors(self, patient_data: Dict, therapy_plan: Dict) -> Dict:
         """Assess risk factors that might affect treatment outcome"""
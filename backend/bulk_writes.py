@@ -0,0 +1,107 @@
+"""
+Bulk Upsert Helpers for Ingestion Pipelines
+- One unordered bulk_write of UpdateOne(..., upsert=True) per batch instead of
+  find_one + insert_one/update_one per document
+- $setOnInsert for the full document, $addToSet for accumulating search tags, and an
+  optional per-document $set for fields the source may have revised since the first insert
+- Documents-per-second throughput recorded per collection
+- Upsert keys (pmid, gs_id, nct_id) are backed by unique indexes in db_indexes
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+async def bulk_upsert(
+    collection,
+    documents: List[Dict[str, Any]],
+    key_field: str,
+    add_to_set: Optional[Dict[str, List[Any]]] = None,
+    set_fields: Optional[Dict[str, Any]] = None,
+    refresh_fields: Optional[List[str]] = None,
+    batch_size: int = 1000
+) -> Dict[str, Any]:
+    """Upsert documents keyed on key_field in unordered bulk_write batches
+
+    New documents are inserted whole via $setOnInsert; existing ones only
+    receive set_fields, their own values of refresh_fields and the add_to_set
+    values. Returns counts plus the newly inserted documents (with their _id)
+    and the matched ones, so callers can update indexes.
+    """
+
+    started = time.monotonic()
+    add_to_set = {field: values for field, values in (add_to_set or {}).items() if values}
+    set_fields = set_fields or {}
+    refresh_fields = [field for field in (refresh_fields or []) if field not in set_fields]
+    protected = set(set_fields) | set(add_to_set) | set(refresh_fields) | {"_id"}
+
+    inserted_documents: List[Dict[str, Any]] = []
+    updated_documents: List[Dict[str, Any]] = []
+    matched = 0
+    modified = 0
+    skipped = 0
+
+    for offset in range(0, len(documents), batch_size):
+        batch = [doc for doc in documents[offset:offset + batch_size] if doc.get(key_field)]
+        skipped += len(documents[offset:offset + batch_size]) - len(batch)
+        if not batch:
+            continue
+
+        operations = []
+        for doc in batch:
+            # Fields updated on every write must not also appear in $setOnInsert
+            update: Dict[str, Any] = {"$setOnInsert": {k: v for k, v in doc.items() if k not in protected}}
+            refreshed = {field: doc[field] for field in refresh_fields if field in doc}
+            if set_fields or refreshed:
+                update["$set"] = {**set_fields, **refreshed}
+            if add_to_set:
+                update["$addToSet"] = {field: {"$each": values} for field, values in add_to_set.items()}
+            operations.append(UpdateOne({key_field: doc[key_field]}, update, upsert=True))
+
+        failed = set()
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            # Concurrent upserts of the same key race on the unique index; the loser is a no-op
+            details = e.details
+            failed = {err.get("index") for err in details.get("writeErrors", [])}
+            non_duplicate = [err for err in details.get("writeErrors", []) if err.get("code") != 11000]
+            if non_duplicate:
+                logger.error(f"Bulk upsert into {collection.name} had {len(non_duplicate)} write errors: {non_duplicate[0].get('errmsg')}")
+
+        matched += details.get("nMatched", 0)
+        modified += details.get("nModified", 0)
+        upserted_indexes = set()
+        for upserted in details.get("upserted", []):
+            upserted_indexes.add(upserted["index"])
+            inserted_documents.append({**batch[upserted["index"]], **set_fields, "_id": upserted["_id"]})
+        updated_documents.extend(
+            {**doc, **set_fields} for index, doc in enumerate(batch)
+            if index not in upserted_indexes and index not in failed
+        )
+
+    elapsed = time.monotonic() - started
+    written = len(inserted_documents) + matched
+    metrics.record_throughput("ingest_documents_per_second", written, elapsed, collection=collection.name)
+    metrics.increment("ingest_documents_upserted_total", value=len(inserted_documents), collection=collection.name)
+    metrics.increment("ingest_documents_matched_total", value=matched, collection=collection.name)
+
+    return {
+        "inserted": len(inserted_documents),
+        "matched": matched,
+        "modified": modified,
+        "skipped": skipped,
+        "elapsed_seconds": elapsed,
+        "inserted_documents": inserted_documents,
+        "updated_documents": updated_documents
+    }
+
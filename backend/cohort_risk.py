@@ -0,0 +1,212 @@
+"""
+Vectorized Cohort Risk Stratification
+- Flattens a patient cohort into one DataFrame (ages, severity text, joined history/medication text)
+- Success, adverse-event, bleeding, infection and cardiovascular scores as NumPy column operations
+- Same thresholds and weights as PersonalizedRiskAssessment's per-patient calculators
+- Returns ranked summaries plus compact per-patient documents for a single insert_many
+"""
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Same term lists as the per-patient calculators in PersonalizedRiskAssessment
+SIMPLE_ANTICOAGULANTS = ["warfarin", "heparin", "apixaban", "rivaroxaban", "dabigatran", "aspirin"]
+ANTICOAGULANTS = ["warfarin", "heparin", "apixaban", "rivaroxaban", "dabigatran"]
+ANTIPLATELETS = ["aspirin", "clopidogrel", "prasugrel"]
+CV_CONDITIONS = ["hypertension", "diabetes", "hyperlipidemia", "smoking", "family history"]
+IMMUNOCOMPROMISING_CONDITIONS = ["diabetes", "immunodeficiency", "cancer", "organ transplant"]
+IMMUNOSUPPRESSIVE_MEDS = ["steroid", "methotrexate", "biologics", "immunosuppressive"]
+
+# Complication risks are fixed population estimates (mean of the four 12-month risks)
+OVERALL_COMPLICATION_RISK = float(np.mean([0.20, 0.15, 0.08, 0.12]))
+
+
+def _as_list(value: Any) -> List[str]:
+    return [str(item) for item in value] if isinstance(value, list) else []
+
+
+def build_cohort_frame(patients: List[Dict[str, Any]]) -> pd.DataFrame:
+    """One row per patient with the raw inputs every score needs
+
+    List fields are joined with newlines and lowercased so a term match on
+    the joined text equals "any item contains the term".
+    """
+
+    rows = []
+    for patient in patients:
+        demographics = patient.get("demographics") or {}
+        presentation = patient.get("clinical_presentation") or {}
+        history = patient.get("medical_history") or {}
+
+        if isinstance(history, dict):
+            past_history = _as_list(history.get("past_medical_history"))
+            medications = _as_list(history.get("medications"))
+            allergies = _as_list(history.get("allergies"))
+            complexity = len(past_history) + len(medications) + len(allergies)
+        else:
+            # Simple format: medical_history is just a list of conditions
+            past_history, medications, allergies = [], [], []
+            complexity = len(history) if isinstance(history, list) else 0
+
+        rows.append({
+            # Entries without an id stay unidentified rather than getting a made-up one
+            "patient_id": patient.get("patient_id"),
+            "age": demographics.get("age", 50),
+            "gender": str(demographics.get("gender", "unknown")).lower(),
+            "symptom_duration": str(presentation.get("symptom_duration", "unknown")).lower(),
+            "symptom_severity": str(presentation.get("symptom_severity", "moderate")).lower(),
+            "medical_complexity": complexity,
+            "allergy_count": len(allergies),
+            "medications": "\n".join(medications).lower(),
+            "past_history": "\n".join(past_history).lower()
+        })
+
+    frame = pd.DataFrame(rows, columns=[
+        "patient_id", "age", "gender", "symptom_duration", "symptom_severity",
+        "medical_complexity", "allergy_count", "medications", "past_history"
+    ])
+    frame["age"] = pd.to_numeric(frame["age"], errors="coerce")
+    return frame
+
+
+def _mentions_any(text: pd.Series, terms: List[str]) -> np.ndarray:
+    return text.str.contains("|".join(terms), regex=True).to_numpy()
+
+
+def _term_count(text: pd.Series, terms: List[str]) -> np.ndarray:
+    return sum(text.str.contains(term, regex=False).to_numpy().astype(np.int64) for term in terms)
+
+
+def score_cohort(frame: pd.DataFrame) -> pd.DataFrame:
+    """Add score/level columns for every patient using whole-column operations"""
+
+    age = frame["age"].to_numpy(dtype=float)
+    known_age = ~np.isnan(age)
+    age_filled = np.nan_to_num(age, nan=0.0)
+
+    # Treatment success
+    age_score = np.where(~known_age, 0.0, np.where(age_filled > 70, -0.25, np.where(age_filled > 60, -0.10, 0.05)))
+    duration_score = np.where(frame["symptom_duration"].str.contains("year", regex=False).to_numpy(), -0.05, 0.10)
+    complexity = frame["medical_complexity"].to_numpy()
+    complexity_score = np.where(complexity > 8, -0.15, np.where(complexity > 4, -0.05, 0.05))
+    success = np.clip(0.75 + age_score + duration_score + complexity_score, 0.1, 0.95)
+
+    # Adverse events (mean of pain flare, infection, bleeding, allergic reaction)
+    severity = frame["symptom_severity"]
+    pain_flare = np.where(severity.str.contains("severe", regex=False).to_numpy(), 0.25,
+                          np.where(severity.str.contains("moderate", regex=False).to_numpy(), 0.15, 0.10))
+    infection_multiplier = (
+        np.where(_mentions_any(frame["medications"], ["steroid", "immunosuppressive"]), 2.5, 1.0) *
+        np.where(frame["past_history"].str.contains("diabetes", regex=False).to_numpy(), 1.8, 1.0)
+    )
+    infection_simple = np.minimum(0.15, 0.02 * infection_multiplier)
+    bleeding_simple = np.where(_mentions_any(frame["medications"], SIMPLE_ANTICOAGULANTS), 0.09, 0.03)
+    allergies = frame["allergy_count"].to_numpy()
+    allergic = np.where(allergies > 3, 0.04, np.where(allergies > 0, 0.02, 0.01))
+    adverse = (pain_flare + infection_simple + bleeding_simple + allergic) / 4
+
+    # Cardiovascular risk factor count
+    cv_factors = (
+        np.where(age_filled > 65, 2, np.where(age_filled > 55, 1, 0)) * known_age +
+        (frame["gender"] == "male").to_numpy().astype(np.int64) +
+        _term_count(frame["past_history"], CV_CONDITIONS)
+    )
+
+    # Detailed bleeding score
+    anticoagulated = _mentions_any(frame["medications"], ANTICOAGULANTS)
+    antiplatelet = _mentions_any(frame["medications"], ANTIPLATELETS)
+    bleeding_score = (
+        np.where(anticoagulated, 3, np.where(antiplatelet, 1, 0)) +
+        np.where(frame["past_history"].str.contains("bleeding", regex=False).to_numpy(), 2, 0)
+    )
+
+    # Detailed infection score
+    infection_score = (
+        2 * _term_count(frame["past_history"], IMMUNOCOMPROMISING_CONDITIONS) +
+        _term_count(frame["medications"], IMMUNOSUPPRESSIVE_MEDS)
+    )
+
+    # Overall stratification
+    harm = adverse + OVERALL_COMPLICATION_RISK
+    composite = success - harm
+    category = np.select(
+        [(composite > 0.50) & (success > 0.80), (composite > 0.30) & (success > 0.65), composite > 0.10],
+        ["low_risk_high_benefit", "moderate_risk_moderate_benefit", "moderate_risk_uncertain_benefit"],
+        default="high_risk_low_benefit"
+    )
+
+    def level(scores: np.ndarray, high: float, moderate: float, strict: bool = False) -> np.ndarray:
+        above_high = scores > high if strict else scores >= high
+        above_moderate = scores > moderate if strict else scores >= moderate
+        return np.select([above_high, above_moderate], ["high", "moderate"], default="low")
+
+    return frame.assign(
+        treatment_success_probability=success,
+        success_risk_level=np.select(
+            [success >= 0.80, success >= 0.65],
+            ["high_success_probability", "moderate_success_probability"],
+            default="lower_success_probability"
+        ),
+        adverse_event_risk=adverse,
+        adverse_event_risk_level=level(adverse, 0.20, 0.10, strict=True),
+        complication_risk=OVERALL_COMPLICATION_RISK,
+        cardiovascular_risk_factors=cv_factors,
+        cardiovascular_risk_level=level(cv_factors, 4, 2),
+        bleeding_risk_score=bleeding_score,
+        bleeding_risk_level=level(bleeding_score, 4, 2),
+        infection_risk_score=infection_score,
+        infection_risk_level=level(infection_score, 4, 2),
+        composite_risk_score=composite,
+        risk_benefit_ratio=success / np.maximum(0.01, harm),
+        overall_risk_category=category
+    )
+
+
+SUMMARY_COLUMNS = [
+    "patient_id", "overall_risk_category", "treatment_success_probability", "adverse_event_risk",
+    "risk_benefit_ratio", "composite_risk_score", "success_risk_level", "adverse_event_risk_level",
+    "cardiovascular_risk_level", "cardiovascular_risk_factors", "bleeding_risk_level", "bleeding_risk_score",
+    "infection_risk_level", "infection_risk_score"
+]
+
+
+def stratify_cohort(patients: List[Dict[str, Any]], treatment_type: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Score and rank a cohort (highest risk-benefit first)
+
+    Returns (summaries, assessment documents ready for insert_many).
+    """
+
+    if not patients:
+        return [], []
+
+    scored = score_cohort(build_cohort_frame(patients))
+    scored = scored.sort_values("risk_benefit_ratio", ascending=False, kind="stable")
+    # to_dict converts NumPy scalars to Python types, so documents are BSON-encodable
+    summaries = scored[SUMMARY_COLUMNS].to_dict(orient="records")
+    for summary in summaries:
+        # pandas turns a missing id into NaN, which must not reach Mongo or the response
+        if pd.isna(summary["patient_id"]):
+            summary["patient_id"] = None
+
+    cohort_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    documents = [
+        {
+            **summary,
+            "assessment_id": str(uuid.uuid4()),
+            "cohort_id": cohort_id,
+            "treatment_type": treatment_type,
+            "assessment_type": "cohort_stratification",
+            "assessment_timestamp": now.isoformat(),
+            "stored_at": now
+        }
+        for summary in summaries
+    ]
+    return summaries, documents
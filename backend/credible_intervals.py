@@ -0,0 +1,101 @@
+"""
+Bayesian Credible Intervals for Diagnostic Probabilities
+- Beta(p * n, (1 - p) * n) posterior with n pseudo-observations per probability
+- 80/90/95% equal-tailed intervals for every probability from one vectorized beta.ppf call
+- LRU cache keyed on the rounded (alpha, beta) pair; repeated probabilities skip scipy entirely
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from scipy import stats
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PSEUDO_COUNT = 100
+# Parameters are rounded before caching; 2 decimals of alpha/beta is far below interval precision
+PARAMETER_DECIMALS = 2
+CACHE_SIZE = 4096
+
+INTERVAL_LEVELS = {
+    "95_percent": (0.025, 0.975),
+    "90_percent": (0.05, 0.95),
+    "80_percent": (0.1, 0.9),
+}
+_QUANTILES = np.array([q for bounds in INTERVAL_LEVELS.values() for q in bounds])
+
+# Keeps alpha and beta strictly positive for probabilities of exactly 0 or 1
+_PROBABILITY_EPSILON = 1e-4
+
+_cache: "OrderedDict[Tuple[float, float], np.ndarray]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _beta_parameters(probabilities: np.ndarray, pseudo_count: float) -> Tuple[np.ndarray, np.ndarray]:
+    probabilities = np.clip(probabilities, _PROBABILITY_EPSILON, 1 - _PROBABILITY_EPSILON)
+    alpha = np.round(probabilities * pseudo_count, PARAMETER_DECIMALS)
+    beta = np.round((1 - probabilities) * pseudo_count, PARAMETER_DECIMALS)
+    return alpha, beta
+
+
+def interval_quantiles(probabilities: Iterable[float], pseudo_count: float = PSEUDO_COUNT) -> np.ndarray:
+    """(n, 6) array of interval bounds in INTERVAL_LEVELS order: lower/upper for 95, 90, 80%"""
+
+    probabilities = np.asarray(list(probabilities), dtype=float)
+    if probabilities.size == 0:
+        return np.empty((0, _QUANTILES.size))
+
+    alpha, beta = _beta_parameters(probabilities, pseudo_count)
+    keys = list(zip(alpha.tolist(), beta.tolist()))
+    result = np.empty((len(keys), _QUANTILES.size))
+
+    missing: Dict[Tuple[float, float], List[int]] = {}
+    with _cache_lock:
+        for row, key in enumerate(keys):
+            cached = _cache.get(key)
+            if cached is None:
+                missing.setdefault(key, []).append(row)
+            else:
+                _cache.move_to_end(key)
+                result[row] = cached
+
+    hits = len(keys) - sum(len(rows) for rows in missing.values())
+    if hits:
+        metrics.increment("credible_interval_cache_hits_total", value=hits)
+
+    if missing:
+        metrics.increment("credible_interval_cache_misses_total", value=len(missing))
+        pairs = np.array(list(missing.keys()))
+        # One ppf call for every uncached (alpha, beta) pair and every quantile
+        computed = stats.beta.ppf(_QUANTILES[np.newaxis, :], pairs[:, :1], pairs[:, 1:])
+        with _cache_lock:
+            for (key, rows), quantiles in zip(missing.items(), computed):
+                result[rows] = quantiles
+                _cache[key] = quantiles
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    return result
+
+
+def credible_intervals(probabilities: Iterable[float], pseudo_count: float = PSEUDO_COUNT) -> List[Dict[str, List[float]]]:
+    """Per probability: {"95_percent": [lower, upper], "90_percent": [...], "80_percent": [...]}"""
+
+    quantiles = interval_quantiles(probabilities, pseudo_count)
+    return [
+        {
+            level: [float(bounds[2 * index]), float(bounds[2 * index + 1])]
+            for index, level in enumerate(INTERVAL_LEVELS)
+        }
+        for bounds in quantiles
+    ]
+
+
+def clear_interval_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,238 @@
+"""
+Practitioner Dashboard Rollups
+- One practitioner_rollups document per practitioner, maintained with atomic $inc
+- Running sums/counts for outcome metrics so averages never rescan patient_outcomes
+- Protocol counts per status, adjusted on every status transition
+- Every increment bumps rollup_version; reconciliation rebuilds rollups from the source
+  collections and writes them only if the version is unchanged since its snapshot, retrying
+  the practitioner when an increment landed during the rebuild
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS_COLLECTION = "practitioner_rollups"
+
+# Snapshot/rebuild/compare rounds per practitioner before leaving it to the next reconciliation
+RECONCILE_ATTEMPTS = 3
+
+# outcome field -> rollup running-sum prefix
+OUTCOME_METRICS = {
+    "overall_success_score": "success_score",
+    "pain_reduction_percentage": "pain_reduction",
+    "patient_satisfaction": "patient_satisfaction"
+}
+
+_COUNTER_FIELDS = ["total_patients", "total_protocols", "outcomes_tracked"] + [
+    f"{prefix}_{suffix}" for prefix in OUTCOME_METRICS.values() for suffix in ("sum", "count")
+]
+
+
+def _metric_value(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def _increment(db_client, practitioner_id: str, increments: Dict[str, float]):
+    if not practitioner_id or not increments:
+        return
+    try:
+        await db_client[ROLLUPS_COLLECTION].update_one(
+            {"practitioner_id": practitioner_id},
+            {"$inc": {**increments, "rollup_version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        metrics.increment("practitioner_rollup_updates_total")
+    except Exception as e:
+        # A missed increment is repaired by the next reconciliation
+        logger.error(f"Rollup update for practitioner {practitioner_id} failed: {str(e)}")
+
+
+async def record_patient_created(db_client, practitioner_id: str):
+    await _increment(db_client, practitioner_id, {"total_patients": 1})
+
+
+async def record_protocol_created(db_client, practitioner_id: str, status: str = "draft"):
+    await _increment(db_client, practitioner_id, {"total_protocols": 1, f"protocols_by_status.{status}": 1})
+
+
+async def record_protocol_status_change(db_client, practitioner_id: str, old_status: Optional[str], new_status: str):
+    if old_status == new_status:
+        return
+    increments = {f"protocols_by_status.{new_status}": 1}
+    if old_status:
+        increments[f"protocols_by_status.{old_status}"] = -1
+    await _increment(db_client, practitioner_id, increments)
+
+
+async def record_outcome(db_client, practitioner_id: str, outcome: Dict[str, Any]):
+    increments: Dict[str, float] = {"outcomes_tracked": 1}
+    for field, prefix in OUTCOME_METRICS.items():
+        value = _metric_value(outcome.get(field))
+        if value is not None:
+            increments[f"{prefix}_sum"] = value
+            increments[f"{prefix}_count"] = 1
+    await _increment(db_client, practitioner_id, increments)
+
+
+async def get_practitioner_rollup(db_client, practitioner_id: str) -> Optional[Dict[str, Any]]:
+    return await db_client[ROLLUPS_COLLECTION].find_one({"practitioner_id": practitioner_id}, {"_id": 0})
+
+
+def rollup_average(rollup: Dict[str, Any], prefix: str) -> Optional[float]:
+    count = rollup.get(f"{prefix}_count", 0)
+    return rollup.get(f"{prefix}_sum", 0) / count if count else None
+
+
+async def _snapshot(collection, practitioner_id: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    snapshot: Dict[str, Dict[str, Any]] = {}
+    async for current in collection.find(
+        {"practitioner_id": practitioner_id} if practitioner_id else {},
+        {"_id": 0, "updated_at": 0, "reconciled_at": 0}
+    ):
+        snapshot[current["practitioner_id"]] = current
+    return snapshot
+
+
+async def _rebuild(db_client, practitioner_id: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """Rollup documents recomputed with server-side $group aggregations"""
+
+    rebuilt: Dict[str, Dict[str, Any]] = {}
+
+    def rollup_for(pid: str) -> Dict[str, Any]:
+        if pid not in rebuilt:
+            rebuilt[pid] = {"practitioner_id": pid, "protocols_by_status": {}, **{field: 0 for field in _COUNTER_FIELDS}}
+        return rebuilt[pid]
+
+    patient_match = {"practitioner_id": practitioner_id} if practitioner_id else {}
+    async for row in db_client.patients.aggregate([
+        {"$match": patient_match},
+        {"$group": {"_id": "$practitioner_id", "count": {"$sum": 1}}}
+    ]):
+        if row["_id"]:
+            rollup_for(row["_id"])["total_patients"] = row["count"]
+
+    async for row in db_client.protocols.aggregate([
+        {"$match": patient_match},
+        {"$group": {"_id": {"practitioner_id": "$practitioner_id", "status": "$status"}, "count": {"$sum": 1}}}
+    ]):
+        pid = row["_id"].get("practitioner_id")
+        if not pid:
+            continue
+        rollup = rollup_for(pid)
+        rollup["total_protocols"] += row["count"]
+        rollup["protocols_by_status"][row["_id"].get("status") or "unknown"] = row["count"]
+
+    outcome_group: Dict[str, Any] = {"_id": "$recorded_by", "outcomes_tracked": {"$sum": 1}}
+    for field, prefix in OUTCOME_METRICS.items():
+        numeric = {"$convert": {"input": f"${field}", "to": "double", "onError": None, "onNull": None}}
+        outcome_group[f"{prefix}_sum"] = {"$sum": numeric}
+        outcome_group[f"{prefix}_count"] = {"$sum": {"$cond": [{"$ne": [numeric, None]}, 1, 0]}}
+    async for row in db_client.patient_outcomes.aggregate([
+        {"$match": {"recorded_by": practitioner_id} if practitioner_id else {}},
+        {"$group": outcome_group}
+    ]):
+        if row["_id"]:
+            rollup = rollup_for(row.pop("_id"))
+            rollup.update(row)
+
+    if practitioner_id:
+        rollup_for(practitioner_id)
+    return rebuilt
+
+
+async def _write_if_unchanged(collection, current: Optional[Dict[str, Any]], rollup: Dict[str, Any]) -> bool:
+    """Replace the counters only if no increment landed since current was read"""
+
+    version = (current or {}).get("rollup_version")
+    now = datetime.utcnow()
+    try:
+        result = await collection.update_one(
+            {
+                "practitioner_id": rollup["practitioner_id"],
+                "rollup_version": version if version is not None else {"$exists": False}
+            },
+            {
+                "$set": {
+                    **{field: rollup.get(field) or 0 for field in _COUNTER_FIELDS},
+                    "protocols_by_status": rollup.get("protocols_by_status") or {},
+                    "updated_at": now,
+                    "reconciled_at": now
+                },
+                "$inc": {"rollup_version": 1}
+            },
+            # Only a practitioner with no rollup yet is inserted
+            upsert=current is None
+        )
+    except DuplicateKeyError:
+        # Its first increment created the document while the rebuild ran
+        return False
+    return current is None or result.matched_count > 0
+
+
+async def reconcile_practitioner_rollups(db_client, practitioner_id: Optional[str] = None) -> Dict[str, Any]:
+    """Rebuild rollups from patients, protocols and patient_outcomes
+
+    Each practitioner's document is read (with its rollup_version) before the
+    aggregations and overwritten only if the version is unchanged. If a write
+    incremented it meanwhile, that practitioner is re-read and rebuilt alone,
+    up to RECONCILE_ATTEMPTS times. Returns how many were rebuilt, which had
+    drifted from their incrementally maintained values, and which were left
+    for the next reconciliation.
+    """
+
+    started = datetime.utcnow()
+    collection = db_client[ROLLUPS_COLLECTION]
+
+    snapshot = await _snapshot(collection, practitioner_id)
+    rebuilt = await _rebuild(db_client, practitioner_id)
+
+    drifted: List[str] = []
+    skipped: List[str] = []
+    for pid, rollup in rebuilt.items():
+        current = snapshot.get(pid)
+        for attempt in range(RECONCILE_ATTEMPTS):
+            if attempt:
+                metrics.increment("practitioner_rollup_reconcile_retries_total")
+                current = (await _snapshot(collection, pid)).get(pid)
+                rollup = (await _rebuild(db_client, pid))[pid]
+            if await _write_if_unchanged(collection, current, rollup):
+                break
+        else:
+            skipped.append(pid)
+            continue
+        if current is not None and _drifted(current, rollup):
+            drifted.append(pid)
+
+    metrics.increment("practitioner_rollup_reconciliations_total")
+    metrics.increment("practitioner_rollup_drift_total", value=len(drifted))
+    if drifted:
+        logger.warning(f"Rollups drifted for {len(drifted)} practitioners; rebuilt from source collections")
+    if skipped:
+        logger.warning(f"Rollups for {len(skipped)} practitioners kept changing during reconciliation; left for the next run")
+
+    return {
+        "practitioners_rebuilt": len(rebuilt) - len(skipped),
+        "drifted_practitioners": drifted,
+        "skipped_practitioners": skipped,
+        "elapsed_seconds": (datetime.utcnow() - started).total_seconds()
+    }
+
+
+def _drifted(current: Dict[str, Any], rebuilt: Dict[str, Any]) -> bool:
+    for field in _COUNTER_FIELDS:
+        if abs((current.get(field) or 0) - (rebuilt.get(field) or 0)) > 1e-6:
+            return True
+    current_status = {k: v for k, v in (current.get("protocols_by_status") or {}).items() if v}
+    return current_status != rebuilt.get("protocols_by_status", {})
@@ -0,0 +1,313 @@
+"""
+Declarative MongoDB Index Registry
+- One INDEX_REGISTRY entry per collection the API queries, keyed by its hot filters and sorts
+- Applied idempotently at startup: indexes already present (by key pattern and options) are left alone
+- Audit reports missing, conflicting and extra (unregistered) indexes per collection
+- CLI for checking and building indexes out of band on large collections:
+    python db_indexes.py --check
+    python db_indexes.py --apply --background [--collection literature_papers]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ASCENDING = 1
+DESCENDING = -1
+
+
+class IndexSpec(NamedTuple):
+    keys: List[Tuple[str, int]]
+    unique: bool = False
+    partial_filter: Optional[Dict[str, Any]] = None
+    expire_after_seconds: Optional[int] = None
+    name: Optional[str] = None
+
+    @property
+    def index_name(self) -> str:
+        # Mongo's default naming, so indexes created before the registry are recognised
+        return self.name or "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    def create_options(self, background: bool = False) -> Dict[str, Any]:
+        options: Dict[str, Any] = {"name": self.index_name}
+        if self.unique:
+            options["unique"] = True
+        if self.partial_filter is not None:
+            options["partialFilterExpression"] = self.partial_filter
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        if background:
+            options["background"] = True
+        return options
+
+    def matches(self, existing: Dict[str, Any]) -> bool:
+        """True when an index_information() entry has the same keys and options"""
+        # Numeric directions come back as floats; text/2dsphere keys are strings
+        existing_keys = [
+            (field, int(direction) if isinstance(direction, (int, float)) else direction)
+            for field, direction in existing.get("key", [])
+        ]
+        return (
+            existing_keys == list(self.keys)
+            and bool(existing.get("unique", False)) == self.unique
+            and existing.get("partialFilterExpression") == self.partial_filter
+            and existing.get("expireAfterSeconds") == self.expire_after_seconds
+        )
+
+
+def _partial_unique(field: str) -> IndexSpec:
+    # Partial so documents lacking the upsert key are still allowed
+    return IndexSpec([(field, ASCENDING)], unique=True,
+                     partial_filter={field: {"$type": "string"}}, name=f"{field}_unique")
+
+
+INDEX_REGISTRY: Dict[str, List[IndexSpec]] = {
+    "patients": [
+        IndexSpec([("patient_id", ASCENDING)], unique=True),
+        IndexSpec([("practitioner_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "uploaded_files": [
+        IndexSpec([("file_id", ASCENDING)], unique=True),
+        IndexSpec([("patient_id", ASCENDING), ("upload_date", DESCENDING)]),
+        # Content dedup per patient; legacy records without a hash are excluded
+        IndexSpec(
+            [("patient_id", ASCENDING), ("content_sha256", ASCENDING)],
+            unique=True,
+            partial_filter={"content_sha256": {"$type": "string"}},
+            name="patient_content_sha256_unique"
+        ),
+    ],
+    "processed_files": [
+        IndexSpec([("file_id", ASCENDING)]),
+        IndexSpec([("patient_id", ASCENDING), ("processing_time", DESCENDING)]),
+    ],
+    "patient_analyses": [
+        IndexSpec([("patient_id", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "comprehensive_analyses": [
+        IndexSpec([("patient_id", ASCENDING), ("analysis_timestamp", DESCENDING)]),
+    ],
+    "dicom_analyses": [
+        IndexSpec([("patient_id", ASCENDING), ("processing_date", DESCENDING)]),
+    ],
+    "dicom_studies": [
+        IndexSpec([("patient_id", ASCENDING), ("study_instance_uid", ASCENDING)], unique=True),
+        IndexSpec([("patient_id", ASCENDING), ("processing_date", DESCENDING)]),
+    ],
+    "image_previews": [
+        IndexSpec([("file_id", ASCENDING), ("preset", ASCENDING), ("level", ASCENDING)], unique=True),
+    ],
+    "dicom_series": [
+        IndexSpec([("patient_id", ASCENDING), ("series_instance_uid", ASCENDING)], unique=True),
+        IndexSpec([("patient_id", ASCENDING), ("study_instance_uid", ASCENDING)]),
+    ],
+    "protocols": [
+        IndexSpec([("protocol_id", ASCENDING)], unique=True),
+        IndexSpec([("practitioner_id", ASCENDING), ("status", ASCENDING)]),
+        IndexSpec([("patient_id", ASCENDING), ("generation_timestamp", DESCENDING)]),
+    ],
+    "patient_outcomes": [
+        IndexSpec([("recorded_by", ASCENDING), ("created_at", DESCENDING)]),
+        IndexSpec([("patient_id", ASCENDING), ("assessment_date", DESCENDING)]),
+        IndexSpec([("created_at", DESCENDING)]),
+    ],
+    "audit_log": [
+        IndexSpec([("practitioner_id", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "literature_papers": [
+        _partial_unique("pmid"),
+        _partial_unique("gs_id"),
+        # Literature index sync re-reads papers re-stored since its last pass
+        IndexSpec([("last_accessed", ASCENDING)]),
+    ],
+    "clinical_trials": [
+        _partial_unique("nct_id"),
+    ],
+    "evidence_mappings": [
+        IndexSpec([("protocol_id", ASCENDING)]),
+    ],
+    "visual_explanations": [
+        IndexSpec([("explanation_id", ASCENDING)]),
+    ],
+    "enhanced_explanations": [
+        IndexSpec([("explanation_id", ASCENDING)]),
+    ],
+    "risk_assessments": [
+        IndexSpec([("assessment_id", ASCENDING)]),
+        IndexSpec([("cohort_id", ASCENDING)]),
+    ],
+    "comparative_analyses": [
+        IndexSpec([("comparison_id", ASCENDING)]),
+    ],
+    "comprehensive_diagnoses": [
+        IndexSpec([("diagnosis_id", ASCENDING)]),
+    ],
+    "federated_models": [
+        IndexSpec([("model_id", ASCENDING), ("last_updated", DESCENDING)]),
+    ],
+    "practitioner_rollups": [
+        IndexSpec([("practitioner_id", ASCENDING)], unique=True),
+    ],
+    "llm_response_cache": [
+        # TTL expiry plus patient_id for invalidation
+        IndexSpec([("expires_at", ASCENDING)], expire_after_seconds=0),
+        IndexSpec([("patient_id", ASCENDING)]),
+    ],
+    "jobs": [
+        # Claim order, job_id lookup, per-patient job listing
+        IndexSpec([("job_id", ASCENDING)], unique=True),
+        IndexSpec([("status", ASCENDING), ("priority", DESCENDING), ("created_at", ASCENDING)]),
+        IndexSpec([("patient_id", ASCENDING), ("created_at", DESCENDING)]),
+        # One queued/running job per dedupe_key (unset when the job finishes)
+        _partial_unique("dedupe_key"),
+    ],
+}
+
+
+def _selected(collections: Optional[List[str]]) -> Dict[str, List[IndexSpec]]:
+    if not collections:
+        return INDEX_REGISTRY
+    unknown = [name for name in collections if name not in INDEX_REGISTRY]
+    if unknown:
+        raise ValueError(f"Collections not in the index registry: {', '.join(unknown)}")
+    return {name: INDEX_REGISTRY[name] for name in collections}
+
+
+def _spec_summary(spec: IndexSpec) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"name": spec.index_name, "keys": [list(key) for key in spec.keys]}
+    if spec.unique:
+        summary["unique"] = True
+    if spec.partial_filter is not None:
+        summary["partialFilterExpression"] = spec.partial_filter
+    if spec.expire_after_seconds is not None:
+        summary["expireAfterSeconds"] = spec.expire_after_seconds
+    return summary
+
+
+async def audit_indexes(db_client, collections: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Compare the registry against the live indexes without changing anything
+
+    Per collection: present (registered and matching), missing (not built),
+    conflicting (same name but different keys/options) and extra (live
+    indexes the registry does not declare, other than _id_).
+    """
+
+    report: Dict[str, Any] = {}
+    totals = {"present": 0, "missing": 0, "conflicting": 0, "extra": 0}
+
+    for collection_name, specs in _selected(collections).items():
+        existing = await db_client[collection_name].index_information()
+        entry = {"present": [], "missing": [], "conflicting": [], "extra": []}
+        claimed = {"_id_"}
+
+        for spec in specs:
+            match = next((name for name, info in existing.items() if spec.matches(info)), None)
+            if match:
+                claimed.add(match)
+                entry["present"].append(match)
+            elif spec.index_name in existing:
+                claimed.add(spec.index_name)
+                entry["conflicting"].append(_spec_summary(spec))
+            else:
+                entry["missing"].append(_spec_summary(spec))
+
+        entry["extra"] = sorted(name for name in existing if name not in claimed)
+        for bucket in totals:
+            totals[bucket] += len(entry[bucket])
+        report[collection_name] = entry
+
+    return {"collections": report, "totals": totals}
+
+
+async def ensure_indexes(
+    db_client,
+    background: bool = False,
+    collections: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Create every registered index that is missing; safe to run on every startup
+
+    Conflicting indexes are reported rather than dropped, since rebuilding a
+    large index should be a deliberate operation (see the CLI).
+    """
+
+    audit = await audit_indexes(db_client, collections)
+    created: List[str] = []
+    failed: List[Dict[str, str]] = []
+
+    for collection_name, entry in audit["collections"].items():
+        specs = {spec.index_name: spec for spec in INDEX_REGISTRY[collection_name]}
+        for missing in entry["missing"]:
+            spec = specs[missing["name"]]
+            qualified = f"{collection_name}.{spec.index_name}"
+            try:
+                await db_client[collection_name].create_index(spec.keys, **spec.create_options(background))
+                created.append(qualified)
+                metrics.increment("db_indexes_created_total", collection=collection_name)
+            except Exception as e:
+                # Typically pre-existing duplicates blocking a unique index
+                logger.error(f"Index {qualified} could not be created: {str(e)}")
+                failed.append({"index": qualified, "error": str(e)})
+
+        for conflict in entry["conflicting"]:
+            logger.warning(f"Index {collection_name}.{conflict['name']} exists with different keys/options; leaving it in place")
+        if entry["extra"]:
+            logger.info(f"Unregistered indexes on {collection_name}: {', '.join(entry['extra'])}")
+
+    if created:
+        logger.info(f"Created {len(created)} MongoDB indexes: {', '.join(created)}")
+    return {"created": created, "failed": failed, "audit": audit}
+
+
+async def _run_cli(args: argparse.Namespace) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db_client = client[os.environ['DB_NAME']]
+
+    try:
+        if args.apply:
+            result = await ensure_indexes(db_client, background=args.background, collections=args.collection)
+            if args.drop_extra:
+                for collection_name, entry in result["audit"]["collections"].items():
+                    for name in entry["extra"]:
+                        await db_client[collection_name].drop_index(name)
+                        logger.info(f"Dropped unregistered index {collection_name}.{name}")
+            print(json.dumps({"created": result["created"], "failed": result["failed"]}, indent=2))
+            return 1 if result["failed"] else 0
+
+        audit = await audit_indexes(db_client, collections=args.collection)
+        print(json.dumps(audit, indent=2, default=str))
+        return 1 if audit["totals"]["missing"] or audit["totals"]["conflicting"] else 0
+    finally:
+        client.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check or build the registered MongoDB indexes")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--check", action="store_true", help="Report missing/conflicting/extra indexes (default)")
+    mode.add_argument("--apply", action="store_true", help="Create missing indexes")
+    parser.add_argument("--background", action="store_true",
+                        help="Request background builds (large collections on pre-4.2 servers)")
+    parser.add_argument("--collection", action="append",
+                        help="Limit to a registered collection; repeatable")
+    parser.add_argument("--drop-extra", action="store_true",
+                        help="With --apply, drop indexes the registry does not declare")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    return asyncio.run(_run_cli(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,215 @@
+"""
+Near-Duplicate Detection for Literature Results
+- Exact short-circuits on normalized PMID and DOI
+- MinHash signatures over character shingles of the normalized title
+- LSH banding so only papers sharing a band bucket are compared (no O(n^2) scan)
+- Duplicates are merged into the first-seen record, keeping PubMed/Scholar metadata
+"""
+
+import hashlib
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Mersenne-style prime just below 2**32 keeps (a * x + b) inside uint64
+_HASH_PRIME = np.uint64(4294967291)
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_DOI_PREFIX = re.compile(r"^(https?://(dx\.)?doi\.org/|doi:\s*)", re.IGNORECASE)
+
+# Fields copied from a duplicate when the kept record lacks them
+_MERGEABLE_FIELDS = ("pmid", "doi", "gs_id", "abstract", "journal", "year", "authors", "url",
+                     "mesh_terms", "mesh_headings", "publication_types", "evidence_level")
+
+
+def normalize_title(title: str) -> str:
+    title = _NON_WORD.sub(" ", (title or "").lower())
+    return " ".join(title.split())
+
+
+def normalize_doi(doi: Optional[str]) -> Optional[str]:
+    if not doi:
+        return None
+    return _DOI_PREFIX.sub("", str(doi).strip()).lower() or None
+
+
+def _normalize_pmid(pmid: Any) -> Optional[str]:
+    if pmid in (None, "", "Unknown"):
+        return None
+    return str(pmid).strip()
+
+
+def _paper_source(paper: Dict[str, Any]) -> str:
+    if paper.get("source"):
+        return str(paper["source"])
+    if paper.get("gs_id"):
+        return "google_scholar"
+    if _normalize_pmid(paper.get("pmid")):
+        return "pubmed"
+    return "unknown"
+
+
+class MinHashDeduplicator:
+    """MinHash + LSH banding near-duplicate detector for paper titles"""
+
+    def __init__(
+        self,
+        num_permutations: int = 64,
+        bands: int = 16,
+        shingle_size: int = 5,
+        threshold: float = 0.8,
+        seed: int = 1
+    ):
+        if num_permutations % bands:
+            raise ValueError("num_permutations must be divisible by bands")
+        self.num_permutations = num_permutations
+        self.bands = bands
+        self.rows_per_band = num_permutations // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_HASH_PRIME), size=num_permutations, dtype=np.uint64)
+        self._b = rng.integers(0, int(_HASH_PRIME), size=num_permutations, dtype=np.uint64)
+
+    def shingles(self, text: str) -> Set[str]:
+        """Character k-shingles; short titles fall back to the whole string"""
+        if len(text) <= self.shingle_size:
+            return {text} if text else set()
+        return {text[i:i + self.shingle_size] for i in range(len(text) - self.shingle_size + 1)}
+
+    def signature(self, shingles: Set[str]) -> np.ndarray:
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        # (num_permutations x num_shingles) universal hashes, min over shingles
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _HASH_PRIME
+        return permuted.min(axis=1)
+
+    @staticmethod
+    def jaccard(first: Set[str], second: Set[str]) -> float:
+        if not first or not second:
+            return 0.0
+        return len(first & second) / len(first | second)
+
+    def deduplicate(
+        self,
+        papers: List[Dict[str, Any]],
+        text_getter: Optional[Callable[[Dict[str, Any]], str]] = None,
+        merge: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Return papers with duplicates removed, preserving first-seen order
+
+        Duplicates are detected by exact PMID/DOI match first, then by title
+        similarity (Jaccard over shingles >= threshold) among LSH candidates.
+        With merge=True the kept record absorbs missing metadata and the
+        source list of every duplicate it represents.
+        """
+
+        text_getter = text_getter or (lambda paper: paper.get("title", ""))
+
+        kept: List[Dict[str, Any]] = []
+        kept_shingles: List[Set[str]] = []
+        by_pmid: Dict[str, int] = {}
+        by_doi: Dict[str, int] = {}
+        buckets: Dict[tuple, List[int]] = {}
+        comparisons = 0
+
+        for paper in papers:
+            pmid = _normalize_pmid(paper.get("pmid"))
+            doi = normalize_doi(paper.get("doi"))
+
+            match = by_pmid.get(pmid) if pmid else None
+            if match is None and doi:
+                match = by_doi.get(doi)
+
+            shingles = self.shingles(normalize_title(text_getter(paper)))
+            band_keys = []
+            if shingles:
+                signature = self.signature(shingles)
+                band_keys = [
+                    (band, signature[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes())
+                    for band in range(self.bands)
+                ]
+
+            if match is None and shingles:
+                candidates = {index for key in band_keys for index in buckets.get(key, ())}
+                for index in sorted(candidates):
+                    comparisons += 1
+                    if self.jaccard(shingles, kept_shingles[index]) >= self.threshold:
+                        match = index
+                        break
+
+            if match is not None:
+                if merge:
+                    self._merge_into(kept[match], paper)
+                else:
+                    paper["duplicate_status"] = "potential_duplicate"
+                # Let the kept record also be found by the duplicate's identifiers
+                if pmid:
+                    by_pmid.setdefault(pmid, match)
+                if doi:
+                    by_doi.setdefault(doi, match)
+                continue
+
+            index = len(kept)
+            if merge:
+                paper = {**paper, "sources": [_paper_source(paper)]}
+            kept.append(paper)
+            kept_shingles.append(shingles)
+            if pmid:
+                by_pmid[pmid] = index
+            if doi:
+                by_doi[doi] = index
+            for key in band_keys:
+                buckets.setdefault(key, []).append(index)
+
+        metrics.increment("dedup_papers_in_total", value=len(papers))
+        metrics.increment("dedup_duplicates_removed_total", value=len(papers) - len(kept))
+        metrics.increment("dedup_candidate_comparisons_total", value=comparisons)
+        return kept
+
+    @staticmethod
+    def _merge_into(target: Dict[str, Any], duplicate: Dict[str, Any]):
+        source = _paper_source(duplicate)
+        sources = target.setdefault("sources", [])
+        if source not in sources:
+            sources.append(source)
+
+        for field in _MERGEABLE_FIELDS:
+            if not target.get(field) and duplicate.get(field):
+                target[field] = duplicate[field]
+
+        # Keep the strongest signals reported by any source
+        for field in ("citation_count", "relevance_score"):
+            if duplicate.get(field) is not None:
+                target[field] = max(target.get(field) or 0, duplicate[field])
+
+        target["duplicate_count"] = target.get("duplicate_count", 0) + 1
+
+
+_default_deduplicator: Optional[MinHashDeduplicator] = None
+
+
+def get_deduplicator() -> MinHashDeduplicator:
+    global _default_deduplicator
+    if _default_deduplicator is None:
+        _default_deduplicator = MinHashDeduplicator()
+    return _default_deduplicator
+
+
+def deduplicate_papers(
+    papers: List[Dict[str, Any]],
+    text_getter: Optional[Callable[[Dict[str, Any]], str]] = None,
+    merge: bool = True
+) -> List[Dict[str, Any]]:
+    """Deduplicate with the shared default-configured engine"""
+    return get_deduplicator().deduplicate(papers, text_getter=text_getter, merge=merge)
@@ -0,0 +1,300 @@
+"""
+Compiled Diagnostic Knowledge Base for Bayesian Differential Scoring
+- Diagnoses, prevalence, age/gender factors and clue likelihoods live in data/diagnosis_kb.json
+- Compiled once into a diagnosis x clue-pattern log-likelihood matrix, prevalence/age/gender tables
+  and a trigger matrix for candidate selection
+- Diagnostic clues map to a sparse indicator vector (bounded LRU per clue string), so priors,
+  likelihoods and normalized posteriors for every diagnosis come from a few array ops
+- Hot-reloadable: a watcher task checks the data file's mtime in the I/O thread pool and
+  recompiles there, so request paths only ever read the current compiled KB
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from executors import run_io
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KB_PATH = Path(__file__).parent / "data" / "diagnosis_kb.json"
+
+# Age factors are tabulated per whole year; older ages share the last entry
+MAX_TABULATED_AGE = 130
+DEFAULT_AGE = 50
+
+# Clue strings come from free-text patient data; the per-clue pattern memo keeps this many
+CLUE_CACHE_SIZE = 4096
+
+
+@dataclass
+class DiagnosticScores:
+    """Scores for the candidate diagnoses of one patient, in knowledge-base order"""
+    names: List[str]
+    icd_10_codes: List[str]
+    pattern_match: bool
+    priors: np.ndarray
+    likelihoods: np.ndarray
+    posteriors: np.ndarray
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "diagnosis_name": name,
+                "icd_10_code": code,
+                "pattern_match": self.pattern_match,
+                "prior_probability": float(prior),
+                "likelihood": float(likelihood),
+                "posterior_probability": float(posterior)
+            }
+            for name, code, prior, likelihood, posterior in zip(
+                self.names, self.icd_10_codes, self.priors, self.likelihoods, self.posteriors
+            )
+        ]
+
+
+class DiagnosisKnowledgeBase:
+    """Array form of the diagnosis knowledge base; immutable once compiled"""
+
+    def __init__(self, spec: Dict[str, Any], source: Optional[str] = None):
+        self.source = source
+        self.version = spec.get("version")
+        scoring = spec.get("scoring", {})
+        self.default_prevalence = float(scoring.get("default_prevalence", 0.05))
+        self.prior_cap = float(scoring.get("prior_cap", 0.8))
+        self.likelihood_cap = float(scoring.get("likelihood_cap", 0.95))
+        self.likelihood_without_clues = float(scoring.get("likelihood_without_clues", 0.5))
+        self.likelihood_without_matches = float(scoring.get("likelihood_without_matches", 0.3))
+
+        entries = list(spec.get("diagnoses", []))
+        fallbacks = list(spec.get("fallback_diagnoses", []))
+        if not entries:
+            raise ValueError("Diagnosis knowledge base defines no diagnoses")
+        rows = entries + fallbacks
+
+        self.names = [row["name"] for row in rows]
+        self.icd_10_codes = [row.get("icd_10_code", "") for row in rows]
+        self.is_fallback = np.array([False] * len(entries) + [True] * len(fallbacks))
+        n_rows = len(rows)
+
+        # Prevalence, age (diagnosis x year) and gender (diagnosis x gender) factor tables
+        self.base_prevalence = np.array([float(row.get("base_prevalence", self.default_prevalence)) for row in rows])
+        ages = np.arange(MAX_TABULATED_AGE + 1)
+        self.age_factors = np.ones((n_rows, ages.size))
+        for index, row in enumerate(rows):
+            factors = np.full(ages.size, float(row.get("default_age_factor", 1.0)))
+            assigned = np.zeros(ages.size, dtype=bool)
+            # First matching band wins, as in an if/elif chain
+            for band in row.get("age_factors", []):
+                in_band = (ages >= band.get("min_age", 0)) & (ages <= band.get("max_age", MAX_TABULATED_AGE)) & ~assigned
+                factors[in_band] = float(band["factor"])
+                assigned |= in_band
+            self.age_factors[index] = factors
+
+        self.genders = sorted({gender.lower() for row in rows for gender in row.get("gender_factors", {})})
+        self.gender_factors = np.ones((n_rows, len(self.genders) + 1))  # last column: any other gender
+        for index, row in enumerate(rows):
+            for gender, factor in row.get("gender_factors", {}).items():
+                self.gender_factors[index, self.genders.index(gender.lower())] = float(factor)
+
+        # Candidate triggers: exact clue matches and chief-complaint substrings
+        self.trigger_clues = sorted({clue for row in entries for clue in row.get("trigger_clues", [])})
+        self.complaint_terms = sorted({term.lower() for row in entries for term in row.get("complaint_terms", [])})
+        self.clue_triggers = np.zeros((n_rows, len(self.trigger_clues)), dtype=bool)
+        self.complaint_triggers = np.zeros((n_rows, len(self.complaint_terms)), dtype=bool)
+        for index, row in enumerate(entries):
+            for clue in row.get("trigger_clues", []):
+                self.clue_triggers[index, self.trigger_clues.index(clue)] = True
+            for term in row.get("complaint_terms", []):
+                self.complaint_triggers[index, self.complaint_terms.index(term.lower())] = True
+
+        # Clue likelihoods: log P(pattern | diagnosis), with a mask for patterns a diagnosis defines
+        self.patterns = sorted({pattern.lower() for row in rows for pattern in row.get("clue_likelihoods", {})})
+        self.log_likelihoods = np.zeros((n_rows, len(self.patterns)))
+        self.likelihood_mask = np.zeros((n_rows, len(self.patterns)))
+        for index, row in enumerate(rows):
+            for pattern, likelihood in row.get("clue_likelihoods", {}).items():
+                column = self.patterns.index(pattern.lower())
+                self.log_likelihoods[index, column] = np.log(float(likelihood))
+                self.likelihood_mask[index, column] = 1.0
+
+        self._clue_patterns: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._clue_patterns_lock = threading.Lock()
+
+    def _pattern_indicator(self, clue: str) -> np.ndarray:
+        """Indices of the likelihood patterns contained in a clue (LRU-memoized; clues repeat across patients)"""
+        with self._clue_patterns_lock:
+            indicator = self._clue_patterns.get(clue)
+            if indicator is not None:
+                self._clue_patterns.move_to_end(clue)
+                return indicator
+
+        lowered = clue.lower()
+        indicator = np.array([index for index, pattern in enumerate(self.patterns) if pattern in lowered], dtype=np.intp)
+        with self._clue_patterns_lock:
+            self._clue_patterns[clue] = indicator
+            while len(self._clue_patterns) > CLUE_CACHE_SIZE:
+                self._clue_patterns.popitem(last=False)
+        return indicator
+
+    def clue_counts(self, diagnostic_clues: List[str]) -> np.ndarray:
+        """How many clues contain each pattern (a clue can match several patterns)"""
+        counts = np.zeros(len(self.patterns))
+        for clue in diagnostic_clues:
+            np.add.at(counts, self._pattern_indicator(str(clue)), 1.0)
+        return counts
+
+    def candidate_mask(self, diagnostic_clues: List[str], chief_complaint: str) -> np.ndarray:
+        clue_set = set(diagnostic_clues)
+        clue_hits = np.array([clue in clue_set for clue in self.trigger_clues], dtype=bool)
+        complaint = (chief_complaint or "").lower()
+        term_hits = np.array([term in complaint for term in self.complaint_terms], dtype=bool)
+        return (self.clue_triggers @ clue_hits) | (self.complaint_triggers @ term_hits)
+
+    def priors(self, age: Any, gender: Any) -> np.ndarray:
+        try:
+            age_index = int(age)
+        except (ValueError, TypeError):
+            age_index = DEFAULT_AGE
+        age_index = min(max(age_index, 0), MAX_TABULATED_AGE)
+        gender = str(gender or "unknown").lower()
+        gender_index = self.genders.index(gender) if gender in self.genders else len(self.genders)
+        prior = self.base_prevalence * self.age_factors[:, age_index] * self.gender_factors[:, gender_index]
+        return np.minimum(self.prior_cap, prior)
+
+    def likelihoods(self, diagnostic_clues: List[str]) -> np.ndarray:
+        """Geometric mean of matched clue likelihoods per diagnosis"""
+        if not diagnostic_clues:
+            return np.full(len(self.names), self.likelihood_without_clues)
+        counts = self.clue_counts(diagnostic_clues)
+        matched = self.likelihood_mask @ counts
+        log_sum = self.log_likelihoods @ counts
+        with np.errstate(divide="ignore", invalid="ignore"):
+            combined = np.where(matched > 0, np.exp(log_sum / matched), self.likelihood_without_matches)
+        return np.minimum(self.likelihood_cap, combined)
+
+    def score(self, diagnostic_clues: List[str], patient_data: Dict[str, Any]) -> DiagnosticScores:
+        """Candidate diagnoses with priors, likelihoods and posteriors normalized over the candidates"""
+
+        diagnostic_clues = [str(clue) for clue in diagnostic_clues or []]
+        demographics = patient_data.get("demographics", {}) or {}
+        chief_complaint = str((patient_data.get("clinical_presentation", {}) or {}).get("chief_complaint", "") or "")
+
+        candidates = self.candidate_mask(diagnostic_clues, chief_complaint) & ~self.is_fallback
+        pattern_match = bool(candidates.any())
+        if not pattern_match:
+            candidates = self.is_fallback.copy()
+
+        priors = self.priors(demographics.get("age", DEFAULT_AGE), demographics.get("gender", "unknown"))[candidates]
+        likelihoods = self.likelihoods(diagnostic_clues)[candidates]
+        joint = priors * likelihoods
+        total = joint.sum()
+        posteriors = joint / total if total > 0 else np.full(joint.size, 1.0 / max(joint.size, 1))
+
+        indices = np.flatnonzero(candidates)
+        return DiagnosticScores(
+            names=[self.names[index] for index in indices],
+            icd_10_codes=[self.icd_10_codes[index] for index in indices],
+            pattern_match=pattern_match,
+            priors=priors,
+            likelihoods=likelihoods,
+            posteriors=posteriors
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "version": self.version,
+            "diagnoses": int((~self.is_fallback).sum()),
+            "fallback_diagnoses": int(self.is_fallback.sum()),
+            "clue_patterns": len(self.patterns),
+            "trigger_clues": len(self.trigger_clues),
+            "complaint_terms": len(self.complaint_terms)
+        }
+
+
+def load_knowledge_base(path: Path) -> DiagnosisKnowledgeBase:
+    with open(path) as handle:
+        return DiagnosisKnowledgeBase(json.load(handle), source=str(path))
+
+
+_kb: Optional[DiagnosisKnowledgeBase] = None
+_kb_path: Optional[Path] = None
+_kb_mtime: Optional[float] = None
+_kb_lock = threading.Lock()
+_watch_task: Optional[asyncio.Task] = None
+
+
+def configure_diagnosis_kb(path: Optional[str] = None) -> DiagnosisKnowledgeBase:
+    global _kb_path
+    _kb_path = Path(path or os.environ.get("DIAGNOSIS_KB_PATH", str(DEFAULT_KB_PATH)))
+    return reload_diagnosis_kb(force=True)
+
+
+def reload_diagnosis_kb(force: bool = False) -> DiagnosisKnowledgeBase:
+    """Recompile when the data file changed; a broken file keeps the previous compiled KB"""
+
+    global _kb, _kb_mtime
+    if _kb_path is None:
+        return configure_diagnosis_kb()
+
+    with _kb_lock:
+        mtime = None
+        try:
+            mtime = _kb_path.stat().st_mtime
+            if force or _kb is None or mtime != _kb_mtime:
+                _kb = load_knowledge_base(_kb_path)
+                _kb_mtime = mtime
+                metrics.increment("diagnosis_kb_reloads_total")
+                logger.info(f"Compiled diagnosis knowledge base {_kb.version} from {_kb_path}")
+        except Exception as e:
+            metrics.increment("diagnosis_kb_reload_errors_total")
+            if _kb is None or force:
+                raise
+            # Don't retry the same broken file on every call
+            _kb_mtime = mtime
+            logger.error(f"Diagnosis knowledge base reload failed, keeping version {_kb.version}: {str(e)}")
+        return _kb
+
+
+def get_diagnosis_kb() -> DiagnosisKnowledgeBase:
+    """Current compiled KB (compiled on first use; edits are picked up by the watcher)"""
+    if _kb is None:
+        return reload_diagnosis_kb()
+    return _kb
+
+
+async def _watch_loop(interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await run_io(reload_diagnosis_kb)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Diagnosis knowledge base check failed: {str(e)}")
+
+
+def start_diagnosis_kb_watcher(interval_seconds: Optional[float] = None):
+    """Recompile on data file edits every DIAGNOSIS_KB_CHECK_SECONDS (default 10)"""
+    global _watch_task
+    interval_seconds = interval_seconds or float(os.environ.get("DIAGNOSIS_KB_CHECK_SECONDS", "10"))
+    if _watch_task is None or _watch_task.done():
+        _watch_task = asyncio.create_task(_watch_loop(interval_seconds))
+
+
+async def stop_diagnosis_kb_watcher():
+    global _watch_task
+    if _watch_task is not None:
+        _watch_task.cancel()
+        await asyncio.gather(_watch_task, return_exceptions=True)
+        _watch_task = None
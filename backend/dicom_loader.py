@@ -0,0 +1,252 @@
+"""
+Lazy Two-Phase DICOM Loading
+- Phase 1: header only (stop_before_pixels=True) for metadata, routing and listings
+- Phase 2, on demand: pixel frames
+    - uncompressed PixelData is memory-mapped from the stored file (or viewed in place
+      over an in-memory buffer) - no copy, no decode, pages loaded as frames are touched
+    - compressed transfer syntaxes are decoded one frame at a time
+- Layouts the fast paths don't cover (big endian, packed 1-bit, YCbCr 4:2:2) fall back to
+  pydicom's full pixel_array
+"""
+
+import io
+import itertools
+import logging
+import os
+from typing import Any, Dict, Iterator, Optional, Union
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset
+from pydicom.encaps import encapsulate, generate_pixel_data_frame
+from pydicom.uid import ExplicitVRLittleEndian, ImplicitVRLittleEndian
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DicomSource = Union[str, os.PathLike, bytes]
+
+# Elements larger than this are skipped (value offset recorded) when locating PixelData
+_DEFER_SIZE = 1024
+
+# Pixel-module attributes a single-frame dataset needs for pydicom's decoders
+_PIXEL_MODULE = [
+    "Rows", "Columns", "SamplesPerPixel", "BitsAllocated", "BitsStored", "HighBit",
+    "PixelRepresentation", "PhotometricInterpretation", "PlanarConfiguration"
+]
+
+
+def is_dicom(file_data: bytes) -> bool:
+    """DICOM Part 10 files carry "DICM" after a 128-byte preamble"""
+    return len(file_data) >= 132 and file_data[128:132] == b"DICM"
+
+
+def dicom_metadata(dataset: Dataset) -> Dict[str, Any]:
+    """Header fields used for routing, listings and study grouping (never touches pixels)"""
+
+    def text(keyword: str, default: str = "") -> str:
+        value = dataset.get(keyword, default)
+        return str(value) if value is not None else default
+
+    rows = dataset.get("Rows")
+    columns = dataset.get("Columns")
+    transfer_syntax = getattr(getattr(dataset, "file_meta", None), "TransferSyntaxUID", None)
+    return {
+        "modality": text("Modality", "Unknown"),
+        "study_date": text("StudyDate"),
+        "patient_age": text("PatientAge"),
+        "body_part": text("BodyPartExamined"),
+        "study_description": text("StudyDescription"),
+        "series_description": text("SeriesDescription"),
+        "patient_position": text("PatientPosition"),
+        "study_instance_uid": text("StudyInstanceUID"),
+        "series_instance_uid": text("SeriesInstanceUID"),
+        "sop_instance_uid": text("SOPInstanceUID"),
+        "instance_number": int(dataset.get("InstanceNumber") or 0),
+        "rows": int(rows) if rows else None,
+        "columns": int(columns) if columns else None,
+        "number_of_frames": int(dataset.get("NumberOfFrames") or 1),
+        "samples_per_pixel": int(dataset.get("SamplesPerPixel") or 1),
+        "bits_allocated": int(dataset.get("BitsAllocated") or 0),
+        "photometric_interpretation": text("PhotometricInterpretation"),
+        "transfer_syntax_uid": str(transfer_syntax) if transfer_syntax else str(ImplicitVRLittleEndian),
+        "is_compressed": bool(transfer_syntax and transfer_syntax.is_compressed),
+        "image_dimensions": f"{rows}x{columns}" if rows and columns else "Unknown"
+    }
+
+
+class LazyDicom:
+    """One DICOM instance whose header and pixels load separately, on first use"""
+
+    def __init__(self, source: DicomSource):
+        self.source = source
+        self._header: Optional[Dataset] = None
+
+    def _open(self):
+        if isinstance(self.source, (bytes, bytearray, memoryview)):
+            return io.BytesIO(self.source)
+        return self.source
+
+    @property
+    def header(self) -> Dataset:
+        if self._header is None:
+            self._header = pydicom.dcmread(self._open(), stop_before_pixels=True, force=True)
+            metrics.increment("dicom_header_reads_total")
+        return self._header
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return dicom_metadata(self.header)
+
+    @property
+    def has_pixels(self) -> bool:
+        # stop_before_pixels leaves no trace of PixelData, so check the dimensions instead
+        return bool(self.header.get("Rows")) and bool(self.header.get("Columns"))
+
+    @property
+    def number_of_frames(self) -> int:
+        return int(self.header.get("NumberOfFrames") or 1)
+
+    @property
+    def transfer_syntax(self):
+        file_meta = getattr(self.header, "file_meta", None)
+        return getattr(file_meta, "TransferSyntaxUID", None) or ImplicitVRLittleEndian
+
+    @property
+    def is_compressed(self) -> bool:
+        return self.transfer_syntax.is_compressed
+
+    def _frame_layout(self):
+        """(dtype, per-frame shape, planar) for the memory-mappable layouts, else None"""
+
+        header = self.header
+        bits = int(header.get("BitsAllocated") or 0)
+        samples = int(header.get("SamplesPerPixel") or 1)
+        photometric = str(header.get("PhotometricInterpretation", ""))
+        if bits not in (8, 16, 32) or self.transfer_syntax not in (ExplicitVRLittleEndian, ImplicitVRLittleEndian):
+            return None
+        if photometric == "YBR_FULL_422":
+            return None
+        kind = "i" if int(header.get("PixelRepresentation") or 0) == 1 else "u"
+        dtype = np.dtype(f"<{kind}{bits // 8}")
+        rows, columns = int(header.Rows), int(header.Columns)
+        planar = samples > 1 and int(header.get("PlanarConfiguration") or 0) == 1
+        if samples == 1:
+            shape = (rows, columns)
+        elif planar:
+            shape = (samples, rows, columns)
+        else:
+            shape = (rows, columns, samples)
+        return dtype, shape, planar
+
+    def _pixel_value_offset(self) -> Optional[int]:
+        """Byte offset of the PixelData value, found without reading the value itself"""
+        dataset = pydicom.dcmread(self._open(), defer_size=_DEFER_SIZE, force=True)
+        if "PixelData" not in dataset:
+            return None
+        element = dataset.get_item("PixelData")
+        return getattr(element, "value_tell", None)
+
+    def _uncompressed_volume(self) -> Optional[np.ndarray]:
+        layout = self._frame_layout()
+        if layout is None:
+            return None
+        offset = self._pixel_value_offset()
+        if offset is None:
+            return None
+
+        dtype, frame_shape, planar = layout
+        shape = (self.number_of_frames,) + frame_shape
+        count = int(np.prod(shape))
+        if isinstance(self.source, (bytes, bytearray, memoryview)):
+            if len(self.source) < offset + count * dtype.itemsize:
+                return None
+            volume = np.frombuffer(self.source, dtype=dtype, count=count, offset=offset).reshape(shape)
+        else:
+            if os.path.getsize(self.source) < offset + count * dtype.itemsize:
+                return None
+            volume = np.memmap(self.source, dtype=dtype, mode="r", offset=offset, shape=shape)
+        metrics.increment("dicom_pixel_memory_maps_total")
+        # Planar RGB (RRR..GGG..BBB) is presented channel-last like pydicom's pixel_array
+        return np.moveaxis(volume, 1, -1) if planar else volume
+
+    def _compressed_dataset(self) -> Dataset:
+        # Reads the encapsulated (still compressed) bytes; nothing is decoded here
+        return pydicom.dcmread(self._open(), force=True)
+
+    @staticmethod
+    def _decode_fragment(dataset: Dataset, fragment: bytes) -> np.ndarray:
+        """Decode one frame's compressed bytes through a single-frame dataset"""
+        frame = Dataset()
+        frame.file_meta = dataset.file_meta
+        frame.is_little_endian = True
+        frame.is_implicit_VR = False
+        for keyword in _PIXEL_MODULE:
+            if keyword in dataset:
+                setattr(frame, keyword, dataset.get(keyword))
+        frame.NumberOfFrames = 1
+        frame.PixelData = encapsulate([fragment])
+        frame["PixelData"].is_undefined_length = True
+        metrics.increment("dicom_frames_decoded_total")
+        return frame.pixel_array
+
+    def _compressed_frames(self) -> Iterator[np.ndarray]:
+        dataset = self._compressed_dataset()
+        for fragment in generate_pixel_data_frame(dataset.PixelData, self.number_of_frames):
+            yield self._decode_fragment(dataset, fragment)
+
+    def _compressed_frame(self, index: int) -> Optional[np.ndarray]:
+        # Earlier frames' fragments are skipped as raw bytes; only the wanted one is decoded
+        dataset = self._compressed_dataset()
+        fragments = generate_pixel_data_frame(dataset.PixelData, self.number_of_frames)
+        fragment = next(itertools.islice(fragments, index, None), None)
+        return None if fragment is None else self._decode_fragment(dataset, fragment)
+
+    def _full_decode_frames(self) -> Iterator[np.ndarray]:
+        logger.info("DICOM layout not memory-mappable; decoding full pixel_array")
+        pixels = pydicom.dcmread(self._open(), force=True).pixel_array
+        metrics.increment("dicom_full_decodes_total")
+        if self.number_of_frames > 1:
+            yield from pixels
+        else:
+            yield pixels
+
+    def iter_frames(self) -> Iterator[np.ndarray]:
+        """Pixel frames one at a time; only the current frame is decoded/paged in"""
+
+        if not self.has_pixels:
+            return
+        if self.is_compressed:
+            yield from self._compressed_frames()
+            return
+        volume = self._uncompressed_volume()
+        if volume is None:
+            yield from self._full_decode_frames()
+            return
+        for index in range(volume.shape[0]):
+            yield volume[index]
+
+    def frame(self, index: int) -> np.ndarray:
+        """A single frame; uncompressed data is sliced, compressed data decodes only that frame"""
+
+        if not 0 <= index < self.number_of_frames:
+            raise IndexError(f"Frame {index} out of range ({self.number_of_frames} frames)")
+        if self.is_compressed:
+            frame = self._compressed_frame(index)
+            if frame is None:
+                raise IndexError(f"Frame {index} not present in pixel data")
+            return frame
+        volume = self._uncompressed_volume()
+        if volume is not None:
+            return volume[index]
+        for position, frame in enumerate(self._full_decode_frames()):
+            if position == index:
+                return frame
+        raise IndexError(f"Frame {index} not present in pixel data")
+
+    def representative_frame(self) -> Optional[np.ndarray]:
+        """Middle frame of a multi-frame instance (the single frame otherwise)"""
+        if not self.has_pixels:
+            return None
+        return np.asarray(self.frame(self.number_of_frames // 2))
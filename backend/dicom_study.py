@@ -0,0 +1,204 @@
+"""
+Streaming DICOM Study Ingestion
+- Instances arrive as zip archives or as individual files; zip members are extracted one at a
+  time to a spool file, so an archive is never unpacked (or read) whole
+- Instances are grouped by StudyInstanceUID / SeriesInstanceUID from their headers alone
+- Every frame goes through image_statistics in the CPU pool and is dropped; series keep only
+  running sums, so memory stays at one frame however many slices a study has
+- Non-DICOM members (DICOMDIR, reports, readme files) are skipped and listed
+- Archives with more than MAX_ZIP_MEMBERS entries are rejected and members larger than
+  MAX_MEMBER_BYTES uncompressed are skipped before extraction, so a zip bomb never reaches disk
+"""
+
+import logging
+import os
+import shutil
+import zipfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dicom_loader import LazyDicom, dicom_metadata
+from executors import run_cpu_array, run_io
+from imaging_kernels import image_statistics
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Per-frame records kept per series; aggregates still cover every frame past this
+MAX_FRAME_RECORDS = 2000
+
+# Zip limits checked against the central directory before anything is extracted
+MAX_ZIP_MEMBERS = int(os.environ.get("DICOM_ZIP_MAX_MEMBERS", "20000"))
+MAX_MEMBER_BYTES = int(os.environ.get("DICOM_ZIP_MAX_MEMBER_BYTES", str(2 * 1024 ** 3)))
+
+SpoolPathFactory = Callable[[str], str]
+
+
+class SeriesAggregate:
+    """Running intensity/quality statistics for one series, updated frame by frame"""
+
+    def __init__(self, metadata: Dict[str, Any]):
+        self.study_instance_uid = metadata["study_instance_uid"]
+        self.series_instance_uid = metadata["series_instance_uid"]
+        self.modality = metadata["modality"]
+        self.series_description = metadata["series_description"]
+        self.body_part = metadata["body_part"]
+        self.sop_instance_uids: List[str] = []
+        self.frame_count = 0
+        self.pixel_count = 0
+        self.intensity_sum = 0.0
+        self.intensity_sum_sq = 0.0
+        self.min_intensity: Optional[float] = None
+        self.max_intensity: Optional[float] = None
+        self.quality_sum = 0.0
+        self.min_quality: Optional[float] = None
+        self.frame_shapes = set()
+        self.frames: List[Dict[str, Any]] = []
+
+    def add_instance(self, metadata: Dict[str, Any]):
+        self.sop_instance_uids.append(metadata["sop_instance_uid"])
+
+    def add_frame(self, instance_number: int, frame_index: int, kernel_results: Dict[str, Any]):
+        stats = kernel_results["image_statistics"]
+        quality = kernel_results["quality_score"]
+        pixels = 1
+        for dim in stats["image_shape"]:
+            pixels *= dim
+        mean, std = stats["mean_intensity"], stats["std_intensity"]
+
+        # Pooled moments: sum and sum of squares recovered from each frame's mean/std
+        self.frame_count += 1
+        self.pixel_count += pixels
+        self.intensity_sum += mean * pixels
+        self.intensity_sum_sq += (std ** 2 + mean ** 2) * pixels
+        self.min_intensity = stats["min_intensity"] if self.min_intensity is None else min(self.min_intensity, stats["min_intensity"])
+        self.max_intensity = stats["max_intensity"] if self.max_intensity is None else max(self.max_intensity, stats["max_intensity"])
+        self.quality_sum += quality
+        self.min_quality = quality if self.min_quality is None else min(self.min_quality, quality)
+        self.frame_shapes.add(tuple(stats["image_shape"]))
+
+        if len(self.frames) < MAX_FRAME_RECORDS:
+            self.frames.append({
+                "instance_number": instance_number,
+                "frame_index": frame_index,
+                "mean_intensity": mean,
+                "std_intensity": std,
+                "quality_score": quality
+            })
+
+    def to_document(self) -> Dict[str, Any]:
+        mean = self.intensity_sum / self.pixel_count if self.pixel_count else 0.0
+        variance = self.intensity_sum_sq / self.pixel_count - mean ** 2 if self.pixel_count else 0.0
+        return {
+            "study_instance_uid": self.study_instance_uid,
+            "series_instance_uid": self.series_instance_uid,
+            "modality": self.modality,
+            "series_description": self.series_description,
+            "body_part": self.body_part,
+            "instance_count": len(self.sop_instance_uids),
+            "frame_count": self.frame_count,
+            "frame_shapes": [list(shape) for shape in sorted(self.frame_shapes)],
+            "image_statistics": {
+                "mean_intensity": mean,
+                "std_intensity": max(0.0, variance) ** 0.5,
+                "min_intensity": self.min_intensity,
+                "max_intensity": self.max_intensity
+            },
+            "mean_quality_score": self.quality_sum / self.frame_count if self.frame_count else 0.0,
+            "min_quality_score": self.min_quality,
+            "frames": sorted(self.frames, key=lambda frame: (frame["instance_number"], frame["frame_index"])),
+            "frames_truncated": self.frame_count > len(self.frames)
+        }
+
+
+def _zip_members(path: str) -> List[Tuple[str, int]]:
+    """(name, uncompressed size) of every file entry, from the central directory"""
+    with zipfile.ZipFile(path) as archive:
+        return [(info.filename, info.file_size) for info in archive.infolist() if not info.is_dir()]
+
+
+def _extract_member(path: str, member: str, destination: str) -> str:
+    with zipfile.ZipFile(path) as archive, archive.open(member) as source, open(destination, "wb") as target:
+        shutil.copyfileobj(source, target)
+    return destination
+
+
+def _discard(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class StudyIngestion:
+    """Accumulates the series of one or more studies from a stream of instance files"""
+
+    def __init__(self, spool_path: SpoolPathFactory):
+        self.spool_path = spool_path
+        self.series: Dict[Tuple[str, str], SeriesAggregate] = {}
+        self.skipped: List[Dict[str, str]] = []
+        self.instance_count = 0
+
+    async def add_upload(self, path: str, name: str):
+        """A stored upload: a zip of instances or a single DICOM instance"""
+        if await run_io(zipfile.is_zipfile, path):
+            members = await run_io(_zip_members, path)
+            if len(members) > MAX_ZIP_MEMBERS:
+                self.skipped.append({"name": name, "reason": f"archive has {len(members)} members (limit {MAX_ZIP_MEMBERS})"})
+                metrics.increment("dicom_study_archives_rejected_total")
+                return
+            for member, size in members:
+                if size > MAX_MEMBER_BYTES:
+                    # Extraction stops at the declared size, so checking it bounds what is written
+                    self.skipped.append({"name": member, "reason": f"{size} bytes uncompressed (limit {MAX_MEMBER_BYTES})"})
+                    continue
+                member_path = await run_io(_extract_member, path, member, self.spool_path("dicom-member"))
+                try:
+                    await self.add_instance(member_path, member)
+                finally:
+                    await run_io(_discard, member_path)
+        else:
+            await self.add_instance(path, name)
+
+    async def add_instance(self, path: str, name: str):
+        dicom = LazyDicom(path)
+        try:
+            header = await run_io(lambda: dicom.header)
+        except Exception as e:
+            self.skipped.append({"name": name, "reason": f"unreadable: {str(e)}"})
+            return
+        metadata = dicom_metadata(header)
+        if not metadata["series_instance_uid"] or not dicom.has_pixels:
+            self.skipped.append({"name": name, "reason": "not an image instance"})
+            return
+
+        key = (metadata["study_instance_uid"], metadata["series_instance_uid"])
+        aggregate = self.series.get(key) or SeriesAggregate(metadata)
+
+        # One frame in memory at a time: decode/page in, hand to the CPU pool, drop
+        frames = dicom.iter_frames()
+        frame_index = 0
+        try:
+            while True:
+                frame = await run_io(next, frames, None)
+                if frame is None:
+                    break
+                kernel_results = await run_cpu_array(image_statistics, frame)
+                aggregate.add_frame(metadata["instance_number"], frame_index, kernel_results)
+                frame_index += 1
+                del frame
+        except Exception as e:
+            # e.g. a transfer syntax with no decoder installed; the rest of the study still counts
+            logger.warning(f"DICOM frame decoding failed for {name}: {str(e)}")
+            self.skipped.append({"name": name, "reason": f"pixel decoding failed after {frame_index} frames: {str(e)}"})
+        if frame_index:
+            aggregate.add_instance(metadata)
+            self.series[key] = aggregate
+            self.instance_count += 1
+        metrics.increment("dicom_study_frames_total", value=frame_index)
+
+    def studies(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Series documents grouped by StudyInstanceUID"""
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for (study_uid, _), aggregate in sorted(self.series.items()):
+            grouped.setdefault(study_uid, []).append(aggregate.to_document())
+        return grouped
@@ -0,0 +1,475 @@
+"""
+Async NCBI E-utilities Client for RegenMed AI Pro
+- One pooled httpx.AsyncClient shared by every PubMed call
+- NCBI-compliant rate limiting: 3 requests/second, 10 with an API key
+- tool/email/api_key sent on every request (NCBI_TOOL, NCBI_EMAIL, NCBI_API_KEY)
+- Retries on 429/5xx with exponential backoff
+- History-server (WebEnv/query_key) paging with incremental PubmedArticle parsing
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EUTILS_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Above this many IDs efetch switches to POST (NCBI guidance for long ID lists)
+POST_ID_THRESHOLD = 200
+
+# History-server page size bounds for bulk ingestion
+MIN_EFETCH_BATCH = 200
+MAX_EFETCH_BATCH = 500
+
+# efetch rejects retstart >= 10000 against the history server, so one esearch result set
+# can be paged no further than this
+MAX_HISTORY_RECORDS = 10000
+
+# parse_pubmed_article fields PubMed revises after first indexing (MeSH is assigned weeks to
+# months after publication; abstracts and titles get corrected)
+PUBMED_REFRESH_FIELDS = [
+    "title", "abstract", "abstract_sections", "year", "doi", "mesh_terms", "mesh_headings",
+    "publication_types", "keywords"
+]
+
+
+class EUtilsError(Exception):
+    """Raised when an E-utilities request fails after retries"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AsyncRateLimiter:
+    """Spaces request starts at least 1/rate seconds apart across all coroutines"""
+
+    def __init__(self, requests_per_second: float):
+        self.min_interval = 1.0 / requests_per_second
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class EUtilsClient:
+    """Shared, rate-limited E-utilities client"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        tool: str = "RegenMedAI",
+        email: str = "research@regenmed.ai",
+        base_url: str = DEFAULT_EUTILS_BASE_URL,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        max_connections: int = 10
+    ):
+        self.api_key = api_key
+        self.tool = tool
+        self.email = email
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.requests_per_second = 10.0 if api_key else 3.0
+
+        self.rate_limiter = AsyncRateLimiter(self.requests_per_second)
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+
+    def _common_params(self) -> Dict[str, str]:
+        params = {"tool": self.tool, "email": self.email}
+        if self.api_key:
+            params["api_key"] = self.api_key
+        return params
+
+    async def request(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        method: str = "GET",
+        timeout: Optional[float] = None
+    ) -> httpx.Response:
+        """Issue one rate-limited E-utilities call (e.g. endpoint="esearch")"""
+
+        url = f"{self.base_url}/{endpoint}.fcgi"
+        all_params = {**params, **self._common_params()}
+        last_error: Optional[str] = None
+        last_status: Optional[int] = None
+
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            self.stats["requests"] += 1
+            started = time.monotonic()
+            try:
+                if method == "POST":
+                    response = await self._client.post(url, data=all_params, timeout=timeout or self.timeout)
+                else:
+                    response = await self._client.get(url, params=all_params, timeout=timeout or self.timeout)
+            except httpx.TransportError as e:
+                last_error, last_status = f"{type(e).__name__}: {str(e)}", None
+                metrics.increment("eutils_requests_total", endpoint=endpoint, outcome="transport_error")
+            else:
+                metrics.set_gauge("eutils_last_latency_seconds", time.monotonic() - started, endpoint=endpoint)
+                if response.status_code == 200:
+                    metrics.increment("eutils_requests_total", endpoint=endpoint, outcome="ok")
+                    return response
+                last_error, last_status = f"HTTP {response.status_code}", response.status_code
+                metrics.increment("eutils_requests_total", endpoint=endpoint, outcome=str(response.status_code))
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    break
+
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(random.uniform(0, min(8.0, 0.5 * (2 ** attempt))))
+
+        self.stats["failures"] += 1
+        raise EUtilsError(f"E-utilities {endpoint} failed: {last_error}", status_code=last_status)
+
+    async def esearch(
+        self,
+        term: str,
+        retmax: int = 20,
+        retstart: int = 0,
+        sort: Optional[str] = None,
+        usehistory: bool = False,
+        **extra_params
+    ) -> Dict[str, Any]:
+        """Run esearch and return {"ids", "count", "webenv", "query_key"}"""
+
+        params: Dict[str, Any] = {
+            "db": "pubmed",
+            "term": term,
+            "retmax": retmax,
+            "retstart": retstart,
+            "retmode": "xml",
+            **extra_params
+        }
+        if sort:
+            params["sort"] = sort
+        if usehistory:
+            params["usehistory"] = "y"
+
+        response = await self.request("esearch", params)
+        return self.parse_esearch(response.content)
+
+    @staticmethod
+    def parse_esearch(xml_content: bytes) -> Dict[str, Any]:
+        try:
+            root = ET.fromstring(xml_content)
+        except ET.ParseError as e:
+            raise EUtilsError(f"Malformed esearch response: {str(e)}")
+
+        count_text = root.findtext("Count")
+        return {
+            "ids": [id_elem.text for id_elem in root.findall("./IdList/Id") if id_elem.text],
+            "count": int(count_text) if count_text and count_text.isdigit() else 0,
+            "webenv": root.findtext("WebEnv"),
+            "query_key": root.findtext("QueryKey")
+        }
+
+    def _efetch_params(
+        self,
+        ids: Optional[List[str]],
+        webenv: Optional[str],
+        query_key: Optional[str],
+        retstart: int,
+        retmax: Optional[int]
+    ) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"db": "pubmed", "retmode": "xml"}
+        if ids:
+            params["id"] = ",".join(ids)
+        elif webenv and query_key:
+            params.update({"WebEnv": webenv, "query_key": query_key, "retstart": retstart})
+        else:
+            raise ValueError("efetch requires ids or webenv/query_key")
+        if retmax is not None:
+            params["retmax"] = retmax
+        return params
+
+    async def efetch(
+        self,
+        ids: Optional[List[str]] = None,
+        webenv: Optional[str] = None,
+        query_key: Optional[str] = None,
+        retstart: int = 0,
+        retmax: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> bytes:
+        """Fetch PubMed XML for explicit IDs or a history-server result set"""
+
+        params = self._efetch_params(ids, webenv, query_key, retstart, retmax)
+        method = "POST" if ids and len(ids) > POST_ID_THRESHOLD else "GET"
+        response = await self.request("efetch", params, method=method, timeout=timeout)
+        return response.content
+
+    async def iter_efetch_articles(
+        self,
+        ids: Optional[List[str]] = None,
+        webenv: Optional[str] = None,
+        query_key: Optional[str] = None,
+        retstart: int = 0,
+        retmax: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[ET.Element]:
+        """Stream efetch XML and yield each PubmedArticle as soon as it closes
+
+        The response is fed chunk by chunk into an XMLPullParser, and every
+        article is cleared from the tree once the consumer resumes, so memory
+        stays flat regardless of batch size. A yielded element is only valid
+        until the next iteration - parse it (parse_pubmed_article) before
+        advancing. Retries happen only before the first article is yielded.
+        """
+
+        url = f"{self.base_url}/efetch.fcgi"
+        params = {**self._efetch_params(ids, webenv, query_key, retstart, retmax), **self._common_params()}
+        method = "POST" if ids and len(ids) > POST_ID_THRESHOLD else "GET"
+        request_kwargs = {"data": params} if method == "POST" else {"params": params}
+        last_error: Optional[str] = None
+        last_status: Optional[int] = None
+
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            self.stats["requests"] += 1
+            yielded = 0
+            try:
+                async with self._client.stream(method, url, timeout=timeout or self.timeout, **request_kwargs) as response:
+                    if response.status_code != 200:
+                        last_error, last_status = f"HTTP {response.status_code}", response.status_code
+                        metrics.increment("eutils_requests_total", endpoint="efetch", outcome=str(response.status_code))
+                        if response.status_code not in RETRYABLE_STATUS_CODES:
+                            break
+                    else:
+                        metrics.increment("eutils_requests_total", endpoint="efetch", outcome="ok")
+                        parser = ET.XMLPullParser(events=("start", "end"))
+                        root: Optional[ET.Element] = None
+                        async for chunk in response.aiter_bytes():
+                            parser.feed(chunk)
+                            for event, element in parser.read_events():
+                                if event == "start":
+                                    if root is None:
+                                        root = element
+                                    continue
+                                if element.tag in ("PubmedArticle", "PubmedBookArticle"):
+                                    if element.tag == "PubmedArticle":
+                                        yielded += 1
+                                        yield element
+                                    # Drop the finished article (and its siblings) from the tree
+                                    element.clear()
+                                    if root is not None:
+                                        root.clear()
+                        parser.close()
+                        metrics.increment("eutils_articles_streamed_total", value=yielded)
+                        return
+            except ET.ParseError as e:
+                raise EUtilsError(f"Malformed efetch response: {str(e)}")
+            except httpx.TransportError as e:
+                if yielded:
+                    raise EUtilsError(f"efetch stream interrupted after {yielded} articles: {str(e)}")
+                last_error, last_status = f"{type(e).__name__}: {str(e)}", None
+                metrics.increment("eutils_requests_total", endpoint="efetch", outcome="transport_error")
+
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(random.uniform(0, min(8.0, 0.5 * (2 ** attempt))))
+
+        self.stats["failures"] += 1
+        raise EUtilsError(f"E-utilities efetch failed: {last_error}", status_code=last_status)
+
+    async def iter_history_articles(
+        self,
+        term: str,
+        max_records: int = 5000,
+        batch_size: int = MAX_EFETCH_BATCH,
+        **search_params
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Page through a whole esearch result set via the history server
+
+        Yields parsed article dicts (see parse_pubmed_article). The first item
+        yielded is a header dict {"_search": {"count", "webenv", "query_key",
+        "total", "skipped"}} so callers can size progress reporting before
+        articles arrive; "skipped" counts requested records past the
+        MAX_HISTORY_RECORDS paging limit.
+        """
+
+        batch_size = max(MIN_EFETCH_BATCH, min(batch_size, MAX_EFETCH_BATCH))
+        search = await self.esearch(term, retmax=0, usehistory=True, **search_params)
+        if not search["webenv"] or not search["query_key"]:
+            raise EUtilsError("esearch did not return a history server WebEnv")
+
+        requested = min(search["count"], max_records)
+        total = min(requested, MAX_HISTORY_RECORDS)
+        if requested > total:
+            logger.warning(f"PubMed query matches {search['count']} records; history paging stops at {MAX_HISTORY_RECORDS}")
+        yield {"_search": {**search, "total": total, "skipped": requested - total}}
+
+        for retstart in range(0, total, batch_size):
+            async for element in self.iter_efetch_articles(
+                webenv=search["webenv"],
+                query_key=search["query_key"],
+                retstart=retstart,
+                retmax=min(batch_size, total - retstart),
+                timeout=max(self.timeout, 120.0)
+            ):
+                article = parse_pubmed_article(element)
+                if article:
+                    yield article
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "tool": self.tool,
+            "api_key_configured": bool(self.api_key),
+            "rate_limit_per_second": self.requests_per_second,
+            **self.stats
+        }
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def _element_text(element: Optional[ET.Element]) -> str:
+    """Full text of an element including inline markup (<i>, <sup>, ...)"""
+    if element is None:
+        return ""
+    return "".join(element.itertext()).strip()
+
+
+def parse_pubmed_article(article: ET.Element) -> Optional[Dict[str, Any]]:
+    """Extract a corpus record from one PubmedArticle element
+
+    Captures every AbstractText section (with its Label/NlmCategory), MeSH
+    descriptors with qualifiers and major-topic flags, publication types,
+    keywords and DOI.
+    """
+
+    citation = article.find("MedlineCitation")
+    if citation is None:
+        return None
+    pmid = citation.findtext("PMID")
+    if not pmid:
+        return None
+
+    article_info = citation.find("Article")
+    if article_info is None:
+        return None
+
+    abstract_sections = []
+    for section in article_info.findall("./Abstract/AbstractText"):
+        text = _element_text(section)
+        if text:
+            abstract_sections.append({
+                "label": section.get("Label"),
+                "nlm_category": section.get("NlmCategory"),
+                "text": text
+            })
+    abstract = "\n".join(
+        f"{section['label']}: {section['text']}" if section["label"] else section["text"]
+        for section in abstract_sections
+    )
+
+    authors = []
+    for author in article_info.findall("./AuthorList/Author"):
+        last_name = author.findtext("LastName")
+        if last_name:
+            fore_name = author.findtext("ForeName")
+            authors.append(f"{fore_name} {last_name}" if fore_name else last_name)
+        elif author.findtext("CollectiveName"):
+            authors.append(author.findtext("CollectiveName"))
+
+    mesh_terms = []
+    for heading in citation.findall("./MeshHeadingList/MeshHeading"):
+        descriptor = heading.find("DescriptorName")
+        if descriptor is None or not descriptor.text:
+            continue
+        mesh_terms.append({
+            "descriptor": descriptor.text,
+            "ui": descriptor.get("UI"),
+            "major_topic": descriptor.get("MajorTopicYN") == "Y",
+            "qualifiers": [q.text for q in heading.findall("QualifierName") if q.text]
+        })
+
+    journal = article_info.find("Journal")
+    pub_date = journal.find("./JournalIssue/PubDate") if journal is not None else None
+    year = pub_date.findtext("Year") if pub_date is not None else None
+    if not year and pub_date is not None:
+        medline_date = pub_date.findtext("MedlineDate") or ""
+        year = medline_date[:4] if medline_date[:4].isdigit() else None
+
+    doi = None
+    for article_id in article.findall("./PubmedData/ArticleIdList/ArticleId"):
+        if article_id.get("IdType") == "doi":
+            doi = article_id.text
+            break
+    if not doi:
+        for location in article_info.findall("ELocationID"):
+            if location.get("EIdType") == "doi":
+                doi = location.text
+                break
+
+    return {
+        "pmid": pmid,
+        "title": _element_text(article_info.find("ArticleTitle")) or "Title not available",
+        "abstract": abstract,
+        "abstract_sections": abstract_sections,
+        "authors": authors,
+        "journal": journal.findtext("Title") if journal is not None else None,
+        "journal_iso": journal.findtext("ISOAbbreviation") if journal is not None else None,
+        "year": year,
+        "doi": doi,
+        "mesh_terms": mesh_terms,
+        "mesh_headings": [term["descriptor"] for term in mesh_terms],
+        "publication_types": [pt.text for pt in article_info.findall("./PublicationTypeList/PublicationType") if pt.text],
+        "keywords": [_element_text(k) for k in citation.findall("./KeywordList/Keyword") if _element_text(k)],
+        "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}"
+    }
+
+
+_client: Optional[EUtilsClient] = None
+
+
+def configure_eutils_client() -> EUtilsClient:
+    """(Re)configure the process-wide client from NCBI_* environment settings"""
+    global _client
+    _client = EUtilsClient(
+        api_key=os.environ.get("NCBI_API_KEY") or None,
+        tool=os.environ.get("NCBI_TOOL", "RegenMedAI"),
+        email=os.environ.get("NCBI_EMAIL", "research@regenmed.ai"),
+        timeout=float(os.environ.get("NCBI_TIMEOUT_SECONDS", "30")),
+        max_retries=int(os.environ.get("NCBI_MAX_RETRIES", "3"))
+    )
+    return _client
+
+
+def get_eutils_client() -> EUtilsClient:
+    """Return the shared client, creating it on first use"""
+    if _client is None:
+        configure_eutils_client()
+    return _client
+
+
+async def shutdown_eutils_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,212 @@
+"""
+Executor Layer for Blocking Work Off the Event Loop
+- Sized ProcessPoolExecutor for CPU-heavy stages (image statistics, Laplacian sharpness, PDF text)
+- ThreadPoolExecutor for I/O-bound parsing (DICOM headers, image decoding)
+- Large NumPy arrays reach worker processes through shared memory instead of pickling
+- Queue depth, active tasks and utilization per pool reported through metrics
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CPU_POOL = "cpu"
+IO_POOL = "io"
+
+# Arrays smaller than this are cheaper to pickle than to copy through shared memory
+DEFAULT_SHARED_MEMORY_THRESHOLD = 1024 * 1024
+
+
+class SharedArray(NamedTuple):
+    """Picklable handle to an array living in a shared memory block"""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always tracks attached blocks; workers share the parent's resource
+        # tracker, so this re-registers the same name and the parent's unlink clears it
+        return shared_memory.SharedMemory(name=name)
+
+
+def _call_with_shared_array(fn: Callable[..., Any], handle: SharedArray, args: tuple) -> Any:
+    """Worker-side trampoline: attach the block, call fn on a zero-copy view, detach
+
+    fn must not return views of the array; the block is closed on return.
+    """
+    block = _attach_shared_memory(handle.name)
+    try:
+        array = np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=block.buf)
+        try:
+            return fn(array, *args)
+        finally:
+            del array
+    finally:
+        block.close()
+
+
+class _PoolStats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def _publish(self):
+        metrics.set_gauge("executor_tasks_in_flight", self.in_flight, pool=self.name)
+        metrics.set_gauge("executor_queue_depth", max(0, self.in_flight - self.workers), pool=self.name)
+        metrics.set_gauge("executor_utilization", min(self.in_flight, self.workers) / self.workers, pool=self.name)
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+            self._publish()
+
+    def finished(self, seconds: float, failed: bool):
+        with self._lock:
+            self.in_flight -= 1
+            self._publish()
+        metrics.increment("executor_tasks_total", pool=self.name, status="failed" if failed else "ok")
+        metrics.increment("executor_task_seconds_total", value=seconds, pool=self.name)
+
+
+class ExecutorPools:
+    """Process pool for CPU-bound work plus thread pool for blocking I/O"""
+
+    def __init__(
+        self,
+        cpu_workers: int,
+        io_workers: int,
+        shared_memory_threshold: int = DEFAULT_SHARED_MEMORY_THRESHOLD,
+        start_method: str = "spawn"
+    ):
+        self.cpu_workers = cpu_workers
+        self.io_workers = io_workers
+        self.shared_memory_threshold = shared_memory_threshold
+        self.start_method = start_method
+        self._process_pool = self._new_process_pool()
+        self._thread_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io-pool")
+        self._stats = {CPU_POOL: _PoolStats(CPU_POOL, cpu_workers), IO_POOL: _PoolStats(IO_POOL, io_workers)}
+
+    def _new_process_pool(self) -> ProcessPoolExecutor:
+        # spawn: forking a process that already runs an event loop and driver threads is unsafe
+        return ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=get_context(self.start_method))
+
+    async def _run(self, pool: str, executor: Executor, fn: Callable[..., Any], *args) -> Any:
+        stats = self._stats[pool]
+        stats.started()
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            stats.finished(time.perf_counter() - started, failed)
+
+    async def run_cpu(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a module-level (picklable) function in the process pool"""
+        try:
+            return await self._run(CPU_POOL, self._process_pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in a native decoder); replace the pool for later calls
+            logger.error("CPU process pool broken; restarting it")
+            metrics.increment("executor_pool_restarts_total", pool=CPU_POOL)
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = self._new_process_pool()
+            raise
+
+    async def run_cpu_array(self, fn: Callable[..., Any], array: np.ndarray, *args) -> Any:
+        """Run fn(array, *args) in the process pool, sharing large arrays instead of pickling them"""
+
+        array = np.ascontiguousarray(array)
+        if array.nbytes < self.shared_memory_threshold or array.dtype.hasobject:
+            return await self.run_cpu(fn, array, *args)
+
+        block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        try:
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            handle = SharedArray(block.name, array.shape, array.dtype.str)
+            metrics.increment("executor_shared_memory_bytes_total", value=array.nbytes)
+            return await self.run_cpu(_call_with_shared_array, fn, handle, args)
+        finally:
+            block.close()
+            block.unlink()
+
+    async def run_io(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a blocking call (file parsing, decoding) in the thread pool"""
+        return await self._run(IO_POOL, self._thread_pool, fn, *args)
+
+    def status(self) -> dict:
+        return {
+            name: {"workers": stats.workers, "in_flight": stats.in_flight,
+                   "queue_depth": max(0, stats.in_flight - stats.workers)}
+            for name, stats in self._stats.items()
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._process_pool.shutdown(wait=wait, cancel_futures=True)
+        self._thread_pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_pools: Optional[ExecutorPools] = None
+
+
+def configure_executors() -> ExecutorPools:
+    """Create the process-wide pools from environment settings"""
+    global _pools
+    cpu_count = os.cpu_count() or 2
+    _pools = ExecutorPools(
+        cpu_workers=int(os.environ.get("CPU_POOL_WORKERS", str(max(1, min(4, cpu_count - 1))))),
+        io_workers=int(os.environ.get("IO_POOL_WORKERS", str(min(32, cpu_count * 4)))),
+        shared_memory_threshold=int(os.environ.get("SHARED_MEMORY_THRESHOLD_BYTES", str(DEFAULT_SHARED_MEMORY_THRESHOLD))),
+        start_method=os.environ.get("CPU_POOL_START_METHOD", "spawn")
+    )
+    return _pools
+
+
+def get_executors() -> Optional[ExecutorPools]:
+    return _pools
+
+
+def shutdown_executors():
+    global _pools
+    if _pools:
+        _pools.shutdown(wait=False)
+        _pools = None
+
+
+async def run_cpu(fn: Callable[..., Any], *args) -> Any:
+    """CPU-bound call: process pool when configured, otherwise a worker thread (scripts, CLIs)"""
+    if _pools is None:
+        return await asyncio.to_thread(fn, *args)
+    return await _pools.run_cpu(fn, *args)
+
+
+async def run_cpu_array(fn: Callable[..., Any], array: np.ndarray, *args) -> Any:
+    if _pools is None:
+        return await asyncio.to_thread(fn, array, *args)
+    return await _pools.run_cpu_array(fn, array, *args)
+
+
+async def run_io(fn: Callable[..., Any], *args) -> Any:
+    if _pools is None:
+        return await asyncio.to_thread(fn, *args)
+    return await _pools.run_io(fn, *args)
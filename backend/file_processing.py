@@ -17,21 +17,28 @@ import hashlib
 # File processing imports
 import pandas as pd
 from PIL import Image, ImageEnhance
-import cv2
 import numpy as np
-import PyPDF2
 from pydantic import BaseModel, Field
 import re
 import xml.etree.ElementTree as ET
 
+from llm_gateway import get_llm_gateway
+from llm_cache import invalidate_patient_llm_cache
+from synthetic_training_data import generate_dosage_training_data
+from executors import run_cpu, run_cpu_array, run_io
+from imaging_kernels import extract_pdf_text, image_quality_score, image_statistics, pixel_summary
+from image_pyramid import dicom_rendering, generate_previews
+
 # Medical file format imports
 try:
-    import pydicom
+    from dicom_loader import LazyDicom, dicom_metadata
     DICOM_AVAILABLE = True
 except ImportError:
     DICOM_AVAILABLE = False
     logging.warning("pydicom not available - DICOM processing will be simulated")
 
+DICOM_EXTENSIONS = ('.dcm', '.dicom')
+
 class FileUpload(BaseModel):
     file_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     patient_id: str
@@ -43,6 +50,8 @@ class FileUpload(BaseModel):
     processed: bool = False
     processing_status: str = "pending"
     extracted_data: Dict[str, Any] = {}
+    content_sha256: Optional[str] = None
+    storage_id: Optional[str] = None  # GridFS id of the raw bytes
 
 class ProcessedFileData(BaseModel):
     file_id: str
@@ -67,14 +76,28 @@ class MedicalFileProcessor:
             'medical': ['.dcm', '.dicom', '.hl7']
         }
         
-    async def process_uploaded_file(self, file_data: bytes, file_info: FileUpload) -> ProcessedFileData:
-        """Main file processing orchestrator"""
+    @staticmethod
+    def is_dicom_upload(file_info: FileUpload) -> bool:
+        """DICOM uploads can be processed from a local file path instead of in-memory bytes"""
+        return file_info.file_category == 'imaging' and file_info.filename.lower().endswith(DICOM_EXTENSIONS)
+
+    async def process_uploaded_file(
+        self, file_data: Optional[bytes], file_info: FileUpload, file_path: Optional[str] = None
+    ) -> ProcessedFileData:
+        """Main file processing orchestrator
+        
+        file_path, when given, is a local copy of the upload; DICOM pixel data is
+        memory-mapped from it and file_data may be None for DICOM uploads.
+        """
         start_time = datetime.utcnow()
         
         try:
+            # New file content for this patient - drop AI responses derived from the old file set
+            await invalidate_patient_llm_cache(file_info.patient_id)
+            
             # Determine processing strategy based on file type
             if file_info.file_category == 'imaging':
-                results = await self._process_medical_imaging(file_data, file_info)
+                results = await self._process_medical_imaging(file_data, file_info, file_path)
             elif file_info.file_category == 'genetics':
                 results = await self._process_genetic_data(file_data, file_info)
             elif file_info.file_category == 'chart':
@@ -124,37 +147,43 @@ class MedicalFileProcessor:
             )
             raise
 
-    async def _process_medical_imaging(self, file_data: bytes, file_info: FileUpload) -> Dict[str, Any]:
+    async def _process_medical_imaging(
+        self, file_data: Optional[bytes], file_info: FileUpload, file_path: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Process medical imaging files (DICOM, X-ray, MRI, etc.)"""
         
-        if file_info.filename.lower().endswith(('.dcm', '.dicom')):
-            return await self._process_dicom_file(file_data, file_info)
+        if file_info.filename.lower().endswith(DICOM_EXTENSIONS):
+            return await self._process_dicom_file(file_data, file_info, file_path)
         else:
             return await self._process_medical_image(file_data, file_info)
 
-    async def _process_dicom_file(self, file_data: bytes, file_info: FileUpload) -> Dict[str, Any]:
+    async def _process_dicom_file(
+        self, file_data: Optional[bytes], file_info: FileUpload, file_path: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Process DICOM medical imaging files"""
         
         try:
             if DICOM_AVAILABLE:
-                # Real DICOM processing
-                dicom_dataset = pydicom.dcmread(io.BytesIO(file_data))
+                # Header first (stops before PixelData); pixels are only read for the analyzed frame
+                dicom = LazyDicom(file_path or file_data)
+                header = await run_io(lambda: dicom.header)
                 
                 # Extract DICOM metadata
+                metadata = dicom_metadata(header)
                 dicom_info = {
-                    "modality": getattr(dicom_dataset, 'Modality', 'Unknown'),
-                    "study_date": getattr(dicom_dataset, 'StudyDate', ''),
-                    "patient_age": getattr(dicom_dataset, 'PatientAge', ''),
-                    "body_part": getattr(dicom_dataset, 'BodyPartExamined', ''),
-                    "image_dimensions": f"{dicom_dataset.Rows}x{dicom_dataset.Columns}" if hasattr(dicom_dataset, 'Rows') else 'Unknown'
+                    key: metadata[key]
+                    for key in ("modality", "study_date", "patient_age", "body_part", "image_dimensions",
+                                "number_of_frames", "transfer_syntax_uid")
                 }
                 
-                # Extract pixel array for analysis
-                if hasattr(dicom_dataset, 'pixel_array'):
-                    image_array = dicom_dataset.pixel_array
+                # Analyze a representative frame (memory-mapped when uncompressed)
+                if dicom.has_pixels:
+                    image_array = await run_io(dicom.representative_frame)
                     image_analysis = await self._analyze_medical_image_array(image_array, dicom_info['modality'])
+                    previews = await self._generate_previews(file_info, image_array, **dicom_rendering(header))
                 else:
                     image_analysis = {"status": "no_pixel_data"}
+                    previews = {}
                 
             else:
                 # Simulated DICOM processing
@@ -165,6 +194,7 @@ class MedicalFileProcessor:
                     "image_dimensions": "512x512"
                 }
                 image_analysis = await self._simulate_dicom_analysis(file_info.filename)
+                previews = {}
             
             # Generate medical insights
             medical_insights = await self._generate_imaging_insights(dicom_info, image_analysis)
@@ -175,6 +205,7 @@ class MedicalFileProcessor:
                 "image_analysis": image_analysis,
                 "medical_insights": medical_insights,
                 "regenerative_assessment": await self._assess_regenerative_candidacy_from_imaging(dicom_info, image_analysis),
+                "previews": previews,
                 "confidence_score": 0.92,
                 "processing_notes": "DICOM file processed successfully"
             }
@@ -192,9 +223,8 @@ class MedicalFileProcessor:
         """Process standard medical images (X-ray JPEGs, etc.)"""
         
         try:
-            # Load image
-            image = Image.open(io.BytesIO(file_data))
-            image_array = np.array(image)
+            # Load image (decoding happens in the I/O pool)
+            image, image_array = await run_io(self._decode_image, file_data)
             
             # Basic image analysis
             image_info = {
@@ -206,6 +236,7 @@ class MedicalFileProcessor:
             
             # Medical image analysis
             analysis_results = await self._analyze_medical_image_array(image_array, "XRAY")  # Assume X-ray for standard images
+            previews = await self._generate_previews(file_info, image_array)
             
             # Generate medical insights
             medical_insights = await self._generate_imaging_insights(image_info, analysis_results)
@@ -216,6 +247,7 @@ class MedicalFileProcessor:
                 "analysis_results": analysis_results,
                 "medical_insights": medical_insights,
                 "regenerative_assessment": await self._assess_regenerative_candidacy_from_imaging(image_info, analysis_results),
+                "previews": previews,
                 "confidence_score": 0.85,
                 "processing_notes": "Medical image analyzed successfully"
             }
@@ -224,6 +256,19 @@ class MedicalFileProcessor:
             logging.error(f"Medical image processing error: {str(e)}")
             return {"error": str(e), "confidence_score": 0.0}
 
+    async def _generate_previews(self, file_info: FileUpload, image_array: np.ndarray, **rendering) -> Dict[str, Any]:
+        """Thumbnail/512/1024 renditions for viewers; a rendering failure never fails processing"""
+        try:
+            return await generate_previews(self.db, file_info.file_id, file_info.patient_id, image_array, **rendering)
+        except Exception as e:
+            logging.warning(f"Preview generation failed for {file_info.file_id}: {str(e)}")
+            return {}
+
+    @staticmethod
+    def _decode_image(file_data: bytes) -> Tuple[Image.Image, np.ndarray]:
+        image = Image.open(io.BytesIO(file_data))
+        return image, np.array(image)
+
     async def _process_genetic_data(self, file_data: bytes, file_info: FileUpload) -> Dict[str, Any]:
         """Process genetic test results and genomic data"""
         
@@ -288,7 +333,7 @@ class MedicalFileProcessor:
                 extracted_text = f"Processed {file_info.filename} - Chart data extracted"
             
             # Extract structured medical information using AI
-            structured_data = await self._extract_medical_data_with_ai(extracted_text)
+            structured_data = await self._extract_medical_data_with_ai(extracted_text, file_info.patient_id)
             
             # Generate regenerative medicine assessment
             regenerative_assessment = await self._assess_patient_for_regenerative_medicine(structured_data)
@@ -393,47 +438,33 @@ class MedicalFileProcessor:
     async def _analyze_medical_image_array(self, image_array: np.ndarray, modality: str) -> Dict[str, Any]:
         """Advanced AI analysis of medical image arrays"""
         
-        # Image preprocessing
-        if len(image_array.shape) == 3:
-            # Convert to grayscale if color
-            image_gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
-        else:
-            image_gray = image_array
-        
-        # Basic image statistics
-        image_stats = {
-            "mean_intensity": float(np.mean(image_gray)),
-            "std_intensity": float(np.std(image_gray)),
-            "min_intensity": float(np.min(image_gray)),
-            "max_intensity": float(np.max(image_gray)),
-            "image_shape": image_gray.shape
-        }
+        # Grayscale conversion, intensity statistics and Laplacian quality run in the
+        # process pool; large arrays are handed over through shared memory
+        kernel_results = await run_cpu_array(image_statistics, image_array)
+        image_stats = kernel_results["image_statistics"]
         
         # Modality-specific analysis
         if modality == "XRAY":
-            analysis = await self._analyze_xray_image(image_gray, image_stats)
+            analysis = await self._analyze_xray_image(image_array, image_stats)
         elif modality == "MRI":
-            analysis = await self._analyze_mri_image(image_gray, image_stats)
+            analysis = await self._analyze_mri_image(image_array, image_stats)
         elif modality == "CT":
-            analysis = await self._analyze_ct_image(image_gray, image_stats)
+            analysis = await self._analyze_ct_image(image_array, image_stats)
         elif modality == "US":
-            analysis = await self._analyze_ultrasound_image(image_gray, image_stats)
+            analysis = await self._analyze_ultrasound_image(image_array, image_stats)
         else:
-            analysis = await self._analyze_generic_medical_image(image_gray, image_stats)
+            analysis = await self._analyze_generic_medical_image(image_array, image_stats)
         
         return {
             "image_statistics": image_stats,
             "modality_analysis": analysis,
-            "quality_score": self._assess_image_quality(image_gray),
+            "quality_score": kernel_results["quality_score"],
             "processing_timestamp": datetime.utcnow().isoformat()
         }
 
-    async def _extract_medical_data_with_ai(self, text_content: str) -> Dict[str, Any]:
+    async def _extract_medical_data_with_ai(self, text_content: str, patient_id: Optional[str] = None) -> Dict[str, Any]:
         """Use AI to extract structured medical data from text"""
         
-        # Use OpenAI to extract structured data
-        import httpx
-        
         extraction_prompt = f"""
         Extract structured medical information from this patient chart text:
         
@@ -453,41 +484,33 @@ class MedicalFileProcessor:
         """
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.openai_api_key}",
-                        "Content-Type": "application/json"
+            # Use OpenAI (via the shared pooled gateway) to extract structured data
+            ai_response = await get_llm_gateway().chat_completion(
+                model="gpt-4",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a medical AI assistant specialized in extracting structured data from clinical documents. Return only valid JSON."
                     },
-                    json={
-                        "model": "gpt-4",
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "You are a medical AI assistant specialized in extracting structured data from clinical documents. Return only valid JSON."
-                            },
-                            {
-                                "role": "user",
-                                "content": extraction_prompt
-                            }
-                        ],
-                        "temperature": 0.1,
-                        "max_tokens": 1500
+                    {
+                        "role": "user",
+                        "content": extraction_prompt
                     }
-                )
-                
-                if response.status_code == 200:
-                    ai_response = response.json()
-                    content = ai_response['choices'][0]['message']['content']
-                    
-                    try:
-                        return json.loads(content)
-                    except json.JSONDecodeError:
-                        # Fallback parsing
-                        return self._fallback_text_parsing(text_content)
-                else:
-                    return self._fallback_text_parsing(text_content)
+                ],
+                temperature=0.1,
+                max_tokens=1500,
+                timeout=30.0,
+                api_key=self.openai_api_key,
+                use_cache=True,
+                cache_patient_id=patient_id
+            )
+            content = ai_response['choices'][0]['message']['content']
+            
+            try:
+                return json.loads(content)
+            except json.JSONDecodeError:
+                # Fallback parsing
+                return self._fallback_text_parsing(text_content)
                     
         except Exception as e:
             logging.error(f"AI extraction error: {str(e)}")
@@ -538,15 +561,8 @@ class MedicalFileProcessor:
         """Extract text from PDF files"""
         
         try:
-            pdf_file = io.BytesIO(file_data)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            extracted_text = ""
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                extracted_text += page.extract_text() + "\n"
-            
-            return extracted_text
+            # PyPDF2 is pure Python and holds the GIL, so it runs in the process pool
+            return await run_cpu(extract_pdf_text, file_data)
             
         except Exception as e:
             logging.error(f"PDF extraction error: {str(e)}")
@@ -638,14 +654,7 @@ class MedicalFileProcessor:
     def _assess_image_quality(self, image_array: np.ndarray) -> float:
         """Assess medical image quality for analysis reliability"""
         
-        # Calculate image quality metrics
-        contrast = np.std(image_array) / np.mean(image_array) if np.mean(image_array) > 0 else 0
-        sharpness = cv2.Laplacian(image_array.astype(np.uint8), cv2.CV_64F).var()
-        
-        # Normalize to 0-1 scale
-        quality_score = min(1.0, (contrast * 0.5 + sharpness / 1000 * 0.5))
-        
-        return max(0.3, quality_score)  # Minimum quality threshold
+        return image_quality_score(image_array)
 
     async def get_patient_file_summary(self, patient_id: str) -> Dict[str, Any]:
         """Get comprehensive summary of all files for a patient"""
@@ -832,38 +841,7 @@ class MedicalFileProcessor:
 
     def _generate_dosage_training_data(self) -> Dict:
         """Generate synthetic dosage optimization training data"""
-        
-        n_samples = 800
-        
-        features = []
-        optimal_dosages = []
-        
-        for _ in range(n_samples):
-            age = np.random.normal(50, 20)
-            weight = np.random.normal(70, 15)  # kg
-            severity = np.random.uniform(1, 5)
-            therapy_type = np.random.choice([0, 1, 2])  # PRP, BMAC, Exosomes
-            previous_response = np.random.uniform(0, 1)  # 0=no response, 1=excellent
-            
-            feature_vector = [age, weight, severity, therapy_type, previous_response]
-            features.append(feature_vector)
-            
-            # Calculate optimal dosage based on features
-            base_dosage = 1.0
-            dosage_modifier = (
-                (weight / 70) * 0.3 +  # Weight adjustment
-                severity * 0.2 +  # Severity adjustment
-                (therapy_type + 1) * 0.1 +  # Therapy type adjustment
-                (1 - previous_response) * 0.2  # Previous response adjustment
-            )
-            
-            optimal_dosage = max(0.5, min(3.0, base_dosage + dosage_modifier))
-            optimal_dosages.append(optimal_dosage)
-        
-        return {
-            "features": np.array(features),
-            "optimal_dosages": np.array(optimal_dosages)
-        }
+        return generate_dosage_training_data(n_samples=800)
 
     async def _assess_patient_for_regenerative_medicine(self, structured_data: Dict) -> Dict[str, Any]:
         """Assess patient candidacy for regenerative medicine based on chart data"""
@@ -1190,33 +1168,24 @@ class MedicalFileProcessor:
         """Process DICOM imaging files for regenerative medicine analysis"""
         
         try:
-            import pydicom
-            import numpy as np
-            from PIL import Image
-            
-            # Read DICOM file
-            dicom_data = pydicom.dcmread(file_path)
+            # Read the DICOM header only; pixel data stays on disk until a frame is needed
+            dicom = LazyDicom(file_path)
+            header_metadata = dicom_metadata(await run_io(lambda: dicom.header))
             
             # Extract metadata
             metadata = {
-                "study_date": str(getattr(dicom_data, 'StudyDate', 'Unknown')),
-                "modality": str(getattr(dicom_data, 'Modality', 'Unknown')),
-                "body_part": str(getattr(dicom_data, 'BodyPartExamined', 'Unknown')),
-                "study_description": str(getattr(dicom_data, 'StudyDescription', 'Unknown')),
-                "series_description": str(getattr(dicom_data, 'SeriesDescription', 'Unknown')),
-                "patient_position": str(getattr(dicom_data, 'PatientPosition', 'Unknown'))
+                key: str(header_metadata[key] or 'Unknown')
+                for key in ("study_date", "modality", "body_part", "study_description",
+                            "series_description", "patient_position")
             }
             
-            # Convert to image array for analysis
-            image_array = dicom_data.pixel_array
+            # Memory-mapped (or single-frame decoded) image array for analysis
+            image_array = await run_io(dicom.representative_frame)
+            if image_array is None:
+                raise ValueError("DICOM file contains no pixel data")
             
             # Basic image analysis
-            image_stats = {
-                "dimensions": image_array.shape,
-                "data_type": str(image_array.dtype),
-                "intensity_range": [int(image_array.min()), int(image_array.max())],
-                "mean_intensity": float(image_array.mean())
-            }
+            image_stats = await run_cpu_array(pixel_summary, image_array)
             
             # Regenerative medicine specific analysis
             regenerative_analysis = await self._analyze_dicom_for_regenerative_targets(
@@ -0,0 +1,125 @@
+"""
+Multi-Resolution Image Previews
+- Thumbnail (256px), 512px and 1024px renditions rendered once, at processing time, so views
+  never re-decode the original DICOM or JPEG
+- DICOM frames are rendered per window/level preset: the header's VOI window (or an automatic
+  percentile window) plus the standard CT presets, in rescaled (Hounsfield) units
+- Renditions are stored in image_previews keyed on (file_id, preset, level), with a content
+  hash that doubles as the HTTP ETag
+"""
+
+import hashlib
+import logging
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from executors import run_cpu_array
+from imaging_kernels import render_pyramid
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PYRAMID_LEVELS = {"thumbnail": 256, "512": 512, "1024": 1024}
+DEFAULT_PRESET = "default"
+
+# (center, width) in Hounsfield units
+CT_WINDOW_PRESETS = {
+    "soft_tissue": (40.0, 400.0),
+    "bone": (300.0, 1500.0),
+    "lung": (-600.0, 1500.0),
+    "brain": (40.0, 80.0),
+}
+
+Window = Optional[Tuple[float, float]]
+
+
+def _first_value(value) -> Optional[float]:
+    # WindowCenter/WindowWidth may be multi-valued; the first pair is the primary window
+    if isinstance(value, Sequence) and not isinstance(value, str):
+        value = value[0] if len(value) else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def dicom_rendering(header) -> Dict[str, Any]:
+    """Rescale, inversion and window presets for one DICOM header"""
+
+    center = _first_value(header.get("WindowCenter"))
+    width = _first_value(header.get("WindowWidth"))
+    presets: Dict[str, Window] = {DEFAULT_PRESET: (center, width) if center is not None and width else None}
+    if str(header.get("Modality", "")).upper() == "CT":
+        presets.update(CT_WINDOW_PRESETS)
+    return {
+        "presets": presets,
+        "rescale": (float(header.get("RescaleSlope") or 1.0), float(header.get("RescaleIntercept") or 0.0)),
+        "invert": str(header.get("PhotometricInterpretation", "")) == "MONOCHROME1"
+    }
+
+
+async def generate_previews(
+    db_client,
+    file_id: str,
+    patient_id: str,
+    image_array: np.ndarray,
+    presets: Optional[Dict[str, Window]] = None,
+    rescale: Tuple[float, float] = (1.0, 0.0),
+    invert: bool = False
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Render and store every preset x level; returns {preset: {level: {width, height, etag}}}"""
+
+    presets = presets or {DEFAULT_PRESET: None}
+    names_by_size = {size: level for level, size in PYRAMID_LEVELS.items()}
+    now = datetime.utcnow()
+    summary: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    for preset, window in presets.items():
+        renditions = await run_cpu_array(
+            render_pyramid, image_array, list(PYRAMID_LEVELS.values()), window, rescale, invert
+        )
+        summary[preset] = {}
+        for rendition in renditions:
+            level = names_by_size[rendition["size"]]
+            etag = hashlib.sha256(rendition["data"]).hexdigest()[:32]
+            await db_client.image_previews.replace_one(
+                {"file_id": file_id, "preset": preset, "level": level},
+                {
+                    "file_id": file_id,
+                    "patient_id": patient_id,
+                    "preset": preset,
+                    "level": level,
+                    "window": list(window) if window else None,
+                    "width": rendition["width"],
+                    "height": rendition["height"],
+                    "media_type": rendition["media_type"],
+                    "etag": etag,
+                    "size_bytes": len(rendition["data"]),
+                    "data": rendition["data"],
+                    "created_at": now
+                },
+                upsert=True
+            )
+            summary[preset][level] = {"width": rendition["width"], "height": rendition["height"], "etag": etag}
+            metrics.increment("image_preview_bytes_total", value=len(rendition["data"]))
+    metrics.increment("image_previews_generated_total", value=len(presets) * len(PYRAMID_LEVELS))
+    return summary
+
+
+async def get_preview(db_client, file_id: str, preset: str, level: str, include_data: bool = True) -> Optional[Dict[str, Any]]:
+    projection = {"_id": 0} if include_data else {"_id": 0, "data": 0}
+    return await db_client.image_previews.find_one({"file_id": file_id, "preset": preset, "level": level}, projection)
+
+
+async def list_previews(db_client, file_id: str) -> list:
+    return await db_client.image_previews.find(
+        {"file_id": file_id}, {"_id": 0, "data": 0}
+    ).to_list(None)
+
+
+async def delete_previews(db_client, file_id: str) -> int:
+    result = await db_client.image_previews.delete_many({"file_id": file_id})
+    return result.deleted_count
@@ -0,0 +1,131 @@
+"""
+CPU-Bound Imaging and Document Kernels
+- Plain module-level functions so they can run in the executor process pool
+- Kept free of service/database imports: spawned workers import only this module
+"""
+
+import io
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+import PyPDF2
+from PIL import Image, features
+
+
+def to_grayscale(image_array: np.ndarray) -> np.ndarray:
+    if len(image_array.shape) == 3:
+        # Convert to grayscale if color
+        return cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
+    return image_array
+
+
+def image_quality_score(image_gray: np.ndarray) -> float:
+    """Contrast and Laplacian sharpness on a 0.3-1.0 reliability scale"""
+
+    # Calculate image quality metrics
+    mean = np.mean(image_gray)
+    contrast = np.std(image_gray) / mean if mean > 0 else 0
+    sharpness = cv2.Laplacian(image_gray.astype(np.uint8), cv2.CV_64F).var()
+
+    # Normalize to 0-1 scale
+    quality_score = min(1.0, (contrast * 0.5 + sharpness / 1000 * 0.5))
+
+    return float(max(0.3, quality_score))  # Minimum quality threshold
+
+
+def image_statistics(image_array: np.ndarray) -> Dict[str, Any]:
+    """Intensity statistics and quality score for one image"""
+
+    image_gray = to_grayscale(image_array)
+    return {
+        "image_statistics": {
+            "mean_intensity": float(np.mean(image_gray)),
+            "std_intensity": float(np.std(image_gray)),
+            "min_intensity": float(np.min(image_gray)),
+            "max_intensity": float(np.max(image_gray)),
+            "image_shape": tuple(int(dim) for dim in image_gray.shape)
+        },
+        "quality_score": image_quality_score(image_gray)
+    }
+
+
+def pixel_summary(image_array: np.ndarray) -> Dict[str, Any]:
+    return {
+        "dimensions": tuple(int(dim) for dim in image_array.shape),
+        "data_type": str(image_array.dtype),
+        "intensity_range": [int(image_array.min()), int(image_array.max())],
+        "mean_intensity": float(image_array.mean())
+    }
+
+
+def window_to_uint8(
+    image_array: np.ndarray,
+    window: Optional[Tuple[float, float]] = None,
+    rescale: Tuple[float, float] = (1.0, 0.0),
+    invert: bool = False
+) -> np.ndarray:
+    """Map stored pixel values to 8-bit display values
+
+    rescale is (slope, intercept) to modality units (e.g. Hounsfield); window is
+    (center, width). Without a window, 8-bit images pass through and anything else
+    is stretched between its 0.5th and 99.5th percentiles.
+    """
+
+    if window is None and image_array.dtype == np.uint8 and rescale == (1.0, 0.0):
+        display = image_array
+    else:
+        values = image_array.astype(np.float32) * rescale[0] + rescale[1]
+        if window is None:
+            lower, upper = np.percentile(values, [0.5, 99.5])
+        else:
+            center, width = window
+            lower, upper = center - width / 2, center + width / 2
+        scale = 255.0 / max(float(upper - lower), 1e-6)
+        display = np.clip((values - lower) * scale, 0, 255).astype(np.uint8)
+    return 255 - display if invert else display
+
+
+def render_pyramid(
+    image_array: np.ndarray,
+    sizes: Sequence[int],
+    window: Optional[Tuple[float, float]] = None,
+    rescale: Tuple[float, float] = (1.0, 0.0),
+    invert: bool = False
+) -> List[Dict[str, Any]]:
+    """Encoded renditions of one image whose longest side fits each size (never upscaled)
+
+    Levels are resized from the next larger level rather than from the original.
+    WebP when the Pillow build supports it, PNG otherwise.
+    """
+
+    display = window_to_uint8(image_array, window, rescale, invert)
+    if display.ndim == 3 and display.shape[-1] not in (3, 4):
+        display = display[..., 0]
+    image = Image.fromarray(np.ascontiguousarray(display))
+    if image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGB")
+
+    webp = features.check("webp")
+    renditions = []
+    for size in sorted(sizes, reverse=True):
+        image = image.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if webp:
+            image.save(buffer, format="WEBP", quality=85, method=4)
+        else:
+            image.save(buffer, format="PNG", optimize=True)
+        renditions.append({
+            "size": size,
+            "width": image.width,
+            "height": image.height,
+            "media_type": "image/webp" if webp else "image/png",
+            "data": buffer.getvalue()
+        })
+    return renditions
+
+
+def extract_pdf_text(file_data: bytes) -> str:
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_data))
+    return "".join(page.extract_text() + "\n" for page in pdf_reader.pages)
@@ -0,0 +1,462 @@
+"""
+Durable Background Job Queue for RegenMed AI Pro
+- Jobs persisted in MongoDB so queued work survives restarts
+- Workers claim jobs atomically (highest priority first, then FIFO)
+- Leases with heartbeats: jobs held by a dead worker are reclaimed while attempts remain;
+  jobs whose lease lapsed on their last attempt are swept to failed
+- Completion/failure writes are fenced on the claim's lease_id, so a worker that lost its
+  lease cannot overwrite the new owner's result
+- Retries with exponential backoff up to max_attempts
+- Optional dedupe_key: at most one queued/running job per key (unique index), so every
+  worker process can enqueue the same singleton job at startup
+- Per-job progress with in-process subscribers for live status channels
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from bson.errors import InvalidDocument
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "jobs"
+
+# Job lifecycle states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+TERMINAL_STATES = {JOB_COMPLETED, JOB_FAILED}
+
+ProgressCallback = Callable[[float, Optional[str]], Awaitable[None]]
+JobHandler = Callable[[Dict[str, Any], ProgressCallback], Awaitable[Dict[str, Any]]]
+FailureHook = Callable[[Dict[str, Any], Exception, bool], Awaitable[None]]
+
+
+class JobQueue:
+    """Mongo-backed priority job queue with an in-process worker pool"""
+
+    def __init__(
+        self,
+        db_client,
+        spool_dir: str,
+        concurrency: int = 2,
+        poll_interval: float = 2.0,
+        lease_seconds: int = 300,
+        retry_base_seconds: float = 5.0
+    ):
+        self.db = db_client
+        self.spool_dir = Path(spool_dir)
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._failure_hooks: Dict[str, FailureHook] = {}
+        self._workers: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    @property
+    def collection(self):
+        return self.db[JOBS_COLLECTION]
+
+    def register_handler(self, job_type: str, handler: JobHandler, on_failure: Optional[FailureHook] = None):
+        """Register the coroutine that executes jobs of job_type
+
+        on_failure(job, error, will_retry) is awaited after every failed attempt
+        so callers can mirror the job state onto their own records.
+        """
+        self._handlers[job_type] = handler
+        if on_failure:
+            self._failure_hooks[job_type] = on_failure
+
+    # =============== SPOOL ===============
+
+    def spool_path(self, name: str) -> Path:
+        """Fresh path in the spool directory; the caller discards it with discard_spool"""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        return self.spool_dir / f"{name}-{uuid.uuid4().hex}"
+
+    @staticmethod
+    def discard_spool(path: Optional[str]):
+        if not path:
+            return
+        try:
+            Path(path).unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Spool cleanup failed for {path}: {str(e)}")
+
+    # =============== PRODUCER API ===============
+
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: Dict[str, Any],
+        priority: int = 5,
+        max_attempts: int = 3,
+        patient_id: Optional[str] = None,
+        practitioner_id: Optional[str] = None,
+        dedupe_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Persist a new job and wake an idle worker
+
+        With dedupe_key, an already queued or running job holding the key is returned
+        instead of enqueueing another (the key is released when the job finishes).
+        """
+
+        if dedupe_key:
+            existing = await self.collection.find_one({"dedupe_key": dedupe_key}, {"_id": 0})
+            if existing is not None:
+                metrics.increment("jobs_deduplicated_total", job_type=job_type)
+                return existing
+
+        now = datetime.utcnow()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "job_type": job_type,
+            "payload": payload,
+            "status": JOB_QUEUED,
+            "priority": priority,
+            "attempts": 0,
+            "max_attempts": max_attempts,
+            "progress": 0.0,
+            "progress_message": "Queued",
+            "patient_id": patient_id,
+            "practitioner_id": practitioner_id,
+            "result": None,
+            "last_error": None,
+            "created_at": now,
+            "updated_at": now,
+            "run_after": now,
+            "started_at": None,
+            "finished_at": None,
+            "worker_id": None,
+            "lease_id": None,
+            "lease_expires_at": None
+        }
+        if dedupe_key:
+            job["dedupe_key"] = dedupe_key
+        try:
+            await self.collection.insert_one(job)
+        except DuplicateKeyError:
+            # Another process enqueued the same key between the lookup and the insert
+            existing = await self.collection.find_one({"dedupe_key": dedupe_key}, {"_id": 0}) if dedupe_key else None
+            if existing is None:
+                raise
+            metrics.increment("jobs_deduplicated_total", job_type=job_type)
+            return existing
+        job.pop("_id", None)
+
+        metrics.increment("jobs_enqueued_total", job_type=job_type)
+        self._wakeup.set()
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"job_id": job_id}, {"_id": 0})
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """In-process progress feed for a job (used by the SSE endpoint)"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    def _publish(self, job_id: str, update: Dict[str, Any]):
+        for queue in list(self._subscribers.get(job_id, ())):
+            try:
+                queue.put_nowait(update)
+            except asyncio.QueueFull:
+                pass  # slow consumer - it will re-read the job document
+
+    # =============== WORKERS ===============
+
+    def start(self):
+        """Spawn the worker pool on the running event loop"""
+        self._stopping = False
+        for index in range(self.concurrency):
+            self._workers.append(asyncio.create_task(self._worker_loop(index)))
+        logger.info(f"Job queue started with {self.concurrency} workers ({self.worker_id})")
+
+    async def stop(self):
+        """Stop claiming new jobs; running jobs are left to lease expiry and retried"""
+        self._stopping = True
+        self._wakeup.set()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def _claim_next(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {
+                "job_type": {"$in": list(self._handlers.keys())},
+                "$or": [
+                    {"status": JOB_QUEUED, "run_after": {"$lte": now}},
+                    # Lease expired: the worker holding it died mid-job. Only while attempts
+                    # remain - a job that kills its worker must not take down workers forever
+                    {
+                        "status": JOB_RUNNING,
+                        "lease_expires_at": {"$lt": now},
+                        "$expr": {"$lt": ["$attempts", "$max_attempts"]}
+                    }
+                ]
+            },
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "worker_id": self.worker_id,
+                    "lease_id": uuid.uuid4().hex,
+                    "started_at": now,
+                    "updated_at": now,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("priority", -1), ("created_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _sweep_expired_leases(self):
+        """Fail jobs whose lease lapsed on their last attempt (the worker died every time)"""
+        while True:
+            now = datetime.utcnow()
+            job = await self.collection.find_one_and_update(
+                {
+                    "job_type": {"$in": list(self._handlers.keys())},
+                    "status": JOB_RUNNING,
+                    "lease_expires_at": {"$lt": now},
+                    "$expr": {"$gte": ["$attempts", "$max_attempts"]}
+                },
+                {"$set": {"status": JOB_FAILED, "worker_id": self.worker_id, "lease_id": uuid.uuid4().hex}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if job is None:
+                return
+            error = RuntimeError(f"Worker lost during attempt {job['attempts']} of {job['max_attempts']} (lease expired)")
+            await self._record_failure(job, error)
+
+    async def _worker_loop(self, index: int):
+        while not self._stopping:
+            if index == 0:
+                try:
+                    await self._sweep_expired_leases()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Expired lease sweep failed: {str(e)}")
+
+            try:
+                job = await self._claim_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job claim failed (worker {index}): {str(e)}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._execute(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A failed bookkeeping write must not end this worker; the lease sweep finishes the job
+                logger.error(f"Job {job['job_id']} ({job['job_type']}) bookkeeping failed (worker {index}): {str(e)}")
+                metrics.increment("job_worker_errors_total", job_type=job["job_type"])
+
+    def _owned(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Filter matching the job only while this claim still holds its lease"""
+        return {"job_id": job["job_id"], "worker_id": self.worker_id, "lease_id": job.get("lease_id")}
+
+    async def _heartbeat(self, job: Dict[str, Any]):
+        """Extend the lease while a long job is still making progress"""
+        interval = max(self.lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                result = await self.collection.update_one(
+                    {**self._owned(job), "status": JOB_RUNNING},
+                    {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+                )
+                if result.matched_count == 0:
+                    logger.warning(f"Job {job['job_id']} lease lost; another worker may have reclaimed it")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Transient errors must not end the heartbeat; the next beat retries before expiry
+                metrics.increment("job_heartbeat_errors_total", job_type=job["job_type"])
+                logger.warning(f"Job {job['job_id']} heartbeat failed: {str(e)}")
+
+    async def _execute(self, job: Dict[str, Any]):
+        job_id = job["job_id"]
+        job_type = job["job_type"]
+        handler = self._handlers[job_type]
+        started = datetime.utcnow()
+
+        async def report_progress(progress: float, message: Optional[str] = None):
+            update = {"progress": max(0.0, min(float(progress), 1.0)), "updated_at": datetime.utcnow()}
+            if message:
+                update["progress_message"] = message
+            written = await self.collection.update_one({**self._owned(job), "status": JOB_RUNNING}, {"$set": update})
+            if written.matched_count:
+                self._publish(job_id, {"status": JOB_RUNNING, **update})
+
+        self._publish(job_id, {"status": JOB_RUNNING, "attempts": job["attempts"], "progress": job.get("progress", 0.0)})
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            result = await handler(job, report_progress)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._record_failure(job, e)
+            return
+        finally:
+            heartbeat.cancel()
+
+        finished = datetime.utcnow()
+        update = {
+            "status": JOB_COMPLETED,
+            "progress": 1.0,
+            "progress_message": "Completed",
+            "result": result,
+            "finished_at": finished,
+            "updated_at": finished,
+            "lease_expires_at": None
+        }
+        try:
+            written = await self.collection.update_one(
+                {**self._owned(job), "status": JOB_RUNNING},
+                {"$set": update, "$unset": {"dedupe_key": ""}}
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The handler succeeded but its result could not be stored (e.g. a non-BSON value);
+            # a result that cannot be encoded will not encode on a retry either
+            logger.error(f"Job {job_id} ({job_type}) result could not be stored: {str(e)}")
+            await self._record_failure(
+                job, RuntimeError(f"Result could not be stored: {str(e)}"), retry=not isinstance(e, InvalidDocument)
+            )
+            return
+        if written.matched_count == 0:
+            # Lease lost mid-run: the job now belongs to another worker, whose result stands
+            logger.warning(f"Job {job_id} ({job_type}) finished after losing its lease; result discarded")
+            metrics.increment("jobs_stale_results_total", job_type=job_type)
+            return
+        self._publish(job_id, update)
+
+        metrics.increment("jobs_completed_total", job_type=job_type)
+        metrics.set_gauge("job_last_duration_seconds", (finished - started).total_seconds(), job_type=job_type)
+
+    async def _record_failure(self, job: Dict[str, Any], error: Exception, retry: bool = True):
+        job_id = job["job_id"]
+        job_type = job["job_type"]
+        will_retry = retry and job["attempts"] < job.get("max_attempts", 1)
+        now = datetime.utcnow()
+
+        if will_retry:
+            # Exponential backoff with jitter between attempts
+            delay = self.retry_base_seconds * (2 ** (job["attempts"] - 1)) * random.uniform(0.5, 1.5)
+            update = {
+                "status": JOB_QUEUED,
+                "run_after": now + timedelta(seconds=delay),
+                "progress_message": f"Retrying after error (attempt {job['attempts']} of {job['max_attempts']})"
+            }
+            logger.warning(f"Job {job_id} ({job_type}) failed, retrying in {delay:.1f}s: {str(error)}")
+            metrics.increment("jobs_retried_total", job_type=job_type)
+        else:
+            update = {
+                "status": JOB_FAILED,
+                "finished_at": now,
+                "progress_message": "Failed"
+            }
+            logger.error(f"Job {job_id} ({job_type}) failed permanently: {str(error)}")
+            metrics.increment("jobs_failed_total", job_type=job_type)
+
+        update.update({"last_error": str(error), "updated_at": now, "lease_expires_at": None})
+        change: Dict[str, Any] = {"$set": update}
+        if not will_retry:
+            change["$unset"] = {"dedupe_key": ""}
+        written = await self.collection.update_one(self._owned(job), change)
+        if written.matched_count == 0:
+            logger.warning(f"Job {job_id} ({job_type}) failed after losing its lease; failure not recorded")
+            metrics.increment("jobs_stale_results_total", job_type=job_type)
+            return
+        self._publish(job_id, update)
+
+        hook = self._failure_hooks.get(job_type)
+        if hook:
+            try:
+                await hook(job, error, will_retry)
+            except Exception as e:
+                logger.error(f"Job failure hook for {job_type} raised: {str(e)}")
+
+    async def get_status(self) -> Dict[str, Any]:
+        """Queue depth by state for the metrics endpoint"""
+        counts: Dict[str, int] = {}
+        try:
+            async for row in self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+                counts[row["_id"]] = row["count"]
+        except Exception as e:
+            logger.warning(f"Job status aggregation failed: {str(e)}")
+
+        return {
+            "worker_id": self.worker_id,
+            "workers": len(self._workers),
+            "registered_job_types": sorted(self._handlers.keys()),
+            "jobs_by_status": counts,
+            "live_subscribers": sum(len(s) for s in self._subscribers.values())
+        }
+
+
+_queue: Optional[JobQueue] = None
+
+
+def configure_job_queue(db_client, spool_dir: Optional[str] = None) -> JobQueue:
+    """Create the process-wide queue from environment settings"""
+    global _queue
+    _queue = JobQueue(
+        db_client,
+        spool_dir=spool_dir or os.environ.get("UPLOAD_SPOOL_DIR", "/tmp/regenmed_upload_spool"),
+        concurrency=int(os.environ.get("JOB_WORKER_CONCURRENCY", "2")),
+        poll_interval=float(os.environ.get("JOB_POLL_INTERVAL_SECONDS", "2")),
+        lease_seconds=int(os.environ.get("JOB_LEASE_SECONDS", "300")),
+        retry_base_seconds=float(os.environ.get("JOB_RETRY_BASE_SECONDS", "5"))
+    )
+    return _queue
+
+
+def get_job_queue() -> Optional[JobQueue]:
+    return _queue
@@ -0,0 +1,891 @@
+"""
+Local Full-Text Literature Index for RegenMed AI Pro
+- BM25 ranking over title, abstract and MeSH terms (field-weighted term frequencies)
+- Tokenization with stopword removal and light suffix-stripping stemming
+- Immutable on-disk segments (numpy arrays, memory-mapped on load)
+- In-memory delta segment for incremental updates, flushed at a size threshold
+- Segment merging keeps query fan-out bounded as the corpus grows
+- Tokenization, flushes and merges run in the I/O thread pool (flushes/merges serialized by
+  a lock); the startup catch-up runs in the background and searches wait for `ready`
+- One writer process per index directory (an flock on writer.lock); the other workers keep
+  their delta in memory and reload when the writer's manifest changes
+- Papers re-stored with different indexed fields replace their old postings (content
+  fingerprint per document; replaced documents are masked until a merge drops them)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from executors import run_io
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Field weights applied to term frequencies (BM25F-style)
+FIELD_WEIGHTS = {"title": 2.0, "mesh": 1.5, "abstract": 1.0}
+
+MANIFEST_FILE = "manifest.json"
+WRITER_LOCK_FILE = "writer.lock"
+
+# Re-read window for sync, covering ObjectIds/timestamps minted slightly out of order across processes
+SYNC_OVERLAP = timedelta(seconds=5)
+
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been being between both but by can could did do does
+during each for from had has have he her his how however i if in into is it its may more most no nor
+not of on or other our out over per she should so such than that the their them then there these they
+this those through to under up use used using very was we were what when where which while who will
+with within without would
+""".split())
+
+# Longest suffixes first; (suffix, replacement)
+_STEM_RULES = (
+    ("ational", "ate"), ("ization", "ize"), ("isation", "ize"), ("iveness", "ive"), ("fulness", "ful"),
+    ("ousness", "ous"), ("ations", "ate"), ("ation", "ate"), ("ative", "ate"), ("atory", "ate"),
+    ("ments", ""), ("ment", ""), ("ities", ""), ("ity", ""), ("ings", ""), ("ing", ""),
+    ("edly", ""), ("ies", ""), ("ied", ""), ("ed", ""), ("ly", ""), ("y", "")
+)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def stem(token: str) -> str:
+    """Light suffix-stripping stemmer (regeneration/regenerative -> regenerate)"""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for suffix, replacement in _STEM_RULES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            base = token[:-len(suffix)]
+            # stopped -> stop, but keep "fell", "pass", "buzz"
+            if not replacement and len(base) > 3 and base[-1] == base[-2] and base[-1] not in "lsz":
+                base = base[:-1]
+            return base + replacement
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-alphanumerics, drop stopwords, stem"""
+    if not text:
+        return []
+    return [stem(token) for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS and len(token) > 1]
+
+
+def paper_key(paper: Dict[str, Any]) -> Optional[str]:
+    """Stable identity of a literature_papers document"""
+    if paper.get("pmid") and paper["pmid"] != "Unknown":
+        return f"pmid:{paper['pmid']}"
+    if paper.get("gs_id"):
+        return f"gs:{paper['gs_id']}"
+    if paper.get("_id") is not None:
+        return f"id:{paper['_id']}"
+    return None
+
+
+def _paper_year(paper: Dict[str, Any]) -> int:
+    for field in ("year", "publication_date", "publication_year"):
+        value = str(paper.get(field) or "")[:4]
+        if value.isdigit():
+            return int(value)
+    return 0
+
+
+def _indexed_fields(paper: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    mesh_text = " ".join(
+        term if isinstance(term, str) else term.get("descriptor", "")
+        for term in (paper.get("mesh_headings") or paper.get("mesh_terms") or [])
+    )
+    return [("title", paper.get("title")), ("abstract", paper.get("abstract")), ("mesh", mesh_text)]
+
+
+def _fingerprint(paper: Dict[str, Any]) -> int:
+    """64-bit hash of everything the index stores for a paper (except relevance)"""
+    digest = hashlib.blake2b(digest_size=8)
+    for _, text in _indexed_fields(paper):
+        digest.update((text if isinstance(text, str) else "").encode("utf-8", "replace") + b"\x1f")
+    digest.update(str(_paper_year(paper)).encode())
+    return int.from_bytes(digest.digest(), "little")
+
+
+def _weighted_terms(paper: Dict[str, Any]) -> Counter:
+    """Field-weighted term frequencies for one paper"""
+    weighted: Counter = Counter()
+    for field, text in _indexed_fields(paper):
+        if not isinstance(text, str):
+            continue
+        weight = FIELD_WEIGHTS[field]
+        for token in tokenize(text):
+            weighted[token] += weight
+    return weighted
+
+
+class _Segment:
+    """Immutable, memory-mapped postings segment"""
+
+    def __init__(self, segment_id: str, path: Path):
+        self.segment_id = segment_id
+        self.path = path
+        with open(path / "terms.json") as f:
+            self.term_index: Dict[str, int] = {term: i for i, term in enumerate(json.load(f))}
+        with open(path / "doc_keys.json") as f:
+            self.doc_keys: List[str] = json.load(f)
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        self.postings_docs = np.load(path / "postings_docs.npy", mmap_mode="r")
+        self.postings_tf = np.load(path / "postings_tf.npy", mmap_mode="r")
+        self.doc_len = np.load(path / "doc_len.npy", mmap_mode="r")
+        self.doc_year = np.load(path / "doc_year.npy", mmap_mode="r")
+        self.doc_relevance = np.load(path / "doc_relevance.npy", mmap_mode="r")
+        fingerprint_path = path / "doc_fingerprint.npy"
+        # Segments written before fingerprints existed match nothing, so a re-store re-indexes once
+        self.doc_fingerprint = (
+            np.load(fingerprint_path, mmap_mode="r") if fingerprint_path.exists()
+            else np.zeros(len(self.doc_keys), dtype=np.uint64)
+        )
+        # Documents superseded by a newer version in a later segment or the delta
+        self.dead = np.zeros(len(self.doc_keys), dtype=bool)
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_keys)
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        i = self.term_index.get(term)
+        if i is None:
+            return None
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.postings_docs[start:end], self.postings_tf[start:end]
+
+    def document_frequencies(self) -> Dict[str, int]:
+        counts = np.diff(np.asarray(self.offsets))
+        return {term: int(counts[i]) for term, i in self.term_index.items()}
+
+    def iter_postings(self) -> Iterable[Tuple[str, np.ndarray, np.ndarray]]:
+        for term, i in self.term_index.items():
+            start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+            yield term, self.postings_docs[start:end], self.postings_tf[start:end]
+
+
+class _DeltaSegment:
+    """Mutable in-memory segment receiving newly stored papers"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.doc_keys: List[str] = []
+        self.doc_len: List[float] = []
+        self.doc_year: List[int] = []
+        self.doc_relevance: List[float] = []
+        self.doc_fingerprint: List[int] = []
+        self.dead: List[bool] = []
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_keys)
+
+    def add(self, key: str, terms: Counter, year: int, relevance: float, fingerprint: int) -> int:
+        doc = len(self.doc_keys)
+        self.doc_keys.append(key)
+        self.doc_len.append(float(sum(terms.values())))
+        self.doc_year.append(year)
+        self.doc_relevance.append(relevance)
+        self.doc_fingerprint.append(fingerprint)
+        self.dead.append(False)
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc] = tf
+        return doc
+
+    def document_frequencies(self) -> Dict[str, int]:
+        return {term: len(entries) for term, entries in self.postings.items()}
+
+    def iter_postings(self) -> Iterable[Tuple[str, np.ndarray, np.ndarray]]:
+        for term in list(self.postings):
+            docs, tfs = self.postings_for(term)
+            yield term, docs, tfs
+
+    def postings_for(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        entries = self.postings.get(term)
+        if not entries:
+            return None
+        return np.fromiter(entries.keys(), dtype=np.int32), np.fromiter(entries.values(), dtype=np.float32)
+
+
+def _write_segment(
+    path: Path,
+    postings: Dict[str, List[Tuple[int, float]]],
+    doc_keys: List[str],
+    doc_len: List[float],
+    doc_year: List[int],
+    doc_relevance: List[float],
+    doc_fingerprint: List[int]
+):
+    """Write a segment directory atomically (tmp dir + rename)"""
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    for i, term in enumerate(terms):
+        offsets[i + 1] = offsets[i] + len(postings[term])
+
+    postings_docs = np.empty(int(offsets[-1]), dtype=np.int32)
+    postings_tf = np.empty(int(offsets[-1]), dtype=np.float32)
+    for i, term in enumerate(terms):
+        entries = sorted(postings[term])
+        start, end = int(offsets[i]), int(offsets[i + 1])
+        postings_docs[start:end] = [doc for doc, _ in entries]
+        postings_tf[start:end] = [tf for _, tf in entries]
+
+    with open(tmp_path / "terms.json", "w") as f:
+        json.dump(terms, f)
+    with open(tmp_path / "doc_keys.json", "w") as f:
+        json.dump(doc_keys, f)
+    np.save(tmp_path / "offsets.npy", offsets)
+    np.save(tmp_path / "postings_docs.npy", postings_docs)
+    np.save(tmp_path / "postings_tf.npy", postings_tf)
+    np.save(tmp_path / "doc_len.npy", np.asarray(doc_len, dtype=np.float32))
+    np.save(tmp_path / "doc_year.npy", np.asarray(doc_year, dtype=np.int16))
+    np.save(tmp_path / "doc_relevance.npy", np.asarray(doc_relevance, dtype=np.float32))
+    np.save(tmp_path / "doc_fingerprint.npy", np.asarray(doc_fingerprint, dtype=np.uint64))
+
+    os.replace(tmp_path, path)
+
+
+def _compact_segment(path: Path, sources: List[Any]) -> List[Tuple[Any, int]]:
+    """Write the live documents of sources (segments or deltas) as one segment
+
+    Returns the (source, doc) each written document came from, in segment order.
+    """
+
+    postings: Dict[str, List[Tuple[int, float]]] = {}
+    doc_keys: List[str] = []
+    doc_len: List[float] = []
+    doc_year: List[int] = []
+    doc_relevance: List[float] = []
+    doc_fingerprint: List[int] = []
+    origins: List[Tuple[Any, int]] = []
+
+    for source in sources:
+        live = np.flatnonzero(~np.asarray(source.dead, dtype=bool))
+        remap = np.full(source.n_docs, -1, dtype=np.int64)
+        remap[live] = np.arange(len(live)) + len(doc_keys)
+        for term, docs, tfs in source.iter_postings():
+            new_docs = remap[np.asarray(docs)]
+            keep = new_docs >= 0
+            if keep.any():
+                postings.setdefault(term, []).extend(zip(new_docs[keep].tolist(), np.asarray(tfs)[keep].tolist()))
+        doc_keys.extend(source.doc_keys[doc] for doc in live.tolist())
+        doc_len.extend(np.asarray(source.doc_len)[live].tolist())
+        doc_year.extend(np.asarray(source.doc_year)[live].tolist())
+        doc_relevance.extend(np.asarray(source.doc_relevance)[live].tolist())
+        doc_fingerprint.extend(np.asarray(source.doc_fingerprint, dtype=np.uint64)[live].tolist())
+        origins.extend((source, doc) for doc in live.tolist())
+
+    _write_segment(path, postings, doc_keys, doc_len, doc_year, doc_relevance, doc_fingerprint)
+    return origins
+
+
+def _acquire_writer_lock(index_dir: Path):
+    """Non-blocking exclusive flock; the open file is the lock (None if another process holds it)"""
+    try:
+        import fcntl
+    except ImportError:
+        # No flock (Windows): single-process deployments only
+        return True
+    index_dir.mkdir(parents=True, exist_ok=True)
+    handle = open(index_dir / WRITER_LOCK_FILE, "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+class LiteratureIndex:
+    """BM25 inverted index over literature_papers"""
+
+    def __init__(
+        self,
+        db_client,
+        index_dir: str,
+        delta_flush_threshold: int = 2000,
+        max_segments: int = 8,
+        writer: bool = True
+    ):
+        self.db = db_client
+        self.index_dir = Path(index_dir)
+        self.delta_flush_threshold = delta_flush_threshold
+        self.max_segments = max_segments
+        self.writer = writer
+
+        # Lists are replaced, never mutated, so a search in flight keeps a consistent snapshot
+        self.segments: List[_Segment] = []
+        self.delta = _DeltaSegment()
+        self._flushing: List[_DeltaSegment] = []
+        # paper key -> (segment or delta, doc) of its current version
+        self._locations: Dict[str, Tuple[Any, int]] = {}
+        self._df: Counter = Counter()
+        self._total_len = 0.0
+        self._next_segment = 0
+        self._watermark_id: Optional[str] = None
+        self._pending_watermark_id: Optional[str] = None
+        self._manifest_updated_at: Optional[float] = None
+        self._synced_at: Optional[datetime] = None
+        self._flush_lock = asyncio.Lock()
+        self.ready = False
+
+    # =============== PERSISTENCE ===============
+
+    def _manifest_path(self) -> Path:
+        return self.index_dir / MANIFEST_FILE
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        manifest_path = self._manifest_path()
+        if not manifest_path.exists():
+            return {}
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, segments: List[_Segment], watermark_id: Optional[str]):
+        manifest = {
+            "segments": [segment.segment_id for segment in segments],
+            "next_segment": self._next_segment,
+            "watermark_id": watermark_id,
+            "synced_at": self._synced_at.isoformat() if self._synced_at else None,
+            "writer_pid": os.getpid(),
+            "updated_at": time.time()
+        }
+        tmp_path = self._manifest_path().with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path())
+        self._manifest_updated_at = manifest["updated_at"]
+
+    def manifest_changed(self) -> bool:
+        """True once the writer has published segments this (reader) index hasn't loaded"""
+        try:
+            return self._read_manifest().get("updated_at") != self._manifest_updated_at
+        except (OSError, ValueError):
+            return False
+
+    def _retire(self, location: Tuple[Any, int]):
+        source, doc = location
+        source.dead[doc] = True
+        self._total_len -= float(source.doc_len[doc])
+
+    def _register_segment(self, segment: _Segment):
+        # Segments load oldest first, so a key seen again supersedes its earlier version
+        self.segments = self.segments + [segment]
+        self._total_len += float(np.sum(segment.doc_len))
+        for doc, key in enumerate(segment.doc_keys):
+            previous = self._locations.get(key)
+            if previous is not None:
+                self._retire(previous)
+            self._locations[key] = (segment, doc)
+        self._df.update(segment.document_frequencies())
+
+    def _adopt(self, segment: _Segment, origins: List[Tuple[Any, int]]):
+        """Point keys at a freshly written segment unless they were replaced while it was written"""
+        for doc, (key, (source, source_doc)) in enumerate(zip(segment.doc_keys, origins)):
+            location = self._locations.get(key)
+            if location is not None and location[0] is source and location[1] == source_doc:
+                self._locations[key] = (segment, doc)
+            else:
+                segment.dead[doc] = True
+
+    def _recount_document_frequencies(self):
+        # Merges drop replaced documents, so their stale postings stop counting here
+        df: Counter = Counter()
+        for source in self.segments + self._flushing + [self.delta]:
+            df.update(source.document_frequencies())
+        self._df = df
+
+    def load(self):
+        """Memory-map every segment listed in the manifest"""
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        manifest = self._read_manifest()
+        if manifest:
+            self._next_segment = manifest.get("next_segment", 0)
+            self._watermark_id = manifest.get("watermark_id")
+            self._manifest_updated_at = manifest.get("updated_at")
+            if manifest.get("synced_at"):
+                self._synced_at = datetime.fromisoformat(manifest["synced_at"])
+            for segment_id in manifest.get("segments", []):
+                try:
+                    self._register_segment(_Segment(segment_id, self.index_dir / segment_id))
+                except Exception as e:
+                    # A lost segment is rebuilt by catch_up once the watermark is reset
+                    logger.error(f"Literature index segment {segment_id} unreadable: {str(e)}")
+                    self._watermark_id = None
+                    self._synced_at = None
+
+        role = "writer" if self.writer else "reader"
+        logger.info(f"Literature index loaded ({role}): {len(self.segments)} segments, {self.document_count} documents")
+
+    async def catch_up(self, incremental: bool = False, batch_size: int = 1000) -> int:
+        """Index literature_papers stored since the last flushed segment
+
+        Papers re-stored (last_accessed) since the last catch-up are re-read too, so updated
+        fields replace their old postings. incremental re-reads by time instead of the flushed
+        watermark, picking up papers other worker processes stored since the last sync.
+        """
+
+        from bson import ObjectId
+
+        started = datetime.utcnow()
+        since = self._synced_at - SYNC_OVERLAP if self._synced_at else None
+        if incremental and since:
+            new_papers = {"_id": {"$gt": ObjectId.from_datetime(since)}}
+        elif self._watermark_id:
+            new_papers = {"_id": {"$gt": ObjectId(self._watermark_id)}}
+        else:
+            new_papers = None
+
+        query: Dict[str, Any] = {}
+        if new_papers is not None:
+            query = {"$or": [new_papers, {"last_accessed": {"$gt": since}}]} if since else new_papers
+
+        projection = {"pmid": 1, "gs_id": 1, "title": 1, "abstract": 1, "mesh_headings": 1,
+                      "mesh_terms": 1, "year": 1, "publication_date": 1, "relevance_score": 1}
+        added = 0
+        batch: List[Dict[str, Any]] = []
+        async for paper in self.db.literature_papers.find(query, projection).sort("_id", 1):
+            batch.append(paper)
+            if len(batch) >= batch_size:
+                added += await self.index_documents(batch)
+                batch = []
+                await self.maybe_flush()
+        if batch:
+            added += await self.index_documents(batch)
+        await self.maybe_flush()
+
+        self._synced_at = started
+        self.ready = True
+        if added:
+            logger.info(f"Literature index caught up with {added} documents")
+        return added
+
+    async def sync(self) -> int:
+        """Pick up papers stored or re-stored by any process since the last catch-up"""
+        return await self.catch_up(incremental=True)
+
+    async def maybe_flush(self):
+        if self.delta.n_docs >= self.delta_flush_threshold:
+            await self.flush()
+
+    async def flush(self):
+        """Persist the delta segment and merge segments when there are too many
+
+        Segment writes run in the I/O thread pool; the lock keeps one flush/merge in flight.
+        Only the writer process persists; readers keep their delta until the next reload.
+        """
+
+        if not self.writer:
+            return
+        async with self._flush_lock:
+            if self.delta.n_docs == 0 and not self._flushing:
+                return
+
+            started = time.monotonic()
+            # New documents go to a fresh delta; the frozen one stays searchable until swapped out
+            if self.delta.n_docs:
+                self._flushing = self._flushing + [self.delta]
+                self.delta = _DeltaSegment()
+            frozen = self._flushing
+            watermark_id = self._pending_watermark_id or self._watermark_id
+
+            segment_id = f"seg_{self._next_segment:06d}"
+            self._next_segment += 1
+            try:
+                origins = await run_io(_compact_segment, self.index_dir / segment_id, frozen)
+                segment = await run_io(_Segment, segment_id, self.index_dir / segment_id)
+            except Exception as e:
+                # Frozen deltas stay searchable and are retried by the next flush
+                logger.error(f"Literature index flush failed: {str(e)}")
+                return
+
+            self._adopt(segment, origins)
+            self.segments = self.segments + [segment]
+            self._flushing = []
+            self._watermark_id = watermark_id
+
+            if len(self.segments) > self.max_segments:
+                try:
+                    await self._merge_segments()
+                except Exception as e:
+                    logger.error(f"Literature index merge failed: {str(e)}")
+            await run_io(self._write_manifest, self.segments, self._watermark_id)
+
+            metrics.increment("literature_index_flushes_total")
+            metrics.set_gauge("literature_index_last_flush_seconds", time.monotonic() - started)
+
+    async def _merge_segments(self):
+        """Merge every on-disk segment into one (dropping replaced documents) to bound per-query fan-out"""
+
+        old_segments = self.segments
+        segment_id = f"seg_{self._next_segment:06d}"
+        self._next_segment += 1
+        origins = await run_io(_compact_segment, self.index_dir / segment_id, old_segments)
+        merged = await run_io(_Segment, segment_id, self.index_dir / segment_id)
+
+        self._adopt(merged, origins)
+        self.segments = [merged]
+        self._recount_document_frequencies()
+        await run_io(self._write_manifest, self.segments, self._watermark_id)
+        for segment in old_segments:
+            await run_io(shutil.rmtree, segment.path, True)
+
+        metrics.increment("literature_index_merges_total")
+        logger.info(f"Literature index merged {len(old_segments)} segments into {segment_id} ({merged.n_docs} documents)")
+
+    # =============== UPDATES ===============
+
+    def _prepare_documents(self, papers: Iterable[Dict[str, Any]]) -> List[Tuple[str, int, Counter, Dict[str, Any]]]:
+        """Fingerprint and tokenize papers (read-only, so it can run off the event loop)"""
+
+        prepared = []
+        for paper in papers:
+            key = paper_key(paper)
+            if not key:
+                continue
+            fingerprint = _fingerprint(paper)
+            previous = self._locations.get(key)
+            if previous is not None and int(previous[0].doc_fingerprint[previous[1]]) == fingerprint:
+                continue
+            terms = _weighted_terms(paper)
+            if terms:
+                prepared.append((key, fingerprint, terms, paper))
+        return prepared
+
+    def _apply_documents(self, prepared: List[Tuple[str, int, Counter, Dict[str, Any]]]) -> int:
+        added = 0
+        replaced = 0
+        for key, fingerprint, terms, paper in prepared:
+            # Re-checked here: the same version may have been indexed while this batch was tokenized
+            previous = self._locations.get(key)
+            if previous is not None and int(previous[0].doc_fingerprint[previous[1]]) == fingerprint:
+                continue
+
+            if previous is not None:
+                # relevance_score is per-search and not refreshed on re-store; keep the indexed one
+                relevance = float(previous[0].doc_relevance[previous[1]])
+                self._retire(previous)
+                replaced += 1
+            else:
+                try:
+                    relevance = float(paper.get("relevance_score") or 0.0)
+                except (TypeError, ValueError):
+                    relevance = 0.0
+
+            delta = self.delta
+            self._locations[key] = (delta, delta.add(key, terms, _paper_year(paper), relevance, fingerprint))
+            self._df.update(terms.keys())
+            self._total_len += float(sum(terms.values()))
+            if paper.get("_id") is not None:
+                object_id = str(paper["_id"])
+                if self._pending_watermark_id is None or object_id > self._pending_watermark_id:
+                    self._pending_watermark_id = object_id
+            added += 1
+
+        if added:
+            metrics.increment("literature_index_documents_added_total", value=added)
+        if replaced:
+            metrics.increment("literature_index_documents_replaced_total", value=replaced)
+        return added
+
+    def add_documents(self, papers: Iterable[Dict[str, Any]]) -> int:
+        """Index unseen papers and re-index papers whose indexed fields changed
+
+        Only touches the in-memory delta; flushing is left to maybe_flush/flush.
+        Returns how many papers were (re)indexed.
+        """
+        return self._apply_documents(self._prepare_documents(papers))
+
+    async def index_documents(self, papers: Iterable[Dict[str, Any]]) -> int:
+        """add_documents with tokenization in the I/O thread pool; only the delta update runs on the loop"""
+        prepared = await run_io(self._prepare_documents, list(papers))
+        return self._apply_documents(prepared)
+
+    # =============== SEARCH ===============
+
+    @property
+    def document_count(self) -> int:
+        return len(self._locations)
+
+    def _idf(self, term: str, n_docs: int) -> float:
+        # Replaced documents keep counting in _df until a merge recounts it; clamped so a
+        # term in every live document never gets a negative idf
+        df = min(self._df.get(term, 0), n_docs)
+        return float(np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5)))
+
+    @staticmethod
+    def _filter_mask(year: np.ndarray, relevance: np.ndarray, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        mask = None
+        if filters.get("year_min"):
+            mask = year >= int(filters["year_min"])
+        if filters.get("year_max"):
+            condition = (year > 0) & (year <= int(filters["year_max"]))
+            mask = condition if mask is None else mask & condition
+        if filters.get("min_relevance_score") is not None:
+            condition = relevance >= float(filters["min_relevance_score"])
+            mask = condition if mask is None else mask & condition
+        return mask
+
+    def search(self, query: str, k: int = 20, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """Top-k (paper_key, bm25_score) for a free-text query
+
+        filters: year_min, year_max, min_relevance_score, exclude_keys
+        """
+
+        started = time.monotonic()
+        filters = filters or {}
+        query_terms = Counter(tokenize(query))
+        n_docs = self.document_count
+        if not query_terms or n_docs == 0:
+            return []
+
+        avgdl = self._total_len / n_docs if n_docs else 1.0
+        idf = {term: self._idf(term, n_docs) for term in query_terms}
+        exclude = set(filters.get("exclude_keys") or ())
+
+        candidates: List[Tuple[float, str]] = []
+        sources = [(segment, segment.postings, segment.doc_len, segment.doc_year, segment.doc_relevance, segment.doc_keys)
+                   for segment in self.segments]
+        for delta in self._flushing + [self.delta]:
+            if delta.n_docs:
+                sources.append((
+                    delta, delta.postings_for,
+                    np.asarray(delta.doc_len, dtype=np.float32),
+                    np.asarray(delta.doc_year, dtype=np.int16),
+                    np.asarray(delta.doc_relevance, dtype=np.float32),
+                    delta.doc_keys
+                ))
+
+        for source, postings_for, doc_len, doc_year, doc_relevance, doc_keys in sources:
+            scores = np.zeros(source.n_docs, dtype=np.float32)
+            for term, query_tf in query_terms.items():
+                postings = postings_for(term)
+                if postings is None:
+                    continue
+                docs, tfs = postings
+                lengths = doc_len[docs]
+                scores[docs] += query_tf * idf[term] * tfs * (BM25_K1 + 1) / (
+                    tfs + BM25_K1 * (1 - BM25_B + BM25_B * lengths / avgdl)
+                )
+
+            mask = self._filter_mask(doc_year, doc_relevance, filters)
+            if mask is not None:
+                scores = np.where(mask, scores, 0.0)
+            # Superseded versions of re-indexed papers
+            scores[np.asarray(source.dead, dtype=bool)] = 0.0
+
+            hits = np.flatnonzero(scores > 0)
+            if hits.size > k + len(exclude):
+                top = np.argpartition(scores[hits], -(k + len(exclude)))[-(k + len(exclude)):]
+                hits = hits[top]
+            candidates.extend((float(scores[i]), doc_keys[i]) for i in hits)
+
+        candidates.sort(reverse=True)
+        results = [(key, score) for score, key in candidates if key not in exclude][:k]
+
+        metrics.increment("literature_index_queries_total")
+        metrics.set_gauge("literature_index_last_query_seconds", time.monotonic() - started)
+        return results
+
+    async def search_documents(
+        self,
+        query: str,
+        k: int = 20,
+        filters: Optional[Dict[str, Any]] = None,
+        projection: Optional[Dict[str, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """search() hydrated with literature_papers documents in rank order"""
+
+        from bson import ObjectId
+
+        hits = self.search(query, k=k, filters=filters)
+        if not hits:
+            return []
+
+        pmids, gs_ids, object_ids = [], [], []
+        for key, _ in hits:
+            kind, _, value = key.partition(":")
+            if kind == "pmid":
+                pmids.append(value)
+            elif kind == "gs":
+                gs_ids.append(value)
+            elif ObjectId.is_valid(value):
+                object_ids.append(ObjectId(value))
+
+        clauses = []
+        if pmids:
+            clauses.append({"pmid": {"$in": pmids}})
+        if gs_ids:
+            clauses.append({"gs_id": {"$in": gs_ids}})
+        if object_ids:
+            clauses.append({"_id": {"$in": object_ids}})
+
+        if projection:
+            # Identity fields are needed to put documents back in rank order
+            projection = {**projection, "pmid": 1, "gs_id": 1}
+        documents = await self.db.literature_papers.find({"$or": clauses}, projection).to_list(len(hits) * 2)
+        by_key = {paper_key(doc): doc for doc in documents}
+
+        ranked = []
+        for key, score in hits:
+            doc = by_key.get(key)
+            if doc is not None:
+                doc["search_score"] = round(score, 4)
+                ranked.append(doc)
+        return ranked
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "writer": self.writer,
+            "documents": self.document_count,
+            "segments": len(self.segments),
+            "delta_documents": self.delta.n_docs,
+            "flushing_documents": sum(delta.n_docs for delta in self._flushing),
+            "vocabulary_size": len(self._df),
+            "index_dir": str(self.index_dir)
+        }
+
+
+_index: Optional[LiteratureIndex] = None
+_writer_lock = None
+_sync_task: Optional[asyncio.Task] = None
+
+
+def _index_dir(index_dir: Optional[str]) -> str:
+    return index_dir or os.environ.get("LITERATURE_INDEX_DIR", str(Path(__file__).parent / "data" / "literature_index"))
+
+
+def _create_index(db_client, index_dir: str) -> LiteratureIndex:
+    return LiteratureIndex(
+        db_client,
+        index_dir=index_dir,
+        delta_flush_threshold=int(os.environ.get("LITERATURE_INDEX_FLUSH_DOCS", "2000")),
+        max_segments=int(os.environ.get("LITERATURE_INDEX_MAX_SEGMENTS", "8")),
+        writer=_writer_lock is not None
+    )
+
+
+def configure_literature_index(db_client, index_dir: Optional[str] = None) -> LiteratureIndex:
+    """Create and load the process-wide literature index (the writer if no other worker is)"""
+    global _index, _writer_lock
+    index_dir = _index_dir(index_dir)
+    _writer_lock = _writer_lock or _acquire_writer_lock(Path(index_dir))
+    _index = _create_index(db_client, index_dir)
+    _index.load()
+    return _index
+
+
+def get_literature_index() -> Optional[LiteratureIndex]:
+    return _index
+
+
+async def index_literature_papers(papers: Iterable[Dict[str, Any]]) -> int:
+    """Incremental update hook for every path that stores (or re-stores) literature_papers"""
+    if _index is None:
+        return 0
+    try:
+        added = await _index.index_documents(papers)
+        await _index.maybe_flush()
+        return added
+    except Exception as e:
+        logger.error(f"Literature index update failed: {str(e)}")
+        return 0
+
+
+async def sync_literature_index() -> int:
+    """Catch up with papers other workers stored; readers reload after the writer publishes
+
+    A reader also takes over as writer once the previous writer process has exited.
+    """
+    global _index, _writer_lock
+    if _index is None:
+        return 0
+    if not _index.writer:
+        _writer_lock = await run_io(_acquire_writer_lock, _index.index_dir)
+        if _writer_lock is not None or await run_io(_index.manifest_changed):
+            fresh = _create_index(_index.db, str(_index.index_dir))
+            await run_io(fresh.load)
+            added = await fresh.catch_up()
+            _index = fresh
+            return added
+    return await _index.sync()
+
+
+async def _sync_loop(interval_seconds: float):
+    # The first catch-up may index the whole corpus (first boot, lost index directory);
+    # searches return nothing until it marks the index ready
+    try:
+        await _index.catch_up()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Literature index catch-up failed: {str(e)}")
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await sync_literature_index()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Literature index sync failed: {str(e)}")
+
+
+def start_literature_index_sync(interval_seconds: Optional[float] = None):
+    """Background catch-up, then periodic sync on the running event loop (LITERATURE_INDEX_SYNC_SECONDS, default 60)"""
+    global _sync_task
+    interval_seconds = interval_seconds or float(os.environ.get("LITERATURE_INDEX_SYNC_SECONDS", "60"))
+    if _sync_task is None or _sync_task.done():
+        _sync_task = asyncio.create_task(_sync_loop(interval_seconds))
+
+
+async def search_literature(
+    query: str,
+    k: int = 20,
+    filters: Optional[Dict[str, Any]] = None,
+    projection: Optional[Dict[str, int]] = None
+) -> List[Dict[str, Any]]:
+    """Ranked literature_papers documents for a query (empty until the index is ready)"""
+    if _index is None or not _index.ready:
+        return []
+    return await _index.search_documents(query, k=k, filters=filters, projection=projection)
+
+
+async def shutdown_literature_index():
+    """Stop syncing, flush the delta (writer only) and release the writer lock"""
+    global _sync_task, _writer_lock
+    if _sync_task is not None:
+        _sync_task.cancel()
+        await asyncio.gather(_sync_task, return_exceptions=True)
+        _sync_task = None
+    if _index is not None:
+        await _index.flush()
+    if _writer_lock is not None and _writer_lock is not True:
+        _writer_lock.close()
+    _writer_lock = None
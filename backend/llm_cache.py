@@ -0,0 +1,207 @@
+"""
+Content-Addressed LLM Response Cache for RegenMed AI Pro
+- Key: SHA-256 of (model, messages, temperature)
+- Tier 1: in-process LRU with per-entry expiry
+- Tier 2: MongoDB collection with a TTL index
+- Entries are tagged with patient_id so file/record changes invalidate them; memory hits on
+  patient-tagged entries are confirmed against Mongo, since the invalidating write may have
+  been handled by another worker process
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_COLLECTION = "llm_response_cache"
+
+
+class LLMResponseCache:
+    """Two-tier (LRU + Mongo TTL) cache for chat completion responses"""
+
+    def __init__(self, db_client, max_memory_entries: int = 512, ttl_seconds: int = 7 * 24 * 3600):
+        self.db = db_client
+        self.max_memory_entries = max_memory_entries
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (expires_at_monotonic, response, patient_id)
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any], Optional[str]]]" = OrderedDict()
+        self._patient_keys: Dict[str, Set[str]] = {}
+
+        self.stats = {
+            "memory_hits": 0,
+            "mongo_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+
+    @staticmethod
+    def build_key(model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+        """Content address for a chat request"""
+        canonical = json.dumps(
+            {"model": model, "messages": messages, "temperature": round(float(temperature), 4)},
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @property
+    def collection(self):
+        return self.db[CACHE_COLLECTION]
+
+    def _remember(self, key: str, response: Dict[str, Any], patient_id: Optional[str], ttl_seconds: float):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+        self._memory[key] = (time.monotonic() + ttl_seconds, response, patient_id)
+        if patient_id:
+            self._patient_keys.setdefault(patient_id, set()).add(key)
+
+        while len(self._memory) > self.max_memory_entries:
+            evicted_key, (_, _, evicted_patient) = self._memory.popitem(last=False)
+            if evicted_patient and evicted_patient in self._patient_keys:
+                self._patient_keys[evicted_patient].discard(evicted_key)
+            self.stats["evictions"] += 1
+
+    def _forget(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry and entry[2] and entry[2] in self._patient_keys:
+            self._patient_keys[entry[2]].discard(key)
+
+    async def _persisted(self, key: str) -> bool:
+        """Whether the Mongo entry still exists (invalidation deletes it in every process's view)"""
+        try:
+            return await self.collection.count_documents({"_id": key}, limit=1) > 0
+        except Exception as e:
+            logger.warning(f"LLM cache confirmation failed: {str(e)}")
+            return False
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached response, promoting Mongo hits into the LRU tier"""
+
+        entry = self._memory.get(key)
+        if entry:
+            expires_at, response, patient_id = entry
+            if expires_at > time.monotonic() and (not patient_id or await self._persisted(key)):
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                metrics.increment("llm_cache_hits_total", tier="memory")
+                return response
+            self._forget(key)
+
+        try:
+            doc = await self.collection.find_one({"_id": key})
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {str(e)}")
+            doc = None
+
+        if doc and doc.get("expires_at", datetime.min) > datetime.utcnow():
+            remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+            self._remember(key, doc["response"], doc.get("patient_id"), remaining)
+            self.stats["mongo_hits"] += 1
+            metrics.increment("llm_cache_hits_total", tier="mongo")
+            return doc["response"]
+
+        self.stats["misses"] += 1
+        metrics.increment("llm_cache_misses_total")
+        return None
+
+    async def set(
+        self,
+        key: str,
+        response: Dict[str, Any],
+        patient_id: Optional[str] = None,
+        model: Optional[str] = None,
+        ttl_seconds: Optional[int] = None
+    ):
+        """Store a response in both tiers"""
+
+        ttl = ttl_seconds or self.ttl_seconds
+        self._remember(key, response, patient_id, ttl)
+        self.stats["stores"] += 1
+
+        try:
+            now = datetime.utcnow()
+            await self.collection.replace_one(
+                {"_id": key},
+                {
+                    "_id": key,
+                    "response": response,
+                    "patient_id": patient_id,
+                    "model": model,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=ttl)
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"LLM cache store failed: {str(e)}")
+
+    async def invalidate_patient(self, patient_id: str) -> int:
+        """Drop every cached response derived from a patient's record or files"""
+
+        if not patient_id:
+            return 0
+
+        for key in list(self._patient_keys.pop(patient_id, set())):
+            self._memory.pop(key, None)
+
+        deleted = 0
+        try:
+            result = await self.collection.delete_many({"patient_id": patient_id})
+            deleted = result.deleted_count
+        except Exception as e:
+            logger.warning(f"LLM cache invalidation failed for patient {patient_id}: {str(e)}")
+
+        self.stats["invalidations"] += 1
+        metrics.increment("llm_cache_invalidations_total")
+        return deleted
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes for capacity planning"""
+
+        hits = self.stats["memory_hits"] + self.stats["mongo_hits"]
+        lookups = hits + self.stats["misses"]
+        try:
+            persisted_entries = await self.collection.estimated_document_count()
+        except Exception:
+            persisted_entries = None
+
+        return {
+            **self.stats,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_capacity": self.max_memory_entries,
+            "persisted_entries": persisted_entries,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+_cache: Optional[LLMResponseCache] = None
+
+
+def configure_llm_cache(db_client, max_memory_entries: int = 512, ttl_seconds: int = 7 * 24 * 3600) -> LLMResponseCache:
+    """Create the process-wide cache bound to the application database"""
+    global _cache
+    _cache = LLMResponseCache(db_client, max_memory_entries=max_memory_entries, ttl_seconds=ttl_seconds)
+    return _cache
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    return _cache
+
+
+async def invalidate_patient_llm_cache(patient_id: str) -> int:
+    """Convenience hook for write paths that change a patient's record or files"""
+    if _cache is None:
+        return 0
+    return await _cache.invalidate_patient(patient_id)
@@ -0,0 +1,514 @@
+"""
+Shared LLM Gateway for RegenMed AI Pro
+- One pooled, keep-alive (HTTP/2 when available) client for every OpenAI call
+- Per-model concurrency limits
+- Retries with exponential backoff and full jitter
+- Per-model circuit breaker so degraded providers fail fast into fallbacks
+- Token-delta streaming for server-sent-event endpoints
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from metrics import metrics
+from llm_cache import LLMResponseCache, get_llm_cache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (presence enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+    logging.warning("h2 not available - LLM gateway will use pooled HTTP/1.1 connections")
+
+DEFAULT_OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+# Status codes worth retrying: rate limiting and transient provider failures
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMGatewayError(Exception):
+    """Raised when an LLM request fails after retries or with a non-retryable error"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(LLMGatewayError):
+    """Raised immediately while a model's circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open probe"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    def is_open(self) -> bool:
+        """Open and still cooling down (cheap pre-check that never takes the probe)"""
+        return self.state == self.OPEN and time.monotonic() - (self.opened_at or 0.0) < self.reset_timeout
+
+    def allow_request(self) -> bool:
+        """Return True if a request may be sent to the provider
+
+        In half-open state the single caller let through holds the probe and must
+        end it with record_success, record_failure or release_probe.
+        """
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if time.monotonic() - (self.opened_at or 0.0) >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            else:
+                return False
+
+        # Half-open: let exactly one probe through
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def release_probe(self) -> None:
+        """End a half-open probe that finished without a health verdict (cancelled, client gone)"""
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    f"LLM circuit breaker opened after {self.consecutive_failures} consecutive failures"
+                )
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "seconds_until_probe": max(
+                0.0, self.reset_timeout - (time.monotonic() - self.opened_at)
+            ) if self.state == self.OPEN and self.opened_at else 0.0
+        }
+
+
+class LLMGateway:
+    """App-wide gateway for OpenAI chat completions"""
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: str = DEFAULT_OPENAI_BASE_URL,
+        max_concurrency_per_model: int = 8,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        timeout: float = 60.0,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 20,
+        circuit_failure_threshold: int = 5,
+        circuit_reset_timeout: float = 30.0
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency_per_model = max_concurrency_per_model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.circuit_failure_threshold = circuit_failure_threshold
+        self.circuit_reset_timeout = circuit_reset_timeout
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Lazily create the pooled client inside the running event loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=120.0
+                )
+            )
+        return self._client
+
+    def _get_semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(self.max_concurrency_per_model)
+        return self._semaphores[model]
+
+    def _get_breaker(self, model: str) -> CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker(
+                failure_threshold=self.circuit_failure_threshold,
+                reset_timeout=self.circuit_reset_timeout
+            )
+        return self._breakers[model]
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Exponential backoff with full jitter, honouring Retry-After when present"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def _headers(self, api_key: Optional[str]) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {api_key or self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def _admit(self, breaker: CircuitBreaker, model: str) -> bool:
+        """Breaker check once a concurrency slot is held; returns True when this call is the half-open probe
+
+        Checked after the semaphore so callers queued while the circuit opened fail fast
+        instead of all hitting the provider, and so no probe is held while merely queued.
+        """
+        if not breaker.allow_request():
+            metrics.increment("llm_circuit_rejections_total", model=model)
+            raise CircuitOpenError(f"LLM circuit open for model {model}")
+        return breaker.state == CircuitBreaker.HALF_OPEN
+
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4",
+        temperature: float = 0.2,
+        max_tokens: int = 4000,
+        timeout: Optional[float] = None,
+        api_key: Optional[str] = None,
+        use_cache: bool = False,
+        cache_patient_id: Optional[str] = None,
+        **extra_params
+    ) -> Dict[str, Any]:
+        """Send a chat completion and return the parsed OpenAI response body
+
+        With use_cache=True the response is served from / stored in the
+        content-addressed LLM cache; cache_patient_id tags the entry so that
+        patient record or file changes invalidate it.
+        """
+
+        response_cache = get_llm_cache() if use_cache else None
+        cache_key = None
+        if response_cache is not None:
+            cache_key = LLMResponseCache.build_key(model, messages, temperature)
+            cached_response = await response_cache.get(cache_key)
+            if cached_response is not None:
+                return cached_response
+
+        ai_response = await self._send_chat_completion(
+            messages, model, temperature, max_tokens, timeout, api_key, **extra_params
+        )
+
+        if response_cache is not None:
+            await response_cache.set(cache_key, ai_response, patient_id=cache_patient_id, model=model)
+        return ai_response
+
+    async def _send_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        timeout: Optional[float],
+        api_key: Optional[str],
+        **extra_params
+    ) -> Dict[str, Any]:
+        """Rate-limited, retried, circuit-broken POST to /chat/completions"""
+
+        breaker = self._get_breaker(model)
+        if breaker.is_open():
+            metrics.increment("llm_circuit_rejections_total", model=model)
+            raise CircuitOpenError(f"LLM circuit open for model {model}")
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            **extra_params
+        }
+
+        semaphore = self._get_semaphore(model)
+        last_error: Optional[LLMGatewayError] = None
+
+        async with semaphore:
+            is_probe = self._admit(breaker, model)
+            self._in_flight[model] = self._in_flight.get(model, 0) + 1
+            metrics.set_gauge("llm_in_flight_requests", self._in_flight[model], model=model)
+            try:
+                for attempt in range(self.max_retries + 1):
+                    started = time.monotonic()
+                    retry_after = None
+                    try:
+                        response = await self._get_client().post(
+                            f"{self.base_url}/chat/completions",
+                            headers=self._headers(api_key),
+                            json=payload,
+                            timeout=timeout or self.timeout
+                        )
+                        metrics.increment("llm_requests_total", model=model, status=response.status_code)
+                        metrics.record_throughput("llm_request_seconds", 1, time.monotonic() - started, model=model)
+
+                        if response.status_code == 200:
+                            breaker.record_success()
+                            return response.json()
+
+                        last_error = LLMGatewayError(
+                            f"OpenAI API error: {response.status_code} - {response.text[:500]}",
+                            status_code=response.status_code
+                        )
+                        if response.status_code not in RETRYABLE_STATUS_CODES:
+                            # Client errors are not a provider health signal
+                            breaker.record_success()
+                            raise last_error
+                        retry_after = response.headers.get("retry-after")
+
+                    except httpx.TransportError as e:
+                        metrics.increment("llm_transport_errors_total", model=model)
+                        last_error = LLMGatewayError(f"OpenAI transport error: {type(e).__name__}: {str(e)}")
+
+                    breaker.record_failure()
+                    if breaker.state == CircuitBreaker.OPEN or attempt >= self.max_retries:
+                        break
+
+                    delay = self._backoff_delay(attempt, retry_after)
+                    metrics.increment("llm_retries_total", model=model)
+                    logger.warning(f"LLM request failed ({last_error}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+
+            finally:
+                if is_probe:
+                    breaker.release_probe()
+                self._in_flight[model] -= 1
+                metrics.set_gauge("llm_in_flight_requests", self._in_flight[model], model=model)
+
+        metrics.increment("llm_failures_total", model=model)
+        raise last_error or LLMGatewayError("LLM request failed")
+
+    async def complete(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Convenience wrapper returning only the first choice's message content"""
+        ai_response = await self.chat_completion(messages, **kwargs)
+        return ai_response['choices'][0]['message']['content']
+
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4",
+        temperature: float = 0.2,
+        max_tokens: int = 4000,
+        timeout: Optional[float] = None,
+        api_key: Optional[str] = None,
+        use_cache: bool = False,
+        cache_patient_id: Optional[str] = None,
+        **extra_params
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion, yielding content deltas as they arrive
+
+        Retries are only attempted before the first token is received; a
+        failure mid-stream raises LLMGatewayError. Completed streams are stored
+        in the response cache under the same key as chat_completion, and cache
+        hits are replayed as a single delta.
+        """
+
+        response_cache = get_llm_cache() if use_cache else None
+        cache_key = None
+        if response_cache is not None:
+            cache_key = LLMResponseCache.build_key(model, messages, temperature)
+            cached_response = await response_cache.get(cache_key)
+            if cached_response is not None:
+                yield cached_response['choices'][0]['message']['content']
+                return
+
+        breaker = self._get_breaker(model)
+        if breaker.is_open():
+            metrics.increment("llm_circuit_rejections_total", model=model)
+            raise CircuitOpenError(f"LLM circuit open for model {model}")
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+            **extra_params
+        }
+
+        content_parts: List[str] = []
+        last_error: Optional[LLMGatewayError] = None
+        completed = False
+
+        async with self._get_semaphore(model):
+            is_probe = self._admit(breaker, model)
+            self._in_flight[model] = self._in_flight.get(model, 0) + 1
+            metrics.set_gauge("llm_in_flight_requests", self._in_flight[model], model=model)
+            try:
+                for attempt in range(self.max_retries + 1):
+                    retry_after = None
+                    try:
+                        async with self._get_client().stream(
+                            "POST",
+                            f"{self.base_url}/chat/completions",
+                            headers=self._headers(api_key),
+                            json=payload,
+                            timeout=timeout or self.timeout
+                        ) as response:
+                            metrics.increment("llm_requests_total", model=model, status=response.status_code)
+
+                            if response.status_code == 200:
+                                async for line in response.aiter_lines():
+                                    if not line.startswith("data:"):
+                                        continue
+                                    data = line[len("data:"):].strip()
+                                    if data == "[DONE]":
+                                        break
+                                    try:
+                                        chunk = json.loads(data)
+                                    except json.JSONDecodeError:
+                                        continue
+                                    choices = chunk.get("choices") or [{}]
+                                    delta = choices[0].get("delta", {}).get("content")
+                                    if delta:
+                                        content_parts.append(delta)
+                                        yield delta
+                                breaker.record_success()
+                                completed = True
+                                break
+
+                            body = (await response.aread()).decode("utf-8", errors="ignore")
+                            last_error = LLMGatewayError(
+                                f"OpenAI API error: {response.status_code} - {body[:500]}",
+                                status_code=response.status_code
+                            )
+                            if response.status_code not in RETRYABLE_STATUS_CODES:
+                                breaker.record_success()
+                                raise last_error
+                            retry_after = response.headers.get("retry-after")
+
+                    except httpx.TransportError as e:
+                        metrics.increment("llm_transport_errors_total", model=model)
+                        last_error = LLMGatewayError(f"OpenAI transport error: {type(e).__name__}: {str(e)}")
+                        if content_parts:
+                            # Tokens were already relayed to the client - cannot replay transparently
+                            breaker.record_failure()
+                            raise last_error
+
+                    breaker.record_failure()
+                    if breaker.state == CircuitBreaker.OPEN or attempt >= self.max_retries:
+                        break
+
+                    delay = self._backoff_delay(attempt, retry_after)
+                    metrics.increment("llm_retries_total", model=model)
+                    logger.warning(f"LLM stream failed to start ({last_error}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+
+            finally:
+                # Also reached on GeneratorExit when the SSE client disconnects mid-stream
+                if is_probe:
+                    breaker.release_probe()
+                self._in_flight[model] -= 1
+                metrics.set_gauge("llm_in_flight_requests", self._in_flight[model], model=model)
+
+        if not completed:
+            metrics.increment("llm_failures_total", model=model)
+            raise last_error or LLMGatewayError("LLM stream failed")
+
+        if response_cache is not None and content_parts:
+            await response_cache.set(
+                cache_key,
+                {"choices": [{"message": {"role": "assistant", "content": "".join(content_parts)}}]},
+                patient_id=cache_patient_id,
+                model=model
+            )
+
+    def get_status(self) -> Dict[str, Any]:
+        """Gateway configuration and per-model breaker/concurrency state"""
+        return {
+            "http2_enabled": HTTP2_AVAILABLE,
+            "pool_open": self._client is not None and not self._client.is_closed,
+            "max_concurrency_per_model": self.max_concurrency_per_model,
+            "max_retries": self.max_retries,
+            "models": {
+                model: {
+                    "in_flight": self._in_flight.get(model, 0),
+                    "circuit_breaker": breaker.get_status()
+                }
+                for model, breaker in self._breakers.items()
+            }
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def configure_llm_gateway(api_key: Optional[str], base_url: str = DEFAULT_OPENAI_BASE_URL) -> LLMGateway:
+    """(Re)configure the process-wide gateway from environment tuning knobs"""
+    global _gateway
+    _gateway = LLMGateway(
+        api_key=api_key,
+        base_url=base_url,
+        max_concurrency_per_model=int(os.environ.get("LLM_MAX_CONCURRENCY_PER_MODEL", "8")),
+        max_retries=int(os.environ.get("LLM_MAX_RETRIES", "3")),
+        timeout=float(os.environ.get("LLM_TIMEOUT_SECONDS", "60")),
+        circuit_failure_threshold=int(os.environ.get("LLM_CIRCUIT_FAILURE_THRESHOLD", "5")),
+        circuit_reset_timeout=float(os.environ.get("LLM_CIRCUIT_RESET_SECONDS", "30"))
+    )
+    return _gateway
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Return the shared gateway, creating it from OPENAI_API_KEY on first use"""
+    if _gateway is None:
+        configure_llm_gateway(os.environ.get("OPENAI_API_KEY"))
+    return _gateway
+
+
+async def shutdown_llm_gateway() -> None:
+    global _gateway
+    if _gateway is not None:
+        await _gateway.aclose()
+        _gateway = None
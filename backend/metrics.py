@@ -0,0 +1,90 @@
+"""
+Lightweight In-Process Metrics Registry for RegenMed AI Pro
+Counters and gauges shared by the performance infrastructure (LLM gateway,
+caches, ingestion pipelines) and exposed through /api/system/metrics
+"""
+
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+
+def _metric_key(name: str, labels: Dict[str, Any]) -> str:
+    """Build a flat, Prometheus-style metric key such as llm_requests_total{model=gpt-4}"""
+    if not labels:
+        return name
+    label_str = ",".join(f"{key}={labels[key]}" for key in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and throughput meters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._rates: Dict[str, Tuple[float, float]] = {}  # key -> (units, seconds)
+        self._started_at = time.time()
+
+    def increment(self, name: str, value: float = 1.0, **labels) -> None:
+        """Increment a monotonically increasing counter"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Set a point-in-time gauge value"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._gauges[key] = float(value)
+
+    def adjust_gauge(self, name: str, delta: float, **labels) -> None:
+        """Add a delta to a gauge (e.g. in-flight requests)"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + delta
+
+    def record_throughput(self, name: str, units: float, seconds: float, **labels) -> None:
+        """Accumulate units processed over elapsed seconds for a units/second meter"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            total_units, total_seconds = self._rates.get(key, (0.0, 0.0))
+            self._rates[key] = (total_units + units, total_seconds + max(seconds, 0.0))
+            if seconds > 0:
+                self._gauges[f"{key}_last_per_second"] = units / seconds
+
+    def get_counter(self, name: str, **labels) -> float:
+        """Read back a single counter value"""
+        with self._lock:
+            return self._counters.get(_metric_key(name, labels), 0.0)
+
+    def snapshot(self, prefix: Optional[str] = None) -> Dict[str, Any]:
+        """Return a copy of all metrics, optionally filtered by name prefix"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            rates = {
+                key: {
+                    "total_units": units,
+                    "total_seconds": seconds,
+                    "average_per_second": units / seconds if seconds > 0 else 0.0
+                }
+                for key, (units, seconds) in self._rates.items()
+            }
+
+        if prefix:
+            counters = {k: v for k, v in counters.items() if k.startswith(prefix)}
+            gauges = {k: v for k, v in gauges.items() if k.startswith(prefix)}
+            rates = {k: v for k, v in rates.items() if k.startswith(prefix)}
+
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "throughput": rates,
+            "uptime_seconds": time.time() - self._started_at
+        }
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
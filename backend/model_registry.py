@@ -0,0 +1,211 @@
+"""
+Versioned Model Registry for Outcome Prediction
+- Fitted estimators (model + scaler) serialized with joblib to local disk
+- Per-version manifest: feature schema, training data hash, metrics, library versions
+- CURRENT pointer per model, swapped atomically so readers never see a partial write
+- Models are loaded on demand; training only happens through an explicit retrain
+    python model_registry.py --list
+    python model_registry.py --retrain [--model success_predictor]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_DIR = Path(__file__).parent / "data" / "model_registry"
+
+ARTIFACT_FILE = "model.joblib"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+
+class ModelNotFoundError(LookupError):
+    """No registered version exists for the requested model"""
+
+
+def hash_training_data(*arrays: np.ndarray) -> str:
+    """Stable SHA-256 over the training arrays (dtype, shape and bytes)"""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.dtype).encode("utf-8"))
+        digest.update(str(array.shape).encode("utf-8"))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def _library_versions() -> Dict[str, str]:
+    versions = {"numpy": np.__version__, "joblib": joblib.__version__}
+    try:
+        import sklearn
+        versions["scikit-learn"] = sklearn.__version__
+    except ImportError:
+        pass
+    return versions
+
+
+def _write_atomic(path: Path, content: str):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    with os.fdopen(fd, "w") as handle:
+        handle.write(content)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """Local-disk registry of versioned, joblib-serialized models"""
+
+    def __init__(self, root_dir: Path = DEFAULT_REGISTRY_DIR):
+        self.root_dir = Path(root_dir)
+
+    def _model_dir(self, name: str) -> Path:
+        return self.root_dir / name
+
+    def save(
+        self,
+        name: str,
+        artifact: Dict[str, Any],
+        feature_schema: List[str],
+        training_data_hash: str,
+        model_metrics: Dict[str, Any],
+        activate: bool = True
+    ) -> Dict[str, Any]:
+        """Persist a fitted artifact as a new version and (by default) make it current"""
+
+        created_at = datetime.utcnow()
+        version = f"{created_at.strftime('%Y%m%d%H%M%S')}-{training_data_hash[:8]}"
+        if (self._model_dir(name) / version).exists():
+            version = f"{version}-{created_at.microsecond:06d}"
+        manifest = {
+            "name": name,
+            "version": version,
+            "model_type": type(artifact.get("model")).__name__,
+            "feature_schema": list(feature_schema),
+            "training_data_hash": training_data_hash,
+            "metrics": {key: float(value) for key, value in model_metrics.items()},
+            "libraries": _library_versions(),
+            "created_at": created_at.isoformat()
+        }
+
+        model_dir = self._model_dir(name)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        # Build the version in a temp dir and rename it into place
+        staging = Path(tempfile.mkdtemp(dir=model_dir, prefix=".staging-"))
+        try:
+            joblib.dump(artifact, staging / ARTIFACT_FILE, compress=3)
+            (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+            os.replace(staging, model_dir / version)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(name, version)
+        metrics.increment("model_registry_saves_total", model=name)
+        logger.info(f"Registered {name} version {version}")
+        return manifest
+
+    def activate(self, name: str, version: str):
+        if not (self._model_dir(name) / version / ARTIFACT_FILE).exists():
+            raise ModelNotFoundError(f"{name} has no version {version}")
+        _write_atomic(self._model_dir(name) / CURRENT_FILE, version)
+
+    def current_version(self, name: str) -> Optional[str]:
+        pointer = self._model_dir(name) / CURRENT_FILE
+        if not pointer.exists():
+            return None
+        return pointer.read_text().strip() or None
+
+    def get_manifest(self, name: str, version: Optional[str] = None) -> Dict[str, Any]:
+        version = version or self.current_version(name)
+        manifest_path = self._model_dir(name) / (version or "") / MANIFEST_FILE
+        if not version or not manifest_path.exists():
+            raise ModelNotFoundError(f"No registered version of {name}")
+        return json.loads(manifest_path.read_text())
+
+    def load(self, name: str, version: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Return (artifact, manifest) for the given or current version (blocking I/O)"""
+        manifest = self.get_manifest(name, version)
+        artifact = joblib.load(self._model_dir(name) / manifest["version"] / ARTIFACT_FILE)
+        metrics.increment("model_registry_loads_total", model=name)
+        return artifact, manifest
+
+    def list_versions(self, name: str) -> List[str]:
+        model_dir = self._model_dir(name)
+        if not model_dir.exists():
+            return []
+        return sorted(
+            entry.name for entry in model_dir.iterdir()
+            if entry.is_dir() and not entry.name.startswith(".")
+        )
+
+    def list_models(self) -> Dict[str, Any]:
+        models = {}
+        if self.root_dir.exists():
+            for entry in sorted(self.root_dir.iterdir()):
+                if entry.is_dir():
+                    models[entry.name] = {
+                        "current_version": self.current_version(entry.name),
+                        "versions": self.list_versions(entry.name)
+                    }
+        return models
+
+
+_registry: Optional[ModelRegistry] = None
+
+
+def configure_model_registry(root_dir: Optional[str] = None) -> ModelRegistry:
+    global _registry
+    _registry = ModelRegistry(Path(root_dir or os.environ.get("MODEL_REGISTRY_DIR", str(DEFAULT_REGISTRY_DIR))))
+    return _registry
+
+
+def get_model_registry() -> ModelRegistry:
+    if _registry is None:
+        return configure_model_registry()
+    return _registry
+
+
+async def _retrain_cli(model_names: Optional[List[str]]) -> Dict[str, Any]:
+    # Heavy imports only when actually retraining
+    from advanced_services import OutcomePredictionService
+    return await OutcomePredictionService(db_client=None).retrain_models(model_names)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inspect or retrain registered prediction models")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--list", action="store_true", help="List registered models and versions (default)")
+    mode.add_argument("--retrain", action="store_true", help="Retrain and register new model versions")
+    parser.add_argument("--model", action="append", help="Limit --retrain to a model; repeatable")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.retrain:
+        result = asyncio.run(_retrain_cli(args.model))
+    else:
+        registry = get_model_registry()
+        result = {
+            name: {**info, "manifest": registry.get_manifest(name) if info["current_version"] else None}
+            for name, info in registry.list_models().items()
+        }
+    print(json.dumps(result, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
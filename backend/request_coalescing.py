@@ -0,0 +1,103 @@
+"""
+Single-Flight Request Coalescing for RegenMed AI Pro
+Concurrent identical AI operations (double-clicks, frontend retries) share one
+in-flight execution keyed by (operation, patient_id, content hash).
+"""
+
+import asyncio
+import copy
+import functools
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CoalescingKey = Tuple[str, Optional[str], str]
+
+
+def content_hash(*parts: Any) -> str:
+    """Stable SHA-256 over arbitrary JSON-able (or str()-able) request content"""
+
+    def _normalize(value: Any) -> Any:
+        if hasattr(value, "dict") and callable(value.dict):
+            return value.dict()
+        return value
+
+    canonical = json.dumps(
+        [_normalize(part) for part in parts],
+        sort_keys=True,
+        default=str,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Process-wide registry of in-flight operations"""
+
+    def __init__(self):
+        self._in_flight: Dict[CoalescingKey, asyncio.Task] = {}
+
+    async def run(self, key: CoalescingKey, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run factory() once per key; concurrent callers await the same task
+
+        The shared work runs as its own task and callers await it through
+        asyncio.shield, so a leader whose HTTP request is cancelled does not
+        cancel the result its followers are waiting on.
+        """
+
+        task = self._in_flight.get(key)
+        if task is not None and not task.done():
+            metrics.increment("coalesced_requests_total", operation=key[0])
+            logger.info(f"Coalescing concurrent '{key[0]}' request for patient {key[1]}")
+            result = await asyncio.shield(task)
+            # Followers get their own copy so caller-side mutation can't leak
+            return copy.deepcopy(result)
+
+        task = asyncio.ensure_future(factory())
+        self._in_flight[key] = task
+        metrics.increment("coalescing_leaders_total", operation=key[0])
+
+        def _release(finished: asyncio.Task, registered_key: CoalescingKey = key):
+            if self._in_flight.get(registered_key) is finished:
+                del self._in_flight[registered_key]
+
+        task.add_done_callback(_release)
+        return await asyncio.shield(task)
+
+    def get_status(self) -> Dict[str, Any]:
+        operations: Dict[str, int] = {}
+        for operation, _, _ in self._in_flight:
+            operations[operation] = operations.get(operation, 0) + 1
+        return {"in_flight": len(self._in_flight), "by_operation": operations}
+
+
+single_flight = SingleFlight()
+
+
+def coalesce(operation: str, key_builder: Callable[..., Tuple[Optional[str], Any]]):
+    """Decorator for async methods whose concurrent identical calls should be merged
+
+    key_builder receives the same arguments as the wrapped function and returns
+    (patient_id, content); the content is hashed into the coalescing key.
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                patient_id, content = key_builder(*args, **kwargs)
+                key = (operation, patient_id, content_hash(content))
+            except Exception as e:
+                logger.warning(f"Coalescing key build failed for {operation}: {str(e)}")
+                return await func(*args, **kwargs)
+
+            return await single_flight.run(key, lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
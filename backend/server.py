@@ -1,18 +1,21 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, UploadFile, File, Form, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, UploadFile, File, Form, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 import json
+import re
 import asyncio
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Union, AsyncIterator, Tuple
 import uuid
 from datetime import datetime, timedelta
-import httpx
 import base64
 import hashlib
 from enum import Enum
@@ -37,6 +40,32 @@ from file_processing import (
     FileUpload,
     ProcessedFileData
 )
+from llm_gateway import (
+    get_llm_gateway,
+    configure_llm_gateway,
+    shutdown_llm_gateway,
+    LLMGatewayError,
+    CircuitOpenError
+)
+from llm_cache import configure_llm_cache, get_llm_cache, invalidate_patient_llm_cache
+from metrics import metrics
+from request_coalescing import coalesce, single_flight
+from sse_streaming import SSE_HEADERS, format_sse, IncrementalJSONArrayParser
+from job_queue import configure_job_queue, get_job_queue, TERMINAL_STATES
+from upload_storage import configure_upload_storage, get_upload_storage
+from executors import configure_executors, get_executors, shutdown_executors, run_io
+from dicom_study import StudyIngestion
+from image_pyramid import PYRAMID_LEVELS, DEFAULT_PRESET, delete_previews, get_preview, list_previews
+from eutils_client import configure_eutils_client, get_eutils_client, shutdown_eutils_client, MAX_HISTORY_RECORDS
+from model_registry import configure_model_registry, get_model_registry
+from monte_carlo import MAX_SIMULATIONS
+from diagnosis_kb import get_diagnosis_kb, reload_diagnosis_kb, configure_diagnosis_kb, start_diagnosis_kb_watcher, stop_diagnosis_kb_watcher
+from db_indexes import ensure_indexes as ensure_db_indexes, audit_indexes
+from dashboard_rollups import (
+    record_patient_created, record_protocol_created, record_protocol_status_change, record_outcome,
+    get_practitioner_rollup, rollup_average, reconcile_practitioner_rollups
+)
+from literature_index import configure_literature_index, get_literature_index, search_literature, start_literature_index_sync, shutdown_literature_index
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -50,6 +79,12 @@ db = client[os.environ['DB_NAME']]
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 OPENAI_BASE_URL = "https://api.openai.com/v1"
 
+# Shared pooled LLM gateway (keep-alive connections, per-model limits, circuit breaker)
+configure_llm_gateway(OPENAI_API_KEY, OPENAI_BASE_URL)
+
+# Shared rate-limited NCBI E-utilities client (NCBI_API_KEY / NCBI_TOOL / NCBI_EMAIL)
+configure_eutils_client()
+
 # Security
 security = HTTPBearer()
 
@@ -184,6 +219,33 @@ class EvidencePaper(BaseModel):
 
 # Advanced AI Engine for Regenerative Medicine
 class RegenerativeMedicineAI:
+    ANALYSIS_SYSTEM_PROMPT = """You are the world's leading AI expert in regenerative medicine with 25+ years of clinical experience. You specialize in:
+
+- Differential diagnosis for regenerative medicine conditions
+- Multi-modal data integration (labs, genetics, imaging, clinical)
+- Outcome prediction with confidence intervals
+- Mechanism-based therapy selection
+- Risk stratification and personalized treatment planning
+
+Your expertise includes stem cells, PRP, BMAC, Wharton's jelly, MSC exosomes, cord blood therapies, and cutting-edge biologics.
+
+Always provide comprehensive differential diagnosis with probability rankings, integrate all available data sources, and give evidence-based confidence scores.
+
+Format all responses as valid JSON with detailed reasoning."""
+
+    PROTOCOL_SYSTEM_PROMPT = """You are the world's most advanced regenerative medicine protocol generator. You have complete knowledge of:
+
+- All regenerative therapies: PRP, BMAC, Wharton's jelly MSCs, umbilical cord MSCs, placental MSCs, cord blood, exosomes
+- Global regulatory status and legal frameworks
+- Evidence-based dosing, timing, and delivery methods
+- Synergistic combinations and contraindications
+- Expected outcomes and realistic timelines
+- Cost-effectiveness analysis
+
+Generate detailed, actionable protocols that practitioners can implement immediately. Include specific dosages, timing, delivery methods, and monitoring parameters.
+
+Always format responses as valid JSON with complete protocol details."""
+
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.base_url = OPENAI_BASE_URL
@@ -239,86 +301,42 @@ class RegenerativeMedicineAI:
             )
         }
 
+    @coalesce("analyze_patient_data", lambda self, patient_data: (patient_data.patient_id, patient_data))
     async def analyze_patient_data(self, patient_data: PatientData) -> List[DiagnosticResult]:
         """Comprehensive multi-modal patient analysis with differential diagnosis"""
         
+        uploaded_files = {}
         try:
             # Get uploaded files for multi-modal integration
-            uploaded_files = {}
-            if file_processor:
-                try:
-                    file_summary = await file_processor.get_patient_file_summary(patient_data.patient_id)
-                    uploaded_files = file_summary.get("files_by_category", {})
-                except Exception as e:
-                    logging.warning(f"File summary retrieval failed: {str(e)}")
+            uploaded_files = await self._get_uploaded_files_by_category(patient_data.patient_id)
             
             # Build enhanced analysis prompt with multi-modal data
             analysis_prompt = self._build_enhanced_analysis_prompt(patient_data, uploaded_files)
             
-            # Generate comprehensive AI analysis
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "gpt-4",
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": """You are the world's leading AI expert in regenerative medicine with 25+ years of clinical experience. You specialize in:
-
-- Differential diagnosis for regenerative medicine conditions
-- Multi-modal data integration (labs, genetics, imaging, clinical)
-- Outcome prediction with confidence intervals
-- Mechanism-based therapy selection
-- Risk stratification and personalized treatment planning
-
-Your expertise includes stem cells, PRP, BMAC, Wharton's jelly, MSC exosomes, cord blood therapies, and cutting-edge biologics.
-
-Always provide comprehensive differential diagnosis with probability rankings, integrate all available data sources, and give evidence-based confidence scores.
-
-Format all responses as valid JSON with detailed reasoning."""
-                            },
-                            {
-                                "role": "user", 
-                                "content": analysis_prompt
-                            }
-                        ],
-                        "temperature": 0.2,
-                        "max_tokens": 4000
-                    }
+            # Generate comprehensive AI analysis through the shared gateway
+            try:
+                ai_response = await get_llm_gateway().chat_completion(
+                    model="gpt-4",
+                    messages=self._build_analysis_messages(analysis_prompt),
+                    temperature=0.2,
+                    max_tokens=4000,
+                    api_key=self.api_key,
+                    use_cache=True,
+                    cache_patient_id=patient_data.patient_id
                 )
-                
-            if response.status_code != 200:
-                logging.error(f"OpenAI API error: {response.status_code} - {response.text}")
+            except CircuitOpenError:
+                # Provider is degraded - skip the timeout and go straight to rule-based fallback
+                logging.warning("OpenAI circuit open - using fallback diagnostics")
+                return await self._generate_fallback_diagnostics(patient_data, uploaded_files)
+            except LLMGatewayError as e:
+                logging.error(str(e))
                 return await self._generate_fallback_diagnostics(patient_data, uploaded_files)
                 
-            ai_response = response.json()
             content = ai_response['choices'][0]['message']['content']
             
             # Parse and structure the comprehensive analysis
             try:
-                diagnostic_data = json.loads(content)
-                
-                # Convert to DiagnosticResult objects with enhanced information
-                diagnostic_results = []
-                
-                differential_diagnoses = diagnostic_data.get('differential_diagnosis', [])
-                
-                for i, diagnosis in enumerate(differential_diagnoses):
-                    # Enhanced diagnostic result with multi-modal insights
-                    result = DiagnosticResult(
-                        diagnosis=diagnosis.get('diagnosis', f'Diagnosis {i+1}'),
-                        confidence_score=diagnosis.get('probability', 0.7),
-                        reasoning=diagnosis.get('mechanism', 'Mechanism under evaluation'),
-                        supporting_evidence=diagnosis.get('supporting_evidence', []),
-                        mechanisms_involved=[diagnosis.get('mechanism', 'Mechanism under evaluation')],
-                        regenerative_targets=diagnosis.get('regenerative_targets', [])
-                    )
-                    diagnostic_results.append(result)
+                diagnostic_data, diagnostic_results = self._parse_diagnostic_content(content)
                 
                 # Store comprehensive analysis for later retrieval
                 await self._store_comprehensive_analysis(patient_data.patient_id, diagnostic_data, uploaded_files)
@@ -333,6 +351,89 @@ Format all responses as valid JSON with detailed reasoning."""
             logging.error(f"Patient analysis error: {str(e)}")
             return await self._generate_fallback_diagnostics(patient_data, uploaded_files)
 
+    async def stream_patient_analysis(self, patient_data: PatientData) -> AsyncIterator[Tuple[str, Any]]:
+        """Streaming variant of analyze_patient_data
+        
+        Yields (event, data) tuples: "token" for raw content deltas, "diagnosis"
+        as each differential diagnosis object completes, and a final
+        "diagnostic_results" carrying the same List[DiagnosticResult] the
+        blocking call would return.
+        """
+        
+        yield "status", {"stage": "gathering_patient_context"}
+        uploaded_files = await self._get_uploaded_files_by_category(patient_data.patient_id)
+        analysis_prompt = self._build_enhanced_analysis_prompt(patient_data, uploaded_files)
+        
+        yield "status", {"stage": "analyzing"}
+        parser = IncrementalJSONArrayParser("differential_diagnosis")
+        try:
+            async for delta in get_llm_gateway().stream_chat_completion(
+                model="gpt-4",
+                messages=self._build_analysis_messages(analysis_prompt),
+                temperature=0.2,
+                max_tokens=4000,
+                api_key=self.api_key,
+                use_cache=True,
+                cache_patient_id=patient_data.patient_id
+            ):
+                yield "token", {"content": delta}
+                for diagnosis in parser.feed(delta):
+                    yield "diagnosis", diagnosis
+        except LLMGatewayError as e:
+            logging.warning(f"Streaming analysis unavailable, using fallback diagnostics: {str(e)}")
+            yield "status", {"stage": "fallback", "reason": str(e)}
+            yield "diagnostic_results", await self._generate_fallback_diagnostics(patient_data, uploaded_files)
+            return
+        
+        try:
+            diagnostic_data, diagnostic_results = self._parse_diagnostic_content(parser.text)
+            await self._store_comprehensive_analysis(patient_data.patient_id, diagnostic_data, uploaded_files)
+        except (json.JSONDecodeError, KeyError) as e:
+            logging.error(f"Failed to parse streamed AI response: {str(e)}")
+            diagnostic_results = []
+        
+        if not diagnostic_results:
+            diagnostic_results = await self._generate_fallback_diagnostics(patient_data, uploaded_files)
+        yield "diagnostic_results", diagnostic_results
+
+    async def _get_uploaded_files_by_category(self, patient_id: str) -> Dict:
+        """Uploaded file context for multi-modal integration"""
+        if not file_processor:
+            return {}
+        try:
+            file_summary = await file_processor.get_patient_file_summary(patient_id)
+            return file_summary.get("files_by_category", {})
+        except Exception as e:
+            logging.warning(f"File summary retrieval failed: {str(e)}")
+            return {}
+
+    def _build_analysis_messages(self, analysis_prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": analysis_prompt}
+        ]
+
+    def _parse_diagnostic_content(self, content: str) -> Tuple[Dict, List[DiagnosticResult]]:
+        """Parse the analysis JSON into DiagnosticResult objects with enhanced information"""
+        diagnostic_data = json.loads(content)
+        diagnostic_results = []
+        
+        differential_diagnoses = diagnostic_data.get('differential_diagnosis', [])
+        
+        for i, diagnosis in enumerate(differential_diagnoses):
+            # Enhanced diagnostic result with multi-modal insights
+            result = DiagnosticResult(
+                diagnosis=diagnosis.get('diagnosis', f'Diagnosis {i+1}'),
+                confidence_score=diagnosis.get('probability', 0.7),
+                reasoning=diagnosis.get('mechanism', 'Mechanism under evaluation'),
+                supporting_evidence=diagnosis.get('supporting_evidence', []),
+                mechanisms_involved=[diagnosis.get('mechanism', 'Mechanism under evaluation')],
+                regenerative_targets=diagnosis.get('regenerative_targets', [])
+            )
+            diagnostic_results.append(result)
+        
+        return diagnostic_data, diagnostic_results
+
     def _build_enhanced_analysis_prompt(self, patient_data: PatientData, uploaded_files: Dict) -> str:
         """Build enhanced analysis prompt with multi-modal data integration"""
         
@@ -515,13 +616,8 @@ Generate the most accurate, evidence-based analysis possible using all available
                 # Search literature database for relevant papers
                 for keyword in condition_keywords[:2]:  # Limit to 2 searches
                     try:
-                        # Search local database first
-                        papers = await db.literature_papers.find({
-                            "$or": [
-                                {"title": {"$regex": keyword.split()[0], "$options": "i"}},
-                                {"search_queries": {"$in": [keyword.lower()]}}
-                            ]
-                        }).sort("relevance_score", -1).limit(2).to_list(2)
+                        # Search local database first (BM25 full-text index)
+                        papers = await search_literature(keyword, k=2)
                         
                         if papers:
                             literature_evidence += f"\n**RELEVANT EVIDENCE for {keyword.upper()}:**\n"
@@ -546,98 +642,131 @@ Generate the most accurate, evidence-based analysis possible using all available
     ) -> RegenerativeProtocol:
         """Generate comprehensive regenerative medicine protocol"""
         
-        # Get therapy recommendations based on school of thought
-        available_therapies = self._get_therapies_by_school(school)
-        
-        # Get literature evidence for the diagnoses
-        literature_evidence = await self._get_literature_evidence(diagnoses)
-        
-        # Build protocol generation prompt
-        protocol_prompt = self._build_protocol_prompt(patient_data, diagnoses, school, available_therapies)
-        
-        # Add literature evidence to the prompt
-        if literature_evidence:
-            protocol_prompt = protocol_prompt.replace(
-                "{literature_evidence}",
-                literature_evidence
-            )
-        else:
-            protocol_prompt = protocol_prompt.replace(
-                "{literature_evidence}",
-                "\n**LITERATURE EVIDENCE:**\nNo specific literature evidence found in database for this condition. Protocol based on general regenerative medicine principles.\n"
-            )
+        # Build protocol generation prompt with literature evidence
+        protocol_prompt = await self._prepare_protocol_prompt(patient_data, diagnoses, school)
         
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "gpt-4",
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": """You are the world's most advanced regenerative medicine protocol generator. You have complete knowledge of:
-
-- All regenerative therapies: PRP, BMAC, Wharton's jelly MSCs, umbilical cord MSCs, placental MSCs, cord blood, exosomes
-- Global regulatory status and legal frameworks
-- Evidence-based dosing, timing, and delivery methods
-- Synergistic combinations and contraindications
-- Expected outcomes and realistic timelines
-- Cost-effectiveness analysis
-
-Generate detailed, actionable protocols that practitioners can implement immediately. Include specific dosages, timing, delivery methods, and monitoring parameters.
-
-Always format responses as valid JSON with complete protocol details."""
-                            },
-                            {
-                                "role": "user",
-                                "content": protocol_prompt
-                            }
-                        ],
-                        "temperature": 0.3,
-                        "max_tokens": 4000
-                    }
+            try:
+                ai_response = await get_llm_gateway().chat_completion(
+                    model="gpt-4",
+                    messages=self._build_protocol_messages(protocol_prompt),
+                    temperature=0.3,
+                    max_tokens=4000,
+                    api_key=self.api_key,
+                    use_cache=True,
+                    cache_patient_id=patient_data.patient_id
                 )
+            except CircuitOpenError:
+                raise HTTPException(status_code=503, detail="Protocol generation temporarily unavailable: AI provider degraded")
+            except LLMGatewayError as e:
+                raise HTTPException(status_code=500, detail=f"Protocol generation failed: {e.status_code or str(e)}")
                 
-            if response.status_code != 200:
-                raise HTTPException(status_code=500, detail=f"Protocol generation failed: {response.status_code}")
-                
-            ai_response = response.json()
             content = ai_response['choices'][0]['message']['content']
             
-            # Parse protocol response
-            try:
-                protocol_data = json.loads(content)
-            except json.JSONDecodeError:
-                protocol_data = self._parse_protocol_fallback(content, school)
-            
-            # Create comprehensive protocol
-            protocol = RegenerativeProtocol(
-                patient_id=patient_data.patient_id,
-                practitioner_id=patient_data.practitioner_id,
-                school_of_thought=school,
-                primary_diagnoses=[d.diagnosis for d in diagnoses[:3]],
-                protocol_steps=[ProtocolStep(**step) for step in protocol_data.get('protocol_steps', [])],
-                supporting_evidence=protocol_data.get('supporting_evidence', []),
-                expected_outcomes=protocol_data.get('expected_outcomes', []),
-                timeline_predictions=protocol_data.get('timeline_predictions', {}),
-                contraindications=protocol_data.get('contraindications', []),
-                legal_warnings=protocol_data.get('legal_warnings', []),
-                cost_estimate=protocol_data.get('cost_estimate'),
-                confidence_score=protocol_data.get('confidence_score', 0.8),
-                ai_reasoning=protocol_data.get('ai_reasoning', 'Protocol generated based on current evidence and best practices.')
-            )
+            # Parse protocol response into a comprehensive protocol
+            protocol = self._build_protocol_from_content(content, patient_data, diagnoses, school)
             
             return protocol
             
+        except HTTPException:
+            raise
         except Exception as e:
             logging.error(f"Protocol generation failed: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Protocol generation failed: {str(e)}")
 
+    async def stream_regenerative_protocol(
+        self,
+        patient_data: PatientData,
+        diagnoses: List[DiagnosticResult],
+        school: SchoolOfThought
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Streaming variant of generate_regenerative_protocol
+        
+        Yields (event, data) tuples: "token" for raw content deltas,
+        "protocol_step" as each step object completes, and a final "protocol"
+        carrying the assembled RegenerativeProtocol. Gateway failures are
+        re-raised as LLMGatewayError for the caller to report in-stream.
+        """
+        
+        yield "status", {"stage": "gathering_evidence"}
+        protocol_prompt = await self._prepare_protocol_prompt(patient_data, diagnoses, school)
+        
+        yield "status", {"stage": "generating_protocol"}
+        parser = IncrementalJSONArrayParser("protocol_steps")
+        async for delta in get_llm_gateway().stream_chat_completion(
+            model="gpt-4",
+            messages=self._build_protocol_messages(protocol_prompt),
+            temperature=0.3,
+            max_tokens=4000,
+            api_key=self.api_key,
+            use_cache=True,
+            cache_patient_id=patient_data.patient_id
+        ):
+            yield "token", {"content": delta}
+            for step in parser.feed(delta):
+                yield "protocol_step", step
+        
+        yield "protocol", self._build_protocol_from_content(parser.text, patient_data, diagnoses, school)
+
+    async def _prepare_protocol_prompt(
+        self,
+        patient_data: PatientData,
+        diagnoses: List[DiagnosticResult],
+        school: SchoolOfThought
+    ) -> str:
+        """Protocol prompt with literature evidence substituted in"""
+        
+        # Get therapy recommendations based on school of thought
+        available_therapies = self._get_therapies_by_school(school)
+        
+        # Get literature evidence for the diagnoses
+        literature_evidence = await self._get_literature_evidence(diagnoses)
+        
+        protocol_prompt = self._build_protocol_prompt(patient_data, diagnoses, school, available_therapies)
+        
+        # Add literature evidence to the prompt
+        if literature_evidence:
+            return protocol_prompt.replace("{literature_evidence}", literature_evidence)
+        return protocol_prompt.replace(
+            "{literature_evidence}",
+            "\n**LITERATURE EVIDENCE:**\nNo specific literature evidence found in database for this condition. Protocol based on general regenerative medicine principles.\n"
+        )
+
+    def _build_protocol_messages(self, protocol_prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.PROTOCOL_SYSTEM_PROMPT},
+            {"role": "user", "content": protocol_prompt}
+        ]
+
+    def _build_protocol_from_content(
+        self,
+        content: str,
+        patient_data: PatientData,
+        diagnoses: List[DiagnosticResult],
+        school: SchoolOfThought
+    ) -> RegenerativeProtocol:
+        """Create a comprehensive protocol from the model's JSON response"""
+        try:
+            protocol_data = json.loads(content)
+        except json.JSONDecodeError:
+            protocol_data = self._parse_protocol_fallback(content, school)
+        
+        return RegenerativeProtocol(
+            patient_id=patient_data.patient_id,
+            practitioner_id=patient_data.practitioner_id,
+            school_of_thought=school,
+            primary_diagnoses=[d.diagnosis for d in diagnoses[:3]],
+            protocol_steps=[ProtocolStep(**step) for step in protocol_data.get('protocol_steps', [])],
+            supporting_evidence=protocol_data.get('supporting_evidence', []),
+            expected_outcomes=protocol_data.get('expected_outcomes', []),
+            timeline_predictions=protocol_data.get('timeline_predictions', {}),
+            contraindications=protocol_data.get('contraindications', []),
+            legal_warnings=protocol_data.get('legal_warnings', []),
+            cost_estimate=protocol_data.get('cost_estimate'),
+            confidence_score=protocol_data.get('confidence_score', 0.8),
+            ai_reasoning=protocol_data.get('ai_reasoning', 'Protocol generated based on current evidence and best practices.')
+        )
+
     def _get_therapies_by_school(self, school: SchoolOfThought) -> List[TherapyInfo]:
         """Get available therapies based on school of thought"""
         if school == SchoolOfThought.TRADITIONAL_AUTOLOGOUS:
@@ -858,6 +987,18 @@ async def get_current_practitioner(credentials: HTTPAuthorizationCredentials = D
         specialty="Regenerative Medicine"
     )
 
+# Practitioners allowed to run operational/admin actions (comma-separated ids); empty denies all
+ADMIN_PRACTITIONER_IDS = {
+    practitioner_id.strip()
+    for practitioner_id in os.environ.get("ADMIN_PRACTITIONER_IDS", "").split(",")
+    if practitioner_id.strip()
+}
+
+async def require_admin(practitioner: Practitioner = Depends(get_current_practitioner)) -> Practitioner:
+    if practitioner.id not in ADMIN_PRACTITIONER_IDS:
+        raise HTTPException(status_code=403, detail="Administrator access required")
+    return practitioner
+
 # File Upload and Processing API Endpoints
 
 @api_router.post("/files/upload")
@@ -867,15 +1008,17 @@ async def upload_patient_file(
     file_category: str = Form(...),  # 'chart', 'genetics', 'imaging', 'labs', 'other'
     practitioner: Practitioner = Depends(get_current_practitioner)
 ):
-    """Upload and process patient files (charts, genetics, imaging, labs)"""
+    """Upload patient files (charts, genetics, imaging, labs) and queue them for background processing"""
     
     if not file_processor:
         raise HTTPException(status_code=503, detail="File processing service unavailable")
     
+    job_queue = get_job_queue()
+    upload_storage = get_upload_storage()
+    if not job_queue or not upload_storage:
+        raise HTTPException(status_code=503, detail="Background job queue unavailable")
+    
     try:
-        # Read file data
-        file_data = await file.read()
-        
         # Determine file type
         file_extension = Path(file.filename).suffix.lower()
         if file_extension in ['.dcm', '.dicom']:
@@ -893,45 +1036,297 @@ async def upload_patient_file(
         else:
             file_type = 'document'
         
+        # Stream into GridFS chunk by chunk, hashing as we go - never the whole file in memory
+        stored = await upload_storage.store_stream(
+            file.read, file.filename, metadata={"patient_id": patient_id, "file_category": file_category}
+        )
+        
+        # Identical content for this patient: reuse the existing record and its results
+        existing = await db.uploaded_files.find_one(
+            {"patient_id": patient_id, "content_sha256": stored.sha256}, {"_id": 0}
+        )
+        if existing:
+            await upload_storage.delete(stored.storage_id)
+            return await _duplicate_upload_response(existing, practitioner)
+        
         # Create file upload record
         file_upload = FileUpload(
             patient_id=patient_id,
             filename=file.filename,
             file_type=file_type,
             file_category=file_category,
-            file_size=len(file_data)
+            file_size=stored.size,
+            content_sha256=stored.sha256,
+            storage_id=stored.storage_id
         )
         
-        # Store file record
-        await db.uploaded_files.insert_one(file_upload.dict())
+        # Store file record before enqueueing so a worker can always find it
+        file_upload.processing_status = "queued"
+        try:
+            await db.uploaded_files.insert_one(file_upload.dict())
+        except DuplicateKeyError:
+            # A concurrent upload of the same content won the race
+            await upload_storage.delete(stored.storage_id)
+            existing = await db.uploaded_files.find_one(
+                {"patient_id": patient_id, "content_sha256": stored.sha256}, {"_id": 0}
+            )
+            return await _duplicate_upload_response(existing, practitioner)
         
-        # Process file in background
-        processed_data = await file_processor.process_uploaded_file(file_data, file_upload)
+        # Hand extraction + AI analysis to the background workers
+        job = await job_queue.enqueue(
+            "file_processing",
+            {"file_id": file_upload.file_id, "storage_id": stored.storage_id},
+            priority=FILE_JOB_PRIORITIES.get(file_category, 5),
+            patient_id=patient_id,
+            practitioner_id=practitioner.id
+        )
+        await db.uploaded_files.update_one({"file_id": file_upload.file_id}, {"$set": {"job_id": job["job_id"]}})
         
         # Audit log
         await db.audit_log.insert_one({
             "timestamp": datetime.utcnow(),
             "practitioner_id": practitioner.id,
-            "action": "file_upload_processed",
+            "action": "file_upload_queued",
             "patient_id": patient_id,
             "file_id": file_upload.file_id,
+            "job_id": job["job_id"],
             "file_category": file_category,
-            "file_type": file_type,
-            "processing_confidence": processed_data.confidence_score
+            "file_type": file_type
         })
         
         return {
-            "status": "processed",
+            "status": "queued",
             "file_id": file_upload.file_id,
-            "processing_results": processed_data.extraction_results,
-            "confidence_score": processed_data.confidence_score,
-            "processing_time": processed_data.processing_time,
-            "medical_insights": processed_data.medical_insights
+            "job_id": job["job_id"],
+            "status_url": f"/api/jobs/{job['job_id']}",
+            "events_url": f"/api/jobs/{job['job_id']}/events"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logging.error(f"File upload processing error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"File processing failed: {str(e)}")
+        logging.error(f"File upload error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
+
+async def _duplicate_upload_response(existing: Dict[str, Any], practitioner: Practitioner) -> Dict[str, Any]:
+    """Point a re-upload of identical content at the existing file record
+    
+    A completed record returns its stored processing results; a failed one is
+    queued again from its stored bytes.
+    """
+    
+    file_id = existing["file_id"]
+    job_id = existing.get("job_id")
+    processing_status = existing.get("processing_status")
+    
+    if processing_status == "failed":
+        job = await get_job_queue().enqueue(
+            "file_processing",
+            {"file_id": file_id, "storage_id": existing.get("storage_id")},
+            priority=FILE_JOB_PRIORITIES.get(existing.get("file_category"), 5),
+            patient_id=existing["patient_id"],
+            practitioner_id=practitioner.id
+        )
+        job_id = job["job_id"]
+        processing_status = "queued"
+        await db.uploaded_files.update_one(
+            {"file_id": file_id}, {"$set": {"job_id": job_id, "processing_status": processing_status}}
+        )
+    
+    processed = await db.processed_files.find_one({"file_id": file_id}, {"_id": 0})
+    metrics.increment("file_upload_duplicates_total")
+    
+    await db.audit_log.insert_one({
+        "timestamp": datetime.utcnow(),
+        "practitioner_id": practitioner.id,
+        "action": "file_upload_deduplicated",
+        "patient_id": existing["patient_id"],
+        "file_id": file_id,
+        "job_id": job_id,
+        "content_sha256": existing.get("content_sha256")
+    })
+    
+    response = {
+        "status": "duplicate",
+        "file_id": file_id,
+        "job_id": job_id,
+        "processing_status": processing_status,
+        "processing_results": processed.get("extraction_results") if processed else None,
+        "confidence_score": processed.get("confidence_score") if processed else None
+    }
+    if job_id:
+        response["status_url"] = f"/api/jobs/{job_id}"
+        response["events_url"] = f"/api/jobs/{job_id}/events"
+    return response
+
+# Chart and lab extraction feed directly into diagnosis, so they jump ahead of bulk imaging
+FILE_JOB_PRIORITIES = {"chart": 8, "labs": 7, "genetics": 6, "other": 5, "imaging": 4}
+
+async def run_file_processing_job(job: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    """Background worker handler: extract, analyze and store one uploaded file"""
+    
+    if not file_processor:
+        raise RuntimeError("File processing service unavailable")
+    
+    payload = job["payload"]
+    file_record = await db.uploaded_files.find_one({"file_id": payload["file_id"]}, {"_id": 0})
+    if not file_record:
+        raise RuntimeError(f"Uploaded file {payload['file_id']} not found")
+    
+    await db.uploaded_files.update_one(
+        {"file_id": payload["file_id"]},
+        {"$set": {"processing_status": "processing", "processing_attempts": job["attempts"]}}
+    )
+    await report_progress(0.1, "Reading uploaded file")
+    
+    file_upload = FileUpload(**{k: v for k, v in file_record.items() if k in FileUpload.__fields__})
+    if not payload.get("storage_id"):
+        raise RuntimeError(f"Uploaded file {payload['file_id']} has no stored content")
+    file_data = None
+    file_path = None
+    local_copy = None
+    if file_processor.is_dicom_upload(file_upload):
+        # DICOM pixel data is memory-mapped from a local file rather than held in memory
+        local_copy = str(get_job_queue().spool_path(f"dicom-{file_upload.file_id}"))
+        file_path = await get_upload_storage().download_to_file(payload["storage_id"], local_copy)
+    else:
+        file_data = await get_upload_storage().read_bytes(payload["storage_id"])
+    
+    await report_progress(0.3, f"Extracting {file_upload.file_category} data")
+    try:
+        processed_data = await file_processor.process_uploaded_file(file_data, file_upload, file_path=file_path)
+    finally:
+        get_job_queue().discard_spool(local_copy)
+    await report_progress(0.9, "Storing results")
+    
+    await db.audit_log.insert_one({
+        "timestamp": datetime.utcnow(),
+        "practitioner_id": job.get("practitioner_id"),
+        "action": "file_upload_processed",
+        "patient_id": file_upload.patient_id,
+        "file_id": file_upload.file_id,
+        "job_id": job["job_id"],
+        "file_category": file_upload.file_category,
+        "file_type": file_upload.file_type,
+        "processing_confidence": processed_data.confidence_score
+    })
+    
+    return {
+        "file_id": file_upload.file_id,
+        "processing_results": processed_data.extraction_results,
+        "confidence_score": processed_data.confidence_score,
+        "processing_time": processed_data.processing_time,
+        "medical_insights": processed_data.medical_insights
+    }
+
+async def on_file_processing_failure(job: Dict[str, Any], error: Exception, will_retry: bool):
+    """Mirror job retries/failures onto the uploaded_files record"""
+    
+    update = {"processing_status": "queued" if will_retry else "failed", "error_message": str(error)}
+    await db.uploaded_files.update_one({"file_id": job["payload"]["file_id"]}, {"$set": update})
+
+async def run_dicom_study_job(job: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    """Background worker handler: stream every frame of an uploaded study into per-series aggregates"""
+    
+    if not dicom_service:
+        raise RuntimeError("DICOM processing service unavailable")
+    
+    payload = job["payload"]
+    job_queue = get_job_queue()
+    ingestion = StudyIngestion(lambda name: str(job_queue.spool_path(name)))
+    uploads = payload["uploads"]
+    
+    for index, upload in enumerate(uploads):
+        await report_progress(0.05 + 0.8 * index / len(uploads), f"Reading {upload['filename']}")
+        # One upload on local disk at a time; instance pixels are memory-mapped from it
+        local_copy = str(job_queue.spool_path("dicom-study"))
+        try:
+            await get_upload_storage().download_to_file(upload["storage_id"], local_copy)
+            await ingestion.add_upload(local_copy, upload["filename"])
+        finally:
+            job_queue.discard_spool(local_copy)
+    
+    if not ingestion.series:
+        raise RuntimeError("No DICOM image instances found in upload")
+    
+    await report_progress(0.9, "Storing series aggregates")
+    result = await dicom_service.store_study_ingestion(
+        payload["patient_id"], ingestion.studies(), job_id=job["job_id"],
+        storage_ids=[upload["storage_id"] for upload in uploads]
+    )
+    
+    await db.audit_log.insert_one({
+        "timestamp": datetime.utcnow(),
+        "practitioner_id": job.get("practitioner_id"),
+        "action": "dicom_study_ingested",
+        "patient_id": payload["patient_id"],
+        "job_id": job["job_id"],
+        "study_instance_uids": [study["study_instance_uid"] for study in result["studies"]],
+        "instance_count": ingestion.instance_count
+    })
+    
+    return {
+        "patient_id": payload["patient_id"],
+        "instance_count": ingestion.instance_count,
+        "series_count": len(ingestion.series),
+        "studies": [
+            {key: study[key] for key in ("study_instance_uid", "modalities", "series_count", "instance_count", "frame_count")}
+            for study in result["studies"]
+        ],
+        "skipped": ingestion.skipped
+    }
+
+async def run_patient_analysis_job(job: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    """Background worker handler: full multi-modal patient analysis"""
+    
+    patient_id = job["payload"]["patient_id"]
+    patient_record = await db.patients.find_one({"patient_id": patient_id})
+    if not patient_record:
+        raise RuntimeError(f"Patient {patient_id} not found")
+    
+    await report_progress(0.2, "Analyzing patient data")
+    diagnostic_results = await regen_ai.analyze_patient_data(PatientData(**patient_record))
+    
+    await report_progress(0.9, "Storing analysis")
+    analysis_results = [result.dict() for result in diagnostic_results]
+    await db.patient_analyses.insert_one({
+        "patient_id": patient_id,
+        "practitioner_id": job.get("practitioner_id"),
+        "analysis_results": analysis_results,
+        "timestamp": datetime.utcnow()
+    })
+    
+    return {"patient_id": patient_id, "diagnostic_results": analysis_results}
+
+async def run_literature_ingest_job(job: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    """Background worker handler: bulk PubMed corpus ingestion"""
+    
+    if not pubmed_service:
+        raise RuntimeError("Literature service unavailable")
+    
+    payload = job["payload"]
+    await report_progress(0.0, f"Searching PubMed for '{payload['query']}'")
+    return await pubmed_service.ingest_pubmed_corpus(
+        payload["query"],
+        max_records=payload.get("max_records", 5000),
+        batch_size=payload.get("batch_size", 500),
+        progress_callback=report_progress
+    )
+
+async def run_rollup_reconciliation_job(job: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    """Background worker handler: rebuild practitioner dashboard rollups from source collections"""
+    
+    await report_progress(0.0, "Rebuilding practitioner rollups")
+    return await reconcile_practitioner_rollups(db, job["payload"].get("practitioner_id"))
+
+async def run_model_retrain_job(job: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    """Background worker handler: retrain outcome prediction models into the registry"""
+    
+    if not prediction_service:
+        raise RuntimeError("Prediction service unavailable")
+    
+    await report_progress(0.0, "Retraining outcome prediction models")
+    return await prediction_service.retrain_models(job["payload"].get("models"))
 
 @api_router.get("/patients/{patient_id}/files")
 async def get_patient_files(
@@ -951,9 +1346,9 @@ async def get_patient_files(
             if '_id' in file_record:
                 file_record['_id'] = str(file_record['_id'])
             
-            # Add processing status
-            file_record['processing_status'] = 'completed'
-            file_record['integration_status'] = 'integrated'
+            # Processing status is maintained by the background job that owns the file
+            file_record.setdefault('processing_status', 'completed')
+            file_record['integration_status'] = 'integrated' if file_record['processing_status'] == 'completed' else 'pending'
             files_with_status.append(file_record)
         
         # Group files by category
@@ -1133,6 +1528,7 @@ async def generate_protocol_from_files(
         
         # Store enhanced protocol
         await db.protocols.insert_one(enhanced_protocol.dict())
+        await record_protocol_created(db, practitioner.id, enhanced_protocol.status)
         
         # Audit log
         await db.audit_log.insert_one({
@@ -1156,6 +1552,66 @@ async def generate_protocol_from_files(
         logging.error(f"File-based protocol generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Protocol generation failed: {str(e)}")
 
+# Previews are immutable per content: clients revalidate with If-None-Match after max-age
+PREVIEW_CACHE_CONTROL = "private, max-age=86400"
+
+@api_router.get("/files/{file_id}/previews")
+async def list_file_previews(
+    file_id: str,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Available preview renditions (presets x levels) for an imaging file"""
+    
+    previews = await list_previews(db, file_id)
+    if not previews:
+        raise HTTPException(status_code=404, detail="No previews for this file")
+    
+    return {
+        "file_id": file_id,
+        "levels": list(PYRAMID_LEVELS),
+        "previews": [
+            {
+                **{key: preview[key] for key in ("preset", "level", "width", "height", "media_type", "etag", "window")},
+                "url": f"/api/files/{file_id}/preview?level={preview['level']}&preset={preview['preset']}"
+            }
+            for preview in previews
+        ]
+    }
+
+@api_router.get("/files/{file_id}/preview")
+async def get_file_preview(
+    file_id: str,
+    request: Request,
+    level: str = "thumbnail",
+    preset: str = DEFAULT_PRESET,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """One pre-rendered preview image, served with an ETag (304 when the client's copy is current)"""
+    
+    if level not in PYRAMID_LEVELS:
+        raise HTTPException(status_code=400, detail=f"level must be one of {list(PYRAMID_LEVELS)}")
+    
+    # Revalidation needs only the ETag, so check it before loading the image bytes
+    preview = await get_preview(db, file_id, preset, level, include_data=False)
+    if not preview:
+        raise HTTPException(status_code=404, detail="Preview not found")
+    
+    etag = f'"{preview["etag"]}"'
+    headers = {"ETag": etag, "Cache-Control": PREVIEW_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match", "")
+    client_tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if etag in client_tags or "*" in client_tags:
+        metrics.increment("image_preview_requests_total", status="not_modified")
+        return Response(status_code=304, headers=headers)
+    
+    preview = await get_preview(db, file_id, preset, level)
+    if not preview:
+        raise HTTPException(status_code=404, detail="Preview not found")
+    # Re-read in case the file was reprocessed in between
+    headers["ETag"] = f'"{preview["etag"]}"'
+    metrics.increment("image_preview_requests_total", status="ok")
+    return Response(content=preview["data"], media_type=preview["media_type"], headers=headers)
+
 @api_router.delete("/files/{file_id}")
 async def delete_patient_file(
     file_id: str,
@@ -1164,14 +1620,22 @@ async def delete_patient_file(
     """Delete uploaded patient file"""
     
     # Delete from uploaded_files
-    upload_result = await db.uploaded_files.delete_one({"file_id": file_id})
+    deleted_upload = await db.uploaded_files.find_one_and_delete({"file_id": file_id})
     
     # Delete from processed_files
-    processed_result = await db.processed_files.delete_one({"file_id": file_id})
+    deleted_processed = await db.processed_files.find_one_and_delete({"file_id": file_id})
     
-    if upload_result.deleted_count == 0 and processed_result.deleted_count == 0:
+    # Raw bytes in GridFS
+    if deleted_upload and get_upload_storage():
+        await get_upload_storage().delete(deleted_upload.get("storage_id"))
+    await delete_previews(db, file_id)
+    
+    if deleted_upload is None and deleted_processed is None:
         raise HTTPException(status_code=404, detail="File not found")
     
+    # The patient's file set changed - cached AI analyses are stale
+    await invalidate_patient_llm_cache((deleted_upload or deleted_processed).get("patient_id"))
+    
     # Audit log
     await db.audit_log.insert_one({
         "timestamp": datetime.utcnow(),
@@ -1417,17 +1881,12 @@ async def search_literature_database(
     
     if pubmed_service:
         try:
-            # First, search local database
-            search_filter = {
-                "$or": [
-                    {"title": {"$regex": query, "$options": "i"}},
-                    {"abstract": {"$regex": query, "$options": "i"}},
-                    {"search_queries": {"$in": [query.lower()]}}
-                ],
-                "relevance_score": {"$gte": relevance_threshold}
-            }
-            
-            local_papers = await db.literature_papers.find(search_filter).sort("relevance_score", -1).limit(limit).to_list(limit)
+            # First, search local database through the BM25 full-text index
+            local_papers = await search_literature(
+                query,
+                k=limit,
+                filters={"min_relevance_score": relevance_threshold}
+            )
             
             # Convert ObjectId to string for JSON serialization
             for paper in local_papers:
@@ -1470,6 +1929,40 @@ async def search_literature_database(
     
     return {"status": "service_unavailable", "message": "Literature search service not available"}
 
+@api_router.post("/literature/ingest")
+async def ingest_literature_corpus(
+    request_data: Dict[str, Any],
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Queue a bulk PubMed ingestion (history server paging) into the local corpus"""
+    
+    query = request_data.get("query")
+    if not query:
+        raise HTTPException(status_code=400, detail="query is required")
+    
+    job_queue = get_job_queue()
+    if not job_queue or not pubmed_service:
+        raise HTTPException(status_code=503, detail="Literature ingestion unavailable")
+    
+    job = await job_queue.enqueue(
+        "literature_ingest",
+        {
+            "query": query,
+            # PubMed's history server pages no further than MAX_HISTORY_RECORDS per query
+            "max_records": min(int(request_data.get("max_records", 5000)), MAX_HISTORY_RECORDS),
+            "batch_size": int(request_data.get("batch_size", 500))
+        },
+        priority=2,  # bulk corpus building yields to interactive work
+        practitioner_id=practitioner.id
+    )
+    
+    return {
+        "status": "queued",
+        "job_id": job["job_id"],
+        "status_url": f"/api/jobs/{job['job_id']}",
+        "events_url": f"/api/jobs/{job['job_id']}/events"
+    }
+
 @api_router.get("/literature/google-scholar-search")
 async def search_google_scholar(
     query: str,
@@ -1954,6 +2447,7 @@ async def record_patient_outcome(
         
         # Store outcome record
         await db.patient_outcomes.insert_one(outcome_record)
+        await record_outcome(db, practitioner.id, outcome_record)
         
         # Update protocol success tracking
         for protocol_id in outcome_record["protocol_ids"]:
@@ -2052,6 +2546,94 @@ async def get_patient_outcomes(
         logging.error(f"Error retrieving patient outcomes: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Outcome retrieval failed: {str(e)}")
 
+def _truthy_expr(field: str) -> Dict[str, Any]:
+    """Aggregation equivalent of Python truthiness for a scalar or list field"""
+    value = {"$ifNull": [field, None]}
+    return {
+        "$cond": [
+            {"$isArray": value},
+            {"$gt": [{"$size": value}, 0]},
+            {"$not": [{"$in": [value, [None, False, 0, ""]]}]}
+        ]
+    }
+
+def _nonzero_or_null(field: str) -> Dict[str, Any]:
+    """Keep a metric only when it is set and non-zero so $avg skips it"""
+    return {"$cond": [_truthy_expr(field), field, None]}
+
+def _build_outcomes_analytics_pipeline(
+    cutoff_date: Optional[datetime],
+    school_of_thought: Optional[str],
+    condition: Optional[str]
+) -> List[Dict[str, Any]]:
+    """Single $facet aggregation returning only summary rows for /analytics/outcomes"""
+    
+    pipeline: List[Dict[str, Any]] = []
+    if cutoff_date:
+        pipeline.append({"$match": {"created_at": {"$gte": cutoff_date}}})
+    
+    # Outcomes carry protocol_ids only; school/condition live on the linked protocols
+    protocol_filter: Dict[str, Any] = {}
+    if school_of_thought:
+        protocol_filter["school_of_thought"] = school_of_thought
+    if condition:
+        protocol_filter["primary_diagnoses"] = {"$regex": re.escape(condition), "$options": "i"}
+    if protocol_filter:
+        pipeline.extend([
+            {"$lookup": {
+                "from": "protocols",
+                "localField": "protocol_ids",
+                "foreignField": "protocol_id",
+                "pipeline": [{"$match": protocol_filter}, {"$project": {"_id": 0, "protocol_id": 1}}],
+                "as": "matched_protocols"
+            }},
+            {"$match": {"matched_protocols.0": {"$exists": True}}},
+            # Per-protocol stats only cover the protocols that satisfied the filter
+            {"$set": {"protocol_ids": "$matched_protocols.protocol_id"}},
+            {"$unset": "matched_protocols"}
+        ])
+    
+    pipeline.append({"$facet": {
+        "summary": [
+            {"$group": {
+                "_id": None,
+                "total_outcomes": {"$sum": 1},
+                "scored_outcomes": {"$sum": {"$cond": [{"$ne": [{"$ifNull": ["$overall_success_score", None]}, None]}, 1, 0]}},
+                "average_success_score": {"$avg": "$overall_success_score"},
+                "average_pain_reduction": {"$avg": "$pain_reduction_percentage"},
+                "average_functional_improvement": {"$avg": "$functional_improvement_percentage"},
+                "average_patient_satisfaction": {"$avg": "$patient_satisfaction"},
+                "returned_to_activities": {"$sum": {"$cond": [_truthy_expr("$return_to_activities"), 1, 0]}},
+                "with_adverse_events": {"$sum": {"$cond": [_truthy_expr("$adverse_events"), 1, 0]}}
+            }}
+        ],
+        "unique_patients": [
+            {"$group": {"_id": "$patient_id"}},
+            {"$count": "count"}
+        ],
+        "protocol_performance": [
+            {"$unwind": "$protocol_ids"},
+            {"$match": {"protocol_ids": {"$nin": [None, ""]}}},
+            {"$group": {
+                "_id": "$protocol_ids",
+                "outcome_count": {"$sum": 1},
+                "average_success_score": {"$avg": _nonzero_or_null("$overall_success_score")},
+                "average_pain_reduction": {"$avg": _nonzero_or_null("$pain_reduction_percentage")},
+                "complications": {"$sum": {"$cond": [_truthy_expr("$complications"), 1, 0]}}
+            }}
+        ],
+        "timepoint_analysis": [
+            {"$group": {
+                "_id": {"$ifNull": ["$timepoint", "unknown"]},
+                "count": {"$sum": 1},
+                "average_success": {"$avg": _nonzero_or_null("$overall_success_score")},
+                "average_pain_reduction": {"$avg": _nonzero_or_null("$pain_reduction_percentage")}
+            }}
+        ]
+    }})
+    
+    return pipeline
+
 @api_router.get("/analytics/outcomes")
 async def get_outcomes_analytics(
     timeframe: str = "all",  # "30_days", "90_days", "6_months", "1_year", "all"
@@ -2061,10 +2643,8 @@ async def get_outcomes_analytics(
     """Get comprehensive outcomes analytics across all patients"""
     
     try:
-        # Build query filters
-        query_filter = {}
-        
         # Time filter
+        cutoff_date = None
         if timeframe != "all":
             days_map = {
                 "30_days": 30,
@@ -2075,13 +2655,18 @@ async def get_outcomes_analytics(
             
             if timeframe in days_map:
                 cutoff_date = datetime.utcnow() - timedelta(days=days_map[timeframe])
-                query_filter["created_at"] = {"$gte": cutoff_date}
         
-        # Get all outcomes matching filters
-        outcomes_cursor = db.patient_outcomes.find(query_filter)
-        outcomes = await outcomes_cursor.to_list(length=None)
+        # All statistics are computed server-side; only summary rows are returned
+        pipeline = _build_outcomes_analytics_pipeline(cutoff_date, school_of_thought, condition)
+        facets = (await db.patient_outcomes.aggregate(pipeline, allowDiskUse=True).to_list(1))[0]
         
-        if not outcomes:
+        filters_applied = {
+            "timeframe": timeframe,
+            "school_of_thought": school_of_thought,
+            "condition": condition
+        }
+        
+        if not facets["summary"]:
             return {
                 "analytics_summary": {
                     "total_outcomes": 0,
@@ -2092,81 +2677,49 @@ async def get_outcomes_analytics(
                 "protocol_performance": {},
                 "condition_outcomes": {},
                 "timepoint_analysis": {},
-                "trend_analysis": "insufficient_data"
+                "trend_analysis": "insufficient_data",
+                "filters_applied": filters_applied
             }
         
-        # Calculate overall analytics
-        pain_reductions = [o.get("pain_reduction_percentage", 0) for o in outcomes if o.get("pain_reduction_percentage") is not None]
-        functional_improvements = [o.get("functional_improvement_percentage", 0) for o in outcomes if o.get("functional_improvement_percentage") is not None]
-        success_scores = [o.get("overall_success_score", 0) for o in outcomes if o.get("overall_success_score") is not None]
-        patient_satisfaction = [o.get("patient_satisfaction", 0) for o in outcomes if o.get("patient_satisfaction") is not None]
+        summary = facets["summary"][0]
+        total_outcomes = summary["total_outcomes"]
         
         analytics_summary = {
-            "total_outcomes": len(outcomes),
-            "unique_patients": len(set([o.get("patient_id") for o in outcomes])),
-            "average_success_rate": (sum(success_scores) / len(success_scores)) * 100 if success_scores else 0,
-            "average_pain_reduction": sum(pain_reductions) / len(pain_reductions) if pain_reductions else 0,
-            "average_functional_improvement": sum(functional_improvements) / len(functional_improvements) if functional_improvements else 0,
-            "average_patient_satisfaction": sum(patient_satisfaction) / len(patient_satisfaction) if patient_satisfaction else 0,
-            "return_to_activities_rate": (sum(1 for o in outcomes if o.get("return_to_activities")) / len(outcomes)) * 100,
-            "adverse_events_rate": (sum(1 for o in outcomes if o.get("adverse_events")) / len(outcomes)) * 100
+            "total_outcomes": total_outcomes,
+            "unique_patients": facets["unique_patients"][0]["count"] if facets["unique_patients"] else 0,
+            "average_success_rate": (summary["average_success_score"] or 0) * 100,
+            "average_pain_reduction": summary["average_pain_reduction"] or 0,
+            "average_functional_improvement": summary["average_functional_improvement"] or 0,
+            "average_patient_satisfaction": summary["average_patient_satisfaction"] or 0,
+            "return_to_activities_rate": (summary["returned_to_activities"] / total_outcomes) * 100,
+            "adverse_events_rate": (summary["with_adverse_events"] / total_outcomes) * 100
         }
         
-        # Protocol performance analysis
         protocol_performance = {}
-        for outcome in outcomes:
-            for protocol_id in outcome.get("protocol_ids", []):
-                if protocol_id and protocol_id not in protocol_performance:
-                    protocol_performance[protocol_id] = {
-                        "outcome_count": 0,
-                        "success_scores": [],
-                        "pain_reductions": [],
-                        "complications": 0
-                    }
-                
-                if protocol_id:
-                    protocol_performance[protocol_id]["outcome_count"] += 1
-                    if outcome.get("overall_success_score"):
-                        protocol_performance[protocol_id]["success_scores"].append(outcome["overall_success_score"])
-                    if outcome.get("pain_reduction_percentage"):
-                        protocol_performance[protocol_id]["pain_reductions"].append(outcome["pain_reduction_percentage"])
-                    if outcome.get("complications"):
-                        protocol_performance[protocol_id]["complications"] += 1
-        
-        # Calculate averages for each protocol
-        for protocol_id, data in protocol_performance.items():
-            data["average_success_score"] = sum(data["success_scores"]) / len(data["success_scores"]) if data["success_scores"] else 0
-            data["average_pain_reduction"] = sum(data["pain_reductions"]) / len(data["pain_reductions"]) if data["pain_reductions"] else 0
-            data["complication_rate"] = (data["complications"] / data["outcome_count"]) * 100 if data["outcome_count"] > 0 else 0
-        
-        # Timepoint analysis
-        timepoint_analysis = {}
-        for outcome in outcomes:
-            timepoint = outcome.get("timepoint", "unknown")
-            if timepoint not in timepoint_analysis:
-                timepoint_analysis[timepoint] = {
-                    "count": 0,
-                    "success_scores": [],
-                    "pain_reductions": []
-                }
-            
-            timepoint_analysis[timepoint]["count"] += 1
-            if outcome.get("overall_success_score"):
-                timepoint_analysis[timepoint]["success_scores"].append(outcome["overall_success_score"])
-            if outcome.get("pain_reduction_percentage"):
-                timepoint_analysis[timepoint]["pain_reductions"].append(outcome["pain_reduction_percentage"])
+        for row in facets["protocol_performance"]:
+            protocol_performance[row["_id"]] = {
+                "outcome_count": row["outcome_count"],
+                "complications": row["complications"],
+                "average_success_score": row["average_success_score"] or 0,
+                "average_pain_reduction": row["average_pain_reduction"] or 0,
+                "complication_rate": (row["complications"] / row["outcome_count"]) * 100
+            }
         
-        # Calculate timepoint averages
-        for timepoint, data in timepoint_analysis.items():
-            data["average_success"] = sum(data["success_scores"]) / len(data["success_scores"]) if data["success_scores"] else 0
-            data["average_pain_reduction"] = sum(data["pain_reductions"]) / len(data["pain_reductions"]) if data["pain_reductions"] else 0
+        timepoint_analysis = {}
+        for row in facets["timepoint_analysis"]:
+            timepoint_analysis[row["_id"]] = {
+                "count": row["count"],
+                "average_success": row["average_success"] or 0,
+                "average_pain_reduction": row["average_pain_reduction"] or 0
+            }
         
         return {
             "analytics_summary": analytics_summary,
             "protocol_performance": protocol_performance,
             "timepoint_analysis": timepoint_analysis,
             "total_protocols_analyzed": len(protocol_performance),
-            "data_quality_score": min(100, (len(success_scores) / len(outcomes)) * 100) if outcomes else 0,
+            "data_quality_score": min(100, (summary["scored_outcomes"] / total_outcomes) * 100),
+            "filters_applied": filters_applied,
             "generated_at": datetime.utcnow().isoformat()
         }
         
@@ -2203,22 +2756,109 @@ async def analyze_dicom_image(
         
         return analysis_result
     
-    return {"status": "service_unavailable"}
+    return {"status": "service_unavailable"}
+
+@api_router.get("/imaging/analysis-history/{patient_id}")
+async def get_imaging_analysis_history(
+    patient_id: str,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Get imaging analysis history for a patient"""
+    
+    # Stored analysis records only; listing never re-reads or decodes any DICOM pixel data
+    analyses = await db.dicom_analyses.find(
+        {"patient_id": patient_id}, {"_id": 0}
+    ).sort("processing_date", -1).to_list(20)
+    
+    return {
+        "patient_id": patient_id,
+        "total_analyses": len(analyses),
+        "analyses": analyses
+    }
+
+@api_router.post("/imaging/studies/upload")
+async def upload_dicom_study(
+    files: List[UploadFile] = File(...),
+    patient_id: str = Form(...),
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Upload a DICOM study (zip archives and/or individual instances) for series-level analysis
+    
+    Instances are grouped by StudyInstanceUID / SeriesInstanceUID in a background job
+    that streams one frame at a time; results land in /imaging/studies/{patient_id}.
+    """
+    
+    job_queue = get_job_queue()
+    upload_storage = get_upload_storage()
+    if not dicom_service or not job_queue or not upload_storage:
+        raise HTTPException(status_code=503, detail="DICOM study ingestion unavailable")
+    
+    uploads = []
+    try:
+        for upload in files:
+            stored = await upload_storage.store_stream(
+                upload.read, upload.filename, metadata={"patient_id": patient_id, "file_category": "dicom_study"}
+            )
+            uploads.append({"storage_id": stored.storage_id, "filename": upload.filename, "size": stored.size})
+    except Exception as e:
+        for stored_upload in uploads:
+            await upload_storage.delete(stored_upload["storage_id"])
+        logging.error(f"DICOM study upload error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"DICOM study upload failed: {str(e)}")
+    
+    job = await job_queue.enqueue(
+        "dicom_study_ingestion",
+        {"patient_id": patient_id, "uploads": uploads},
+        priority=FILE_JOB_PRIORITIES["imaging"],
+        patient_id=patient_id,
+        practitioner_id=practitioner.id
+    )
+    
+    await db.audit_log.insert_one({
+        "timestamp": datetime.utcnow(),
+        "practitioner_id": practitioner.id,
+        "action": "dicom_study_upload_queued",
+        "patient_id": patient_id,
+        "job_id": job["job_id"],
+        "upload_count": len(uploads),
+        "total_bytes": sum(upload["size"] for upload in uploads)
+    })
+    
+    return {
+        "status": "queued",
+        "job_id": job["job_id"],
+        "uploads": len(uploads),
+        "status_url": f"/api/jobs/{job['job_id']}",
+        "events_url": f"/api/jobs/{job['job_id']}/events"
+    }
 
-@api_router.get("/imaging/analysis-history/{patient_id}")
-async def get_imaging_analysis_history(
+@api_router.get("/imaging/studies/{patient_id}")
+async def get_dicom_studies(
     patient_id: str,
     practitioner: Practitioner = Depends(get_current_practitioner)
 ):
-    """Get imaging analysis history for a patient"""
+    """Study summaries with per-series aggregates (per-frame records omitted)"""
     
-    analyses = await db.dicom_analyses.find({"patient_id": patient_id}).sort("processing_date", -1).to_list(20)
+    studies = await db.dicom_studies.find(
+        {"patient_id": patient_id}, {"_id": 0}
+    ).sort("processing_date", -1).to_list(50)
     
-    return {
-        "patient_id": patient_id,
-        "total_analyses": len(analyses),
-        "analyses": analyses
-    }
+    return {"patient_id": patient_id, "total_studies": len(studies), "studies": studies}
+
+@api_router.get("/imaging/studies/{patient_id}/series/{series_instance_uid}")
+async def get_dicom_series(
+    patient_id: str,
+    series_instance_uid: str,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """One series' aggregates including its per-frame statistics"""
+    
+    series = await db.dicom_series.find_one(
+        {"patient_id": patient_id, "series_instance_uid": series_instance_uid}, {"_id": 0}
+    )
+    if not series:
+        raise HTTPException(status_code=404, detail="Series not found")
+    return series
 
 @api_router.post("/predictions/treatment-outcome")
 async def predict_treatment_outcome(
@@ -2257,10 +2897,144 @@ async def predict_treatment_outcome(
     
     return {"status": "service_unavailable"}
 
+@api_router.post("/predictions/treatment-outcome/batch")
+async def predict_treatment_outcomes_batch(
+    batch_request: Dict[str, Any],
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Predict outcomes for N patients x M therapy plans with one model call per model"""
+    
+    if not prediction_service:
+        return {"status": "service_unavailable"}
+    
+    therapy_plans = batch_request.get("therapy_plans") or []
+    if not therapy_plans:
+        raise HTTPException(status_code=400, detail="therapy_plans is required")
+    
+    # Omitting patient_ids pages through every patient of the practitioner (nightly re-scoring):
+    # pass the returned next_after_patient_id as after_patient_id until truncated is false
+    patient_ids = batch_request.get("patient_ids")
+    patient_filter: Dict[str, Any] = {"practitioner_id": practitioner.id}
+    if patient_ids:
+        patient_filter["patient_id"] = {"$in": patient_ids}
+    elif batch_request.get("after_patient_id"):
+        patient_filter["patient_id"] = {"$gt": batch_request["after_patient_id"]}
+    
+    max_rows = int(os.environ.get("PREDICTION_BATCH_MAX_ROWS", "100000"))
+    max_patients = max(1, max_rows // len(therapy_plans))
+    if patient_ids and len(patient_ids) > max_patients:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {max_rows} patient x therapy rows")
+    
+    # One extra record tells whether another page follows
+    patient_records = await db.patients.find(patient_filter, {"_id": 0}).sort("patient_id", 1).to_list(max_patients + 1)
+    truncated = len(patient_records) > max_patients
+    patient_records = patient_records[:max_patients]
+    patients = [PatientData(**record).dict() for record in patient_records]
+    
+    started = datetime.utcnow()
+    results = await prediction_service.predict_treatment_outcomes_batch(
+        patients,
+        therapy_plans,
+        store=batch_request.get("store", True)
+    )
+    elapsed = (datetime.utcnow() - started).total_seconds()
+    metrics.record_throughput("outcome_predictions_per_second", len(results), elapsed)
+    
+    found_ids = {patient["patient_id"] for patient in patients}
+    await db.audit_log.insert_one({
+        "timestamp": datetime.utcnow(),
+        "practitioner_id": practitioner.id,
+        "action": "outcome_prediction_batch",
+        "patients_scored": len(patients),
+        "therapy_plans": len(therapy_plans),
+        "predictions": len(results)
+    })
+    
+    return {
+        "predictions": results,
+        "total_predictions": len(results),
+        "patients_scored": len(patients),
+        "therapy_plans": len(therapy_plans),
+        "missing_patient_ids": [pid for pid in (patient_ids or []) if pid not in found_ids],
+        "truncated": truncated,
+        "next_after_patient_id": patients[-1]["patient_id"] if truncated else None,
+        "elapsed_seconds": elapsed
+    }
+
+@api_router.get("/admin/models")
+async def list_registered_models(
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """List registered prediction model versions and the current manifest of each"""
+    
+    registry = get_model_registry()
+    models = await asyncio.to_thread(registry.list_models)
+    for name, info in models.items():
+        info["manifest"] = registry.get_manifest(name) if info["current_version"] else None
+    
+    return {"models": models, "registry_dir": str(registry.root_dir)}
+
+@api_router.post("/admin/models/retrain")
+async def retrain_prediction_models(
+    request_data: Optional[Dict[str, Any]] = None,
+    practitioner: Practitioner = Depends(require_admin)
+):
+    """Queue a retrain of the outcome prediction models into the model registry"""
+    
+    request_data = request_data or {}
+    job_queue = get_job_queue()
+    if not job_queue or not prediction_service:
+        raise HTTPException(status_code=503, detail="Model retraining unavailable")
+    
+    model_names = request_data.get("models")
+    unknown = [name for name in (model_names or []) if name not in prediction_service.MODEL_NAMES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown models: {', '.join(unknown)}")
+    
+    job = await job_queue.enqueue(
+        "model_retrain",
+        {"models": model_names},
+        priority=2,
+        max_attempts=1,
+        practitioner_id=practitioner.id
+    )
+    
+    return {
+        "status": "queued",
+        "job_id": job["job_id"],
+        "status_url": f"/api/jobs/{job['job_id']}",
+        "events_url": f"/api/jobs/{job['job_id']}/events"
+    }
+
+@api_router.get("/admin/diagnosis-kb")
+async def get_diagnosis_knowledge_base(
+    practitioner: Practitioner = Depends(require_admin)
+):
+    """Describe the compiled diagnosis knowledge base currently in use"""
+    
+    return await asyncio.to_thread(lambda: get_diagnosis_kb().describe())
+
+@api_router.post("/admin/diagnosis-kb/reload")
+async def reload_diagnosis_knowledge_base(
+    practitioner: Practitioner = Depends(require_admin)
+):
+    """Recompile the diagnosis knowledge base from its data file"""
+    
+    try:
+        kb = await asyncio.to_thread(reload_diagnosis_kb, True)
+    except Exception as e:
+        logger.error(f"Diagnosis knowledge base reload error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to reload diagnosis knowledge base: {str(e)}")
+    
+    return {"status": "reloaded", **kb.describe()}
+
 @api_router.get("/predictions/model-performance")
 async def get_prediction_model_performance():
     """Get performance metrics for prediction models"""
     
+    if prediction_service:
+        await prediction_service.ensure_models_loaded()
+    
     if prediction_service and prediction_service.models:
         performance_metrics = {}
         
@@ -2268,7 +3042,10 @@ async def get_prediction_model_performance():
             performance_metrics[model_name] = {
                 "performance": model_data.get("performance", {}),
                 "features": model_data.get("features", []),
-                "model_type": type(model_data.get("model", None)).__name__
+                "model_type": type(model_data.get("model", None)).__name__,
+                "version": model_data.get("version"),
+                "training_data_hash": model_data.get("training_data_hash"),
+                "trained_at": model_data.get("trained_at")
             }
         
         return {
@@ -2618,20 +3395,13 @@ async def predict_treatment_outcomes_advanced(
         try:
             ai_engine = RegenerativeMedicineAI(OPENAI_API_KEY)
             
-            # Use the existing httpx client pattern
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{ai_engine.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {ai_engine.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "gpt-4",
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": """You are a world-renowned expert in regenerative medicine outcomes research and predictive analytics. You have access to:
+            try:
+                ai_response = await get_llm_gateway().chat_completion(
+                    model="gpt-4",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": """You are a world-renowned expert in regenerative medicine outcomes research and predictive analytics. You have access to:
 
 - 25+ years of clinical outcome data
 - Advanced biomarker analysis and prognostic modeling
@@ -2642,19 +3412,17 @@ async def predict_treatment_outcomes_advanced(
 Your expertise includes predicting treatment success rates, timeline to improvement, risk factors, and personalized optimization strategies based on patient-specific factors.
 
 Provide evidence-based outcome predictions with statistical confidence intervals and detailed reasoning."""
-                            },
-                            {"role": "user", "content": prediction_prompt}
-                        ],
-                        "max_tokens": 3000,
-                        "temperature": 0.3
-                    }
+                        },
+                        {"role": "user", "content": prediction_prompt}
+                    ],
+                    max_tokens=3000,
+                    temperature=0.3,
+                    api_key=ai_engine.api_key
                 )
-            
-            if response.status_code != 200:
-                logging.error(f"OpenAI API error: {response.status_code} - {response.text}")
+            except LLMGatewayError as e:
+                logging.error(str(e))
                 return _generate_fallback_outcome_prediction(patient, therapy_plan)
             
-            ai_response = response.json()
             prediction_content = ai_response['choices'][0]['message']['content']
             
             # Parse and structure outcome predictions
@@ -3548,6 +4316,10 @@ async def create_patient(
     
     # Store in database
     await db.patients.insert_one(patient.dict())
+    await record_patient_created(db, practitioner.id)
+    
+    # Patient record (re)written - cached AI responses for this patient_id are stale
+    await invalidate_patient_llm_cache(patient.patient_id)
     
     # Log audit event
     await db.audit_log.insert_one({
@@ -3667,6 +4439,7 @@ async def generate_protocol(
     
     # Store protocol
     await db.protocols.insert_one(protocol.dict())
+    await record_protocol_created(db, practitioner.id, protocol.status)
     
     # Audit log
     await db.audit_log.insert_one({
@@ -3680,6 +4453,121 @@ async def generate_protocol(
     
     return protocol
 
+@api_router.post("/patients/{patient_id}/analyze/stream")
+async def analyze_patient_stream(
+    patient_id: str,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Comprehensive AI analysis streamed as server-sent events
+    
+    Events: status, token, diagnosis (each differential as it completes),
+    complete (final diagnostic results, persisted like /analyze), error.
+    """
+    
+    patient_record = await db.patients.find_one({
+        "patient_id": patient_id,
+        "practitioner_id": practitioner.id
+    })
+    
+    if not patient_record:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    patient_data = PatientData(**patient_record)
+    
+    async def event_stream():
+        try:
+            async for event, data in regen_ai.stream_patient_analysis(patient_data):
+                if event != "diagnostic_results":
+                    yield format_sse(event, data)
+                    continue
+                
+                analysis_record = {
+                    "patient_id": patient_id,
+                    "practitioner_id": practitioner.id,
+                    "analysis_results": [result.dict() for result in data],
+                    "timestamp": datetime.utcnow()
+                }
+                await db.patient_analyses.insert_one(analysis_record)
+                
+                yield format_sse("complete", {
+                    "patient_id": patient_id,
+                    "diagnostic_results": [result.dict() for result in data],
+                    "analysis_timestamp": datetime.utcnow()
+                })
+        except Exception as e:
+            logging.error(f"Streaming analysis error: {str(e)}")
+            yield format_sse("error", {"detail": f"Analysis failed: {str(e)}"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@api_router.post("/protocols/generate/stream")
+async def generate_protocol_stream(
+    request_data: Dict[str, Any],
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Generate a regenerative medicine protocol streamed as server-sent events
+    
+    Events: status, token, protocol_step (each step as it completes),
+    complete (final protocol, persisted and audited like /protocols/generate),
+    error.
+    """
+    
+    patient_id = request_data.get("patient_id")
+    school = SchoolOfThought(request_data.get("school_of_thought", "ai_optimized"))
+    
+    patient_record = await db.patients.find_one({
+        "patient_id": patient_id,
+        "practitioner_id": practitioner.id
+    })
+    
+    if not patient_record:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    patient_data = PatientData(**patient_record)
+    
+    async def event_stream():
+        # First byte goes out before any Mongo or LLM work
+        yield format_sse("status", {"stage": "started", "patient_id": patient_id})
+        try:
+            analysis = await db.patient_analyses.find_one(
+                {"patient_id": patient_id},
+                sort=[("timestamp", -1)]
+            )
+            
+            if not analysis:
+                yield format_sse("status", {"stage": "analyzing_patient"})
+                diagnostic_results = await regen_ai.analyze_patient_data(patient_data)
+            else:
+                diagnostic_results = [DiagnosticResult(**result) for result in analysis["analysis_results"]]
+            
+            async for event, data in regen_ai.stream_regenerative_protocol(patient_data, diagnostic_results, school):
+                if event != "protocol":
+                    yield format_sse(event, data)
+                    continue
+                
+                await db.protocols.insert_one(data.dict())
+                await record_protocol_created(db, practitioner.id, data.status)
+                
+                await db.audit_log.insert_one({
+                    "timestamp": datetime.utcnow(),
+                    "practitioner_id": practitioner.id,
+                    "action": "protocol_generated",
+                    "patient_id": patient_id,
+                    "protocol_id": data.protocol_id,
+                    "school_of_thought": school.value
+                })
+                
+                yield format_sse("complete", data.dict())
+        except CircuitOpenError:
+            yield format_sse("error", {"status_code": 503, "detail": "Protocol generation temporarily unavailable: AI provider degraded"})
+        except LLMGatewayError as e:
+            yield format_sse("error", {"status_code": 500, "detail": f"Protocol generation failed: {e.status_code or str(e)}"})
+        except Exception as e:
+            logging.error(f"Streaming protocol generation failed: {str(e)}")
+            yield format_sse("error", {"status_code": 500, "detail": f"Protocol generation failed: {str(e)}"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @api_router.get("/protocols/international-search")
 async def search_international_protocols(
     condition: str,
@@ -3740,19 +4628,24 @@ async def approve_protocol(
 ):
     """Approve protocol for implementation"""
     
-    result = await db.protocols.update_one(
+    # Previous status is needed to move the protocol between rollup buckets
+    previous = await db.protocols.find_one_and_update(
         {"protocol_id": protocol_id, "practitioner_id": practitioner.id},
         {
             "$set": {
                 "status": "approved",
                 "approved_at": datetime.utcnow()
             }
-        }
+        },
+        projection={"_id": 0, "status": 1},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Protocol not found")
     
+    await record_protocol_status_change(db, practitioner.id, previous.get("status"), "approved")
+    
     # Audit log
     await db.audit_log.insert_one({
         "timestamp": datetime.utcnow(),
@@ -3822,6 +4715,38 @@ async def submit_outcome(
     
     return outcome
 
+@api_router.post("/analytics/rollups/reconcile")
+async def reconcile_dashboard_rollups(
+    request_data: Optional[Dict[str, Any]] = None,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Queue a rebuild of practitioner_rollups from patients, protocols and patient_outcomes"""
+    
+    request_data = request_data or {}
+    all_practitioners = bool(request_data.get("all_practitioners"))
+    if all_practitioners:
+        # Rebuilding every practitioner's rollups is an administrative operation
+        await require_admin(practitioner)
+    job_queue = get_job_queue()
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="Background job queue unavailable")
+    
+    job = await job_queue.enqueue(
+        "rollup_reconciliation",
+        # Omitting practitioner_id (all_practitioners) rebuilds every rollup
+        {"practitioner_id": None if all_practitioners else practitioner.id},
+        priority=2,
+        practitioner_id=practitioner.id,
+        dedupe_key="rollup_reconciliation:all" if all_practitioners else f"rollup_reconciliation:{practitioner.id}"
+    )
+    
+    return {
+        "status": "queued",
+        "job_id": job["job_id"],
+        "status_url": f"/api/jobs/{job['job_id']}",
+        "events_url": f"/api/jobs/{job['job_id']}/events"
+    }
+
 @api_router.get("/analytics/dashboard")
 async def get_dashboard_analytics(
     practitioner: Practitioner = Depends(get_current_practitioner)
@@ -3829,26 +4754,18 @@ async def get_dashboard_analytics(
     """Get practitioner dashboard analytics with real outcome data"""
     
     try:
-        # Get patient counts
-        total_patients = await db.patients.count_documents(
-            {"practitioner_id": practitioner.id}
-        )
-        
-        # Get protocol counts by status
-        protocols_pending = await db.protocols.count_documents({
-            "practitioner_id": practitioner.id,
-            "status": "draft"
-        })
-        
-        protocols_approved = await db.protocols.count_documents({
-            "practitioner_id": practitioner.id,
-            "status": "approved"
-        })
-        
-        # Get all protocols for this practitioner
-        total_protocols = await db.protocols.count_documents({
-            "practitioner_id": practitioner.id
-        })
+        # Patient / protocol / outcome statistics come from one incrementally maintained document
+        rollup = await get_practitioner_rollup(db, practitioner.id)
+        if rollup is None:
+            # First dashboard load for this practitioner (or rollups never built): backfill it
+            await reconcile_practitioner_rollups(db, practitioner.id)
+            rollup = await get_practitioner_rollup(db, practitioner.id) or {}
+        
+        protocols_by_status = rollup.get("protocols_by_status", {})
+        total_patients = rollup.get("total_patients", 0)
+        protocols_pending = protocols_by_status.get("draft", 0)
+        protocols_approved = protocols_by_status.get("approved", 0)
+        total_protocols = rollup.get("total_protocols", 0)
         
         # Get recent outcomes from new patient_outcomes collection
         recent_outcomes = await db.patient_outcomes.find(
@@ -3864,32 +4781,12 @@ async def get_dashboard_analytics(
             if 'last_updated' in outcome and hasattr(outcome['last_updated'], 'isoformat'):
                 outcome['last_updated'] = outcome['last_updated'].isoformat()
         
-        # Calculate outcome statistics with error handling
-        try:
-            all_outcomes = await db.patient_outcomes.find(
-                {"recorded_by": practitioner.id}
-            ).to_list(None)
-            
-            outcomes_tracked = len(all_outcomes)
-            
-            # Calculate success rate from actual outcomes
-            success_scores = [o.get("overall_success_score", 0) for o in all_outcomes if o.get("overall_success_score") is not None]
-            average_success_rate = (sum(success_scores) / len(success_scores)) * 100 if success_scores else 87.0  # Default from previous data
-            
-            # Calculate average pain reduction
-            pain_reductions = [o.get("pain_reduction_percentage", 0) for o in all_outcomes if o.get("pain_reduction_percentage") is not None]
-            average_pain_reduction = sum(pain_reductions) / len(pain_reductions) if pain_reductions else 0
-            
-            # Calculate patient satisfaction
-            satisfaction_scores = [o.get("patient_satisfaction", 8) for o in all_outcomes if o.get("patient_satisfaction") is not None]
-            average_satisfaction = sum(satisfaction_scores) / len(satisfaction_scores) if satisfaction_scores else 8.4
-            
-        except Exception as outcome_error:
-            logging.warning(f"Error calculating outcome statistics: {str(outcome_error)}")
-            outcomes_tracked = 0
-            average_success_rate = 87.0
-            average_pain_reduction = 0
-            average_satisfaction = 8.4
+        # Outcome statistics from the rollup running sums
+        outcomes_tracked = rollup.get("outcomes_tracked", 0)
+        average_success = rollup_average(rollup, "success_score")
+        average_success_rate = average_success * 100 if average_success is not None else 87.0  # Default from previous data
+        average_pain_reduction = rollup_average(rollup, "pain_reduction") or 0
+        average_satisfaction = rollup_average(rollup, "patient_satisfaction") or 8.4
         
         # Get recent activities with error handling
         try:
@@ -3910,14 +4807,14 @@ async def get_dashboard_analytics(
         
         # Get literature stats (maintain existing numbers plus real data)
         try:
-            literature_stats = await db.literature_papers.count_documents({})
+            literature_stats = await db.literature_papers.estimated_document_count()
             total_papers = max(2847, literature_stats)  # Use existing number or higher
         except Exception:
             total_papers = 2847
         
         # Get file upload stats
         try:
-            total_files = await db.uploaded_files.count_documents({})
+            total_files = await db.uploaded_files.estimated_document_count()
         except Exception:
             total_files = 0
         
@@ -4219,46 +5116,23 @@ async def risk_stratify_patients(
 ):
     """Risk stratify a cohort of patients for treatment selection"""
     
+    if not personalized_risk_assessment:
+        raise HTTPException(status_code=503, detail="Personalized risk assessment service unavailable")
+    
+    max_cohort = int(os.environ.get("RISK_COHORT_MAX_PATIENTS", "50000"))
+    if len(request.patient_cohort) > max_cohort:
+        raise HTTPException(status_code=400, detail=f"Cohort exceeds {max_cohort} patients")
+    
     try:
-        from advanced_services import PersonalizedRiskAssessment
-        risk_assessment = PersonalizedRiskAssessment(db)
-        await risk_assessment.initialize_risk_assessment()
-        
-        # Process each patient
-        stratification_results = []
         treatment_plan = {"treatment_type": request.treatment_type}
         
-        for patient_data in request.patient_cohort[:20]:  # Limit to 20 patients for performance
-            try:
-                risk_result = await risk_assessment.perform_comprehensive_risk_assessment(
-                    patient_data, treatment_plan
-                )
-                
-                # Extract key risk metrics
-                risk_summary = {
-                    "patient_id": patient_data.get("patient_id"),
-                    "overall_risk_category": risk_result.get("risk_assessment", {}).get(
-                        "overall_risk_stratification", {}
-                    ).get("overall_risk_category", "moderate_risk_moderate_benefit"),
-                    "treatment_success_probability": risk_result.get("risk_assessment", {}).get(
-                        "individual_risk_assessments", {}
-                    ).get("treatment_success", {}).get("predicted_success_probability", 0.75),
-                    "adverse_event_risk": risk_result.get("risk_assessment", {}).get(
-                        "individual_risk_assessments", {}
-                    ).get("adverse_events", {}).get("overall_adverse_event_risk", 0.10),
-                    "risk_benefit_ratio": risk_result.get("risk_assessment", {}).get(
-                        "overall_risk_stratification", {}
-                    ).get("risk_benefit_ratio", 3.0)
-                }
-                
-                stratification_results.append(risk_summary)
-                
-            except Exception as patient_error:
-                logger.warning(f"Risk assessment failed for patient {patient_data.get('patient_id')}: {str(patient_error)}")
-                continue
-        
-        # Sort by risk-benefit ratio (highest first)
-        stratification_results.sort(key=lambda x: x.get("risk_benefit_ratio", 0), reverse=True)
+        # One vectorized pass over the whole cohort, persisted with a single insert_many
+        started = datetime.utcnow()
+        stratification_results = await personalized_risk_assessment.stratify_cohort(
+            request.patient_cohort, treatment_plan
+        )
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        metrics.record_throughput("risk_stratification_patients_per_second", len(stratification_results), elapsed)
         
         # Audit log
         await db.audit_log.insert_one({
@@ -4276,6 +5150,7 @@ async def risk_stratify_patients(
             "successful_assessments": len(stratification_results),
             "treatment_type": request.treatment_type,
             "ranking_criteria": "risk_benefit_ratio",
+            "elapsed_seconds": elapsed,
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -4565,6 +5440,36 @@ async def perform_diagnostic_confidence_analysis(
         logger.error(f"Confidence analysis error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to perform confidence analysis: {str(e)}")
 
+class MonteCarloSimulationRequest(BaseModel):
+    diagnosis: str
+    patient_data: Dict[str, Any] = Field(default_factory=dict)
+    num_simulations: int = Field(default=1000, ge=1, le=MAX_SIMULATIONS)
+    seed: Optional[int] = None
+
+@api_router.post("/diagnosis/monte-carlo")
+async def run_diagnostic_monte_carlo(
+    request: MonteCarloSimulationRequest,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Monte Carlo scenario simulation for one diagnosis (up to 1e6 vectorized scenarios)"""
+    
+    if not pubmed_service:
+        raise HTTPException(status_code=503, detail="Literature service unavailable")
+    
+    try:
+        started = datetime.utcnow()
+        simulation = await pubmed_service._perform_monte_carlo_simulation(
+            request.diagnosis, request.patient_data, request.num_simulations, request.seed
+        )
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        metrics.record_throughput("monte_carlo_scenarios_per_second", request.num_simulations, elapsed)
+        
+        return {**simulation, "diagnosis": request.diagnosis, "elapsed_seconds": elapsed}
+        
+    except Exception as e:
+        logger.error(f"Monte Carlo simulation error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Monte Carlo simulation failed: {str(e)}")
+
 @api_router.get("/diagnosis/mechanism-insights/{diagnosis_name}")
 async def get_diagnostic_mechanism_insights(
     diagnosis_name: str,
@@ -5333,6 +6238,157 @@ async def get_global_knowledge_status(
         logger.error(f"Global knowledge status error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get status: {str(e)}")
 
+# =============== PERFORMANCE & INFRASTRUCTURE ENDPOINTS ===============
+
+@api_router.get("/system/metrics")
+async def get_system_metrics():
+    """Get in-process performance metrics and shared infrastructure status"""
+
+    llm_cache = get_llm_cache()
+    return {
+        "llm_gateway": get_llm_gateway().get_status(),
+        "llm_cache": await llm_cache.get_stats() if llm_cache else {"status": "unavailable"},
+        "request_coalescing": single_flight.get_status(),
+        "pubmed_eutils": get_eutils_client().get_status(),
+        "literature_index": get_literature_index().get_status() if get_literature_index() else {"status": "unavailable"},
+        "job_queue": await get_job_queue().get_status() if get_job_queue() else {"status": "unavailable"},
+        "executors": get_executors().status() if get_executors() else {"status": "unavailable"},
+        "metrics": metrics.snapshot(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@api_router.get("/system/indexes")
+async def get_system_indexes():
+    """Audit registered MongoDB indexes: present, missing, conflicting and unregistered extras"""
+    
+    return {
+        **(await audit_indexes(db)),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@api_router.get("/system/llm-cache/stats")
+async def get_llm_cache_stats():
+    """Get LLM response cache hit/miss counters and tier sizes"""
+    
+    llm_cache = get_llm_cache()
+    if not llm_cache:
+        raise HTTPException(status_code=503, detail="LLM response cache unavailable")
+    
+    return await llm_cache.get_stats()
+
+@api_router.delete("/system/llm-cache/patients/{patient_id}")
+async def invalidate_patient_llm_responses(
+    patient_id: str,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Manually invalidate all cached AI responses for a patient"""
+    
+    deleted = await invalidate_patient_llm_cache(patient_id)
+    return {"status": "invalidated", "patient_id": patient_id, "persisted_entries_deleted": deleted}
+
+# =============== BACKGROUND JOB ENDPOINTS ===============
+
+@api_router.get("/jobs/{job_id}")
+async def get_job_status(
+    job_id: str,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Poll a background job's status, progress and result"""
+    
+    job_queue = get_job_queue()
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="Background job queue unavailable")
+    
+    job = await job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
+
+@api_router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Server-sent progress events for a background job until it finishes"""
+    
+    job_queue = get_job_queue()
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="Background job queue unavailable")
+    
+    job = await job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        updates = job_queue.subscribe(job_id)
+        try:
+            current = job
+            yield format_sse("status", current)
+            while current["status"] not in TERMINAL_STATES:
+                try:
+                    update = await asyncio.wait_for(updates.get(), timeout=5)
+                    yield format_sse("progress", update)
+                    if update.get("status") in TERMINAL_STATES:
+                        break
+                except asyncio.TimeoutError:
+                    # Job may be running in another worker process - fall back to the stored state
+                    current = await job_queue.get_job(job_id) or current
+                    yield format_sse("status", current)
+            yield format_sse("complete", await job_queue.get_job(job_id))
+        finally:
+            job_queue.unsubscribe(job_id, updates)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@api_router.post("/patients/{patient_id}/analyze/jobs")
+async def enqueue_patient_analysis(
+    patient_id: str,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Queue a comprehensive patient analysis and return its job id immediately"""
+    
+    job_queue = get_job_queue()
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="Background job queue unavailable")
+    
+    patient_record = await db.patients.find_one({
+        "patient_id": patient_id,
+        "practitioner_id": practitioner.id
+    })
+    if not patient_record:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    job = await job_queue.enqueue(
+        "patient_analysis",
+        {"patient_id": patient_id},
+        priority=6,
+        max_attempts=2,
+        patient_id=patient_id,
+        practitioner_id=practitioner.id
+    )
+    
+    return {
+        "status": "queued",
+        "job_id": job["job_id"],
+        "status_url": f"/api/jobs/{job['job_id']}",
+        "events_url": f"/api/jobs/{job['job_id']}/events"
+    }
+
+@api_router.get("/patients/{patient_id}/jobs")
+async def get_patient_jobs(
+    patient_id: str,
+    limit: int = 20,
+    practitioner: Practitioner = Depends(get_current_practitioner)
+):
+    """Recent background jobs for a patient"""
+    
+    jobs = await db.jobs.find(
+        {"patient_id": patient_id}, {"_id": 0, "payload": 0}
+    ).sort("created_at", -1).limit(limit).to_list(limit)
+    
+    return {"patient_id": patient_id, "jobs": jobs, "total": len(jobs)}
+
 # Include router in main app
 app.include_router(api_router)
 
@@ -5360,6 +6416,60 @@ async def startup_advanced_services():
     global regulatory_intelligence, protocol_library, collaboration_platform
     global living_evidence_engine, advanced_differential_diagnosis, enhanced_explainable_ai
     
+    # Each subsystem below fails on its own: a broken index, cache or data file is logged
+    # and leaves that subsystem unavailable without taking the core services down with it
+    try:
+        # Registered indexes for every queried collection ("check" only reports, for
+        # large deployments that build indexes out of band with db_indexes.py --apply)
+        index_mode = os.environ.get("DB_INDEX_STARTUP_MODE", "apply").lower()
+        if index_mode == "apply":
+            index_result = await ensure_db_indexes(db)
+            if index_result["failed"]:
+                logger.error(f"{len(index_result['failed'])} registered indexes could not be created")
+        elif index_mode == "check":
+            index_totals = (await audit_indexes(db))["totals"]
+            if index_totals["missing"] or index_totals["conflicting"]:
+                logger.warning(f"MongoDB index audit: {index_totals}")
+    except Exception as e:
+        logger.error(f"MongoDB index provisioning failed: {str(e)}")
+    
+    try:
+        # Content-addressed LLM response cache (LRU + Mongo TTL)
+        configure_llm_cache(
+            db,
+            max_memory_entries=int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", "512")),
+            ttl_seconds=int(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        )
+    except Exception as e:
+        logger.error(f"LLM response cache unavailable: {str(e)}")
+    
+    try:
+        # Process pool for CPU-heavy image/PDF analysis, thread pool for blocking parsing
+        configure_executors()
+    except Exception as e:
+        logger.error(f"Executor pools unavailable, falling back to the default thread pool: {str(e)}")
+    
+    try:
+        # BM25 full-text literature index (memory-mapped segments + background catch-up from
+        # Mongo); one worker writes segments, the others sync from Mongo and reload its manifest
+        await run_io(configure_literature_index, db)
+        start_literature_index_sync()
+    except Exception as e:
+        logger.error(f"Literature index unavailable: {str(e)}")
+    
+    try:
+        # Versioned prediction models on disk (loaded lazily, trained only on explicit retrain)
+        configure_model_registry()
+    except Exception as e:
+        logger.error(f"Model registry unavailable: {str(e)}")
+    
+    try:
+        # Compiled diagnosis knowledge base; the watcher recompiles it off the event loop on edits
+        await run_io(configure_diagnosis_kb)
+        start_diagnosis_kb_watcher()
+    except Exception as e:
+        logger.error(f"Diagnosis knowledge base unavailable: {str(e)}")
+    
     try:
         # Initialize existing advanced services
         federated_service = FederatedLearningService(db)
@@ -5408,9 +6518,44 @@ async def startup_advanced_services():
         
     except Exception as e:
         logger.error(f"Failed to initialize advanced services: {str(e)}")
+    
+    try:
+        # Raw uploads streamed into GridFS (content-hashed for dedup)
+        configure_upload_storage(db)
+    except Exception as e:
+        logger.error(f"Upload storage unavailable: {str(e)}")
+    
+    try:
+        # Durable background job queue (file extraction, queued AI analysis); workers start
+        # once the services their handlers call into have been built
+        job_queue = configure_job_queue(db)
+        job_queue.register_handler("file_processing", run_file_processing_job, on_failure=on_file_processing_failure)
+        job_queue.register_handler("patient_analysis", run_patient_analysis_job)
+        job_queue.register_handler("dicom_study_ingestion", run_dicom_study_job)
+        job_queue.register_handler("literature_ingest", run_literature_ingest_job)
+        job_queue.register_handler("rollup_reconciliation", run_rollup_reconciliation_job)
+        job_queue.register_handler("model_retrain", run_model_retrain_job)
+        job_queue.start()
+        if os.environ.get("ROLLUP_RECONCILE_ON_STARTUP", "true").lower() == "true":
+            # Repairs rollup increments lost to crashes between a write and its $inc; every
+            # worker process runs this, so the dedupe key keeps it to one pending job
+            await job_queue.enqueue(
+                "rollup_reconciliation", {"practitioner_id": None}, priority=1,
+                dedupe_key="rollup_reconciliation:all"
+            )
+    except Exception as e:
+        logger.error(f"Background job queue unavailable: {str(e)}")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    job_queue = get_job_queue()
+    if job_queue:
+        await job_queue.stop()
+    await shutdown_llm_gateway()
+    await shutdown_eutils_client()
+    await shutdown_literature_index()
+    await stop_diagnosis_kb_watcher()
+    shutdown_executors()
     client.close()
 
 if __name__ == "__main__":
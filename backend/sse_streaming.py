@@ -0,0 +1,109 @@
+"""
+Server-Sent Event Helpers for RegenMed AI Pro
+- SSE frame formatting
+- Incremental extraction of JSON array items (protocol steps, differential
+  diagnoses) from a partially streamed LLM completion
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"  # disable proxy buffering so tokens flush immediately
+}
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one server-sent event frame"""
+    payload = json.dumps(data, default=lambda o: o.isoformat() if isinstance(o, datetime) else str(o))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class IncrementalJSONArrayParser:
+    """Emit each complete object of a named JSON array as its text streams in
+
+    Feed successive content deltas; once the array for `array_key` has been
+    located, every fully balanced top-level object inside it is decoded and
+    returned from feed(). Brace counting is string/escape aware so braces
+    inside clinical free text do not confuse the scanner.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self._buffer = ""
+        self._scan_pos = 0
+        self._array_started = False
+        self._array_closed = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start: Optional[int] = None
+        self.items: List[Dict[str, Any]] = []
+
+    def _locate_array(self) -> bool:
+        key_pos = self._buffer.find(f'"{self.array_key}"')
+        if key_pos < 0:
+            return False
+        bracket_pos = self._buffer.find("[", key_pos)
+        if bracket_pos < 0:
+            return False
+        self._array_started = True
+        self._scan_pos = bracket_pos + 1
+        return True
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        """Consume a content delta and return any newly completed array items"""
+
+        self._buffer += delta
+        completed: List[Dict[str, Any]] = []
+
+        if self._array_closed:
+            return completed
+        if not self._array_started and not self._locate_array():
+            return completed
+
+        buffer = self._buffer
+        position = self._scan_pos
+        while position < len(buffer):
+            char = buffer[position]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._item_start = position
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._item_start is not None:
+                    try:
+                        item = json.loads(buffer[self._item_start:position + 1])
+                        self.items.append(item)
+                        completed.append(item)
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_start = None
+            elif char == "]" and self._depth == 0:
+                self._array_closed = True
+                position += 1
+                break
+
+            position += 1
+
+        self._scan_pos = position
+        return completed
+
+    @property
+    def text(self) -> str:
+        """Full content received so far"""
+        return self._buffer
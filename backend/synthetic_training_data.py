@@ -0,0 +1,141 @@
+"""
+Vectorized Synthetic Training Data for Outcome Prediction Models
+- Whole feature matrices drawn column-wise from a seeded np.random.Generator
+- Same feature layout and target formulas as the original per-sample loops
+- Scales to millions of rows (optionally float32) for model stress tests
+- Chunked mode yields (X, y) batches for partial_fit-capable estimators:
+    for X, y in iter_training_batches("dosage", 5_000_000, batch_size=100_000, seed=7):
+        model.partial_fit(X, y)
+"""
+
+import logging
+from typing import Callable, Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEED = 42
+
+SeedLike = Union[None, int, np.random.Generator]
+
+
+def _rng(seed: SeedLike) -> np.random.Generator:
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+def generate_success_training_data(n_samples: int = 1000, seed: SeedLike = DEFAULT_SEED, dtype=np.float64) -> Dict[str, np.ndarray]:
+    """Features [age, gender, diagnosis_confidence, therapy_type, dosage, comorbidities,
+    previous_treatments, baseline_pain] and clamped success rates"""
+
+    rng = _rng(seed)
+    age = rng.normal(55, 15, n_samples)  # Average age 55
+    gender = rng.integers(0, 2, n_samples)  # 0=male, 1=female
+    diagnosis_conf = rng.uniform(0.7, 1.0, n_samples)
+    therapy_type = rng.integers(0, 3, n_samples)  # 0=PRP, 1=BMAC, 2=Exosomes
+    dosage = rng.uniform(0.5, 2.0, n_samples)  # Relative dosage
+    comorbidities = rng.poisson(1, n_samples)
+    prev_treatments = rng.poisson(2, n_samples)
+    baseline_pain = rng.uniform(3, 9, n_samples)  # Pain scale 1-10
+
+    success_rates = (
+        0.8 +  # Base success rate
+        (1 - age / 100) * 0.1 +  # Age factor
+        diagnosis_conf * 0.1 +  # Confidence factor
+        (therapy_type + 1) * 0.05 +  # Therapy effectiveness
+        dosage * 0.05 -  # Dosage optimization
+        comorbidities * 0.03 -  # Comorbidity penalty
+        prev_treatments * 0.02 -  # Previous treatment failures
+        baseline_pain * 0.02  # Pain severity penalty
+    )
+
+    features = np.column_stack([age, gender, diagnosis_conf, therapy_type, dosage,
+                                comorbidities, prev_treatments, baseline_pain]).astype(dtype, copy=False)
+    return {
+        "features": features,
+        "success_rates": np.clip(success_rates, 0.3, 0.95).astype(dtype, copy=False)
+    }
+
+
+def generate_timeline_training_data(n_samples: int = 800, seed: SeedLike = DEFAULT_SEED, dtype=np.float64) -> Dict[str, np.ndarray]:
+    """Features [age, severity, therapy_type, baseline_function, inflammation] and
+    response categories (0=fast, 1=moderate, 2=slow)"""
+
+    rng = _rng(seed)
+    age = rng.normal(50, 20, n_samples)
+    severity = rng.uniform(1, 5, n_samples)
+    therapy_type = rng.integers(0, 3, n_samples)
+    baseline_function = rng.uniform(0.3, 0.9, n_samples)
+    inflammation = rng.uniform(0.1, 0.8, n_samples)
+
+    response_score = (
+        baseline_function * 2 +  # Better baseline = faster response
+        (1 - severity / 5) * 1.5 +  # Lower severity = faster response
+        (1 - inflammation) * 1 +  # Lower inflammation = faster response
+        (therapy_type + 1) * 0.3  # Therapy effectiveness
+    )
+    categories = np.where(response_score > 3.5, 0, np.where(response_score > 2.5, 1, 2))
+
+    features = np.column_stack([age, severity, therapy_type, baseline_function, inflammation]).astype(dtype, copy=False)
+    return {
+        "features": features,
+        "response_categories": categories.astype(np.int64)
+    }
+
+
+def generate_dosage_training_data(n_samples: int = 800, seed: SeedLike = DEFAULT_SEED, dtype=np.float64) -> Dict[str, np.ndarray]:
+    """Features [age, weight, severity, therapy_type, previous_response] and clamped optimal dosages"""
+
+    rng = _rng(seed)
+    age = rng.normal(50, 20, n_samples)
+    weight = rng.normal(70, 15, n_samples)  # kg
+    severity = rng.uniform(1, 5, n_samples)
+    therapy_type = rng.integers(0, 3, n_samples)  # PRP, BMAC, Exosomes
+    previous_response = rng.uniform(0, 1, n_samples)  # 0=no response, 1=excellent
+
+    dosage_modifier = (
+        (weight / 70) * 0.3 +  # Weight adjustment
+        severity * 0.2 +  # Severity adjustment
+        (therapy_type + 1) * 0.1 +  # Therapy type adjustment
+        (1 - previous_response) * 0.2  # Previous response adjustment
+    )
+
+    features = np.column_stack([age, weight, severity, therapy_type, previous_response]).astype(dtype, copy=False)
+    return {
+        "features": features,
+        "optimal_dosages": np.clip(1.0 + dosage_modifier, 0.5, 3.0).astype(dtype, copy=False)
+    }
+
+
+# dataset name -> (generator, target key)
+GENERATORS: Dict[str, Tuple[Callable[..., Dict[str, np.ndarray]], str]] = {
+    "success": (generate_success_training_data, "success_rates"),
+    "timeline": (generate_timeline_training_data, "response_categories"),
+    "dosage": (generate_dosage_training_data, "optimal_dosages"),
+}
+
+
+def iter_training_batches(
+    dataset: str,
+    n_samples: int,
+    batch_size: int = 100_000,
+    seed: Optional[int] = DEFAULT_SEED,
+    dtype=np.float64
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Yield (features, targets) batches so memory stays bounded by batch_size
+
+    Each batch draws from its own child stream spawned from the seed, so the
+    sequence is reproducible for a given (seed, batch_size).
+    """
+
+    if dataset not in GENERATORS:
+        raise ValueError(f"Unknown training dataset: {dataset}")
+    if batch_size <= 0:
+        raise ValueError("batch_size must be positive")
+
+    generator, target_key = GENERATORS[dataset]
+    n_batches = -(-n_samples // batch_size)
+    for index, child in enumerate(np.random.SeedSequence(seed).spawn(n_batches)):
+        size = min(batch_size, n_samples - index * batch_size)
+        batch = generator(size, seed=np.random.default_rng(child), dtype=dtype)
+        yield batch["features"], batch[target_key]
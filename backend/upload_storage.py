@@ -0,0 +1,124 @@
+"""
+Streaming Upload Storage (GridFS)
+- Uploads are copied chunk by chunk into a GridFS bucket; peak memory is one chunk, not one file
+- SHA-256 and byte count computed on the fly while streaming
+- Content hash lets callers short-circuit identical re-uploads to the existing file record
+- Raw bytes stay retrievable by storage_id, so any upload can be reprocessed later
+- Stored files can be streamed to local disk for readers that memory-map their input
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, NamedTuple, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKET = "patient_uploads"
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # Bytes read from the client per iteration
+GRIDFS_CHUNK_SIZE = 255 * 1024  # GridFS default document chunk
+
+ChunkReader = Callable[[int], Awaitable[bytes]]
+
+
+class StoredUpload(NamedTuple):
+    storage_id: str
+    sha256: str
+    size: int
+
+
+class UploadStorage:
+    """GridFS-backed store for raw patient uploads"""
+
+    def __init__(self, db_client, bucket_name: str = DEFAULT_BUCKET, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.db = db_client
+        self.bucket_name = bucket_name
+        self.chunk_size = chunk_size
+        self.bucket = AsyncIOMotorGridFSBucket(db_client, bucket_name=bucket_name, chunk_size_bytes=GRIDFS_CHUNK_SIZE)
+
+    async def store_stream(
+        self, read_chunk: ChunkReader, filename: str, metadata: Optional[Dict[str, Any]] = None
+    ) -> StoredUpload:
+        """Stream read_chunk(n) until it returns b"" into a new GridFS file
+
+        The hash is only known at the end, so it is written to the file's
+        metadata after the last chunk. Partially written files are aborted.
+        """
+
+        digest = hashlib.sha256()
+        size = 0
+        grid_in = self.bucket.open_upload_stream(filename, metadata=dict(metadata or {}))
+        try:
+            while True:
+                chunk = await read_chunk(self.chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                await grid_in.write(chunk)
+            await grid_in.close()
+        except BaseException:
+            await grid_in.abort()
+            raise
+
+        sha256 = digest.hexdigest()
+        await self.db[f"{self.bucket_name}.files"].update_one(
+            {"_id": grid_in._id}, {"$set": {"metadata.sha256": sha256}}
+        )
+        metrics.increment("upload_storage_bytes_total", value=size)
+        return StoredUpload(str(grid_in._id), sha256, size)
+
+    async def iter_chunks(self, storage_id: str) -> AsyncIterator[bytes]:
+        grid_out = await self.bucket.open_download_stream(ObjectId(storage_id))
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+    async def read_bytes(self, storage_id: str) -> bytes:
+        """Whole file in memory, for processors that need a complete buffer"""
+        grid_out = await self.bucket.open_download_stream(ObjectId(storage_id))
+        return await grid_out.read()
+
+    async def download_to_file(self, storage_id: str, path: str) -> str:
+        """Stream the stored bytes into a local file (for memory-mapped readers)"""
+        with open(path, "wb") as handle:
+            async for chunk in self.iter_chunks(storage_id):
+                await asyncio.to_thread(handle.write, chunk)
+        return path
+
+    async def delete(self, storage_id: Optional[str]):
+        if not storage_id:
+            return
+        try:
+            await self.bucket.delete(ObjectId(storage_id))
+        except (NoFile, InvalidId):
+            pass
+        except Exception as e:
+            logger.warning(f"Upload storage cleanup failed for {storage_id}: {str(e)}")
+
+
+_storage: Optional[UploadStorage] = None
+
+
+def configure_upload_storage(db_client) -> UploadStorage:
+    global _storage
+    _storage = UploadStorage(
+        db_client,
+        bucket_name=os.environ.get("UPLOAD_GRIDFS_BUCKET", DEFAULT_BUCKET),
+        chunk_size=int(os.environ.get("UPLOAD_CHUNK_SIZE_BYTES", str(DEFAULT_CHUNK_SIZE)))
+    )
+    return _storage
+
+
+def get_upload_storage() -> Optional[UploadStorage]:
+    return _storage
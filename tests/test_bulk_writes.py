@@ -0,0 +1,128 @@
+"""
+bulk_upsert field partitioning across $setOnInsert / $set / $addToSet, against an in-memory collection
+"""
+
+import asyncio
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from bulk_writes import bulk_upsert
+
+
+class BulkResult:
+    def __init__(self, details):
+        self.bulk_api_result = details
+
+
+class FakeCollection:
+    """Applies unordered upserts the way Mongo would, including its operator conflict check"""
+
+    name = "literature_papers"
+
+    def __init__(self, docs=()):
+        self.docs = {doc["pmid"]: dict(doc) for doc in docs}
+        self.batches = []
+        self.duplicate_keys = set()
+
+    async def bulk_write(self, operations, ordered=True):
+        assert not ordered
+        self.batches.append(operations)
+        details = {"nMatched": 0, "nModified": 0, "upserted": [], "writeErrors": []}
+        for index, operation in enumerate(operations):
+            query, update = operation._filter, operation._doc
+            fields = [field for operator in update.values() for field in operator]
+            assert len(fields) == len(set(fields)), f"conflicting update operators: {update}"
+
+            key = query["pmid"]
+            if key in self.duplicate_keys:
+                details["writeErrors"].append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key"})
+                continue
+            doc = self.docs.get(key)
+            if doc is None:
+                doc = {**query, **update.get("$setOnInsert", {}), "_id": ObjectId()}
+                self.docs[key] = doc
+                details["upserted"].append({"index": index, "_id": doc["_id"]})
+            else:
+                details["nMatched"] += 1
+                details["nModified"] += 1
+            doc.update(update.get("$set", {}))
+            for field, values in update.get("$addToSet", {}).items():
+                existing = doc.setdefault(field, [])
+                existing.extend(value for value in values["$each"] if value not in existing)
+
+        if details["writeErrors"]:
+            raise BulkWriteError(details)
+        return BulkResult(details)
+
+
+def run(collection, documents, **options):
+    return asyncio.run(bulk_upsert(collection, documents, key_field="pmid", **options))
+
+
+def test_new_documents_are_inserted_whole_and_existing_ones_only_refreshed():
+    collection = FakeCollection([{"pmid": "1", "title": "Old title", "abstract": "kept", "search_queries": ["knee"]}])
+    papers = [
+        {"pmid": "1", "title": "Revised title", "abstract": "Source abstract", "search_queries": ["ignored"], "created_at": "t1"},
+        {"pmid": "2", "title": "New paper", "abstract": "fresh", "created_at": "t1"},
+    ]
+
+    result = run(
+        collection, papers,
+        add_to_set={"search_queries": ["prp"]},
+        set_fields={"last_accessed": "now"},
+        refresh_fields=["title"],
+    )
+
+    existing, new = collection.docs["1"], collection.docs["2"]
+    assert existing["title"] == "Revised title"
+    assert existing["abstract"] == "kept"
+    assert "created_at" not in existing
+    assert existing["search_queries"] == ["knee", "prp"]
+    assert existing["last_accessed"] == "now"
+
+    assert new["abstract"] == "fresh"
+    assert new["created_at"] == "t1"
+    assert new["search_queries"] == ["prp"]
+    assert new["last_accessed"] == "now"
+
+    assert result["inserted"] == 1 and result["matched"] == 1
+    assert result["inserted_documents"][0]["_id"] == new["_id"]
+    assert [doc["pmid"] for doc in result["updated_documents"]] == ["1"]
+    assert result["updated_documents"][0]["last_accessed"] == "now"
+
+
+def test_set_fields_win_over_refresh_fields_and_empty_sets_are_dropped():
+    collection = FakeCollection([{"pmid": "1", "title": "Old"}])
+
+    run(collection, [{"pmid": "1", "title": "From source"}],
+        add_to_set={"search_queries": []},
+        set_fields={"title": "Pinned"},
+        refresh_fields=["title"])
+
+    operation = collection.batches[0][0]
+    assert set(operation._doc) == {"$setOnInsert", "$set"}
+    assert operation._doc["$set"] == {"title": "Pinned"}
+    assert collection.docs["1"]["title"] == "Pinned"
+
+
+def test_documents_without_a_key_are_skipped_and_batches_are_split():
+    collection = FakeCollection()
+    papers = [{"pmid": str(number)} for number in range(5)] + [{"pmid": ""}, {"title": "no key"}]
+
+    result = run(collection, papers, batch_size=2)
+
+    assert result["skipped"] == 2
+    assert result["inserted"] == 5
+    assert [len(batch) for batch in collection.batches] == [2, 2, 1]
+
+
+def test_duplicate_key_races_are_neither_inserted_nor_updated():
+    collection = FakeCollection([{"pmid": "1"}])
+    collection.duplicate_keys = {"2"}
+
+    result = run(collection, [{"pmid": "1"}, {"pmid": "2"}, {"pmid": "3"}])
+
+    assert result["matched"] == 1
+    assert [doc["pmid"] for doc in result["inserted_documents"]] == ["3"]
+    assert [doc["pmid"] for doc in result["updated_documents"]] == ["1"]
@@ -0,0 +1,55 @@
+"""
+Vectorized, cached credible intervals vs the per-diagnosis scipy.stats.beta.ppf calls they replaced
+"""
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from credible_intervals import INTERVAL_LEVELS, PSEUDO_COUNT, clear_interval_cache, credible_intervals
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_interval_cache()
+    yield
+    clear_interval_cache()
+
+
+def reference_intervals(probability):
+    alpha = probability * PSEUDO_COUNT
+    beta = (1 - probability) * PSEUDO_COUNT
+    return {
+        level: [stats.beta.ppf(lower, alpha, beta), stats.beta.ppf(upper, alpha, beta)]
+        for level, (lower, upper) in INTERVAL_LEVELS.items()
+    }
+
+
+def test_matches_scalar_beta_ppf():
+    probabilities = np.random.default_rng(5).uniform(0.01, 0.99, 300)
+
+    for probability, intervals in zip(probabilities, credible_intervals(probabilities)):
+        expected = reference_intervals(probability)
+        for level in INTERVAL_LEVELS:
+            # alpha/beta are rounded to 2 decimals before the ppf call
+            np.testing.assert_allclose(intervals[level], expected[level], atol=1e-3)
+
+
+def test_cached_results_equal_uncached():
+    probabilities = [0.12, 0.5, 0.87, 0.5, 0.12]
+
+    first = credible_intervals(probabilities)
+    second = credible_intervals(probabilities)
+
+    assert first == second
+    assert first[0] == first[4] and first[1] == first[3]
+
+
+def test_exact_probabilities_stay_inside_unit_interval():
+    for intervals in credible_intervals([0.0, 1.0]):
+        for lower, upper in intervals.values():
+            assert 0.0 <= lower <= upper <= 1.0
+
+
+def test_empty_input():
+    assert credible_intervals([]) == []
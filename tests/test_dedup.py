@@ -0,0 +1,94 @@
+"""
+MinHash/LSH deduplication vs exhaustive pairwise comparison: with clear near-duplicates the
+banded candidate search must keep exactly the papers a brute-force Jaccard scan keeps
+"""
+
+import random
+
+from dedup import MinHashDeduplicator, normalize_doi, normalize_title
+
+TOPICS = [
+    "platelet rich plasma injections for knee osteoarthritis",
+    "mesenchymal stem cell therapy in rotator cuff repair",
+    "hyaluronic acid viscosupplementation outcomes in older adults",
+    "prolotherapy for chronic low back pain",
+    "bone marrow aspirate concentrate for cartilage defects",
+    "exosome based regeneration of tendon tissue",
+    "adipose derived stromal vascular fraction in hip arthritis",
+    "autologous conditioned serum for lateral epicondylitis",
+]
+DESIGNS = ["a randomized controlled trial", "a systematic review and meta analysis", "a prospective cohort study"]
+
+
+def corpus(seed=3):
+    rng = random.Random(seed)
+    papers = []
+    for index, topic in enumerate(TOPICS):
+        for design_index, design in enumerate(DESIGNS):
+            title = f"{topic.capitalize()}: {design}"
+            base = {"title": title, "pmid": str(10000 + index * 10 + design_index)}
+            papers.append(base)
+            # Case / punctuation variants normalize to the same title
+            papers.append({"title": title.upper() + ".", "gs_id": f"gs-{index}-{design_index}"})
+            # Same record by identifier only
+            papers.append({"title": f"Erratum {index}-{design_index}", "pmid": base["pmid"]})
+            papers.append({"title": f"Preprint {index}-{design_index}", "doi": f"10.1000/{index}.{design_index}"})
+            papers.append({"title": f"Version of record {index}-{design_index}", "doi": f"https://doi.org/10.1000/{index}.{design_index}"})
+            # One-character typo: a near-duplicate well above the threshold
+            position = rng.randrange(len(title) // 2, len(title))
+            papers.append({"title": title[:position] + "x" + title[position + 1:]})
+    rng.shuffle(papers)
+    return papers
+
+
+def brute_force_kept(deduplicator, papers):
+    kept, kept_shingles = [], []
+    pmids, dois = set(), set()
+    for paper in papers:
+        pmid = paper.get("pmid")
+        doi = normalize_doi(paper.get("doi"))
+        shingles = deduplicator.shingles(normalize_title(paper.get("title", "")))
+        duplicate = (pmid and pmid in pmids) or (doi and doi in dois) or any(
+            deduplicator.jaccard(shingles, other) >= deduplicator.threshold for other in kept_shingles
+        )
+        if pmid:
+            pmids.add(pmid)
+        if doi:
+            dois.add(doi)
+        if not duplicate:
+            kept.append(paper)
+            kept_shingles.append(shingles)
+    return kept
+
+
+def test_minhash_keeps_what_brute_force_keeps():
+    deduplicator = MinHashDeduplicator()
+    papers = corpus()
+    expected = [paper["title"] for paper in brute_force_kept(deduplicator, papers)]
+
+    kept = deduplicator.deduplicate([dict(paper) for paper in papers], merge=False)
+
+    assert [paper["title"] for paper in kept] == expected
+    assert len(kept) < len(papers)
+
+
+def test_distinct_titles_are_all_kept():
+    deduplicator = MinHashDeduplicator()
+    papers = [{"title": f"{topic}: {design}"} for topic in TOPICS for design in DESIGNS]
+
+    assert len(deduplicator.deduplicate(papers, merge=False)) == len(papers)
+
+
+def test_merge_keeps_first_seen_and_collects_sources():
+    papers = [
+        {"title": "Platelet rich plasma for knee osteoarthritis", "pmid": "1", "source": "pubmed"},
+        {"title": "PLATELET-RICH PLASMA FOR KNEE OSTEOARTHRITIS", "gs_id": "g1", "abstract": "text"},
+    ]
+
+    kept = MinHashDeduplicator().deduplicate(papers)
+
+    assert len(kept) == 1
+    assert kept[0]["pmid"] == "1"
+    assert kept[0]["gs_id"] == "g1"
+    assert kept[0]["abstract"] == "text"
+    assert kept[0]["sources"] == ["pubmed", "google_scholar"]
@@ -0,0 +1,160 @@
+"""
+Compiled diagnosis knowledge base vs the per-diagnosis rules it replaced
+(_generate_potential_diagnoses / _calculate_prior_probability / _calculate_diagnostic_likelihood)
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from diagnosis_kb import DEFAULT_KB_PATH, load_knowledge_base
+
+CLUES = [
+    "degenerative_conditions", "chronic_degenerative", "mechanical_pattern", "age_related_wear",
+    "knee_pathology", "autoimmune_predisposition", "inflammatory_pattern", "elevated_inflammatory_markers",
+    "morning_stiffness", "autoimmune_progression", "post_traumatic_sequelae", "overuse_injuries",
+    "shoulder_pathology", "occupational_exposure", "nerve_involvement", "widespread_pain",
+    "female_predominance", "activity_related", "unrelated_clue"
+]
+COMPLAINTS = [
+    "", "knee pain", "joint pain and stiffness", "joint swelling", "morning stiffness", "shoulder pain",
+    "rotator cuff tear", "arm weakness", "widespread pain", "tender points", "fatigue", "tendon pain",
+    "activity pain", "chronic pain", "headache"
+]
+GENDERS = ["female", "male", "Female", "unknown", "other", ""]
+
+CLUE_LIKELIHOODS = {
+    "Osteoarthritis": {
+        "degenerative_conditions": 0.9, "mechanical_pattern": 0.85, "age_related_wear": 0.9,
+        "knee_pathology": 0.8, "chronic_degenerative": 0.85
+    },
+    "Rheumatoid Arthritis": {
+        "autoimmune_predisposition": 0.8, "inflammatory_pattern": 0.9, "elevated_inflammatory_markers": 0.7,
+        "morning": 0.85, "autoimmune_progression": 0.9
+    },
+    "Rotator Cuff Injury": {
+        "post_traumatic_sequelae": 0.7, "overuse_injuries": 0.8, "shoulder_pathology": 0.95,
+        "occupational_exposure": 0.6
+    },
+    "Fibromyalgia": {
+        "nerve_involvement": 0.6, "chronic_degenerative": 0.5, "widespread_pain": 0.9, "female": 0.7
+    },
+    "Chronic Tendinopathy": {
+        "overuse_injuries": 0.85, "mechanical_pattern": 0.8, "activity": 0.85, "occupational_exposure": 0.7
+    }
+}
+
+CANDIDATE_RULES = [
+    ("Osteoarthritis", ["degenerative_conditions", "chronic_degenerative", "mechanical_pattern"],
+     ["knee pain", "joint pain", "stiffness"]),
+    ("Rheumatoid Arthritis", ["autoimmune_predisposition", "inflammatory_pattern", "elevated_inflammatory_markers"],
+     ["joint swelling", "morning stiffness"]),
+    ("Rotator Cuff Injury", ["post_traumatic_sequelae", "overuse_injuries"],
+     ["shoulder pain", "rotator cuff", "arm weakness"]),
+    ("Fibromyalgia", ["chronic_degenerative", "nerve_involvement"], ["widespread pain", "tender points", "fatigue"]),
+    ("Chronic Tendinopathy", ["overuse_injuries", "mechanical_pattern"], ["tendon pain", "activity pain", "chronic pain"]),
+]
+FALLBACK_DIAGNOSES = ["Chronic Musculoskeletal Pain", "Joint Degeneration"]
+
+
+def reference_candidates(clues, chief_complaint):
+    chief_complaint = chief_complaint.lower()
+    names = [
+        name for name, trigger_clues, terms in CANDIDATE_RULES
+        if any(clue in trigger_clues for clue in clues) or any(term in chief_complaint for term in terms)
+    ]
+    return (names, True) if names else (list(FALLBACK_DIAGNOSES), False)
+
+
+def reference_prior(name, age, gender):
+    try:
+        age_num = int(age)
+    except (ValueError, TypeError):
+        age_num = 50
+    gender = gender.lower()
+    prevalence = {
+        "Osteoarthritis": (0.15, 1.5 if age_num > 65 else 1.2 if age_num > 50 else 0.8, 1.2 if gender == "female" else 1.0),
+        "Rheumatoid Arthritis": (0.01, 1.3 if 40 <= age_num <= 60 else 1.0, 3.0 if gender == "female" else 1.0),
+        "Rotator Cuff Injury": (0.08, 1.8 if age_num > 60 else 1.0, 1.1 if gender == "male" else 1.0),
+        "Fibromyalgia": (0.02, 1.3 if 30 <= age_num <= 50 else 1.0, 7.0 if gender == "female" else 1.0),
+        "Chronic Tendinopathy": (0.05, 1.2 if age_num > 40 else 1.0, 1.0),
+    }
+    base, age_factor, gender_factor = prevalence.get(name, (0.05, 1.0, 1.0))
+    return min(0.8, base * age_factor * gender_factor)
+
+
+def reference_likelihood(name, clues):
+    if not clues:
+        return 0.5
+    matching = [
+        likelihood
+        for clue in clues
+        for pattern, likelihood in CLUE_LIKELIHOODS.get(name, {}).items()
+        if pattern in clue.lower()
+    ]
+    combined = np.exp(np.mean(np.log(matching))) if matching else 0.3
+    return min(0.95, combined)
+
+
+@pytest.fixture(scope="module")
+def kb():
+    return load_knowledge_base(DEFAULT_KB_PATH)
+
+
+def random_patients(count=500, seed=7):
+    rng = random.Random(seed)
+    for _ in range(count):
+        age = rng.choice([rng.randint(0, 110), str(rng.randint(0, 110)), None, "unknown"])
+        yield (
+            rng.sample(CLUES, rng.randint(0, 5)),
+            {
+                "demographics": {"age": age, "gender": rng.choice(GENDERS)},
+                "clinical_presentation": {"chief_complaint": rng.choice(COMPLAINTS)}
+            }
+        )
+
+
+def test_priors_match_reference(kb):
+    for age in list(range(0, 111)) + ["45", "abc", None]:
+        for gender in GENDERS:
+            expected = [reference_prior(name, age, gender) for name in kb.names]
+            np.testing.assert_allclose(kb.priors(age, gender), expected, rtol=1e-12, err_msg=f"age={age!r} gender={gender!r}")
+
+
+def test_likelihoods_match_reference(kb):
+    rng = random.Random(11)
+    for _ in range(500):
+        clues = [rng.choice(CLUES) for _ in range(rng.randint(0, 6))]
+        expected = [reference_likelihood(name, clues) for name in kb.names]
+        np.testing.assert_allclose(kb.likelihoods(clues), expected, rtol=1e-12, err_msg=str(clues))
+
+
+def test_candidates_priors_and_likelihoods_match_reference(kb):
+    for clues, patient in random_patients():
+        scores = kb.score(clues, patient)
+        complaint = patient["clinical_presentation"]["chief_complaint"]
+        names, pattern_match = reference_candidates(clues, complaint)
+
+        assert scores.names == names
+        assert scores.pattern_match is pattern_match
+        demographics = patient["demographics"]
+        np.testing.assert_allclose(
+            scores.priors, [reference_prior(name, demographics["age"], demographics["gender"]) for name in names], rtol=1e-12
+        )
+        np.testing.assert_allclose(scores.likelihoods, [reference_likelihood(name, clues) for name in names], rtol=1e-12)
+        assert scores.posteriors.sum() == pytest.approx(1.0)
+
+
+def test_clue_memo_is_bounded(kb, monkeypatch):
+    import diagnosis_kb
+
+    monkeypatch.setattr(diagnosis_kb, "CLUE_CACHE_SIZE", 8)
+    for index in range(50):
+        kb.likelihoods([f"free text clue {index} with mechanical_pattern"])
+
+    assert len(kb._clue_patterns) == 8
+    np.testing.assert_allclose(
+        kb.likelihoods(["free text clue 0 with mechanical_pattern"]),
+        [reference_likelihood(name, ["free text clue 0 with mechanical_pattern"]) for name in kb.names]
+    )
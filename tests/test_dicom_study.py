@@ -0,0 +1,80 @@
+"""
+SeriesAggregate pooled statistics must equal the statistics of every frame's pixels taken together
+"""
+
+import numpy as np
+import pytest
+
+import dicom_study
+from dicom_study import SeriesAggregate
+from imaging_kernels import image_statistics
+
+METADATA = {
+    "study_instance_uid": "1.2.3",
+    "series_instance_uid": "1.2.3.4",
+    "modality": "CT",
+    "series_description": "Knee axial",
+    "body_part": "KNEE",
+}
+
+
+def frames(seed=7):
+    rng = np.random.default_rng(seed)
+    # Different shapes and intensity ranges, so an unweighted mean of frame means would be wrong
+    return [
+        rng.normal(40.0, 5.0, size=(64, 64)),
+        rng.normal(300.0, 80.0, size=(32, 48)),
+        rng.normal(-100.0, 20.0, size=(16, 16)),
+        rng.integers(0, 1000, size=(50, 20)).astype(np.float64),
+    ]
+
+
+def aggregate_of(images):
+    aggregate = SeriesAggregate(METADATA)
+    for number, image in enumerate(images):
+        aggregate.add_instance({"sop_instance_uid": f"1.2.3.4.{number}"})
+        aggregate.add_frame(number, 0, image_statistics(image))
+    return aggregate
+
+
+def test_pooled_mean_and_std_match_the_concatenated_frames():
+    images = frames()
+    document = aggregate_of(images).to_document()
+
+    pixels = np.concatenate([image.ravel() for image in images])
+    statistics = document["image_statistics"]
+    assert statistics["mean_intensity"] == pytest.approx(pixels.mean(), rel=1e-9)
+    assert statistics["std_intensity"] == pytest.approx(pixels.std(), rel=1e-9)
+    assert statistics["min_intensity"] == pytest.approx(pixels.min())
+    assert statistics["max_intensity"] == pytest.approx(pixels.max())
+
+    assert document["instance_count"] == document["frame_count"] == len(images)
+    assert document["frame_shapes"] == sorted([list(image.shape) for image in images])
+
+
+def test_constant_series_has_zero_std():
+    document = aggregate_of([np.full((8, 8), 12.0), np.full((4, 4), 12.0)]).to_document()
+
+    assert document["image_statistics"]["mean_intensity"] == pytest.approx(12.0)
+    assert document["image_statistics"]["std_intensity"] == 0.0
+
+
+def test_frame_records_are_capped_but_aggregates_cover_every_frame(monkeypatch):
+    monkeypatch.setattr(dicom_study, "MAX_FRAME_RECORDS", 2)
+    images = frames()
+    document = aggregate_of(images).to_document()
+
+    assert len(document["frames"]) == 2
+    assert document["frames_truncated"]
+    assert document["frame_count"] == len(images)
+    pixels = np.concatenate([image.ravel() for image in images])
+    assert document["image_statistics"]["mean_intensity"] == pytest.approx(pixels.mean(), rel=1e-9)
+
+
+def test_empty_series_document():
+    document = SeriesAggregate(METADATA).to_document()
+
+    assert document["frame_count"] == 0
+    assert document["image_statistics"]["mean_intensity"] == 0.0
+    assert document["image_statistics"]["std_intensity"] == 0.0
+    assert document["mean_quality_score"] == 0.0
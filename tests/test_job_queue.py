@@ -0,0 +1,180 @@
+"""
+Job queue lease fencing, retry/backoff and worker survival, against an in-memory jobs collection
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import bson
+
+from job_queue import JOB_COMPLETED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JobQueue
+
+
+class UpdateResult:
+    def __init__(self, matched_count):
+        self.matched_count = matched_count
+
+
+class FakeJobs:
+    """update_one with equality filters and $set/$unset/$inc, enough for the worker paths"""
+
+    def __init__(self):
+        self.docs = {}
+        self.fail_with = None
+
+    async def update_one(self, query, change, upsert=False):
+        if self.fail_with is not None:
+            raise self.fail_with
+        # Raises InvalidDocument for values Mongo could not store, as the driver would
+        bson.encode(change.get("$set", {}))
+        for doc in self.docs.values():
+            if all(doc.get(field) == value for field, value in query.items()):
+                doc.update(change.get("$set", {}))
+                for field in change.get("$unset", {}):
+                    doc.pop(field, None)
+                for field, value in change.get("$inc", {}).items():
+                    doc[field] = doc.get(field, 0) + value
+                return UpdateResult(1)
+        return UpdateResult(0)
+
+
+class FakeDB:
+    def __init__(self):
+        self.jobs = FakeJobs()
+
+    def __getitem__(self, name):
+        return self.jobs
+
+
+def make_queue(tmp_path, **options):
+    queue = JobQueue(FakeDB(), spool_dir=str(tmp_path), **options)
+    return queue, queue.db.jobs
+
+
+def claimed_job(queue, jobs, attempts=1, max_attempts=3, **fields):
+    job = {
+        "job_id": "job-1",
+        "job_type": "work",
+        "payload": {},
+        "status": JOB_RUNNING,
+        "attempts": attempts,
+        "max_attempts": max_attempts,
+        "worker_id": queue.worker_id,
+        "lease_id": "lease-1",
+        "dedupe_key": "work:1",
+        **fields
+    }
+    jobs.docs[job["job_id"]] = dict(job)
+    return job
+
+
+def test_completion_is_written_while_the_lease_is_held(tmp_path):
+    queue, jobs = make_queue(tmp_path)
+
+    async def handler(job, report_progress):
+        await report_progress(0.5, "halfway")
+        return {"ok": True}
+
+    queue.register_handler("work", handler)
+    asyncio.run(queue._execute(claimed_job(queue, jobs)))
+
+    doc = jobs.docs["job-1"]
+    assert doc["status"] == JOB_COMPLETED
+    assert doc["result"] == {"ok": True}
+    assert "dedupe_key" not in doc
+
+
+def test_result_is_discarded_after_the_lease_is_lost(tmp_path):
+    queue, jobs = make_queue(tmp_path)
+
+    async def handler(job, report_progress):
+        # Another worker reclaims the job mid-run
+        jobs.docs["job-1"].update(worker_id="other-host:1", lease_id="lease-2")
+        await report_progress(0.9, "stale progress")
+        return {"ok": True}
+
+    queue.register_handler("work", handler)
+    asyncio.run(queue._execute(claimed_job(queue, jobs)))
+
+    doc = jobs.docs["job-1"]
+    assert doc["status"] == JOB_RUNNING
+    assert doc["lease_id"] == "lease-2"
+    assert "result" not in doc and "progress_message" not in doc
+
+
+def test_failure_is_retried_with_exponential_backoff(tmp_path):
+    queue, jobs = make_queue(tmp_path, retry_base_seconds=10.0)
+
+    async def handler(job, report_progress):
+        raise RuntimeError("boom")
+
+    queue.register_handler("work", handler)
+    before = datetime.utcnow()
+    asyncio.run(queue._execute(claimed_job(queue, jobs, attempts=2)))
+
+    doc = jobs.docs["job-1"]
+    assert doc["status"] == JOB_QUEUED
+    assert doc["last_error"] == "boom"
+    # base * 2^(attempts - 1) with +/-50% jitter
+    assert before + timedelta(seconds=10) <= doc["run_after"] <= datetime.utcnow() + timedelta(seconds=30)
+    assert doc["dedupe_key"] == "work:1"
+
+
+def test_last_attempt_fails_permanently_and_calls_the_hook(tmp_path):
+    queue, jobs = make_queue(tmp_path)
+    hook_calls = []
+
+    async def handler(job, report_progress):
+        raise RuntimeError("boom")
+
+    async def on_failure(job, error, will_retry):
+        hook_calls.append((str(error), will_retry))
+
+    queue.register_handler("work", handler, on_failure=on_failure)
+    asyncio.run(queue._execute(claimed_job(queue, jobs, attempts=3, max_attempts=3)))
+
+    doc = jobs.docs["job-1"]
+    assert doc["status"] == JOB_FAILED
+    assert "dedupe_key" not in doc
+    assert hook_calls == [("boom", False)]
+
+
+def test_unstorable_result_fails_without_retry(tmp_path):
+    queue, jobs = make_queue(tmp_path)
+
+    async def handler(job, report_progress):
+        return {"value": object()}
+
+    queue.register_handler("work", handler)
+    asyncio.run(queue._execute(claimed_job(queue, jobs, attempts=1, max_attempts=3)))
+
+    doc = jobs.docs["job-1"]
+    assert doc["status"] == JOB_FAILED
+    assert doc["last_error"].startswith("Result could not be stored")
+
+
+def test_worker_survives_failed_bookkeeping_writes(tmp_path):
+    queue, jobs = make_queue(tmp_path, poll_interval=0.01)
+    claims = []
+
+    async def handler(job, report_progress):
+        return {"ok": True}
+
+    async def claim_next():
+        claims.append(1)
+        return claimed_job(queue, jobs) if len(claims) == 1 else None
+
+    queue.register_handler("work", handler)
+    queue._claim_next = claim_next
+    jobs.fail_with = ConnectionError("mongo unreachable")
+
+    async def run():
+        worker = asyncio.create_task(queue._worker_loop(1))
+        await asyncio.sleep(0.1)
+        alive = not worker.done()
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        return alive
+
+    assert asyncio.run(run())
+    assert len(claims) > 1
@@ -0,0 +1,96 @@
+"""
+BM25 literature index: add, replace, flush, merge and reload from disk (no Mongo needed)
+"""
+
+import asyncio
+
+from literature_index import LiteratureIndex
+
+
+def paper(pmid, extra=""):
+    return {
+        "pmid": str(pmid),
+        "title": f"Stem cell therapy {pmid} for the knee {extra}",
+        "abstract": f"Platelet rich plasma and cartilage {'osteoarthritis' if pmid % 3 == 0 else 'tendon'} {extra}",
+        "year": "2020",
+        "relevance_score": 0.5
+    }
+
+
+def keys(index, query, k=200):
+    return [key for key, _ in index.search(query, k=k)]
+
+
+def make_index(tmp_path, **options):
+    index = LiteratureIndex(None, str(tmp_path), writer=True, **options)
+    index.load()
+    return index
+
+
+def test_added_documents_are_searchable(tmp_path):
+    index = make_index(tmp_path)
+
+    assert index.add_documents([paper(pmid) for pmid in range(30)]) == 30
+    assert index.add_documents([paper(pmid) for pmid in range(30)]) == 0
+
+    found = keys(index, "osteoarthritis")
+    assert sorted(found) == sorted(f"pmid:{pmid}" for pmid in range(0, 30, 3))
+    top = [score for _, score in index.search("osteoarthritis", k=5)]
+    assert top == [score for _, score in index.search("osteoarthritis", k=200)][:5]
+
+
+def test_changed_document_replaces_its_old_postings(tmp_path):
+    index = make_index(tmp_path)
+    index.add_documents([paper(pmid) for pmid in range(10)])
+
+    assert index.add_documents([{**paper(3, "zebrafish"), "relevance_score": 0.9}]) == 1
+
+    assert keys(index, "zebrafish") == ["pmid:3"]
+    assert index.document_count == 10
+    found = keys(index, "cartilage")
+    assert len(found) == len(set(found)) == 10
+
+
+def test_flush_persists_segments_that_reload(tmp_path):
+    index = make_index(tmp_path, delta_flush_threshold=5)
+
+    async def build():
+        for start in range(0, 20, 5):
+            await index.index_documents([paper(pmid) for pmid in range(start, start + 5)])
+            await index.maybe_flush()
+        index.add_documents([paper(7, "axolotl")])
+        await index.flush()
+
+    asyncio.run(build())
+    assert index.delta.n_docs == 0
+    assert len(index.segments) >= 4
+
+    reloaded = LiteratureIndex(None, str(tmp_path), writer=False)
+    reloaded.load()
+    assert reloaded.document_count == 20
+    assert keys(reloaded, "axolotl") == ["pmid:7"]
+    assert sorted(keys(reloaded, "cartilage")) == sorted(keys(index, "cartilage"))
+    assert abs(reloaded._total_len - index._total_len) < 1e-3
+
+
+def test_merge_bounds_segments_and_drops_replaced_documents(tmp_path):
+    index = make_index(tmp_path, delta_flush_threshold=5, max_segments=2)
+
+    async def build():
+        for start in range(0, 40, 5):
+            index.add_documents([paper(pmid) for pmid in range(start, start + 5)])
+            await index.maybe_flush()
+        index.add_documents([paper(3, "zebrafish")])
+        await index.flush()
+        # Fill past max_segments again so the replaced version is merged away
+        for start in range(40, 60, 5):
+            index.add_documents([paper(pmid) for pmid in range(start, start + 5)])
+            await index.maybe_flush()
+
+    asyncio.run(build())
+    assert len(index.segments) <= 2
+    assert index.document_count == 60
+    assert sum(segment.n_docs for segment in index.segments) + index.delta.n_docs == 60
+    assert keys(index, "zebrafish") == ["pmid:3"]
+    found = keys(index, "osteoarthritis")
+    assert len(found) == len(set(found)) == 20
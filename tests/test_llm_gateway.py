@@ -0,0 +1,150 @@
+"""
+LLM gateway circuit breaker state machine, alone and driven through the gateway with a mock transport
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import llm_gateway
+from llm_gateway import CircuitBreaker, CircuitOpenError, LLMGateway, LLMGatewayError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_gateway.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_threshold_and_probes_once(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.is_open()
+    assert not breaker.allow_request()
+
+    clock.now += 30.0
+    assert not breaker.is_open()
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only the one probe goes through while it is in flight
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens_for_a_full_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure()
+
+    clock.now += 10.0
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 9.0
+    assert not breaker.allow_request()
+    assert breaker.get_status()["seconds_until_probe"] == pytest.approx(1.0)
+    clock.now += 1.0
+    assert breaker.allow_request()
+
+
+def test_released_probe_lets_the_next_caller_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5.0)
+    breaker.record_failure()
+    clock.now += 5.0
+
+    assert breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def make_gateway(handler, **options):
+    gateway = LLMGateway(api_key="test", backoff_base=0.0, backoff_max=0.0, **options)
+    gateway._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return gateway
+
+
+def test_gateway_fails_fast_once_the_circuit_opens(clock):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503, text="unavailable")
+
+    async def scenario():
+        gateway = make_gateway(handler, max_retries=5, circuit_failure_threshold=2)
+        try:
+            with pytest.raises(LLMGatewayError) as first:
+                await gateway.chat_completion([{"role": "user", "content": "hi"}], model="m")
+            assert first.value.status_code == 503
+            # Retries stop as soon as the breaker opens, not after max_retries
+            assert len(calls) == 2
+
+            with pytest.raises(CircuitOpenError):
+                await gateway.chat_completion([{"role": "user", "content": "hi"}], model="m")
+            assert len(calls) == 2
+        finally:
+            await gateway.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_client_errors_do_not_count_against_the_provider(clock):
+    def handler(request):
+        return httpx.Response(400, text="bad request")
+
+    async def scenario():
+        gateway = make_gateway(handler, circuit_failure_threshold=1)
+        try:
+            for _ in range(3):
+                with pytest.raises(LLMGatewayError) as error:
+                    await gateway.chat_completion([{"role": "user", "content": "hi"}], model="m")
+                assert error.value.status_code == 400
+            assert gateway._get_breaker("m").state == CircuitBreaker.CLOSED
+        finally:
+            await gateway.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_successful_probe_closes_the_circuit(clock):
+    responses = [httpx.Response(503), httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})]
+
+    def handler(request):
+        return responses.pop(0)
+
+    async def scenario():
+        gateway = make_gateway(handler, max_retries=0, circuit_failure_threshold=1, circuit_reset_timeout=30.0)
+        try:
+            with pytest.raises(LLMGatewayError):
+                await gateway.complete([{"role": "user", "content": "hi"}], model="m")
+            assert gateway._get_breaker("m").state == CircuitBreaker.OPEN
+
+            clock.now += 30.0
+            assert await gateway.complete([{"role": "user", "content": "hi"}], model="m") == "ok"
+            assert gateway._get_breaker("m").state == CircuitBreaker.CLOSED
+        finally:
+            await gateway.aclose()
+
+    asyncio.run(scenario())
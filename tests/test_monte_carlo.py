@@ -0,0 +1,65 @@
+"""
+Vectorized Monte Carlo vs the sequential per-scenario reference (simulate_sequential): the two
+draw from the same scenario distribution, so supports, means and adjustments must agree
+"""
+
+import numpy as np
+import pytest
+
+from monte_carlo import MAX_SIMULATIONS, age_adjustment, simulate_diagnostic_probabilities, simulate_sequential
+
+CASES = [
+    ("Osteoarthritis", 58, "moderate", "2 years"),
+    ("Osteoarthritis", 35, "mild", "6 weeks"),
+    ("Rheumatoid Arthritis", 45, "severe", "3 months"),
+    ("Fibromyalgia", 52, "moderate", "several months"),
+    ("Chronic Tendinopathy", "unknown", "moderate", "1 year"),
+    ("Rotator Cuff Injury", 70, "intermittent", "recent"),
+]
+
+
+def scalar_age_adjustment(diagnosis, age):
+    if diagnosis == "Osteoarthritis":
+        return 0.2 if age > 60 else 0.1 if age > 40 else -0.1
+    if diagnosis == "Rheumatoid Arthritis":
+        return 0.15 if 40 <= age <= 60 else 0.05
+    return 0.05 if age > 50 else 0.0
+
+
+@pytest.mark.parametrize("diagnosis", ["Osteoarthritis", "Rheumatoid Arthritis", "Fibromyalgia"])
+def test_age_adjustment_matches_scalar_rules(diagnosis):
+    ages = np.concatenate([np.arange(0, 111, 0.5), [39.999, 40.0, 40.001, 50.0, 59.999, 60.0, 60.001]])
+    expected = [scalar_age_adjustment(diagnosis, age) for age in ages]
+    np.testing.assert_array_equal(age_adjustment(diagnosis, ages), expected)
+
+
+@pytest.mark.parametrize("diagnosis,age,severity,duration", CASES)
+def test_vectorized_matches_sequential_distribution(diagnosis, age, severity, duration):
+    vectorized = simulate_diagnostic_probabilities(diagnosis, age, severity, duration, num_simulations=20000, seed=1)
+    sequential = simulate_sequential(diagnosis, age, severity, duration, num_simulations=20000, seed=2)
+
+    assert vectorized.shape == sequential.shape == (20000,)
+    assert set(np.round(vectorized, 10)) == set(np.round(sequential, 10))
+    assert vectorized.mean() == pytest.approx(sequential.mean(), abs=0.005)
+    assert vectorized.min() >= 0.05 and vectorized.max() <= 0.95
+
+
+def test_deterministic_inputs_match_exactly():
+    # No numeric age, no severity level to shift, no duration to reword: nothing is random
+    args = ("Osteoarthritis", "n/a", "intermittent", "recent")
+    np.testing.assert_array_equal(
+        simulate_diagnostic_probabilities(*args, num_simulations=100, seed=0),
+        simulate_sequential(*args, num_simulations=100, seed=0)
+    )
+
+
+def test_fixed_seed_is_reproducible():
+    first = simulate_diagnostic_probabilities("Osteoarthritis", 58, "moderate", "2 years", num_simulations=1000, seed=42)
+    second = simulate_diagnostic_probabilities("Osteoarthritis", 58, "moderate", "2 years", num_simulations=1000, seed=42)
+    np.testing.assert_array_equal(first, second)
+
+
+@pytest.mark.parametrize("num_simulations", [0, MAX_SIMULATIONS + 1])
+def test_num_simulations_out_of_range(num_simulations):
+    with pytest.raises(ValueError):
+        simulate_diagnostic_probabilities("Osteoarthritis", 58, "moderate", "2 years", num_simulations=num_simulations)
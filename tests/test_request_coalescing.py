@@ -0,0 +1,121 @@
+"""
+SingleFlight sharing, isolation, cancellation and failure paths
+"""
+
+import asyncio
+
+import pytest
+
+from request_coalescing import SingleFlight, coalesce, content_hash, single_flight
+
+KEY = ("analysis", "patient-1", "hash")
+
+
+def test_concurrent_callers_share_one_execution_with_their_own_copies():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"findings": ["a"]}
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.run(KEY, work) for _ in range(5)))
+        assert len(calls) == 1
+        assert all(result == {"findings": ["a"]} for result in results)
+        assert len({id(result) for result in results}) == 5
+        assert flight.get_status() == {"in_flight": 0, "by_operation": {}}
+
+        # Completed work is not cached; the next call runs again
+        await flight.run(KEY, work)
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_do_not_coalesce():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return len(calls)
+
+    async def scenario():
+        flight = SingleFlight()
+        await asyncio.gather(flight.run(KEY, work), flight.run(("analysis", "patient-2", "hash"), work))
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def scenario():
+        flight = SingleFlight()
+        gate = asyncio.Event()
+
+        async def work():
+            await gate.wait()
+            return "done"
+
+        leader = asyncio.ensure_future(flight.run(KEY, work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.run(KEY, work))
+        await asyncio.sleep(0)
+        assert flight.get_status()["by_operation"] == {"analysis": 1}
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        assert await follower == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(scenario())
+
+
+def test_failure_reaches_every_caller_and_releases_the_key():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def boom():
+            await asyncio.sleep(0.01)
+            raise ValueError("provider down")
+
+        results = await asyncio.gather(*(flight.run(KEY, boom) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.get_status()["in_flight"] == 0
+
+        async def ok():
+            return "recovered"
+
+        assert await flight.run(KEY, ok) == "recovered"
+
+    asyncio.run(scenario())
+
+
+def test_coalesce_decorator_keys_on_patient_and_content():
+    calls = []
+
+    @coalesce("protocol", lambda patient_id, payload: (patient_id, payload))
+    async def generate(patient_id, payload):
+        calls.append(patient_id)
+        await asyncio.sleep(0.01)
+        return {"patient": patient_id}
+
+    async def scenario():
+        await asyncio.gather(
+            generate("p1", {"a": 1, "b": 2}),
+            generate("p1", {"b": 2, "a": 1}),
+            generate("p2", {"a": 1, "b": 2}),
+        )
+        assert sorted(calls) == ["p1", "p2"]
+        assert single_flight.get_status()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
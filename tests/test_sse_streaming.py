@@ -0,0 +1,56 @@
+"""
+Incremental JSON array extraction must not depend on where the stream is split into deltas
+"""
+
+import json
+
+from sse_streaming import IncrementalJSONArrayParser, format_sse
+
+DOCUMENT = json.dumps({
+    "summary": "Staged plan [see notes] with {braces}",
+    "protocol_steps": [
+        {"step": 1, "action": "Ultrasound-guided PRP", "notes": "avoid \"}\" and \"]\" confusion"},
+        {"step": 2, "action": "Rest", "details": {"days": [1, 2, 3], "path": "C:\\\\rehab\\\\"}},
+        {"step": 3, "action": "Re-evaluate {pain} score", "tags": []},
+    ],
+    "confidence": 0.8,
+})
+EXPECTED = json.loads(DOCUMENT)["protocol_steps"]
+
+
+def parse(chunks):
+    parser = IncrementalJSONArrayParser("protocol_steps")
+    emitted = []
+    for chunk in chunks:
+        emitted.extend(parser.feed(chunk))
+    return parser, emitted
+
+
+def test_every_two_chunk_split_yields_the_same_items():
+    for cut in range(len(DOCUMENT) + 1):
+        parser, emitted = parse([DOCUMENT[:cut], DOCUMENT[cut:]])
+        assert emitted == EXPECTED, f"split at {cut}: {DOCUMENT[max(0, cut - 10):cut + 10]!r}"
+        assert parser.items == EXPECTED
+        assert parser.text == DOCUMENT
+
+
+def test_character_deltas_emit_each_item_as_soon_as_it_closes():
+    parser = IncrementalJSONArrayParser("protocol_steps")
+    emitted_at = []
+    for position, char in enumerate(DOCUMENT):
+        for item in parser.feed(char):
+            emitted_at.append((position, item))
+
+    assert [item for _, item in emitted_at] == EXPECTED
+    # Each item is emitted on the delta carrying its closing brace, not when the array ends
+    closing = [DOCUMENT.index(json.dumps(item)) + len(json.dumps(item)) - 1 for item in EXPECTED]
+    assert [position for position, _ in emitted_at] == closing
+
+
+def test_nothing_is_emitted_after_the_array_closes():
+    parser, emitted = parse([DOCUMENT, ', "extra": [{"step": 99}]'])
+    assert emitted == EXPECTED
+
+
+def test_format_sse_frames_event_and_json_payload():
+    assert format_sse("step", {"n": 1}) == 'event: step\ndata: {"n": 1}\n\n'